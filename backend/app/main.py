@@ -83,10 +83,15 @@ from app.utils.sse import heartbeats_until_done
 from app.rag.settings_api import router as retrieval_settings_router
 from app.rag.search_api import router as retrieval_search_router
 from app.rag.pipeline_api import router as pipeline_router
+from app.rag.audit_writer import search_audit_writer
+from app.rag.local_keyword_index import local_keyword_index
+from app.rag.local_vector_index import local_vector_index
 from app.rag.pipeline_dispatcher import pipeline_dispatcher
 from app.rag.pipeline_repository import pipeline_repository
 from app.rag.profile_repository import profile_repository
+from app.rag.search_deadline import search_deadline_ms
 from app.rag.search_pipeline import principal_hash, search_pipeline
+from app.rag.text_index_maintenance import text_index_maintainer
 from app.rag.oracle_repository import rag_repository
 from app.rag.oracle_schema import (
     MIGRATION_CONFIRMATION,
@@ -110,11 +115,21 @@ async def lifespan(app: FastAPI):
         "1", "true", "yes", "on"
     }:
         await pipeline_dispatcher.start()
+    await search_audit_writer.start()
+    # 公開Release投影表のOracle Text索引は手動同期のため、Dispatcherの有無に関係なく保守する。
+    await text_index_maintainer.start()
+    await local_vector_index.start()
+    await local_keyword_index.start()
     yield
     # shutdown処理
     logger.info("アプリケーションシャットダウン開始...")
 
     await pipeline_dispatcher.stop()
+    await text_index_maintainer.stop()
+    await local_vector_index.stop()
+    await local_keyword_index.stop()
+    # 受け付け済みの検索監査・フィードバックはDB接続を閉じる前に書き込む。
+    await search_audit_writer.stop()
     
     # データベースサービスのシャットダウン
     try:
@@ -1546,6 +1561,7 @@ async def _legacy_search_from_profiles(
         filename_filter=filename_filter,
         image=image,
         image_media_type=image_media_type,
+        deadline_ms=search_deadline_ms("search"),
     )
     documents = result.results
     scheme = request.headers.get("X-Forwarded-Proto", request.url.scheme)
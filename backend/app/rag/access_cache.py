@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.rag.env import env_int
+
+DOCUMENT_ACCESS_CACHE_DEFAULT_MAX_ENTRIES = 1024
+DOCUMENT_ACCESS_CACHE_DEFAULT_TTL_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class DocumentAccess:
+    """利用者が読める文書IDの解決結果。
+
+    ``unrestricted`` は解決時点の全文書が読めることを表し、検索SQLから
+    ACL条件自体を省略できる。
+    """
+
+    document_ids: frozenset[str]
+    unrestricted: bool = False
+
+    @property
+    def mode(self) -> str:
+        return "unrestricted" if self.unrestricted else "document_ids"
+
+
+class DocumentAccessCache:
+    """利用者(user_hash)ごとのアクセス可能文書集合のプロセス内LRU/TTLキャッシュ。
+
+    ACL行は文書登録時に追加され、文書削除時にカスケード削除される。
+    どちらも ``bump_epoch`` で全エントリを破棄する。別プロセスでの変更は
+    TTLで反映する。``DOCUMENT_ACCESS_CACHE_MAX_ENTRIES=0`` で無効化し、
+    検索は行ごとのEXISTS判定に戻る。
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, tuple[float, DocumentAccess]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        self._last_invalidation: str | None = None
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def max_entries() -> int:
+        return env_int(
+            "DOCUMENT_ACCESS_CACHE_MAX_ENTRIES", DOCUMENT_ACCESS_CACHE_DEFAULT_MAX_ENTRIES
+        )
+
+    @staticmethod
+    def ttl_seconds() -> int:
+        return env_int(
+            "DOCUMENT_ACCESS_CACHE_TTL_SECONDS", DOCUMENT_ACCESS_CACHE_DEFAULT_TTL_SECONDS
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries() > 0 and self.ttl_seconds() > 0
+
+    @property
+    def epoch(self) -> int:
+        with self._lock:
+            return self._epoch
+
+    def bump_epoch(self, reason: str) -> int:
+        """ACLまたは文書集合が変わったことを記録し、既存エントリをすべて破棄する。"""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._last_invalidation = reason
+            return self._epoch
+
+    def get(self, user_hash: str) -> DocumentAccess | None:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_hash)
+            if entry is not None and entry[0] <= now:
+                del self._entries[user_hash]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(user_hash)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, user_hash: str, access: DocumentAccess, *, epoch: int) -> bool:
+        """解決開始時のepochが現在と一致する場合だけ保存する。"""
+        limit = self.max_entries()
+        ttl = self.ttl_seconds()
+        if limit <= 0 or ttl <= 0:
+            return False
+        with self._lock:
+            # 解決中にACLが変わった集合は保存しない。
+            if epoch != self._epoch:
+                return False
+            self._entries[user_hash] = (time.monotonic() + ttl, access)
+            self._entries.move_to_end(user_hash)
+            while len(self._entries) > limit:
+                self._entries.popitem(last=False)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "epoch": self._epoch,
+                "size": len(self._entries),
+                "max_entries": self.max_entries(),
+                "ttl_seconds": self.ttl_seconds(),
+                "hits": self._hits,
+                "misses": self._misses,
+                "last_invalidation": self._last_invalidation,
+            }
+
+
+document_access_cache = DocumentAccessCache()
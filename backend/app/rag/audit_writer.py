@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any
+
+from app.rag.background import BackgroundRefresher
+from app.rag.env import env_int
+from app.rag.oracle_repository import rag_repository
+
+logger = logging.getLogger(__name__)
+
+SEARCH_AUDIT_WRITER_DEFAULT_BATCH_SIZE = 200
+SEARCH_AUDIT_WRITER_DEFAULT_FLUSH_INTERVAL_MS = 1000
+SEARCH_AUDIT_WRITER_DEFAULT_MAX_BUFFER = 10000
+SEARCH_AUDIT_WRITER_DEFAULT_DRAIN_TIMEOUT_SECONDS = 10
+
+
+class SearchAuditWriter(BackgroundRefresher):
+    """検索監査とフィードバックの書き込みを応答から切り離すwrite-behindキュー。
+
+    行は件数（``SEARCH_AUDIT_WRITER_BATCH_SIZE``）か経過時間
+    （``SEARCH_AUDIT_WRITER_FLUSH_INTERVAL_MS``）のどちらかでexecutemanyにまとめて
+    書き込む。フィードバックは参照先の監査行より後に書き込む。
+
+    破棄方針: 未書き込み行が ``SEARCH_AUDIT_WRITER_MAX_BUFFER`` に達すると、新しく
+    届いた行を受け付けずに破棄し ``dropped`` に数える（既に受け付けた行は残す）。
+    書き込みに失敗したバッチは再試行せず ``failed`` に数える。監査は従来どおり
+    ベストエフォートで、検索応答を遅らせない。停止時は残りを書き込んでから終了する。
+    """
+
+    task_name = "search-audit-writer"
+    failure_message = "検索監査の書き込みに失敗しました"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._audits: deque[dict[str, Any]] = deque()
+        self._feedback: deque[dict[str, Any]] = deque()
+        # 受け付け済みでまだコミットしていない監査行のtrace_id（書き込み中のバッチを含む）。
+        self._pending_traces: set[str] = set()
+        self._flush_lock = asyncio.Lock()
+        self._written = {"audit": 0, "feedback": 0}
+        self._dropped = {"audit": 0, "feedback": 0}
+        self._failed = {"audit": 0, "feedback": 0}
+
+    @staticmethod
+    def batch_size() -> int:
+        return max(1, env_int(
+            "SEARCH_AUDIT_WRITER_BATCH_SIZE", SEARCH_AUDIT_WRITER_DEFAULT_BATCH_SIZE
+        ))
+
+    @staticmethod
+    def flush_interval_seconds() -> float:
+        return max(1, env_int(
+            "SEARCH_AUDIT_WRITER_FLUSH_INTERVAL_MS",
+            SEARCH_AUDIT_WRITER_DEFAULT_FLUSH_INTERVAL_MS,
+        )) / 1000
+
+    @staticmethod
+    def max_buffer() -> int:
+        return env_int("SEARCH_AUDIT_WRITER_MAX_BUFFER", SEARCH_AUDIT_WRITER_DEFAULT_MAX_BUFFER)
+
+    @staticmethod
+    def drain_timeout_seconds() -> int:
+        return env_int(
+            "SEARCH_AUDIT_WRITER_DRAIN_TIMEOUT_SECONDS",
+            SEARCH_AUDIT_WRITER_DEFAULT_DRAIN_TIMEOUT_SECONDS,
+        )
+
+    @property
+    def buffered(self) -> int:
+        return len(self._audits) + len(self._feedback)
+
+    def enabled(self) -> bool:
+        """``SEARCH_AUDIT_WRITER_MAX_BUFFER=0`` では起動せず、呼び出し側は同期で書き込む。"""
+        return self.max_buffer() > 0
+
+    def interval_seconds(self) -> float:
+        return self.flush_interval_seconds()
+
+    async def start(self) -> None:
+        if not self.running:
+            # イベントループごとに作り直す。
+            self._flush_lock = asyncio.Lock()
+        await super().start()
+
+    async def stop(self) -> None:
+        """受け付け済みの行を書き込んでから停止する。"""
+        task = self._signal_stop()
+        timeout = self.drain_timeout_seconds() or None
+        try:
+            # 書き込みループは停止指示を受けて実行中のflushを終えてから抜ける。
+            if task:
+                await asyncio.wait_for(task, timeout=timeout)
+            if self.buffered:
+                await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("検索監査の書き込みが停止期限内に終わりませんでした: %s件", self.buffered)
+
+    def submit_audit(self, row: dict[str, Any]) -> bool:
+        accepted = self._submit("audit", self._audits, row)
+        if accepted:
+            self._pending_traces.add(str(row["trace"]))
+        return accepted
+
+    def has_pending_trace(self, trace_id: str) -> bool:
+        """監査行がキューにあり、まだDBで参照できない検索ならTrue。"""
+        return trace_id in self._pending_traces
+
+    def submit_feedback(self, row: dict[str, Any]) -> bool:
+        return self._submit("feedback", self._feedback, row)
+
+    def _submit(self, kind: str, buffer: deque[dict[str, Any]], row: dict[str, Any]) -> bool:
+        if self._stopping or self.buffered >= self.max_buffer():
+            self._dropped[kind] += 1
+            return False
+        buffer.append(row)
+        if self.buffered >= self.batch_size():
+            self.wake()
+        return True
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            # 監査行を先に書き込み、フィードバックの外部キー参照を満たす。
+            while self._audits:
+                await self._write("audit", self._audits, rag_repository.record_search_audits)
+            while self._feedback:
+                await self._write(
+                    "feedback", self._feedback, rag_repository.record_search_feedbacks
+                )
+
+    async def _write(self, kind: str, buffer: deque[dict[str, Any]], insert: Any) -> None:
+        size = self.batch_size()
+        batch = [buffer.popleft() for _ in range(min(size, len(buffer)))]
+        try:
+            failed = await asyncio.to_thread(insert, batch)
+        except Exception:
+            logger.warning("検索%sの一括書き込みに失敗しました: %s件", kind, len(batch), exc_info=True)
+            failed = len(batch)
+        self._failed[kind] += failed
+        self._written[kind] += len(batch) - failed
+        if kind == "audit":
+            self._pending_traces.difference_update(str(row["trace"]) for row in batch)
+
+    async def tick(self) -> None:
+        await self.flush()
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "running": self.running,
+            "buffered": self.buffered,
+            "max_buffer": self.max_buffer(),
+            "written": dict(self._written),
+            "dropped": dict(self._dropped),
+            "failed": dict(self._failed),
+        }
+
+
+search_audit_writer = SearchAuditWriter()
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from contextlib import suppress
+
+
+class BackgroundRefresher:
+    """一定間隔と ``wake`` による即時起床で ``tick`` を繰り返すバックグラウンドタスク。
+
+    監査の書き込み・Oracle Text索引の保守・プロセス内索引の更新が共通に使う。
+    派生クラスは ``task_name`` ・ ``failure_message`` ・ ``interval_seconds`` ・ ``tick`` を定め、
+    起動条件があれば ``enabled`` を上書きする。``tick`` の例外は記録して次の周期へ進む。
+    """
+
+    task_name = "background-refresher"
+    failure_message = "バックグラウンド処理に失敗しました"
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task[None] | None = None
+        self._wake = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stopping = False
+
+    def enabled(self) -> bool:
+        return True
+
+    def interval_seconds(self) -> float:
+        raise NotImplementedError
+
+    async def tick(self) -> None:
+        raise NotImplementedError
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running or not self.enabled():
+            return
+        self._stopping = False
+        # イベントループごとに作り直す（テストや再起動で別ループから起動される）。
+        self._wake = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run(), name=self.task_name)
+
+    def wake(self) -> None:
+        """次の周期を待たずに ``tick`` を実行させる（別スレッドから呼べる）。"""
+        loop = self._loop
+        if not self.running or loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass
+
+    def _signal_stop(self) -> asyncio.Task[None] | None:
+        """停止を指示し、実行中のタスクを手放して返す。"""
+        self._stopping = True
+        self._wake.set()
+        task = self._task
+        self._task = None
+        self._loop = None
+        return task
+
+    async def stop(self) -> None:
+        task = self._signal_stop()
+        if task:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            # 実行中に届いた起床で次の周期がすぐ始まるよう、先に解除する。
+            self._wake.clear()
+            try:
+                await self.tick()
+            except Exception:
+                logging.getLogger(type(self).__module__).warning(
+                    self.failure_message, exc_info=True
+                )
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval_seconds())
+            except asyncio.TimeoutError:
+                pass
@@ -14,7 +14,10 @@ import httpx
 from openai import AsyncOpenAI
 from PIL import Image
 
+from app.rag.embedding_cache import embedding_cache_key, query_embedding_cache
+from app.rag.env import env_int
 from app.rag.models import MinerUSettings, OcrEngineSettings, RerankSettings
+from app.rag.pipeline_models import EMBEDDING_OUTPUT_DIMENSIONS
 from app.services.image_vectorizer import image_vectorizer
 from app.services.oci_service import oci_service
 
@@ -352,12 +355,32 @@ class OciRerankClient:
         return await asyncio.to_thread(request)
 
 
+# OCI Generative AIのembed_textが1リクエストで受け付けるTEXT入力の上限。
+EMBEDDING_TEXT_BATCH_MAX_INPUTS = 96
+
+
+def truncate_embedding(values: list[float], dimensions: int) -> list[float]:
+    """Matryoshka表現の先頭 ``dimensions`` 次元を取り出し、単位長に正規化し直す。
+
+    検索クエリは1536次元で1回だけ埋め込み、低次元レシピにはこの値を渡す。
+    """
+    if dimensions >= len(values):
+        return values
+    head = values[:dimensions]
+    norm = sum(value * value for value in head) ** 0.5
+    return [value / norm for value in head] if norm else head
+
+
 class EmbeddingClient:
     """Cohere Embed 4 の文書・画像・混合入力を1つの入口で扱うクライアント。"""
 
     MODEL_ID = "cohere.embed-v4.0"
     OUTPUT_DIMENSIONS = 1536
 
+    @classmethod
+    def model_id(cls) -> str:
+        return os.environ.get("OCI_COHERE_EMBED_MODEL", cls.MODEL_ID)
+
     @staticmethod
     def _image_url(value: bytes, media_type: str) -> str:
         maximum = int(os.environ.get("EMBEDDING_IMAGE_MAX_BYTES", str(4 * 1024 * 1024)))
@@ -382,30 +405,73 @@ class EmbeddingClient:
         return f"data:{image_type};base64,{base64.b64encode(data).decode()}"
 
     @staticmethod
-    def _validate_vector(value: Any) -> list[float]:
+    def _validate_vector(value: Any, dimensions: int = OUTPUT_DIMENSIONS) -> list[float]:
         vector = [float(item) for item in value]
-        if len(vector) != EmbeddingClient.OUTPUT_DIMENSIONS:
+        if len(vector) != dimensions:
             raise ValueError(
                 f"OCI Embeddingの次元数が不正です: "
-                f"{len(vector)}（期待値: {EmbeddingClient.OUTPUT_DIMENSIONS}）"
+                f"{len(vector)}（期待値: {dimensions}）"
             )
         return vector
 
+    @staticmethod
+    def _models() -> Any:
+        if not image_vectorizer.genai_client:
+            image_vectorizer._initialize_genai_only()
+        if not image_vectorizer.genai_client:
+            raise RuntimeError("OCI Generative AI Embeddingが設定されていません")
+        return importlib.import_module("oci.generative_ai_inference.models")
+
+    def _embed(
+        self,
+        models: Any,
+        *,
+        input_type: str,
+        expected: int,
+        dimensions: int = OUTPUT_DIMENSIONS,
+        **inputs: Any,
+    ) -> list[list[float]]:
+        details = models.EmbedTextDetails(
+            serving_mode=models.OnDemandServingMode(model_id=self.model_id()),
+            compartment_id=os.environ.get("OCI_COMPARTMENT_OCID"),
+            input_type=input_type,
+            output_dimensions=dimensions,
+            embedding_types=["float"],
+            truncate=os.environ.get("OCI_EMBEDDING_TRUNCATE", "END"),
+            is_echo=False,
+            **inputs,
+        )
+        response = image_vectorizer._retry_embedding_api_call(
+            image_vectorizer.genai_client.embed_text,
+            details,
+        )
+        embeddings = getattr(response.data, "embeddings", None) or []
+        if not embeddings:
+            embeddings_by_type = getattr(response.data, "embeddings_by_type", None)
+            if isinstance(embeddings_by_type, dict):
+                embeddings = (
+                    embeddings_by_type.get("float")
+                    or embeddings_by_type.get("FLOAT")
+                    or []
+                )
+        if len(embeddings) != expected:
+            raise ValueError(f"OCI Embeddingの応答件数が不正です: {len(embeddings)}")
+        return [self._validate_vector(item, dimensions) for item in embeddings]
+
     def _request(
         self,
         *,
         ordered_contents: list[tuple[str, str | bytes, str]],
         input_type: str,
+        dimensions: int = OUTPUT_DIMENSIONS,
     ) -> list[float]:
         if not ordered_contents:
             raise ValueError("Embedding入力がありません")
         if input_type not in {"SEARCH_DOCUMENT", "SEARCH_QUERY"}:
             raise ValueError("Embeddingのinput_typeが不正です")
-        if not image_vectorizer.genai_client:
-            image_vectorizer._initialize_genai_only()
-        if not image_vectorizer.genai_client:
-            raise RuntimeError("OCI Generative AI Embeddingが設定されていません")
-        models = importlib.import_module("oci.generative_ai_inference.models")
+        if dimensions not in EMBEDDING_OUTPUT_DIMENSIONS:
+            raise ValueError(f"未対応のEmbedding次元数です: {dimensions}")
+        models = self._models()
         contents: list[Any] = []
         image_count = 0
         for content_type, value, media_type in ordered_contents:
@@ -432,34 +498,28 @@ class EmbeddingClient:
                 raise ValueError(f"未対応のEmbedding入力です: {content_type}")
         if not contents:
             raise ValueError("Embedding入力に空白以外のテキストまたは画像がありません")
-        details = models.EmbedTextDetails(
-            serving_mode=models.OnDemandServingMode(
-                model_id=os.environ.get("OCI_COHERE_EMBED_MODEL", self.MODEL_ID)
-            ),
-            compartment_id=os.environ.get("OCI_COMPARTMENT_OCID"),
-            embed_contents=contents,
+        return self._embed(
+            models,
             input_type=input_type,
-            output_dimensions=self.OUTPUT_DIMENSIONS,
-            embedding_types=["float"],
-            truncate=os.environ.get("OCI_EMBEDDING_TRUNCATE", "END"),
-            is_echo=False,
-        )
-        response = image_vectorizer._retry_embedding_api_call(
-            image_vectorizer.genai_client.embed_text,
-            details,
+            expected=1,
+            dimensions=dimensions,
+            embed_contents=contents,
+        )[0]
+
+    def _request_texts(self, *, texts: list[str], input_type: str) -> list[list[float]]:
+        """複数TEXTを1リクエストで埋め込む。応答はtextsと同じ順序。"""
+        if input_type not in {"SEARCH_DOCUMENT", "SEARCH_QUERY"}:
+            raise ValueError("Embeddingのinput_typeが不正です")
+        return self._embed(
+            self._models(), input_type=input_type, expected=len(texts), inputs=texts
         )
-        embeddings = getattr(response.data, "embeddings", None) or []
-        if not embeddings:
-            embeddings_by_type = getattr(response.data, "embeddings_by_type", None)
-            if isinstance(embeddings_by_type, dict):
-                embeddings = (
-                    embeddings_by_type.get("float")
-                    or embeddings_by_type.get("FLOAT")
-                    or []
-                )
-        if len(embeddings) != 1:
-            raise ValueError(f"OCI Embeddingの応答件数が不正です: {len(embeddings)}")
-        return self._validate_vector(embeddings[0])
+
+    @staticmethod
+    def _is_batch_limit_error(error: Exception) -> bool:
+        """入力件数・サイズ上限による失敗か。設定・認証・内容の誤り（その他の400）は分割しない。"""
+        if getattr(error, "status", None) == 413:
+            return True
+        return "too many inputs" in str(error).casefold()
 
     async def contents(
         self,
@@ -469,6 +529,7 @@ class EmbeddingClient:
         media_type: str = "image/png",
         ordered_contents: list[tuple[str, str | bytes, str]] | None = None,
         input_type: str = "SEARCH_DOCUMENT",
+        dimensions: int = OUTPUT_DIMENSIONS,
     ) -> list[float]:
         ordered = list(ordered_contents or [])
         if not ordered:
@@ -479,18 +540,90 @@ class EmbeddingClient:
             self._request,
             ordered_contents=ordered,
             input_type=input_type,
+            dimensions=dimensions,
         )
 
+    @staticmethod
+    def text_batch_size() -> int:
+        value = env_int("OCI_EMBEDDING_TEXT_BATCH_SIZE", EMBEDDING_TEXT_BATCH_MAX_INPUTS)
+        return max(1, min(value, EMBEDDING_TEXT_BATCH_MAX_INPUTS))
+
+    @staticmethod
+    def concurrency() -> int:
+        return max(1, env_int("OCI_EMBEDDING_CONCURRENCY", 4))
+
+    async def _text_batch(
+        self, texts: list[str], input_type: str, semaphore: asyncio.Semaphore
+    ) -> list[list[float]]:
+        # 同時実行数の枠は実際のリクエストごとに取り、分割後の再送も上限内に収める。
+        try:
+            async with semaphore:
+                return await asyncio.to_thread(
+                    self._request_texts, texts=texts, input_type=input_type
+                )
+        except Exception as error:
+            # 入力件数・サイズ上限に掛かったバッチは半分に割って再送する。
+            if len(texts) <= 1 or not self._is_batch_limit_error(error):
+                raise
+            middle = len(texts) // 2
+            head, tail = await asyncio.gather(
+                self._text_batch(texts[:middle], input_type, semaphore),
+                self._text_batch(texts[middle:], input_type, semaphore),
+            )
+            return [*head, *tail]
+
     async def text(
         self, values: list[str], *, input_type: str = "SEARCH_DOCUMENT"
     ) -> list[list[float]]:
-        return [
-            await self.contents(texts=[value], input_type=input_type)
-            for value in values
-        ]
+        """TEXT入力をまとめて埋め込む。結果はvaluesと同じ順序で返す。
+
+        ``OCI_EMBEDDING_TEXT_BATCH_SIZE`` 件ずつ1リクエストにまとめ、各リクエストは
+        ``OCI_EMBEDDING_CONCURRENCY`` 件まで同時に送る。バッチサイズ1では従来どおり
+        値ごとに ``contents`` を呼ぶ。
+        """
+        texts = [str(value).strip() for value in values]
+        if any(not text for text in texts):
+            raise ValueError("Embedding入力に空白以外のテキストまたは画像がありません")
+        if not texts:
+            return []
+        batch_size = self.text_batch_size()
+        semaphore = asyncio.Semaphore(self.concurrency())
+
+        async def run(batch: list[str]) -> list[list[float]]:
+            if batch_size == 1:
+                async with semaphore:
+                    return [await self.contents(texts=batch, input_type=input_type)]
+            return await self._text_batch(batch, input_type, semaphore)
+
+        results = await asyncio.gather(
+            *(
+                run(texts[start : start + batch_size])
+                for start in range(0, len(texts), batch_size)
+            )
+        )
+        return [vector for batch in results for vector in batch]
 
     async def query(self, values: list[str]) -> list[list[float]]:
-        return await self.text(values, input_type="SEARCH_QUERY")
+        """検索クエリをEmbeddingする。同じクエリの再計算はquery_embedding_cacheで省く。"""
+        keys = [
+            embedding_cache_key(
+                value,
+                model_id=self.model_id(),
+                dimensions=self.OUTPUT_DIMENSIONS,
+                input_type="SEARCH_QUERY",
+            )
+            for value in values
+        ]
+        cached = await query_embedding_cache.get_many(keys)
+        missing = {
+            key: value for key, value in zip(keys, values) if key not in cached
+        }
+        if missing:
+            embeddings = await self.text(list(missing.values()), input_type="SEARCH_QUERY")
+            fresh = dict(zip(missing, embeddings))
+            await query_embedding_cache.put_many(fresh)
+            cached.update(fresh)
+        return [cached[key] for key in keys]
 
     async def image(
         self,
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, Protocol
+
+from app.rag.env import env_int
+
+QUERY_EMBEDDING_CACHE_DEFAULT_MAX_ENTRIES = 2048
+QUERY_EMBEDDING_CACHE_DEFAULT_TTL_SECONDS = 3600
+
+
+def normalize_embedding_text(value: str) -> str:
+    return " ".join(str(value).split())
+
+
+def embedding_cache_key(
+    value: str, *, model_id: str, dimensions: int, input_type: str
+) -> str:
+    """正規化テキスト・モデル・次元数・input_typeを1つのキーにまとめる。"""
+    material = "\x1f".join(
+        (model_id, str(dimensions), input_type, normalize_embedding_text(value))
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class SharedEmbeddingCache(Protocol):
+    """複数APIノードで共有するキャッシュ層（任意）。同期APIでワーカースレッドから呼ばれる。"""
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]: ...
+
+    def set_many(self, values: dict[str, list[float]], ttl_seconds: int) -> None: ...
+
+
+@dataclass
+class EmbeddingCacheUsage:
+    hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {"hits": self.hits, "shared_hits": self.shared_hits, "misses": self.misses}
+
+
+_usage: ContextVar[EmbeddingCacheUsage | None] = ContextVar(
+    "query_embedding_cache_usage", default=None
+)
+
+
+class QueryEmbeddingCache:
+    """検索クエリEmbeddingのプロセス内LRU/TTLキャッシュ。
+
+    ``QUERY_EMBEDDING_CACHE_MAX_ENTRIES=0`` で無効化する。共有層が設定されて
+    いればローカルmiss時に参照し、取得・保存の失敗は検索を止めずmiss扱いにする。
+    """
+
+    def __init__(self, shared: SharedEmbeddingCache | None = None) -> None:
+        self.shared = shared
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def max_entries() -> int:
+        return env_int(
+            "QUERY_EMBEDDING_CACHE_MAX_ENTRIES", QUERY_EMBEDDING_CACHE_DEFAULT_MAX_ENTRIES
+        )
+
+    @staticmethod
+    def ttl_seconds() -> int:
+        return env_int(
+            "QUERY_EMBEDDING_CACHE_TTL_SECONDS", QUERY_EMBEDDING_CACHE_DEFAULT_TTL_SECONDS
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries() > 0
+
+    def _local_get(self, key: str, now: float) -> list[float] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, vector = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _local_put(self, key: str, vector: list[float], now: float) -> None:
+        limit = self.max_entries()
+        ttl = self.ttl_seconds()
+        if limit <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (now + ttl, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > limit:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _record(self, *, hits: int = 0, shared_hits: int = 0, misses: int = 0) -> None:
+        with self._lock:
+            self._hits += hits
+            self._shared_hits += shared_hits
+            self._misses += misses
+        usage = _usage.get()
+        if usage is not None:
+            usage.hits += hits
+            usage.shared_hits += shared_hits
+            usage.misses += misses
+
+    async def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        if not self.enabled:
+            return {}
+        now = time.monotonic()
+        found: dict[str, list[float]] = {}
+        for key in dict.fromkeys(keys):
+            vector = self._local_get(key, now)
+            if vector is not None:
+                found[key] = vector
+        local_hits = len(found)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        shared_found: dict[str, list[float]] = {}
+        if missing and self.shared is not None:
+            try:
+                shared_found = await asyncio.to_thread(self.shared.get_many, missing)
+            except Exception:
+                shared_found = {}
+            for key, vector in shared_found.items():
+                if key in missing:
+                    found[key] = vector
+                    self._local_put(key, vector, now)
+        self._record(
+            hits=local_hits,
+            shared_hits=len(found) - local_hits,
+            misses=len(missing) - (len(found) - local_hits),
+        )
+        return found
+
+    async def put_many(self, values: dict[str, list[float]]) -> None:
+        if not self.enabled or not values:
+            return
+        now = time.monotonic()
+        for key, vector in values.items():
+            self._local_put(key, vector, now)
+        if self.shared is not None:
+            try:
+                await asyncio.to_thread(self.shared.set_many, values, self.ttl_seconds())
+            except Exception:
+                return
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries(),
+                "ttl_seconds": self.ttl_seconds(),
+                "shared_tier": self.shared is not None,
+                "hits": self._hits,
+                "shared_hits": self._shared_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+    @contextmanager
+    def track(self) -> Iterator[EmbeddingCacheUsage]:
+        """このコンテキスト内のhit/miss件数を1検索分として集計する。"""
+        usage = EmbeddingCacheUsage()
+        token = _usage.set(usage)
+        try:
+            yield usage
+        finally:
+            _usage.reset(token)
+
+
+query_embedding_cache = QueryEmbeddingCache()
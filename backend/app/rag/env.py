@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    """0以上の整数の環境変数。未設定なら ``default`` 、整数でなければ ``default`` を返す。"""
+    try:
+        return max(0, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """真偽値の環境変数。未設定なら ``default`` 、``1/true/yes/on`` 以外は偽。"""
+    value = os.environ.get(name)
+    return default if value is None else value.casefold() in {"1", "true", "yes", "on"}
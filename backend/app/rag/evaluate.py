@@ -59,19 +59,27 @@ def _dcg(ranked: list[str], gains: dict[str, float], k: int) -> float:
 
 
 async def evaluate(cases: list[EvaluationCase]) -> dict[str, Any]:
+    # 全ケースを1回のバッチ検索で実行し、Embeddingとリランク枠を共有する。
+    batch = await search_pipeline.search_batch([
+        {
+            "query": case.query,
+            "top_k": 120,
+            "field_filters": case.field_filters,
+            "document_types": [],
+            "current_version_only": True,
+            "user_hash": "evaluation-principal",
+            "image": case.image_path.read_bytes() if case.image_path else None,
+            # 評価は近似誤差を含めないよう厳密検索で行う。
+            "vector_accuracy": "precise",
+            "debug": True,
+        }
+        for case in cases
+    ])
     rows: list[dict[str, Any]] = []
-    for case in cases:
-        image = case.image_path.read_bytes() if case.image_path else None
-        response = await search_pipeline.search(
-            query=case.query,
-            top_k=120,
-            field_filters=case.field_filters,
-            document_types=[],
-            current_version_only=True,
-            user_hash="evaluation-principal",
-            image=image,
-            debug=True,
-        )
+    for case, outcome in zip(cases, batch.results):
+        if outcome.response is None:
+            raise RuntimeError(f"{case.case_id}: {outcome.error}")
+        response = outcome.response
         final_ids = [item.document_id for item in response.results]
         pre_ids = [str(value) for value in response.diagnostics.get("pre_rerank_document_ids", [])]
         relevant = set(case.gains)
@@ -0,0 +1,723 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+
+from app.rag.access_cache import DocumentAccess
+from app.rag.background import BackgroundRefresher
+from app.rag.env import env_bool, env_int
+from app.rag.local_vector_index import document_filter_mask
+from app.rag.models import ProfileConfig
+from app.rag.oracle_repository import (
+    ASCII_TOKEN_PATTERN,
+    HIRAGANA_RUN_PATTERN,
+    KANJI_RUN_PATTERN,
+    KATAKANA_RUN_PATTERN,
+    TOKEN_PATTERN,
+    ChannelQuery,
+    RetrievalHit,
+    oracle_text_term_weights,
+    oracle_text_terms,
+    rag_repository,
+)
+
+logger = logging.getLogger(__name__)
+
+LOCAL_KEYWORD_DEFAULT_DIR = "storage/local_keywords"
+LOCAL_KEYWORD_DEFAULT_REFRESH_SECONDS = 30
+LOCAL_KEYWORD_DEFAULT_MAX_SEGMENTS = 8
+# 1回のSELECTで読む文書数（配列バインドの大きさ）。
+LOCAL_KEYWORD_FETCH_DOCUMENTS = 200
+# 差し替えで無効になった行がこの割合を超えたらセグメント数に関係なく統合する。
+LOCAL_KEYWORD_MERGE_DEAD_RATIO = 0.3
+# 字句解析・ファイル形式を変えたら上げる（保存済みの索引を作り直す）。
+LOCAL_KEYWORD_FORMAT = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_ARRAYS = ("offsets", "posting_rows", "posting_tfs", "lengths", "slots")
+
+
+def local_keyword_enabled() -> bool:
+    """``LOCAL_KEYWORD_ENABLED`` がtrueならキーワード検索をプロセス内の転置索引で行う。"""
+    return env_bool("LOCAL_KEYWORD_ENABLED", False)
+
+
+def _bigrams(run: str) -> list[str]:
+    return [run[index:index + 2] for index in range(len(run) - 1)]
+
+
+def keyword_tokens(text: str) -> list[str]:
+    """索引語の列。英数字は語単位、かな漢字は ``oracle_text_terms`` と同じ字種の連なりを2文字ずつに分ける。"""
+    tokens: list[str] = []
+    for match in TOKEN_PATTERN.finditer(text):
+        raw = match.group(0)
+        if ASCII_TOKEN_PATTERN.fullmatch(raw):
+            if len(raw) >= 2:
+                tokens.append(raw.casefold())
+            continue
+        for pattern in (KANJI_RUN_PATTERN, KATAKANA_RUN_PATTERN, HIRAGANA_RUN_PATTERN):
+            for run in pattern.findall(raw.casefold()):
+                tokens.extend(_bigrams(run))
+    return tokens
+
+
+def term_tokens(term: str) -> list[str]:
+    """検索語（``oracle_text_terms`` の1語）を索引語に分ける。かな漢字語は全bigramを含む行だけが一致する。"""
+    if ASCII_TOKEN_PATTERN.fullmatch(term):
+        return [term.casefold()]
+    return list(dict.fromkeys(_bigrams(term.casefold())))
+
+
+def _slot(component_key: str) -> int:
+    prefix, _, value = component_key.partition(":")
+    return int(value) if prefix == "vlm" and value.isdigit() else 0
+
+
+class _KeywordSegment:
+    """不変の転置索引セグメント。
+
+    索引語ごとの出現行（``posting_rows``）と出現回数（``posting_tfs``）を
+    索引語順に連結し、``offsets`` で区切る。保存後はメモリマップで読む。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        terms: list[str],
+        arrays: dict[str, np.ndarray],
+        hits: list[RetrievalHit],
+    ) -> None:
+        self.name = name
+        self.terms = terms
+        self.vocabulary = {term: index for index, term in enumerate(terms)}
+        self.offsets = arrays["offsets"]
+        self.posting_rows = arrays["posting_rows"]
+        self.posting_tfs = arrays["posting_tfs"]
+        self.lengths = arrays["lengths"]
+        self.slots = arrays["slots"]
+        self.hits = hits
+        # 行→文書は文書ID一覧への添字で持ち、状態の作り直しでは文書数分だけ引き直す。
+        self.document_keys, self.row_documents = np.unique(
+            np.asarray([hit.document_id for hit in hits], dtype=object), return_inverse=True
+        ) if hits else (np.zeros(0, dtype=object), np.zeros(0, dtype=np.int64))
+
+    @property
+    def size(self) -> int:
+        return len(self.hits)
+
+    def postings(self, token: str) -> tuple[np.ndarray, np.ndarray]:
+        index = self.vocabulary.get(token)
+        if index is None:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16)
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        return np.asarray(self.posting_rows[start:end]), np.asarray(self.posting_tfs[start:end])
+
+    @classmethod
+    def build(
+        cls,
+        name: str,
+        rows: list[tuple[RetrievalHit, str, str, str | None, bool]],
+    ) -> "_KeywordSegment":
+        counts = [Counter(keyword_tokens(search_text)) for _, _, search_text, _, _ in rows]
+        terms = sorted({token for counter in counts for token in counter})
+        vocabulary = {term: index for index, term in enumerate(terms)}
+        term_ids = np.fromiter(
+            (vocabulary[token] for counter in counts for token in counter), dtype=np.int64
+        )
+        posting_rows = np.fromiter(
+            (row for row, counter in enumerate(counts) for _ in counter), dtype=np.int32
+        )
+        tfs = np.fromiter(
+            (min(count, 65535) for counter in counts for count in counter.values()),
+            dtype=np.uint16,
+        )
+        arrays = _postings(term_ids, posting_rows, tfs, len(terms))
+        arrays["lengths"] = np.asarray(
+            [sum(counter.values()) for counter in counts], dtype=np.int32
+        )
+        arrays["slots"] = np.asarray([_slot(item[1]) for item in rows], dtype=np.int16)
+        return cls(name, terms, arrays, [item[0] for item in rows])
+
+    @classmethod
+    def merge(cls, name: str, parts: list[tuple["_KeywordSegment", np.ndarray]]) -> "_KeywordSegment":
+        """各セグメントの有効な行だけを、出現リストを展開し直して1つにまとめる。"""
+        terms = sorted({term for segment, _ in parts for term in segment.terms})
+        vocabulary = {term: index for index, term in enumerate(terms)}
+        term_ids: list[np.ndarray] = []
+        posting_rows: list[np.ndarray] = []
+        tfs: list[np.ndarray] = []
+        lengths: list[np.ndarray] = []
+        slots: list[np.ndarray] = []
+        hits: list[RetrievalHit] = []
+        for segment, alive in parts:
+            remap = np.cumsum(alive) - 1 + len(hits)
+            mapping = np.asarray([vocabulary[term] for term in segment.terms], dtype=np.int64)
+            posting_terms = np.repeat(
+                np.arange(len(segment.terms)), np.diff(np.asarray(segment.offsets))
+            )
+            keep = alive[segment.posting_rows]
+            term_ids.append(mapping[posting_terms[keep]])
+            posting_rows.append(remap[np.asarray(segment.posting_rows)[keep]].astype(np.int32))
+            tfs.append(np.asarray(segment.posting_tfs)[keep])
+            lengths.append(np.asarray(segment.lengths)[alive])
+            slots.append(np.asarray(segment.slots)[alive])
+            hits.extend(hit for hit, keep_row in zip(segment.hits, alive) if keep_row)
+        arrays = _postings(
+            np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64),
+            np.concatenate(posting_rows) if posting_rows else np.zeros(0, dtype=np.int32),
+            np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.uint16),
+            len(terms),
+        )
+        # 有効な行から消えた索引語を語彙から外す。
+        used = np.diff(arrays["offsets"]) > 0
+        if not used.all():
+            arrays["offsets"] = np.concatenate([[0], np.cumsum(np.diff(arrays["offsets"])[used])])
+            terms = [term for term, keep in zip(terms, used) if keep]
+        arrays["lengths"] = np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.int32)
+        arrays["slots"] = np.concatenate(slots) if slots else np.zeros(0, dtype=np.int16)
+        return cls(name, terms, arrays, hits)
+
+    def save(self, directory: Path) -> None:
+        target = directory / self.name
+        target.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "offsets": self.offsets,
+            "posting_rows": self.posting_rows,
+            "posting_tfs": self.posting_tfs,
+            "lengths": self.lengths,
+            "slots": self.slots,
+        }
+        for name, value in arrays.items():
+            np.save(target / f"{name}.npy", np.asarray(value))
+        (target / "terms.json").write_text(json.dumps(self.terms, ensure_ascii=False), "utf-8")
+        (target / "hits.json").write_text(
+            json.dumps(
+                [
+                    {key: value for key, value in asdict(hit).items() if key not in {"score", "channel"}}
+                    for hit in self.hits
+                ],
+                ensure_ascii=False,
+            ),
+            "utf-8",
+        )
+        # 最後に書くmeta.jsonで、途中で止まった書き出しを読み込み時に検出する。
+        (target / "meta.json").write_text(
+            json.dumps({"rows": self.size, "terms": len(self.terms)}), "utf-8"
+        )
+
+    @classmethod
+    def load(cls, directory: Path, name: str) -> "_KeywordSegment | None":
+        target = directory / name
+        try:
+            meta = json.loads((target / "meta.json").read_text("utf-8"))
+            terms = json.loads((target / "terms.json").read_text("utf-8"))
+            hits = json.loads((target / "hits.json").read_text("utf-8"))
+            arrays = {
+                item: np.load(target / f"{item}.npy", mmap_mode="r") for item in _SEGMENT_ARRAYS
+            }
+        except (OSError, ValueError):
+            return None
+        if not (
+            len(hits) == len(arrays["lengths"]) == len(arrays["slots"]) == meta.get("rows")
+            and len(terms) + 1 == len(arrays["offsets"]) and len(terms) == meta.get("terms")
+        ):
+            return None
+        return cls(
+            name,
+            terms,
+            arrays,
+            [RetrievalHit(**item, score=0.0, channel="") for item in hits],
+        )
+
+
+def _postings(
+    term_ids: np.ndarray, rows: np.ndarray, tfs: np.ndarray, terms: int
+) -> dict[str, np.ndarray]:
+    order = np.lexsort((rows, term_ids))
+    offsets = np.zeros(terms + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=terms))
+    return {
+        "offsets": offsets,
+        "posting_rows": rows[order].astype(np.int32),
+        "posting_tfs": tfs[order].astype(np.uint16),
+    }
+
+
+@dataclass
+class _KeywordDocument:
+    token: str
+    segment: str
+    file_name: str = ""
+    document_type: str = ""
+    is_current: bool = True
+
+
+class _KeywordState:
+    """検索に使う1時点の索引（セグメント一覧と文書表）。更新は新しいインスタンスで差し替える。"""
+
+    def __init__(
+        self,
+        segments: list[_KeywordSegment],
+        documents: dict[str, _KeywordDocument],
+        next_segment: int,
+    ) -> None:
+        self.segments = segments
+        self.documents = documents
+        self.next_segment = next_segment
+        self.document_ids = list(documents)
+        index_of = {key: index for index, key in enumerate(self.document_ids)}
+        self.document_arrays = (
+            np.asarray(self.document_ids, dtype=object),
+            np.asarray([documents[key].is_current for key in self.document_ids], dtype=bool),
+            np.asarray([documents[key].document_type for key in self.document_ids], dtype=object),
+            np.asarray([documents[key].file_name for key in self.document_ids], dtype=object),
+        )
+        # 行は自分の文書が今そのセグメントを指しているときだけ有効（差し替え前の行は無効）。
+        self.row_documents: list[np.ndarray] = []
+        self.alive: list[np.ndarray] = []
+        for segment in segments:
+            keys = [
+                index_of[key]
+                if key in documents and documents[key].segment == segment.name
+                else -1
+                for key in segment.document_keys
+            ]
+            mapped = np.asarray(keys, dtype=np.int64)[segment.row_documents]
+            self.row_documents.append(np.maximum(mapped, 0))
+            self.alive.append(mapped >= 0)
+        self.live_rows = int(sum(int(alive.sum()) for alive in self.alive))
+        total_length = sum(
+            int(np.asarray(segment.lengths)[alive].sum())
+            for segment, alive in zip(segments, self.alive)
+        )
+        self.average_length = total_length / self.live_rows if self.live_rows else 0.0
+
+    @property
+    def total_rows(self) -> int:
+        return sum(segment.size for segment in self.segments)
+
+    def search(
+        self,
+        weights: dict[str, int],
+        *,
+        top_k: int,
+        slot: int | None,
+        **filters: Any,
+    ) -> list[tuple[RetrievalHit, float]]:
+        """検索語ごとのBM25（かな漢字語はbigramの和）を重み付きで足し上げる。"""
+        if not self.live_rows or not weights:
+            return []
+        tokens = {token: None for term in weights for token in term_tokens(term)}
+        postings = [
+            {token: segment.postings(token) for token in tokens} for segment in self.segments
+        ]
+        # 文書頻度は絞り込みに関係なく有効な全行で数える（Oracle Textと同じく索引全体の統計）。
+        idf: dict[str, float] = {}
+        for token in tokens:
+            frequency = sum(
+                int(alive[postings[index][token][0]].sum())
+                for index, alive in enumerate(self.alive)
+            )
+            idf[token] = math.log(1 + (self.live_rows - frequency + 0.5) / (frequency + 0.5))
+        document_ok = document_filter_mask(*self.document_arrays, **filters)
+        candidates: list[tuple[int, np.ndarray, np.ndarray]] = []
+        for index, segment in enumerate(self.segments):
+            row_ok = self.alive[index] & document_ok[self.row_documents[index]]
+            if slot is not None:
+                row_ok &= np.asarray(segment.slots) == slot
+            if not row_ok.any():
+                continue
+            lengths = np.asarray(segment.lengths, dtype=np.float64)
+            matched_rows: list[np.ndarray] = []
+            matched_scores: list[np.ndarray] = []
+            for term, weight in weights.items():
+                parts = term_tokens(term)
+                term_rows: list[np.ndarray] = []
+                term_scores: list[np.ndarray] = []
+                for token in parts:
+                    rows, tfs = postings[index][token]
+                    keep = row_ok[rows]
+                    rows, tf = rows[keep], tfs[keep].astype(np.float64)
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / self.average_length)
+                    term_rows.append(rows)
+                    term_scores.append(idf[token] * tf * (BM25_K1 + 1) / (tf + norm))
+                if not parts or any(not len(rows) for rows in term_rows):
+                    continue
+                unique, inverse, counts = np.unique(
+                    np.concatenate(term_rows), return_inverse=True, return_counts=True
+                )
+                sums = np.bincount(inverse, weights=np.concatenate(term_scores))
+                complete = counts == len(parts)
+                matched_rows.append(unique[complete])
+                matched_scores.append(sums[complete] * weight)
+            if not matched_rows:
+                continue
+            unique, inverse = np.unique(np.concatenate(matched_rows), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+                unique, scores = unique[best], scores[best]
+            candidates.append((index, unique, scores))
+        ranked = [
+            (self.segments[index].hits[int(row)], float(score))
+            for index, rows, scores in candidates
+            for row, score in zip(rows, scores)
+        ]
+        ranked.sort(key=lambda item: (-item[1], item[0].evidence_id))
+        return ranked[:top_k]
+
+
+class LocalKeywordIndex(BackgroundRefresher):
+    """公開Releaseの検索テキストをBM25の転置索引としてAPIプロセス内に持つ検索バックエンド。
+
+    ``keyword_search`` / ``facet_keyword_search`` は ``OracleRagRepository`` の同名
+    メソッドと同じ引数で呼べ、同じ検索語（``oracle_text_terms`` ・バリエーションの重み）を
+    使う。索引は ``LOCAL_KEYWORD_DIR`` にセグメント単位で保存し、出現リストはメモリマップで
+    読む。公開Releaseが変わった文書は新しいセグメントへ書き、旧行は文書表から外して無効にする。
+    セグメントが ``LOCAL_KEYWORD_MAX_SEGMENTS`` を超えるか無効行が増えたら1つに統合する。
+    """
+
+    task_name = "local-keyword-index"
+    failure_message = "プロセス内キーワード索引の更新に失敗しました"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._state: _KeywordState | None = None
+        self._refresh_lock = threading.Lock()
+        # 索引の差し替えと削除済み文書の除外を直列にする（更新より短時間だけ持つ）。
+        self._publish_lock = threading.Lock()
+        # 実行中の更新が読んだ版一覧より後に削除された文書。
+        self._forgotten: set[str] = set()
+        self._searches = 0
+        self._last_refresh: dict[str, Any] = {}
+
+    @staticmethod
+    def directory() -> Path:
+        return Path(os.environ.get("LOCAL_KEYWORD_DIR") or LOCAL_KEYWORD_DEFAULT_DIR)
+
+    @staticmethod
+    def refresh_seconds() -> int:
+        return max(1, env_int("LOCAL_KEYWORD_REFRESH_SECONDS", LOCAL_KEYWORD_DEFAULT_REFRESH_SECONDS))
+
+    @staticmethod
+    def max_segments() -> int:
+        return max(1, env_int("LOCAL_KEYWORD_MAX_SEGMENTS", LOCAL_KEYWORD_DEFAULT_MAX_SEGMENTS))
+
+    @property
+    def ready(self) -> bool:
+        return local_keyword_enabled() and self._state is not None
+
+    def serves(
+        self, query: ChannelQuery, *, user_hash: str | None, access: DocumentAccess | None = None
+    ) -> bool:
+        """このチャンネルをプロセス内で検索できるか。"""
+        if query.kind not in {"keyword", "facet_keyword"} or not self.ready:
+            return False
+        if query.kind == "facet_keyword" and query.profile is None:
+            return False
+        return not (user_hash and access is None)
+
+    def _search(
+        self,
+        *,
+        query: str,
+        variants: list[str] | None,
+        channel: str,
+        slot: int | None,
+        top_k: int,
+        user_hash: str | None,
+        access: DocumentAccess | None,
+        **filters: Any,
+    ) -> list[RetrievalHit]:
+        state = self._state
+        if state is None or not self.ready:
+            raise LookupError("プロセス内キーワード索引が準備できていません")
+        if user_hash and access is None:
+            raise ValueError("プロセス内キーワード検索にはアクセス可能文書集合が必要です")
+        # Oracle側と同じく、利用者を特定できない検索は結果を返さない。
+        if not user_hash:
+            return []
+        weights = (
+            oracle_text_term_weights(variants)
+            if variants
+            else dict.fromkeys(oracle_text_terms(query), 1)
+        )
+        ranked = state.search(weights, top_k=max(1, top_k), slot=slot, access=access, **filters)
+        self._searches += 1
+        return [
+            replace(
+                hit,
+                # Oracle TextのSCORE/100と同じく0〜1に収める（順位は変わらない）。
+                score=score / (1 + score),
+                channel=channel,
+                **({"slot_no": slot, "caption": hit.raw_text} if slot is not None else {}),
+            )
+            for hit, score in ranked
+        ]
+
+    def keyword_search(self, *, query: str, top_k: int, user_hash: str | None,
+                       current_version_only: bool, document_types: list[str],
+                       filename_filter: str | None = None,
+                       access: DocumentAccess | None = None,
+                       variants: list[str] | None = None) -> list[RetrievalHit]:
+        return self._search(
+            query=query,
+            variants=variants,
+            channel="keyword:page_text",
+            slot=None,
+            top_k=top_k,
+            user_hash=user_hash,
+            access=access,
+            current_version_only=current_version_only,
+            document_types=document_types,
+            filename_filter=filename_filter,
+        )
+
+    def facet_keyword_search(self, *, profile: ProfileConfig, query: str, top_k: int,
+                             user_hash: str | None, current_version_only: bool,
+                             document_types: list[str], filename_filter: str | None = None,
+                             access: DocumentAccess | None = None,
+                             variants: list[str] | None = None) -> list[RetrievalHit]:
+        if not profile.current_revision_id:
+            return []
+        return self._search(
+            query=query,
+            variants=variants,
+            channel=f"keyword:vlm_text_slot_{profile.slot_no}",
+            slot=profile.slot_no,
+            top_k=top_k,
+            user_hash=user_hash,
+            access=access,
+            current_version_only=current_version_only,
+            document_types=document_types,
+            filename_filter=filename_filter,
+        )
+
+    def search_channels(
+        self,
+        queries: list[ChannelQuery],
+        *,
+        top_k: int,
+        user_hash: str | None,
+        current_version_only: bool,
+        document_types: list[str],
+        filename_filter: str | None = None,
+        access: DocumentAccess | None = None,
+    ) -> dict[int, list[RetrievalHit]]:
+        """プロセス内で検索できるチャンネルだけを検索し、位置→結果で返す。"""
+        filters: dict[str, Any] = {
+            "top_k": top_k,
+            "user_hash": user_hash,
+            "current_version_only": current_version_only,
+            "document_types": document_types,
+            "filename_filter": filename_filter,
+            "access": access,
+        }
+        results: dict[int, list[RetrievalHit]] = {}
+        for index, query in enumerate(queries):
+            if not self.serves(query, user_hash=user_hash, access=access):
+                continue
+            if query.kind == "facet_keyword" and query.profile is not None:
+                results[index] = self.facet_keyword_search(
+                    profile=query.profile, query=query.query or "", variants=query.variants,
+                    **filters,
+                )
+            else:
+                results[index] = self.keyword_search(
+                    query=query.query or "", variants=query.variants, **filters
+                )
+        return results
+
+    def _load(self) -> _KeywordState:
+        directory = self.directory()
+        try:
+            manifest = json.loads((directory / "manifest.json").read_text("utf-8"))
+        except (OSError, ValueError):
+            manifest = {}
+        if manifest.get("format") != LOCAL_KEYWORD_FORMAT:
+            return _KeywordState([], {}, 1)
+        segments = [_KeywordSegment.load(directory, name) for name in manifest.get("segments", [])]
+        if any(segment is None for segment in segments):
+            # 欠けたセグメントがあれば全文書を読み直す。
+            return _KeywordState([], {}, int(manifest.get("next_segment") or 1))
+        return _KeywordState(
+            [segment for segment in segments if segment is not None],
+            {key: _KeywordDocument(**value) for key, value in manifest.get("documents", {}).items()},
+            int(manifest.get("next_segment") or 1),
+        )
+
+    def _persist(self, state: _KeywordState) -> None:
+        directory = self.directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / "manifest.json.tmp").write_text(
+            json.dumps(
+                {
+                    "format": LOCAL_KEYWORD_FORMAT,
+                    "segments": [segment.name for segment in state.segments],
+                    "next_segment": state.next_segment,
+                    "documents": {key: asdict(value) for key, value in state.documents.items()},
+                },
+                ensure_ascii=False,
+            ),
+            "utf-8",
+        )
+        os.replace(directory / "manifest.json.tmp", directory / "manifest.json")
+        # 一覧から外れたセグメントを消す（検索中のメモリマップは閉じるまで読める）。
+        keep = {segment.name for segment in state.segments}
+        for path in directory.glob(f"{_SEGMENT_PREFIX}*"):
+            if path.name not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _stored(self, segment: _KeywordSegment) -> _KeywordSegment:
+        """セグメントを保存し、メモリマップで開き直したものを返す。保存できなければメモリ上のまま使う。"""
+        try:
+            segment.save(self.directory())
+        except OSError:
+            logger.warning("プロセス内キーワード索引を保存できませんでした", exc_info=True)
+            return segment
+        return _KeywordSegment.load(self.directory(), segment.name) or segment
+
+    def refresh(self) -> dict[str, Any]:
+        """公開中の文書の版をOracleと照合し、変わった文書だけを新しいセグメントに索引する。"""
+        if not local_keyword_enabled():
+            return {}
+        with self._refresh_lock:
+            started = time.perf_counter()
+            state = self._state
+            loaded = state is None
+            if state is None:
+                state = self._load()
+            with self._publish_lock:
+                # ここより前の削除は版一覧に反映済み。
+                self._forgotten = set()
+            versions = rag_repository.serving_document_versions()
+            changed = [
+                document_id
+                for document_id, token in versions.items()
+                if document_id not in state.documents
+                or state.documents[document_id].token != token
+            ]
+            removed = [document_id for document_id in state.documents if document_id not in versions]
+            documents = {
+                key: value for key, value in state.documents.items() if key not in removed
+            }
+            segments = list(state.segments)
+            next_segment = state.next_segment
+            if changed:
+                rows: list[tuple[RetrievalHit, str, str, str | None, bool]] = []
+                for start in range(0, len(changed), LOCAL_KEYWORD_FETCH_DOCUMENTS):
+                    rows.extend(rag_repository.local_keyword_rows(
+                        document_ids=changed[start:start + LOCAL_KEYWORD_FETCH_DOCUMENTS]
+                    ))
+                name = f"{_SEGMENT_PREFIX}{next_segment:06d}"
+                if rows:
+                    next_segment += 1
+                    segments.append(self._stored(_KeywordSegment.build(name, rows)))
+                metadata = {row[0].document_id: row for row in rows}
+                for document_id in changed:
+                    row = metadata.get(document_id)
+                    documents[document_id] = _KeywordDocument(
+                        token=versions[document_id],
+                        segment=name,
+                        file_name=row[0].file_name.casefold() if row else "",
+                        document_type=str(row[3] or "").casefold() if row else "",
+                        is_current=bool(row[4]) if row else True,
+                    )
+            updated = _KeywordState(segments, documents, next_segment)
+            merged = False
+            dead = updated.total_rows - updated.live_rows
+            if len(segments) > self.max_segments() or (
+                dead and dead > updated.total_rows * LOCAL_KEYWORD_MERGE_DEAD_RATIO
+            ):
+                name = f"{_SEGMENT_PREFIX}{next_segment:06d}"
+                segment = self._stored(
+                    _KeywordSegment.merge(name, list(zip(updated.segments, updated.alive)))
+                )
+                updated = _KeywordState(
+                    [segment],
+                    {key: replace(value, segment=name) for key, value in documents.items()},
+                    next_segment + 1,
+                )
+                merged = True
+            if changed or removed or merged:
+                try:
+                    self._persist(updated)
+                except OSError:
+                    logger.warning("プロセス内キーワード索引の一覧を保存できませんでした", exc_info=True)
+            # 参照の差し替えだけで公開し、検索中の呼び出しは古い索引を使い終える。
+            updated = self._publish(updated)
+            self._last_refresh = {
+                "loaded_from_disk": loaded and bool(state.segments),
+                "documents_updated": len(changed) + len(removed),
+                "segments": len(updated.segments),
+                "rows": updated.live_rows,
+                "merged": merged,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000),
+            }
+            return self._last_refresh
+
+    def _publish(self, state: _KeywordState) -> _KeywordState:
+        with self._publish_lock:
+            if any(document_id in state.documents for document_id in self._forgotten):
+                state = self._without(state, self._forgotten)
+            self._state = state
+            return state
+
+    @staticmethod
+    def _without(state: _KeywordState, document_ids: set[str]) -> _KeywordState:
+        return _KeywordState(
+            state.segments,
+            {key: value for key, value in state.documents.items() if key not in document_ids},
+            state.next_segment,
+        )
+
+    def forget_documents(self, document_ids: Sequence[str]) -> None:
+        """削除した文書の行を次の確認を待たずに検索対象から外す（別スレッドから呼べる）。"""
+        if not document_ids:
+            return
+        with self._publish_lock:
+            self._forgotten.update(document_ids)
+            state = self._state
+            if state is not None and any(key in state.documents for key in document_ids):
+                self._state = self._without(state, set(document_ids))
+        self.notify_published(document_ids[0])
+
+    def notify_published(self, document_id: str) -> None:
+        """公開Releaseが変わった文書を次の確認を待たずに反映させる（別スレッドから呼べる）。"""
+        self.wake()
+
+    def enabled(self) -> bool:
+        return local_keyword_enabled()
+
+    def interval_seconds(self) -> float:
+        return self.refresh_seconds()
+
+    async def tick(self) -> None:
+        await asyncio.to_thread(self.refresh)
+
+    def stats(self) -> dict[str, Any]:
+        state = self._state
+        return {
+            "enabled": local_keyword_enabled(),
+            "ready": self.ready,
+            "segments": len(state.segments) if state else 0,
+            "rows": state.live_rows if state else 0,
+            "searches": self._searches,
+            "last_refresh": self._last_refresh,
+        }
+
+
+local_keyword_index = LocalKeywordIndex()
@@ -0,0 +1,764 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Any, Literal, Sequence
+
+import numpy as np
+
+from app.rag.access_cache import DocumentAccess
+from app.rag.background import BackgroundRefresher
+from app.rag.env import env_int
+from app.rag.oracle_repository import (
+    VECTOR_TARGET_ACCURACY_DEFAULT,
+    VECTOR_TARGET_ACCURACY_EXACT,
+    ChannelQuery,
+    RetrievalHit,
+    rag_repository,
+)
+from app.rag.vector_shadow import quantize_int8
+
+logger = logging.getLogger(__name__)
+
+LocalVectorDtype = Literal["float32", "int8"]
+LOCAL_VECTOR_DEFAULT_DIR = "storage/local_vectors"
+LOCAL_VECTOR_DEFAULT_REFRESH_SECONDS = 30
+LOCAL_VECTOR_DEFAULT_IVF_MIN_ROWS = 20000
+LOCAL_VECTOR_DEFAULT_IVF_PROBES = 8
+# 1回のSELECTで読む文書数（配列バインドの大きさ）。
+LOCAL_VECTOR_FETCH_DOCUMENTS = 500
+# 削除済み行・追記セグメントがこの割合を超えたら1つの行列に詰め直して保存する。
+LOCAL_VECTOR_COMPACT_RATIO = 0.2
+LOCAL_VECTOR_KMEANS_ITERATIONS = 10
+LOCAL_VECTOR_KMEANS_SAMPLE = 50000
+LOCAL_VECTOR_ASSIGN_CHUNK = 65536
+_FILES = (
+    "vectors.npy",
+    "norms.npy",
+    "row_documents.npy",
+    "hits.json",
+    "documents.json",
+    "ivf_centroids.npy",
+    "ivf_assignments.npy",
+)
+
+
+def local_vector_recipes() -> frozenset[str]:
+    """``LOCAL_VECTOR_RECIPES`` （カンマ区切りのレシピコード）。空ならOracleだけで検索する。"""
+    raw = os.environ.get("LOCAL_VECTOR_RECIPES", "")
+    return frozenset(item.strip() for item in raw.split(",") if item.strip())
+
+
+def local_vector_dtype() -> LocalVectorDtype:
+    return "int8" if os.environ.get("LOCAL_VECTOR_DTYPE", "").strip().casefold() == "int8" else "float32"
+
+
+def document_filter_mask(
+    ids: np.ndarray,
+    current: np.ndarray,
+    types: np.ndarray,
+    names: np.ndarray,
+    *,
+    access: DocumentAccess | None,
+    current_version_only: bool,
+    document_types: list[str],
+    filename_filter: str | None,
+) -> np.ndarray:
+    """``_document_where`` と同じ文書単位の絞り込みをメモリ上で行う。
+
+    ``types`` と ``names`` は小文字化済みの文書種別・ファイル名。
+    """
+    mask = np.ones(len(ids), dtype=bool)
+    if access is not None and not access.unrestricted:
+        mask &= np.isin(ids, list(access.document_ids))
+    if current_version_only:
+        mask &= current
+    if document_types:
+        mask &= np.isin(types, [item.casefold() for item in document_types])
+    if filename_filter and filename_filter.strip():
+        needle = filename_filter.strip().casefold()
+        mask &= np.fromiter((needle in name for name in names), dtype=bool, count=len(names))
+    return mask
+
+
+@dataclass
+class _LocalDocument:
+    index: int
+    token: str | None
+    positions: list[int]
+    file_name: str = ""
+    document_type: str = ""
+    is_current: bool = True
+
+
+class _RecipeMatrix:
+    """1レシピ分の行列。更新は新しいインスタンスを返し、検索中の参照は変えない。
+
+    先頭セグメントはファイルからメモリマップで読み、公開Releaseの差し替えで増えた行は
+    追記セグメントとして持つ。入れ替わった文書の旧行は ``alive`` で無効にする。
+    IVFの候補リストは先頭セグメントだけに作り、追記セグメントは全件走査する。
+    """
+
+    def __init__(self, recipe_code: str, dtype: LocalVectorDtype) -> None:
+        self.recipe_code = recipe_code
+        self.dtype = dtype
+        self.dimensions: int | None = None
+        self.segments: list[np.ndarray] = []
+        self.norms: list[np.ndarray] = []
+        self.offsets: list[int] = []
+        self.hits: list[RetrievalHit] = []
+        self.row_documents = np.zeros(0, dtype=np.int32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.documents: dict[str, _LocalDocument] = {}
+        self.document_ids: list[str] = []
+        self.centroids: np.ndarray | None = None
+        self.ivf_lists: list[np.ndarray] = []
+        self._document_arrays: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray] | None = None
+        # 先頭セグメントが詰め直し済み（IVF作成・保存の対象になった）か。
+        self.compact = False
+
+    @property
+    def size(self) -> int:
+        return len(self.hits)
+
+    @property
+    def live_rows(self) -> int:
+        return int(self.alive.sum())
+
+    @property
+    def base_rows(self) -> int:
+        return len(self.segments[0]) if self.segments else 0
+
+    def token(self, document_id: str) -> str | None:
+        document = self.documents.get(document_id)
+        return document.token if document else None
+
+    def published_documents(self) -> list[str]:
+        return [key for key, value in self.documents.items() if value.token is not None]
+
+    def needs_compaction(self) -> bool:
+        if not self.compact:
+            return bool(self.size) or bool(self.documents)
+        if len(self.segments) <= 1 and self.live_rows == self.size:
+            return False
+        stale = self.size - self.live_rows + self.size - self.base_rows
+        return stale > max(1, self.size) * LOCAL_VECTOR_COMPACT_RATIO or not self.base_rows
+
+    def _copy(self) -> "_RecipeMatrix":
+        copy = _RecipeMatrix(self.recipe_code, self.dtype)
+        copy.dimensions = self.dimensions
+        copy.segments = list(self.segments)
+        copy.norms = list(self.norms)
+        copy.offsets = list(self.offsets)
+        copy.hits = list(self.hits)
+        copy.row_documents = self.row_documents
+        copy.alive = self.alive.copy()
+        copy.documents = {
+            key: replace(value, positions=list(value.positions))
+            for key, value in self.documents.items()
+        }
+        copy.document_ids = list(self.document_ids)
+        copy.centroids = self.centroids
+        copy.ivf_lists = self.ivf_lists
+        copy.compact = self.compact
+        return copy
+
+    def _encode(self, vectors: Sequence[Any]) -> tuple[np.ndarray, np.ndarray]:
+        values = np.asarray([np.asarray(item, dtype=np.float32) for item in vectors])
+        if values.ndim != 2:
+            raise ValueError(f"{self.recipe_code}: ベクトルの次元数がそろっていません")
+        if self.dimensions is not None and values.shape[1] != self.dimensions:
+            raise ValueError(
+                f"{self.recipe_code}: ベクトルの次元数が不正です: "
+                f"{values.shape[1]}（期待値: {self.dimensions}）"
+            )
+        if self.dtype == "int8":
+            encoded = np.asarray([quantize_int8(item) for item in values], dtype=np.int8)
+            return encoded, np.linalg.norm(encoded.astype(np.float32), axis=1)
+        norms = np.linalg.norm(values, axis=1)
+        return values, norms
+
+    def with_documents(
+        self,
+        updates: dict[str, str | None],
+        rows: dict[str, list[tuple[RetrievalHit, str | None, bool, Any]]],
+    ) -> "_RecipeMatrix":
+        """文書ごとの旧行を無効にし、新しい版の行を1つの追記セグメントにまとめて足す。
+
+        ``updates`` の値がNoneの文書は公開が外れたものとして行を消すだけにする。
+        """
+        matrix = self._copy()
+        appended: list[tuple[RetrievalHit, int, Any]] = []
+        for document_id, token in updates.items():
+            document = matrix.documents.get(document_id)
+            if document is None:
+                document = _LocalDocument(index=len(matrix.document_ids), token=None, positions=[])
+                matrix.documents[document_id] = document
+                matrix.document_ids.append(document_id)
+            if document.positions:
+                matrix.alive[document.positions] = False
+                document.positions = []
+            document.token = token
+            document_rows = rows.get(document_id, []) if token is not None else []
+            if document_rows:
+                _, document_type, is_current, _ = document_rows[0]
+                document.file_name = document_rows[0][0].file_name.casefold()
+                document.document_type = str(document_type or "").casefold()
+                document.is_current = bool(is_current)
+            for hit, _, _, vector in document_rows:
+                appended.append((hit, document.index, vector))
+        matrix._document_arrays = None
+        if not appended:
+            return matrix
+        vectors, norms = matrix._encode([item[2] for item in appended])
+        matrix.dimensions = int(vectors.shape[1])
+        start = matrix.size
+        matrix.offsets.append(start)
+        matrix.segments.append(vectors)
+        matrix.norms.append(norms)
+        for position, (hit, document_index, _) in enumerate(appended, start):
+            matrix.hits.append(hit)
+            matrix.documents[matrix.document_ids[document_index]].positions.append(position)
+        matrix.row_documents = np.concatenate(
+            [matrix.row_documents, np.asarray([item[1] for item in appended], dtype=np.int32)]
+        )
+        matrix.alive = np.concatenate([matrix.alive, np.ones(len(appended), dtype=bool)])
+        return matrix
+
+    def compacted(self, *, ivf_min_rows: int) -> "_RecipeMatrix":
+        """有効な行だけを1つの行列に詰め、行数が多ければIVFの候補リストを作り直す。"""
+        matrix = _RecipeMatrix(self.recipe_code, self.dtype)
+        matrix.dimensions = self.dimensions
+        matrix.compact = True
+        live = np.flatnonzero(self.alive)
+        documents = {
+            key: value for key, value in self.documents.items() if value.token is not None
+        }
+        matrix.document_ids = list(documents)
+        index_of = {key: index for index, key in enumerate(matrix.document_ids)}
+        matrix.documents = {
+            key: replace(value, index=index_of[key], positions=[])
+            for key, value in documents.items()
+        }
+        if not len(live):
+            return matrix
+        vectors = np.concatenate([self._rows(segment, live) for segment in range(len(self.segments))])
+        norms = np.concatenate(
+            [self._rows(segment, live, norms=True) for segment in range(len(self.segments))]
+        )
+        old_documents = self.row_documents[live]
+        matrix.segments = [vectors]
+        matrix.norms = [norms]
+        matrix.offsets = [0]
+        matrix.hits = [self.hits[int(position)] for position in live]
+        matrix.row_documents = np.asarray(
+            [index_of[self.document_ids[int(item)]] for item in old_documents], dtype=np.int32
+        )
+        matrix.alive = np.ones(len(live), dtype=bool)
+        for position, document_index in enumerate(matrix.row_documents):
+            matrix.documents[matrix.document_ids[int(document_index)]].positions.append(position)
+        if len(live) >= max(1, ivf_min_rows):
+            matrix.centroids, matrix.ivf_lists = _build_ivf(vectors, norms)
+        return matrix
+
+    def _rows(self, segment: int, positions: np.ndarray, *, norms: bool = False) -> np.ndarray:
+        start = self.offsets[segment]
+        end = start + len(self.segments[segment])
+        selected = positions[(positions >= start) & (positions < end)] - start
+        source = self.norms[segment] if norms else self.segments[segment]
+        return np.asarray(source[selected])
+
+    def _document_mask(
+        self,
+        *,
+        access: DocumentAccess | None,
+        current_version_only: bool,
+        document_types: list[str],
+        filename_filter: str | None,
+    ) -> np.ndarray:
+        if self._document_arrays is None:
+            self._document_arrays = (
+                np.asarray(self.document_ids, dtype=object),
+                np.asarray([self.documents[key].is_current for key in self.document_ids], dtype=bool),
+                np.asarray([self.documents[key].document_type for key in self.document_ids], dtype=object),
+                np.asarray([self.documents[key].file_name for key in self.document_ids], dtype=object),
+            )
+        return document_filter_mask(
+            *self._document_arrays,
+            access=access,
+            current_version_only=current_version_only,
+            document_types=document_types,
+            filename_filter=filename_filter,
+        )
+
+    def _score(self, positions: np.ndarray, query: np.ndarray) -> np.ndarray:
+        scores = np.empty(len(positions), dtype=np.float32)
+        for segment, start in enumerate(self.offsets):
+            end = start + len(self.segments[segment])
+            selected = (positions >= start) & (positions < end)
+            if not selected.any():
+                continue
+            local = positions[selected] - start
+            vectors = self.segments[segment]
+            if len(local) == len(vectors):
+                block, norms = vectors, self.norms[segment]
+            else:
+                block, norms = vectors[local], self.norms[segment][local]
+            dots = np.asarray(block, dtype=np.float32) @ query
+            scores[selected] = dots / np.maximum(norms, 1e-12)
+        return scores
+
+    def search(
+        self,
+        query: np.ndarray,
+        *,
+        top_k: int,
+        min_score: float,
+        target_accuracy: int,
+        probes: int,
+        **filters: Any,
+    ) -> tuple[list[tuple[int, float]], str]:
+        """(行位置, コサイン類似度) の上位と、使った走査方法を返す。"""
+        row_mask = self.alive & self._document_mask(**filters)[self.row_documents]
+        method = "exact"
+        positions: np.ndarray | None = None
+        if (
+            self.centroids is not None
+            and target_accuracy < VECTOR_TARGET_ACCURACY_EXACT
+            and row_mask.any()
+        ):
+            # TARGET ACCURACYに比例して調べるリスト数を増やす。
+            count = max(1, min(
+                len(self.ivf_lists),
+                round(probes * target_accuracy / VECTOR_TARGET_ACCURACY_DEFAULT),
+            ))
+            nearest = np.argsort(-(self.centroids @ query))[:count]
+            candidates = np.concatenate(
+                [self.ivf_lists[int(item)] for item in nearest]
+                + [np.arange(self.base_rows, self.size)]
+            )
+            positions = candidates[row_mask[candidates]]
+            method = "ivf"
+        ranked = self._top(positions, query, top_k=top_k, min_score=min_score, row_mask=row_mask)
+        if method == "ivf" and len(ranked) < min(top_k, int(row_mask.sum())):
+            # 絞り込みで候補リストの行が足りない場合は条件に合う行を全件走査する。
+            ranked = self._top(None, query, top_k=top_k, min_score=min_score, row_mask=row_mask)
+            method = "ivf_exact_fallback"
+        return ranked, method
+
+    def _top(
+        self,
+        positions: np.ndarray | None,
+        query: np.ndarray,
+        *,
+        top_k: int,
+        min_score: float,
+        row_mask: np.ndarray,
+    ) -> list[tuple[int, float]]:
+        if positions is None:
+            positions = np.flatnonzero(row_mask)
+        if not len(positions):
+            return []
+        scores = self._score(positions, query)
+        if min_score > 0:
+            keep = scores >= min_score
+            positions, scores = positions[keep], scores[keep]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k - 1)[:top_k]
+            positions, scores = positions[best], scores[best]
+        order = np.lexsort((positions, -scores))
+        return [(int(positions[item]), float(scores[item])) for item in order]
+
+    def save(self, directory: Path) -> None:
+        """詰め直し済みの行列をファイルへ書き出す。各ファイルは置き換えで書き込む。"""
+        directory.mkdir(parents=True, exist_ok=True)
+        vectors = self.segments[0] if self.segments else np.zeros((0, self.dimensions or 0), np.float32)
+        norms = self.norms[0] if self.norms else np.zeros(0, dtype=np.float32)
+        arrays = {
+            "vectors.npy": vectors,
+            "norms.npy": norms,
+            "row_documents.npy": self.row_documents,
+            "ivf_centroids.npy": (
+                self.centroids if self.centroids is not None else np.zeros((0, 0), np.float32)
+            ),
+            "ivf_assignments.npy": _ivf_assignments(self.ivf_lists, len(vectors)),
+        }
+        for name, value in arrays.items():
+            with open(directory / f"{name}.tmp", "wb") as handle:
+                np.save(handle, value)
+        payloads = {
+            "hits.json": [
+                {key: value for key, value in asdict(hit).items() if key not in {"score", "channel"}}
+                for hit in self.hits
+            ],
+            "documents.json": [
+                {
+                    "document_id": key,
+                    "token": self.documents[key].token,
+                    "file_name": self.documents[key].file_name,
+                    "document_type": self.documents[key].document_type,
+                    "is_current": self.documents[key].is_current,
+                }
+                for key in self.document_ids
+            ],
+        }
+        for name, value in payloads.items():
+            (directory / f"{name}.tmp").write_text(json.dumps(value, ensure_ascii=False), "utf-8")
+        for name in _FILES:
+            os.replace(directory / f"{name}.tmp", directory / name)
+        # 最後に書くmeta.jsonの行数で、途中で止まった書き出しを読み込み時に検出する。
+        (directory / "meta.json.tmp").write_text(
+            json.dumps({"dtype": self.dtype, "dimensions": self.dimensions, "rows": self.size}),
+            "utf-8",
+        )
+        os.replace(directory / "meta.json.tmp", directory / "meta.json")
+
+    @classmethod
+    def load(cls, recipe_code: str, directory: Path, dtype: LocalVectorDtype) -> "_RecipeMatrix | None":
+        """保存済みの行列をメモリマップで開く。形式違い・書きかけならNone。"""
+        try:
+            meta = json.loads((directory / "meta.json").read_text("utf-8"))
+            if meta.get("dtype") != dtype:
+                return None
+            vectors = np.load(directory / "vectors.npy", mmap_mode="r")
+            norms = np.load(directory / "norms.npy")
+            row_documents = np.load(directory / "row_documents.npy")
+            centroids = np.load(directory / "ivf_centroids.npy")
+            assignments = np.load(directory / "ivf_assignments.npy")
+            hits = json.loads((directory / "hits.json").read_text("utf-8"))
+            documents = json.loads((directory / "documents.json").read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+        rows = int(meta.get("rows") or 0)
+        if not (len(vectors) == len(norms) == len(row_documents) == len(hits) == rows):
+            return None
+        matrix = cls(recipe_code, dtype)
+        matrix.dimensions = meta.get("dimensions")
+        matrix.compact = True
+        if rows:
+            matrix.segments, matrix.norms, matrix.offsets = [vectors], [norms], [0]
+        matrix.hits = [RetrievalHit(**item, score=0.0, channel="") for item in hits]
+        matrix.row_documents = row_documents.astype(np.int32)
+        matrix.alive = np.ones(rows, dtype=bool)
+        for index, item in enumerate(documents):
+            matrix.document_ids.append(str(item["document_id"]))
+            matrix.documents[str(item["document_id"])] = _LocalDocument(
+                index=index,
+                token=item.get("token"),
+                positions=[],
+                file_name=str(item.get("file_name") or ""),
+                document_type=str(item.get("document_type") or ""),
+                is_current=bool(item.get("is_current")),
+            )
+        for position, document_index in enumerate(matrix.row_documents):
+            matrix.documents[matrix.document_ids[int(document_index)]].positions.append(position)
+        if len(centroids) and len(assignments) == rows:
+            matrix.centroids = centroids
+            matrix.ivf_lists = _ivf_lists(assignments, len(centroids))
+        return matrix
+
+
+def _normalized_rows(vectors: np.ndarray, norms: np.ndarray) -> np.ndarray:
+    return np.asarray(vectors, dtype=np.float32) / np.maximum(norms, 1e-12)[:, None]
+
+
+def _build_ivf(vectors: np.ndarray, norms: np.ndarray) -> tuple[np.ndarray, list[np.ndarray]]:
+    """球面k-meansで行を√N個のリストに分ける（標本で重心を求め、全行を割り当てる）。"""
+    rows = len(vectors)
+    lists = max(1, min(4096, int(math.sqrt(rows))))
+    generator = np.random.default_rng(0)
+    sample_index = (
+        np.sort(generator.choice(rows, LOCAL_VECTOR_KMEANS_SAMPLE, replace=False))
+        if rows > LOCAL_VECTOR_KMEANS_SAMPLE
+        else np.arange(rows)
+    )
+    sample = _normalized_rows(vectors[sample_index], norms[sample_index])
+    centroids = sample[generator.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(LOCAL_VECTOR_KMEANS_ITERATIONS):
+        nearest = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(lists):
+            members = sample[nearest == cluster]
+            if len(members):
+                center = members.sum(axis=0)
+                centroids[cluster] = center / max(float(np.linalg.norm(center)), 1e-12)
+    assignments = np.empty(rows, dtype=np.int32)
+    for start in range(0, rows, LOCAL_VECTOR_ASSIGN_CHUNK):
+        end = min(rows, start + LOCAL_VECTOR_ASSIGN_CHUNK)
+        block = _normalized_rows(vectors[start:end], norms[start:end])
+        assignments[start:end] = np.argmax(block @ centroids.T, axis=1)
+    return centroids, _ivf_lists(assignments, lists)
+
+
+def _ivf_lists(assignments: np.ndarray, lists: int) -> list[np.ndarray]:
+    order = np.argsort(assignments, kind="stable")
+    bounds = np.searchsorted(assignments[order], np.arange(lists + 1))
+    return [order[bounds[index]:bounds[index + 1]] for index in range(lists)]
+
+
+def _ivf_assignments(lists: list[np.ndarray], rows: int) -> np.ndarray:
+    assignments = np.zeros(rows if lists else 0, dtype=np.int32)
+    for cluster, members in enumerate(lists):
+        assignments[members] = cluster
+    return assignments
+
+
+class LocalVectorIndex(BackgroundRefresher):
+    """公開Releaseのベクトルをレシピ別にAPIプロセス内へ持つ検索バックエンド。
+
+    ``LOCAL_VECTOR_RECIPES`` に挙げたレシピだけを扱い、``recipe_vector_search`` は
+    ``OracleRagRepository.recipe_vector_search`` と同じ引数で呼べる。行列は
+    ``LOCAL_VECTOR_DIR`` に保存し、再起動時はメモリマップで開いてから差分だけを読む。
+    文書の公開Releaseが変わるとその文書の行だけを差し替える（同一プロセスの
+    ``publish_release`` は即時、他プロセスでの公開は ``LOCAL_VECTOR_REFRESH_SECONDS``
+    ごとの確認で反映）。初回の読み込みが終わるまでと、利用者のアクセス可能文書集合が
+    解決できない検索はOracleで行う。
+    """
+
+    task_name = "local-vector-index"
+    failure_message = "プロセス内ベクトル索引の更新に失敗しました"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._matrices: dict[str, _RecipeMatrix] = {}
+        self._refresh_lock = threading.Lock()
+        # 行列の差し替えと削除済み文書の除外を直列にする（更新より短時間だけ持つ）。
+        self._publish_lock = threading.Lock()
+        # 実行中の更新が読んだ版一覧より後に削除された文書。
+        self._forgotten: set[str] = set()
+        self._searches = {"exact": 0, "ivf": 0, "ivf_exact_fallback": 0}
+        self._last_refresh: dict[str, Any] = {}
+
+    @staticmethod
+    def directory() -> Path:
+        return Path(os.environ.get("LOCAL_VECTOR_DIR") or LOCAL_VECTOR_DEFAULT_DIR)
+
+    @staticmethod
+    def refresh_seconds() -> int:
+        return max(1, env_int("LOCAL_VECTOR_REFRESH_SECONDS", LOCAL_VECTOR_DEFAULT_REFRESH_SECONDS))
+
+    @staticmethod
+    def ivf_min_rows() -> int:
+        return env_int("LOCAL_VECTOR_IVF_MIN_ROWS", LOCAL_VECTOR_DEFAULT_IVF_MIN_ROWS)
+
+    @staticmethod
+    def ivf_probes() -> int:
+        return max(1, env_int("LOCAL_VECTOR_IVF_PROBES", LOCAL_VECTOR_DEFAULT_IVF_PROBES))
+
+    def ready(self, recipe_code: str | None) -> bool:
+        return bool(recipe_code) and recipe_code in local_vector_recipes() and recipe_code in self._matrices
+
+    def serves(
+        self, query: ChannelQuery, *, user_hash: str | None, access: DocumentAccess | None = None
+    ) -> bool:
+        """このチャンネルをプロセス内で検索できるか。"""
+        if query.kind != "recipe_vector" or query.rescore_recipe_code or query.embedding is None:
+            return False
+        if user_hash and access is None:
+            return False
+        matrix = self._matrices.get(query.recipe_code or "")
+        return (
+            self.ready(query.recipe_code)
+            and matrix is not None
+            and matrix.dimensions in {None, len(query.embedding)}
+        )
+
+    def recipe_vector_search(
+        self,
+        *,
+        recipe_code: str,
+        embedding: list[float],
+        channel: str,
+        top_k: int,
+        user_hash: str | None,
+        current_version_only: bool,
+        document_types: list[str],
+        filename_filter: str | None = None,
+        min_score: float = 0.0,
+        access: DocumentAccess | None = None,
+        target_accuracy: int = VECTOR_TARGET_ACCURACY_DEFAULT,
+    ) -> list[RetrievalHit]:
+        matrix = self._matrices.get(recipe_code)
+        if matrix is None or not self.ready(recipe_code):
+            raise LookupError(f"{recipe_code}: プロセス内ベクトル索引が準備できていません")
+        if user_hash and access is None:
+            raise ValueError("プロセス内ベクトル検索にはアクセス可能文書集合が必要です")
+        # Oracle側と同じく、利用者を特定できない検索は結果を返さない。
+        if not user_hash or not matrix.size:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        ranked, method = matrix.search(
+            query,
+            top_k=max(1, min(top_k, 1000)),
+            min_score=min_score,
+            target_accuracy=target_accuracy,
+            probes=self.ivf_probes(),
+            access=access,
+            current_version_only=current_version_only,
+            document_types=document_types,
+            filename_filter=filename_filter,
+        )
+        self._searches[method] += 1
+        return [
+            replace(matrix.hits[position], score=score, channel=channel)
+            for position, score in ranked
+        ]
+
+    def search_channels(
+        self,
+        queries: list[ChannelQuery],
+        *,
+        top_k: int,
+        user_hash: str | None,
+        current_version_only: bool,
+        document_types: list[str],
+        filename_filter: str | None = None,
+        access: DocumentAccess | None = None,
+    ) -> dict[int, list[RetrievalHit]]:
+        """プロセス内で検索できるチャンネルだけを検索し、位置→結果で返す。"""
+        results: dict[int, list[RetrievalHit]] = {}
+        for index, query in enumerate(queries):
+            if not self.serves(query, user_hash=user_hash, access=access):
+                continue
+            results[index] = self.recipe_vector_search(
+                recipe_code=query.recipe_code or "",
+                embedding=query.embedding or [],
+                channel=query.channel,
+                top_k=top_k,
+                user_hash=user_hash,
+                current_version_only=current_version_only,
+                document_types=document_types,
+                filename_filter=filename_filter,
+                min_score=query.min_score,
+                access=access,
+                target_accuracy=query.target_accuracy,
+            )
+        return results
+
+    def refresh(self) -> dict[str, Any]:
+        """公開中の文書の版をOracleと照合し、変わった文書の行だけを読み直す。"""
+        recipes = local_vector_recipes()
+        if not recipes:
+            return {}
+        with self._refresh_lock:
+            started = time.perf_counter()
+            with self._publish_lock:
+                # ここより前の削除は版一覧に反映済み。
+                self._forgotten = set()
+            versions = rag_repository.serving_document_versions()
+            summary: dict[str, Any] = {}
+            for recipe_code in sorted(recipes):
+                summary[recipe_code] = self._refresh_recipe(recipe_code, versions)
+            for recipe_code in set(self._matrices) - recipes:
+                del self._matrices[recipe_code]
+            self._last_refresh = {
+                "recipes": summary,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000),
+            }
+            return self._last_refresh
+
+    def _refresh_recipe(self, recipe_code: str, versions: dict[str, str]) -> dict[str, Any]:
+        dtype = local_vector_dtype()
+        directory = self.directory() / recipe_code
+        matrix = self._matrices.get(recipe_code)
+        loaded = False
+        if matrix is None or matrix.dtype != dtype:
+            matrix = _RecipeMatrix.load(recipe_code, directory, dtype)
+            loaded = matrix is not None
+            matrix = matrix or _RecipeMatrix(recipe_code, dtype)
+        updates: dict[str, str | None] = {
+            document_id: token
+            for document_id, token in versions.items()
+            if matrix.token(document_id) != token
+        }
+        updates.update({
+            document_id: None
+            for document_id in matrix.published_documents()
+            if document_id not in versions
+        })
+        changed = [document_id for document_id, token in updates.items() if token is not None]
+        rows: dict[str, list[tuple[RetrievalHit, str | None, bool, Any]]] = {}
+        for start in range(0, len(changed), LOCAL_VECTOR_FETCH_DOCUMENTS):
+            for row in rag_repository.local_vector_rows(
+                recipe_code=recipe_code,
+                document_ids=changed[start:start + LOCAL_VECTOR_FETCH_DOCUMENTS],
+            ):
+                rows.setdefault(row[0].document_id, []).append(row)
+        if updates:
+            matrix = matrix.with_documents(updates, rows)
+        compacted = matrix.needs_compaction()
+        if compacted:
+            matrix = matrix.compacted(ivf_min_rows=self.ivf_min_rows())
+            try:
+                matrix.save(directory)
+            except OSError:
+                logger.warning("プロセス内ベクトル索引を保存できませんでした: %s", directory, exc_info=True)
+        # 参照の差し替えだけで公開し、検索中の呼び出しは古い行列を使い終える。
+        matrix = self._publish(recipe_code, matrix)
+        return {
+            "loaded_from_disk": loaded,
+            "documents_updated": len(updates),
+            "rows": matrix.live_rows,
+            "compacted": compacted,
+            "ivf_lists": len(matrix.ivf_lists),
+        }
+
+    def _publish(self, recipe_code: str, matrix: _RecipeMatrix) -> _RecipeMatrix:
+        with self._publish_lock:
+            removed = {
+                document_id: None
+                for document_id in self._forgotten
+                if matrix.token(document_id) is not None
+            }
+            if removed:
+                matrix = matrix.with_documents(removed, {})
+            self._matrices[recipe_code] = matrix
+            return matrix
+
+    def forget_documents(self, document_ids: Sequence[str]) -> None:
+        """削除した文書の行を次の確認を待たずに検索対象から外す（別スレッドから呼べる）。"""
+        if not document_ids:
+            return
+        with self._publish_lock:
+            self._forgotten.update(document_ids)
+            for recipe_code, matrix in list(self._matrices.items()):
+                removed = {
+                    document_id: None
+                    for document_id in document_ids
+                    if matrix.token(document_id) is not None
+                }
+                if removed:
+                    self._matrices[recipe_code] = matrix.with_documents(removed, {})
+        self.notify_published(document_ids[0])
+
+    def notify_published(self, document_id: str) -> None:
+        """公開Releaseが変わった文書を次の確認を待たずに反映させる（別スレッドから呼べる）。"""
+        self.wake()
+
+    def enabled(self) -> bool:
+        return bool(local_vector_recipes())
+
+    def interval_seconds(self) -> float:
+        return self.refresh_seconds()
+
+    async def tick(self) -> None:
+        await asyncio.to_thread(self.refresh)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "recipes": sorted(local_vector_recipes()),
+            "ready": sorted(code for code in self._matrices if self.ready(code)),
+            "rows": {code: matrix.live_rows for code, matrix in self._matrices.items()},
+            "searches": dict(self._searches),
+            "last_refresh": self._last_refresh,
+        }
+
+
+local_vector_index = LocalVectorIndex()
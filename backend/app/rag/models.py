@@ -234,6 +234,15 @@ class GlobalVlmSettings(BaseModel):
     )
 
 
+class JudgeGateSettings(BaseModel):
+    """LLM最終判定を省略してよい「順位が明確」な条件のしきい値。"""
+
+    enabled: bool = True
+    min_rerank_margin: float = Field(default=0.2, ge=0, le=1)
+    min_channel_agreement: int = Field(default=2, ge=1, le=20)
+    min_filename_affinity: float = Field(default=0.8, ge=0, le=1)
+
+
 class QueryExpansionSettings(BaseModel):
     enabled: bool = False
     llm_enabled: bool = False
@@ -303,6 +312,10 @@ RETRIEVAL_MODES: tuple[RetrievalMode, ...] = (
 )
 
 
+# ベクトル近似検索の精度。fast=速度優先、balanced=既定、precise=厳密検索。
+VectorAccuracyMode = Literal["fast", "balanced", "precise"]
+
+
 class RetrievalModeOption(BaseModel):
     value: RetrievalMode
     label: str
@@ -319,6 +332,7 @@ class RetrievalSettingsResponse(BaseModel):
     rerank: RerankSettings
     vlm: GlobalVlmSettings
     query_expansion: QueryExpansionSettings
+    judge_gate: JudgeGateSettings = Field(default_factory=JudgeGateSettings)
     weights: RetrievalWeights
     vlm_model: str = ""
 
@@ -350,10 +364,18 @@ class SearchV2Request(BaseModel):
         min_length=1,
         max_length=len(RETRIEVAL_MODES),
     )
+    vector_accuracy: VectorAccuracyMode | None = None
     verify: bool = False
     debug: bool = False
 
 
+SEARCH_BATCH_MAX_QUERIES = 50
+
+
+class SearchV2BatchRequest(BaseModel):
+    queries: list[SearchV2Request] = Field(min_length=1, max_length=SEARCH_BATCH_MAX_QUERIES)
+
+
 class EvidenceResult(BaseModel):
     evidence_id: str
     document_id: str
@@ -401,3 +423,16 @@ class SearchV2Response(BaseModel):
     total_evidence: int
     processing_time: float
     diagnostics: dict[str, Any] = Field(default_factory=dict)
+
+
+class SearchV2BatchItem(BaseModel):
+    index: int
+    response: SearchV2Response | None = None
+    error: str | None = None
+
+
+class SearchV2BatchResponse(BaseModel):
+    success: bool = True
+    results: list[SearchV2BatchItem]
+    processing_time: float
+    diagnostics: dict[str, Any] = Field(default_factory=dict)
@@ -2,15 +2,29 @@ from __future__ import annotations
 
 import hashlib
 import json
+import math
 import os
 import re
 from array import array
 from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass, field
-from typing import Any, Iterator
+from typing import Any, Iterator, Literal
 from uuid import uuid4
 
-from app.rag.models import ProfileConfig, VlmExtractionOutput
+from app.rag.access_cache import DocumentAccess, document_access_cache
+from app.rag.env import env_int
+from app.rag.models import ProfileConfig, VectorAccuracyMode, VlmExtractionOutput
+from app.rag.search_cache import search_result_cache
+from app.rag.serving_projection import bump_serving_epoch, sync_serving_document
+from app.rag.vector_shadow import (
+    VectorShadowFormat,
+    shadow_vector,
+    vector_shadow_candidate_count,
+    vector_shadow_column,
+    vector_shadow_metric,
+    vector_shadow_search_format,
+)
 from app.services.database_service import database_service
 
 TOKEN_PATTERN = re.compile(r"[0-9A-Za-z_.-]+|[ぁ-んァ-ン一-龯々ー]+")
@@ -19,6 +33,32 @@ KANJI_RUN_PATTERN = re.compile(r"[一-龯々]+")
 KATAKANA_RUN_PATTERN = re.compile(r"[ァ-ンー]+")
 HIRAGANA_RUN_PATTERN = re.compile(r"[ぁ-んー]+")
 ORACLE_TEXT_DEFAULT_MAX_TERMS = 20
+# Oracle Textの重み演算子(*)が受け付ける上限。
+ORACLE_TEXT_MAX_TERM_WEIGHT = 10
+EVIDENCE_PREVIEW_DEFAULT_CHARS = 1000
+# DBMS_LOB.SUBSTRのSQL戻り値はVARCHAR2の4000バイトが上限。UTF-8の日本語（3バイト/文字）でも
+# ORA-06502にならない文字数で切り詰める。
+EVIDENCE_PREVIEW_MAX_CHARS = 1333
+# ベクトル近似検索のTARGET ACCURACY。100は厳密検索（FETCH EXACT）を表す。
+VECTOR_TARGET_ACCURACY_DEFAULT = 95
+VECTOR_TARGET_ACCURACY_FAST_DEFAULT = 80
+VECTOR_TARGET_ACCURACY_EXACT = 100
+# SYS.ODCIVARCHAR2LISTの最大要素数。超える集合はEXISTS判定に戻す。
+DOCUMENT_ACCESS_MAX_BIND_IDS = 32767
+# 公開Release投影表のOracle Text索引（Artifact種別ごとのLOCAL索引）。
+TEXT_INDEX_NAME = "SDS_SERVING_TEXT_IDX"
+# UNION ALLの各枝がそろえる検索ヒット列。
+HIT_BASE_COLUMNS = (
+    "evidence_id, document_id, slot_no, revision_id, page_number, unit_kind, "
+    "source_locator, bbox_json, raw_text, caption, asset_object_name, file_name, "
+    "object_name, bucket"
+)
+HIT_COLUMNS = f"{HIT_BASE_COLUMNS}, score"
+
+
+def _qualified_hit_columns(alias: str) -> str:
+    """結合先にも同名列（document_id等）がある場合に使う、別名付きの検索ヒット列。"""
+    return ", ".join(f"{alias}.{column.strip()}" for column in HIT_BASE_COLUMNS.split(","))
 
 
 def _lob_text(value: object) -> str:
@@ -55,6 +95,84 @@ def oracle_text_max_terms() -> int:
         return ORACLE_TEXT_DEFAULT_MAX_TERMS
 
 
+def _accuracy(value: object, default: int) -> int:
+    try:
+        return min(VECTOR_TARGET_ACCURACY_EXACT, max(1, int(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def vector_target_accuracy(
+    recipe_code: str | None = None, mode: VectorAccuracyMode | None = None
+) -> int:
+    """レシピ（チャンネル）と要求の精度モードからTARGET ACCURACYを決める。
+
+    既定値は ``VECTOR_TARGET_ACCURACY``、レシピ別の値は
+    ``VECTOR_TARGET_ACCURACY_CHANNELS``（``{"recipe_code": 90}`` 形式のJSON）で上書きする。
+    ``fast`` はそれを ``VECTOR_TARGET_ACCURACY_FAST`` 以下に下げ、``precise`` は厳密検索にする。
+    """
+    if mode == "precise":
+        return VECTOR_TARGET_ACCURACY_EXACT
+    accuracy = _accuracy(
+        os.environ.get("VECTOR_TARGET_ACCURACY"), VECTOR_TARGET_ACCURACY_DEFAULT
+    )
+    raw = os.environ.get("VECTOR_TARGET_ACCURACY_CHANNELS")
+    if raw and recipe_code:
+        try:
+            channels = json.loads(raw)
+        except (TypeError, ValueError):
+            channels = None
+        if isinstance(channels, dict) and recipe_code in channels:
+            accuracy = _accuracy(channels[recipe_code], accuracy)
+    if mode == "fast":
+        accuracy = min(accuracy, _accuracy(
+            os.environ.get("VECTOR_TARGET_ACCURACY_FAST"), VECTOR_TARGET_ACCURACY_FAST_DEFAULT
+        ))
+    return accuracy
+
+
+def vector_rescore_recipes() -> dict[str, str]:
+    """低次元レシピ→再採点に使う全次元レシピの対応（``VECTOR_RESCORE_RECIPES``）。
+
+    ``{"chunk_text_256": "chunk_text"}`` 形式のJSONで指定する。
+    """
+    raw = os.environ.get("VECTOR_RESCORE_RECIPES")
+    if not raw:
+        return {}
+    try:
+        pairs = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(pairs, dict):
+        return {}
+    return {
+        str(source): str(target)
+        for source, target in pairs.items()
+        if isinstance(target, str) and target and target != source
+    }
+
+
+def _vector_fetch_sql(top_k: int, target_accuracy: int) -> str:
+    if target_accuracy >= VECTOR_TARGET_ACCURACY_EXACT:
+        return f"FETCH EXACT FIRST {top_k} ROWS ONLY"
+    return (
+        f"FETCH APPROX FIRST {top_k} ROWS ONLY "
+        f"WITH TARGET ACCURACY {max(1, int(target_accuracy))}"
+    )
+
+
+def evidence_preview_chars() -> int:
+    """検索時に取得する本文プレビューの文字数。0でCLOB全文を取得する。"""
+    return min(EVIDENCE_PREVIEW_MAX_CHARS, env_int(
+        "RETRIEVAL_EVIDENCE_PREVIEW_CHARS", EVIDENCE_PREVIEW_DEFAULT_CHARS
+    ))
+
+
+def _text_preview_sql(expression: str) -> str:
+    limit = evidence_preview_chars()
+    return f"DBMS_LOB.SUBSTR({expression}, {limit}, 1)" if limit else expression
+
+
 def oracle_text_terms(query: str, *, max_terms: int | None = None) -> list[str]:
     limit = max_terms or oracle_text_max_terms()
     terms: list[str] = []
@@ -81,6 +199,32 @@ def oracle_text_query(query: str) -> str | None:
     return " ACCUM ".join(f"{{{term}}}" for term in terms) if terms else None
 
 
+def oracle_text_term_weights(variants: list[str]) -> dict[str, int]:
+    """バリエーションをまたいだ検索語と重み（出現バリエーション数、上限あり）。"""
+    limit = oracle_text_max_terms()
+    weights: dict[str, int] = {}
+    for variant in variants:
+        for term in oracle_text_terms(variant):
+            if term in weights:
+                weights[term] += 1
+            elif len(weights) < limit:
+                weights[term] = 1
+    return {term: min(weight, ORACLE_TEXT_MAX_TERM_WEIGHT) for term, weight in weights.items()}
+
+
+def oracle_text_weighted_query(variants: list[str]) -> str | None:
+    """複数のクエリバリエーションを1つのACCUM式にまとめる。
+
+    複数のバリエーションに現れる語ほど重く（出現バリエーション数を重み）し、
+    バリエーションごとのCONTAINSを1回の評価に置き換える。
+    """
+    weights = oracle_text_term_weights(variants)
+    return " ACCUM ".join(
+        f"{{{term}}}" if weight == 1 else f"{{{term}}}*{weight}"
+        for term, weight in weights.items()
+    ) or None
+
+
 @dataclass
 class EvidenceRecord:
     evidence_id: str
@@ -140,13 +284,82 @@ class RetrievalHit:
         return f"{self.document_id}:{self.page_number}:{self.source_locator}:{bbox}"
 
 
+@dataclass
+class ChannelQuery:
+    """``multi_channel_search`` に渡す1チャンネル分の検索条件。"""
+
+    kind: Literal["keyword", "recipe_vector", "facet_keyword"]
+    channel: str
+    query: str | None = None
+    # 設定時はバリエーションを重み付きの1式にまとめて検索する。
+    variants: list[str] = field(default_factory=list)
+    recipe_code: str | None = None
+    embedding: list[float] | None = None
+    profile: ProfileConfig | None = None
+    min_score: float = 0.0
+    target_accuracy: int = VECTOR_TARGET_ACCURACY_DEFAULT
+    # 設定時は低次元の ``embedding`` で候補を取り、このレシピの全次元ベクトルで再採点する。
+    rescore_recipe_code: str | None = None
+    rescore_embedding: list[float] | None = None
+
+
+SEARCH_AUDIT_INSERT_SQL = """
+    INSERT INTO sds_search_audit
+        (trace_id, user_id_hash, query_hash, profile_slots_json,
+         diagnostics_json, result_count, elapsed_ms)
+    VALUES (:trace, :user_hash, :query_hash, :profiles,
+            :diagnostics, :result_count, :elapsed_ms)
+"""
+SEARCH_FEEDBACK_INSERT_SQL = """
+    INSERT INTO sds_search_feedback
+        (feedback_id, trace_id, document_id, artifact_id, action, user_id_hash)
+    VALUES (:feedback, :trace, :document, :artifact, :action, :user_hash)
+"""
+
+
+# 検索段階の残り予算（ミリ秒）。設定中に取得した接続のDB呼び出しはこの時間で打ち切られる。
+# asyncio.to_thread はコンテキストを引き継ぐため、起動したスレッドにも伝わる。
+_call_timeout_ms: ContextVar[int] = ContextVar("oracle_call_timeout_ms", default=0)
+
+
+@contextmanager
+def db_call_timeout(seconds: float | None) -> Iterator[None]:
+    """ブロック内で取得した接続に ``call_timeout`` を設定する。Noneなら何もしない。
+
+    ``asyncio.wait_for`` の打ち切りは待機をやめるだけで、スレッド上のSQLは走り続ける。
+    接続側で打ち切ることで、予算切れの検索がDBとプールの接続を占有し続けないようにする。
+    """
+    if seconds is None:
+        yield
+        return
+    token = _call_timeout_ms.set(max(1, math.ceil(seconds * 1000)))
+    try:
+        yield
+    finally:
+        _call_timeout_ms.reset(token)
+
+
+class _DocumentIdList(list):
+    """実行時にOracleのコレクション型へ変換する文書IDバインド値。"""
+
+
 class OracleRagRepository:
     @contextmanager
     def connection(self) -> Iterator[Any]:
         if not database_service._ensure_pool_initialized():
             raise RuntimeError("database connection is not configured")
         with database_service.pool_manager.acquire_connection() as connection:
-            yield connection
+            timeout_ms = _call_timeout_ms.get()
+            if not timeout_ms:
+                yield connection
+                return
+            # プールへ返す接続に設定を残さない。
+            previous = connection.call_timeout
+            connection.call_timeout = timeout_ms
+            try:
+                yield connection
+            finally:
+                connection.call_timeout = previous
 
     @staticmethod
     def rows(cursor: Any) -> list[dict[str, Any]]:
@@ -154,16 +367,35 @@ class OracleRagRepository:
         return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
     @staticmethod
-    def _text_query(query: str) -> str | None:
+    def _text_query(query: str, variants: list[str] | None = None) -> str | None:
+        if variants:
+            return oracle_text_weighted_query(variants)
         return oracle_text_query(query)
 
     @staticmethod
-    def _access_sql(user_hash: str | None) -> tuple[str, dict[str, Any]]:
+    def _access_sql(
+        user_hash: str | None, access: DocumentAccess | None = None
+    ) -> tuple[str, dict[str, Any]]:
+        """文書単位のACL条件。
+
+        ``access`` が解決済みなら、行ごとの相関EXISTSの代わりに文書ID集合を
+        配列バインドで渡し、ベクトル索引の事前フィルタとして使わせる。
+        """
+        if access is not None and user_hash:
+            if access.unrestricted:
+                return "1=1", {}
+            if not access.document_ids:
+                return "1=0", {}
+            if len(access.document_ids) <= DOCUMENT_ACCESS_MAX_BIND_IDS:
+                return (
+                    "a.document_id IN (SELECT COLUMN_VALUE FROM TABLE(:access_ids))",
+                    {"access_ids": _DocumentIdList(sorted(access.document_ids))},
+                )
         return (
             """
             EXISTS (
                 SELECT 1 FROM sds_document_acl acl
-                WHERE acl.document_id=d.document_id
+                WHERE acl.document_id=a.document_id
                   AND (
                     (:user_hash IS NOT NULL AND acl.principal_type='public_authenticated')
                     OR (:user_hash IS NOT NULL AND acl.principal_type IN ('user', 'service')
@@ -174,6 +406,43 @@ class OracleRagRepository:
             {"user_hash": user_hash},
         )
 
+    @staticmethod
+    def _bind_values(connection: Any, binds: dict[str, Any]) -> dict[str, Any]:
+        """文書ID集合をOracleのコレクション型に変換する。"""
+        if not any(isinstance(value, _DocumentIdList) for value in binds.values()):
+            return binds
+        collection = connection.gettype("SYS.ODCIVARCHAR2LIST")
+        return {
+            key: collection.newobject(list(value)) if isinstance(value, _DocumentIdList) else value
+            for key, value in binds.items()
+        }
+
+    def document_access(self, user_hash: str | None) -> DocumentAccess:
+        """利用者が読める文書IDを1往復で解決する。
+
+        ACL行を持たない文書が1件もなければ ``unrestricted`` とする。
+        """
+        if not user_hash:
+            return DocumentAccess(frozenset())
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT d.document_id,
+                       CASE WHEN EXISTS (
+                           SELECT 1 FROM sds_document_acl acl
+                           WHERE acl.document_id=d.document_id
+                             AND (acl.principal_type='public_authenticated'
+                                  OR (acl.principal_type IN ('user', 'service')
+                                      AND acl.principal_hash=:user_hash))
+                       ) THEN 1 ELSE 0 END readable
+                FROM sds_documents d
+                """,
+                {"user_hash": user_hash},
+            )
+            rows = cursor.fetchall()
+        readable = frozenset(str(row[0]) for row in rows if int(row[1] or 0))
+        return DocumentAccess(readable, unrestricted=len(readable) == len(rows))
+
     def _document_where(
         self,
         *,
@@ -181,21 +450,22 @@ class OracleRagRepository:
         current_version_only: bool,
         document_types: list[str],
         filename_filter: str | None,
+        access: DocumentAccess | None = None,
     ) -> tuple[str, dict[str, Any]]:
-        access, binds = self._access_sql(user_hash)
-        clauses = ["d.serving_release_id IS NOT NULL", access]
+        access_clause, binds = self._access_sql(user_hash, access)
+        clauses = [access_clause]
         if current_version_only:
-            clauses.append("d.is_current=1")
+            clauses.append("a.is_current=1")
         if document_types:
             placeholders: list[str] = []
             for index, value in enumerate(document_types):
                 key = f"document_type_{index}"
                 placeholders.append(f":{key}")
                 binds[key] = value.casefold()
-            clauses.append(f"LOWER(d.document_type) IN ({', '.join(placeholders)})")
+            clauses.append(f"LOWER(a.document_type) IN ({', '.join(placeholders)})")
         if filename_filter and filename_filter.strip():
             binds["filename_filter"] = filename_filter.strip()
-            clauses.append("LOWER(d.file_name) LIKE '%' || LOWER(:filename_filter) || '%'")
+            clauses.append("LOWER(a.file_name) LIKE '%' || LOWER(:filename_filter) || '%'")
         return " AND ".join(clauses), binds
 
     @staticmethod
@@ -221,29 +491,177 @@ class OracleRagRepository:
 
     @staticmethod
     def _base_select() -> str:
-        return """
-            a.artifact_id evidence_id, d.document_id, 0 slot_no,
-            rel.document_revision_id revision_id,
+        return f"""
+            a.artifact_id evidence_id, a.document_id, 0 slot_no,
+            a.document_revision_id revision_id,
             a.page_number, a.artifact_kind unit_kind, a.source_locator, a.bbox_json,
-            NVL(a.raw_text, page_text.raw_text) raw_text, NULL caption,
-            NVL(a.object_name, page_image.object_name) asset_object_name,
-            d.file_name, d.object_name, d.bucket
+            {_text_preview_sql("a.raw_text")} raw_text, NULL caption,
+            a.asset_object_name, a.file_name, a.object_name, a.bucket
         """
 
     @staticmethod
-    def _facet_select() -> str:
-        return """
-            a.artifact_id evidence_id, d.document_id, :slot slot_no,
-            rel.document_revision_id revision_id,
+    def _facet_select(slot_sql: str = ":slot") -> str:
+        return f"""
+            a.artifact_id evidence_id, a.document_id, {slot_sql} slot_no,
+            a.document_revision_id revision_id,
             a.page_number, a.artifact_kind unit_kind, a.source_locator, a.bbox_json,
-            a.raw_text, a.raw_text caption, page_image.object_name asset_object_name,
-            d.file_name, d.object_name, d.bucket
+            {_text_preview_sql("a.raw_text")} raw_text,
+            {_text_preview_sql("a.raw_text")} caption,
+            a.asset_object_name, a.file_name, a.object_name, a.bucket
         """
 
+    def _keyword_sql(self, where: str, *, suffix: str = "", label: int = 1) -> str:
+        return f"""
+                SELECT * FROM (
+                    SELECT {self._base_select()}, SCORE({label})/100 score
+                    FROM sds_serving_artifacts a
+                    WHERE {where}
+                      AND a.search_text IS NOT NULL
+                      AND CONTAINS(a.search_text, :text_query{suffix}, {label})>0
+                    ORDER BY SCORE({label}) DESC, a.artifact_id
+                ) WHERE ROWNUM<=:top_k{suffix}
+                """
+
+    def _recipe_vector_sql(
+        self,
+        where: str,
+        *,
+        top_k: int,
+        min_score: float,
+        suffix: str = "",
+        target_accuracy: int = VECTOR_TARGET_ACCURACY_DEFAULT,
+        shadow_format: VectorShadowFormat | None = None,
+        rescore: bool = False,
+    ) -> str:
+        def score_filter(vector_sql: str) -> str:
+            if min_score <= 0:
+                return ""
+            # min_score is a similarity floor, not a VECTOR_DISTANCE ceiling.
+            return (
+                f"AND (1 - VECTOR_DISTANCE({vector_sql}, :embedding{suffix}, COSINE)) "
+                f">= :min_score{suffix}"
+            )
+
+        # recipe_codeでパーティションを絞り、そのレシピのLOCAL索引だけを走査させる。
+        source = f"""
+                FROM sds_serving_components sc
+                JOIN sds_embeddings ev
+                  ON ev.recipe_code=:recipe_code{suffix}
+                     AND ev.stage_run_id=sc.stage_run_id
+                     AND ev.document_revision_id=sc.document_revision_id
+                JOIN sds_serving_artifacts a
+                  ON a.artifact_id=ev.target_artifact_id AND a.document_id=sc.document_id
+                WHERE sc.component_key='embedding:' || :recipe_code{suffix}
+                  AND {where}
+                """
+        if rescore:
+            # 低次元レシピの索引で広めに候補を取り、同じArtifactの全次元ベクトルで並べ直す。
+            # 全次元ベクトルが未作成の行は低次元の類似度のまま残す。
+            score = (
+                f"NVL(1 - VECTOR_DISTANCE(evr.vector_value, :rescore_embedding{suffix}, COSINE), "
+                f"shortlist.stage_score)"
+            )
+            min_filter = f"AND {score} >= :min_score{suffix}" if min_score > 0 else ""
+            return f"""
+                SELECT {_qualified_hit_columns("shortlist")}, {score} score
+                FROM (
+                    SELECT {self._base_select()}, ev.embedding_id,
+                           (1 - VECTOR_DISTANCE(ev.vector_value, :embedding{suffix}, COSINE))
+                               stage_score
+                    {source}
+                    ORDER BY VECTOR_DISTANCE(ev.vector_value, :embedding{suffix}, COSINE),
+                             ev.embedding_id
+                    {_vector_fetch_sql(vector_shadow_candidate_count(top_k), target_accuracy)}
+                ) shortlist
+                LEFT JOIN sds_serving_components scr
+                  ON scr.document_id=shortlist.document_id
+                     AND scr.component_key='embedding:' || :rescore_recipe{suffix}
+                LEFT JOIN sds_embeddings evr
+                  ON evr.recipe_code=:rescore_recipe{suffix}
+                     AND evr.stage_run_id=scr.stage_run_id
+                     AND evr.document_revision_id=scr.document_revision_id
+                     AND evr.target_artifact_id=shortlist.evidence_id
+                WHERE 1=1 {min_filter}
+                ORDER BY {score} DESC, shortlist.embedding_id
+                FETCH FIRST {top_k} ROWS ONLY
+                """
+        if shadow_format is None:
+            return f"""
+                SELECT {self._base_select()},
+                       (1 - VECTOR_DISTANCE(ev.vector_value, :embedding{suffix}, COSINE)) score
+                {source}
+                {score_filter("ev.vector_value")}
+                ORDER BY VECTOR_DISTANCE(ev.vector_value, :embedding{suffix}, COSINE), ev.embedding_id
+                {_vector_fetch_sql(top_k, target_accuracy)}
+                """
+        # 圧縮ベクトルの索引で広めに候補を取り、FLOAT32の厳密なコサイン距離で並べ直す。
+        column = vector_shadow_column(shadow_format)
+        metric = vector_shadow_metric(shadow_format)
+        return f"""
+                SELECT {HIT_BASE_COLUMNS},
+                       (1 - VECTOR_DISTANCE(shortlist.vector_value, :embedding{suffix}, COSINE)) score
+                FROM (
+                    SELECT {self._base_select()}, ev.vector_value, ev.embedding_id
+                    {source}
+                    ORDER BY VECTOR_DISTANCE(ev.{column}, :shadow_embedding{suffix}, {metric}),
+                             ev.embedding_id
+                    {_vector_fetch_sql(vector_shadow_candidate_count(top_k), target_accuracy)}
+                ) shortlist
+                WHERE 1=1 {score_filter("shortlist.vector_value")}
+                ORDER BY VECTOR_DISTANCE(shortlist.vector_value, :embedding{suffix}, COSINE),
+                         shortlist.embedding_id
+                FETCH FIRST {top_k} ROWS ONLY
+                """
+
+    @staticmethod
+    def _vector_shadow_stage(target_accuracy: int) -> VectorShadowFormat | None:
+        """厳密検索以外で影列が有効なら二段階検索の形式を返す。"""
+        if target_accuracy >= VECTOR_TARGET_ACCURACY_EXACT:
+            return None
+        return vector_shadow_search_format()
+
+    def _facet_keyword_sql(self, where: str, *, suffix: str = "", label: int = 1) -> str:
+        return f"""
+                SELECT * FROM (
+                    SELECT {self._facet_select(f":slot{suffix}")}, SCORE({label})/100 score
+                    FROM sds_serving_artifacts a
+                    WHERE a.component_key='vlm:' || TO_CHAR(:slot{suffix})
+                      AND a.artifact_kind='VLM_TEXT'
+                      AND {where}
+                      AND CONTAINS(a.search_text, :text_query{suffix}, {label})>0
+                    ORDER BY SCORE({label}) DESC, a.artifact_id
+                ) WHERE ROWNUM<=:top_k{suffix}
+                """
+
+    def _facet_keyword_group_sql(
+        self, where: str, *, slot_binds: list[str], suffix: str = "", label: int = 1
+    ) -> str:
+        """複数プロファイルのVLM_TEXTを1回のCONTAINSで検索し、スロットごとに上位を残す。"""
+        slot_keys = ", ".join(f"'vlm:' || TO_CHAR(:{name})" for name in slot_binds)
+        return f"""
+                SELECT {HIT_COLUMNS} FROM (
+                    SELECT ranked.*, ROW_NUMBER() OVER (
+                        PARTITION BY ranked.slot_no ORDER BY ranked.score DESC, ranked.evidence_id
+                    ) slot_rank
+                    FROM (
+                        SELECT {self._facet_select("TO_NUMBER(SUBSTR(a.component_key, 5))")},
+                               SCORE({label})/100 score
+                        FROM sds_serving_artifacts a
+                        WHERE a.component_key IN ({slot_keys})
+                          AND a.artifact_kind='VLM_TEXT'
+                          AND {where}
+                          AND CONTAINS(a.search_text, :text_query{suffix}, {label})>0
+                    ) ranked
+                ) WHERE slot_rank<=:top_k{suffix}
+                ORDER BY slot_no, slot_rank
+                """
+
     def keyword_search(self, *, query: str, top_k: int, user_hash: str | None,
                        current_version_only: bool, document_types: list[str],
-                       filename_filter: str | None = None) -> list[RetrievalHit]:
-        text_query = self._text_query(query)
+                       filename_filter: str | None = None,
+                       access: DocumentAccess | None = None,
+                       variants: list[str] | None = None) -> list[RetrievalHit]:
+        text_query = self._text_query(query, variants)
         if not text_query:
             return []
         where, binds = self._document_where(
@@ -251,46 +669,17 @@ class OracleRagRepository:
             current_version_only=current_version_only,
             document_types=document_types,
             filename_filter=filename_filter,
+            access=access,
         )
         binds.update(text_query=text_query, top_k=top_k)
         with self.connection() as connection, connection.cursor() as cursor:
-            cursor.execute(
-                f"""
-                SELECT * FROM (
-                    SELECT {self._base_select()}, SCORE(1)/100 score
-                    FROM sds_documents d
-                    JOIN sds_index_releases rel
-                      ON rel.release_id=d.serving_release_id AND rel.status='PUBLISHED'
-                    JOIN sds_index_release_components rc
-                      ON rc.release_id=rel.release_id AND rc.is_stale=0
-                    JOIN sds_artifacts a ON a.stage_run_id=rc.stage_run_id
-                    LEFT JOIN sds_index_release_components nc
-                      ON nc.release_id=rel.release_id AND nc.component_key='normalize'
-                         AND nc.is_stale=0
-                    LEFT JOIN sds_artifacts page_text
-                      ON page_text.stage_run_id=nc.stage_run_id
-                         AND page_text.artifact_kind='PAGE_TEXT'
-                         AND page_text.page_number=a.page_number
-                    LEFT JOIN sds_index_release_components ic
-                      ON ic.release_id=rel.release_id AND ic.component_key='render'
-                         AND ic.is_stale=0
-                    LEFT JOIN sds_artifacts page_image
-                      ON page_image.stage_run_id=ic.stage_run_id
-                         AND page_image.artifact_kind='PAGE_IMAGE'
-                         AND page_image.page_number=a.page_number
-                    WHERE {where}
-                      AND a.search_text IS NOT NULL
-                      AND CONTAINS(a.search_text, :text_query, 1)>0
-                    ORDER BY SCORE(1) DESC, a.artifact_id
-                ) WHERE ROWNUM<=:top_k
-                """,
-                binds,
-            )
+            cursor.execute(self._keyword_sql(where), self._bind_values(connection, binds))
             return [self._hit(row, channel="keyword:page_text") for row in self.rows(cursor)]
 
     def vector_search(self, *, embedding: list[float], column: str, channel: str,
                       top_k: int, user_hash: str | None, current_version_only: bool,
-                      document_types: list[str], filename_filter: str | None = None) -> list[RetrievalHit]:
+                      document_types: list[str], filename_filter: str | None = None,
+                      access: DocumentAccess | None = None) -> list[RetrievalHit]:
         if column not in {"text_embedding", "visual_embedding"}:
             raise ValueError("invalid vector column")
         with self.connection() as connection, connection.cursor() as cursor:
@@ -319,6 +708,7 @@ class OracleRagRepository:
                     current_version_only=current_version_only,
                     document_types=document_types,
                     filename_filter=filename_filter,
+                    access=access,
                 )
             )
         return sorted(results, key=lambda item: item.score, reverse=True)[:top_k]
@@ -335,68 +725,159 @@ class OracleRagRepository:
         document_types: list[str],
         filename_filter: str | None = None,
         min_score: float = 0.0,
+        access: DocumentAccess | None = None,
+        target_accuracy: int = VECTOR_TARGET_ACCURACY_DEFAULT,
+        rescore_recipe_code: str | None = None,
+        rescore_embedding: list[float] | None = None,
     ) -> list[RetrievalHit]:
         top_k = max(1, min(top_k, 1000))
-        score_filter = ""
-        if min_score > 0:
-            # min_score is a similarity floor, not a VECTOR_DISTANCE ceiling.
-            score_filter = (
-                "AND (1 - VECTOR_DISTANCE(ev.vector_value, :embedding, COSINE)) "
-                ">= :min_score"
-            )
         where, binds = self._document_where(
             user_hash=user_hash,
             current_version_only=current_version_only,
             document_types=document_types,
             filename_filter=filename_filter,
+            access=access,
         )
         binds.update(embedding=_vector(embedding), recipe_code=recipe_code)
-        if score_filter:
+        if min_score > 0:
             binds["min_score"] = float(min_score)
+        rescore = bool(rescore_recipe_code and rescore_embedding)
+        shadow_format = None if rescore else self._vector_shadow_stage(target_accuracy)
+        if shadow_format is not None:
+            binds["shadow_embedding"] = shadow_vector(embedding, shadow_format)
+        if rescore:
+            binds.update(
+                rescore_recipe=rescore_recipe_code,
+                rescore_embedding=_vector(rescore_embedding),
+            )
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                self._recipe_vector_sql(
+                    where,
+                    top_k=top_k,
+                    min_score=min_score,
+                    target_accuracy=target_accuracy,
+                    shadow_format=shadow_format,
+                    rescore=rescore,
+                ),
+                self._bind_values(connection, binds),
+            )
+            return [self._hit(row, channel=channel) for row in self.rows(cursor)]
+
+    def recipe_row_counts(self, recipe_codes: list[str]) -> dict[str, int]:
+        """レシピごとの公開中ベクトル行数。近似検索の取り直し要否の判定に使う。"""
+        if not recipe_codes:
+            return {}
+        binds = {f"recipe_{index}": code for index, code in enumerate(recipe_codes)}
         with self.connection() as connection, connection.cursor() as cursor:
             cursor.execute(
                 f"""
-                SELECT {self._base_select()},
-                       (1 - VECTOR_DISTANCE(ev.vector_value, :embedding, COSINE)) score
-                FROM sds_documents d
-                JOIN sds_index_releases rel
-                  ON rel.release_id=d.serving_release_id AND rel.status='PUBLISHED'
-                JOIN sds_embedding_recipes recipe ON recipe.code=:recipe_code
-                JOIN sds_index_release_components rc
-                  ON rc.release_id=rel.release_id
-                     AND rc.component_key='embedding:' || recipe.code
-                     AND rc.is_stale=0
+                SELECT ev.recipe_code, COUNT(*)
+                FROM sds_serving_components sc
                 JOIN sds_embeddings ev
-                  ON ev.stage_run_id=rc.stage_run_id
-                     AND ev.document_revision_id=rel.document_revision_id
-                JOIN sds_artifacts a ON a.artifact_id=ev.target_artifact_id
-                LEFT JOIN sds_index_release_components nc
-                  ON nc.release_id=rel.release_id AND nc.component_key='normalize'
-                     AND nc.is_stale=0
-                LEFT JOIN sds_artifacts page_text
-                  ON page_text.stage_run_id=nc.stage_run_id
-                     AND page_text.artifact_kind='PAGE_TEXT'
-                     AND page_text.page_number=a.page_number
-                LEFT JOIN sds_index_release_components ic
-                  ON ic.release_id=rel.release_id AND ic.component_key='render'
-                     AND ic.is_stale=0
-                LEFT JOIN sds_artifacts page_image
-                  ON page_image.stage_run_id=ic.stage_run_id
-                     AND page_image.artifact_kind='PAGE_IMAGE'
-                     AND page_image.page_number=a.page_number
-                WHERE {where}
-                {score_filter}
-                ORDER BY VECTOR_DISTANCE(ev.vector_value, :embedding, COSINE), ev.embedding_id
-                FETCH APPROX FIRST {top_k} ROWS ONLY WITH TARGET ACCURACY 95
+                  ON ev.stage_run_id=sc.stage_run_id
+                     AND ev.document_revision_id=sc.document_revision_id
+                WHERE ev.recipe_code IN ({", ".join(f":{key}" for key in binds)})
+                  AND sc.component_key='embedding:' || ev.recipe_code
+                GROUP BY ev.recipe_code
                 """,
                 binds,
             )
-            return [self._hit(row, channel=channel) for row in self.rows(cursor)]
+            return {str(row[0]): int(row[1]) for row in cursor.fetchall()}
+
+    def serving_document_versions(self) -> dict[str, str]:
+        """公開中の文書ごとの版トークン（公開Releaseと文書属性の更新時刻）。"""
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT document_id, serving_release_id,
+                       TO_CHAR(updated_at, 'YYYYMMDDHH24MISSFF6')
+                FROM sds_documents
+                WHERE serving_release_id IS NOT NULL
+                """
+            )
+            return {str(row[0]): f"{row[1]}:{row[2]}" for row in cursor.fetchall()}
+
+    def local_vector_rows(
+        self, *, recipe_code: str, document_ids: list[str]
+    ) -> list[tuple[RetrievalHit, str | None, bool, Any]]:
+        """プロセス内ベクトル索引に載せる公開中のベクトルと検索ヒット列を文書単位で読む。
+
+        戻り値は (ヒット, 文書種別, 現行版か, ベクトル) の一覧。
+        """
+        if not document_ids:
+            return []
+        binds = {
+            "recipe_code": recipe_code,
+            "document_ids": _DocumentIdList(document_ids),
+        }
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT {self._base_select()}, 0 score,
+                       a.document_type, a.is_current, ev.vector_value
+                FROM sds_serving_components sc
+                JOIN sds_embeddings ev
+                  ON ev.recipe_code=:recipe_code
+                     AND ev.stage_run_id=sc.stage_run_id
+                     AND ev.document_revision_id=sc.document_revision_id
+                JOIN sds_serving_artifacts a
+                  ON a.artifact_id=ev.target_artifact_id AND a.document_id=sc.document_id
+                WHERE sc.component_key='embedding:' || :recipe_code
+                  AND sc.document_id IN (SELECT COLUMN_VALUE FROM TABLE(:document_ids))
+                ORDER BY sc.document_id, ev.embedding_id
+                """,
+                self._bind_values(connection, binds),
+            )
+            return [
+                (
+                    self._hit(row, channel=""),
+                    row.get("document_type"),
+                    bool(row.get("is_current")),
+                    row["vector_value"],
+                )
+                for row in self.rows(cursor)
+            ]
+
+    def local_keyword_rows(
+        self, *, document_ids: list[str]
+    ) -> list[tuple[RetrievalHit, str, str, str | None, bool]]:
+        """プロセス内キーワード索引に載せる公開中のArtifactを文書単位で読む。
+
+        戻り値は (ヒット, コンポーネントキー, 検索テキスト, 文書種別, 現行版か) の一覧。
+        """
+        if not document_ids:
+            return []
+        binds = {"document_ids": _DocumentIdList(document_ids)}
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT {self._base_select()}, 0 score, a.component_key, a.search_text,
+                       a.document_type, a.is_current
+                FROM sds_serving_artifacts a
+                WHERE a.search_text IS NOT NULL
+                  AND a.document_id IN (SELECT COLUMN_VALUE FROM TABLE(:document_ids))
+                ORDER BY a.document_id, a.artifact_id
+                """,
+                self._bind_values(connection, binds),
+            )
+            return [
+                (
+                    self._hit(row, channel=""),
+                    str(row.get("component_key") or ""),
+                    _lob_text(row.get("search_text")),
+                    row.get("document_type"),
+                    bool(row.get("is_current")),
+                )
+                for row in self.rows(cursor)
+            ]
 
     def facet_keyword_search(self, *, profile: ProfileConfig, query: str, top_k: int,
                              user_hash: str | None, current_version_only: bool,
-                             document_types: list[str], filename_filter: str | None = None) -> list[RetrievalHit]:
-        text_query = self._text_query(query)
+                             document_types: list[str], filename_filter: str | None = None,
+                             access: DocumentAccess | None = None,
+                             variants: list[str] | None = None) -> list[RetrievalHit]:
+        text_query = self._text_query(query, variants)
         if not text_query or not profile.current_revision_id:
             return []
         where, binds = self._document_where(
@@ -404,6 +885,7 @@ class OracleRagRepository:
             current_version_only=current_version_only,
             document_types=document_types,
             filename_filter=filename_filter,
+            access=access,
         )
         binds.update(
             text_query=text_query,
@@ -411,39 +893,125 @@ class OracleRagRepository:
             top_k=top_k,
         )
         with self.connection() as connection, connection.cursor() as cursor:
-            cursor.execute(
-                f"""
-                SELECT * FROM (
-                    SELECT {self._facet_select()}, SCORE(1)/100 score
-                    FROM sds_documents d
-                    JOIN sds_index_releases rel
-                      ON rel.release_id=d.serving_release_id AND rel.status='PUBLISHED'
-                    JOIN sds_index_release_components rc
-                      ON rc.release_id=rel.release_id
-                         AND rc.component_key='vlm:' || TO_CHAR(:slot)
-                         AND rc.is_stale=0
-                    JOIN sds_artifacts a
-                      ON a.stage_run_id=rc.stage_run_id AND a.artifact_kind='VLM_TEXT'
-                    LEFT JOIN sds_index_release_components ic
-                      ON ic.release_id=rel.release_id AND ic.component_key='render'
-                         AND ic.is_stale=0
-                    LEFT JOIN sds_artifacts page_image
-                      ON page_image.stage_run_id=ic.stage_run_id
-                         AND page_image.artifact_kind='PAGE_IMAGE'
-                         AND page_image.page_number=a.page_number
-                    WHERE {where}
-                      AND CONTAINS(a.search_text, :text_query, 1)>0
-                    ORDER BY SCORE(1) DESC, a.artifact_id
-                ) WHERE ROWNUM<=:top_k
-                """,
-                binds,
-            )
+            cursor.execute(self._facet_keyword_sql(where), self._bind_values(connection, binds))
             channel = f"keyword:vlm_text_slot_{profile.slot_no}"
             return [self._hit(row, channel=channel) for row in self.rows(cursor)]
 
+    def multi_channel_search(
+        self,
+        *,
+        channels: list[ChannelQuery],
+        top_k: int,
+        user_hash: str | None,
+        current_version_only: bool,
+        document_types: list[str],
+        filename_filter: str | None = None,
+        access: DocumentAccess | None = None,
+    ) -> list[list[RetrievalHit]]:
+        """複数の検索チャンネルをUNION ALLの1文・1接続で実行する。
+
+        戻り値は ``channels`` と同じ順序のチャンネル別ランキング。どれか1つの
+        チャンネルが失敗すると文全体が失敗するため、呼び出し側は必要に応じて
+        チャンネル単位の検索へフォールバックする。
+        """
+        where, binds = self._document_where(
+            user_hash=user_hash,
+            current_version_only=current_version_only,
+            document_types=document_types,
+            filename_filter=filename_filter,
+            access=access,
+        )
+        # 同じ検索式のVLM_TEXTチャンネルはプロファイルをまたいで1つの枝にまとめる。
+        facet_groups: dict[str, list[int]] = {}
+        for index, item in enumerate(channels):
+            if (
+                item.kind == "facet_keyword"
+                and item.profile is not None
+                and item.profile.current_revision_id
+            ):
+                text_query = self._text_query(item.query or "", item.variants)
+                if text_query:
+                    facet_groups.setdefault(text_query, []).append(index)
+        facet_slots: dict[int, dict[int, int]] = {}
+        branches: list[str] = []
+        for index, item in enumerate(channels):
+            suffix = f"_{index}"
+            if item.kind == "facet_keyword":
+                group = next(
+                    (members for members in facet_groups.values() if members[0] == index), None
+                )
+                if group is None:
+                    continue
+                slot_binds = [
+                    f"slot{suffix}" if position == 0 else f"slot{suffix}_{position}"
+                    for position in range(len(group))
+                ]
+                for name, member in zip(slot_binds, group):
+                    binds[name] = channels[member].profile.slot_no
+                facet_slots[index] = {
+                    channels[member].profile.slot_no: member for member in group
+                }
+                sql = self._facet_keyword_group_sql(
+                    where, slot_binds=slot_binds, suffix=suffix, label=index + 1
+                )
+                binds[f"text_query{suffix}"] = self._text_query(item.query or "", item.variants)
+                binds[f"top_k{suffix}"] = top_k
+            elif item.kind == "recipe_vector":
+                branch_k = max(1, min(top_k, 1000))
+                rescore = bool(item.rescore_recipe_code and item.rescore_embedding)
+                shadow_format = (
+                    None if rescore else self._vector_shadow_stage(item.target_accuracy)
+                )
+                sql = self._recipe_vector_sql(
+                    where,
+                    top_k=branch_k,
+                    min_score=item.min_score,
+                    suffix=suffix,
+                    target_accuracy=item.target_accuracy,
+                    shadow_format=shadow_format,
+                    rescore=rescore,
+                )
+                binds[f"embedding{suffix}"] = _vector(item.embedding)
+                if shadow_format is not None:
+                    binds[f"shadow_embedding{suffix}"] = shadow_vector(
+                        item.embedding or [], shadow_format
+                    )
+                if rescore:
+                    binds[f"rescore_recipe{suffix}"] = item.rescore_recipe_code
+                    binds[f"rescore_embedding{suffix}"] = _vector(item.rescore_embedding)
+                binds[f"recipe_code{suffix}"] = item.recipe_code
+                if item.min_score > 0:
+                    binds[f"min_score{suffix}"] = float(item.min_score)
+            else:
+                text_query = self._text_query(item.query or "", item.variants)
+                if not text_query:
+                    continue
+                sql = self._keyword_sql(where, suffix=suffix, label=index + 1)
+                binds[f"text_query{suffix}"] = text_query
+                binds[f"top_k{suffix}"] = top_k
+            # UNION ALLは枝ごとの順序を保証しないため、ROWNUMで枝内順位を残す。
+            branches.append(
+                f"SELECT {index} branch_no, ROWNUM branch_rank, branch.* FROM ({sql}) branch"
+            )
+        results: list[list[RetrievalHit]] = [[] for _ in channels]
+        if not branches:
+            return results
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                "\nUNION ALL\n".join(branches) + "\nORDER BY branch_no, branch_rank",
+                self._bind_values(connection, binds),
+            )
+            for row in self.rows(cursor):
+                index = int(row["branch_no"])
+                if index in facet_slots:
+                    index = facet_slots[index].get(int(row.get("slot_no") or 0), index)
+                results[index].append(self._hit(row, channel=channels[index].channel))
+        return results
+
     def facet_vector_search(self, *, profile: ProfileConfig, embedding: list[float], top_k: int,
                             user_hash: str | None, current_version_only: bool,
-                            document_types: list[str], filename_filter: str | None = None) -> list[RetrievalHit]:
+                            document_types: list[str], filename_filter: str | None = None,
+                            access: DocumentAccess | None = None) -> list[RetrievalHit]:
         code = f"vlm_text_slot_{profile.slot_no}"
         return self.recipe_vector_search(
             recipe_code=code,
@@ -454,8 +1022,32 @@ class OracleRagRepository:
             current_version_only=current_version_only,
             document_types=document_types,
             filename_filter=filename_filter,
+            access=access,
         )
 
+    def evidence_texts(self, evidence_ids: list[str]) -> dict[str, str]:
+        """検索時と同じ解決規則（PAGE_TEXTへのフォールバック込み）で本文全文を返す。"""
+        if not evidence_ids:
+            return {}
+        binds: dict[str, Any] = {}
+        placeholders: list[str] = []
+        for index, value in enumerate(dict.fromkeys(evidence_ids)):
+            binds[f"evidence_{index}"] = value
+            placeholders.append(f":evidence_{index}")
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT a.artifact_id evidence_id, a.raw_text
+                FROM sds_serving_artifacts a
+                WHERE a.artifact_id IN ({", ".join(placeholders)})
+                """,
+                binds,
+            )
+            return {
+                str(row["evidence_id"]): _lob_text(row.get("raw_text"))
+                for row in self.rows(cursor)
+            }
+
     def enrich_hits(self, hits: list[RetrievalHit]) -> None:
         return
 
@@ -509,7 +1101,10 @@ class OracleRagRepository:
                 """,
                 {"document_id": document_id, "principal": "0" * 64},
             )
+            sync_serving_document(cursor, document_id)
+            bump_serving_epoch(cursor)
             connection.commit()
+        document_access_cache.bump_epoch("document_upserted")
         return DocumentUpsertResult(document_id, content_changed, digest, resolved_type)
 
     def reusable_document_run(self, *, document_id: str, content_sha256: str,
@@ -797,8 +1392,95 @@ class OracleRagRepository:
             cursor.execute("SELECT object_name FROM sds_documents ORDER BY object_name")
             return [str(row[0]) for row in cursor.fetchall()]
 
+    def serving_epoch(self) -> int:
+        """検索結果に影響する公開状態の世代。公開・削除・ACL・設定の書き込みで進む。"""
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT epoch FROM sds_serving_epoch WHERE epoch_id=1")
+            row = cursor.fetchone()
+        if not row:
+            raise LookupError("serving epoch row is missing")
+        return int(row[0])
+
+    def advance_serving_epoch(self, reason: str) -> None:
+        """公開状態以外の書き込み（サービス設定など）で検索結果の世代を進める。"""
+        with self.connection() as connection, connection.cursor() as cursor:
+            bump_serving_epoch(cursor)
+            connection.commit()
+        search_result_cache.bump_epoch(reason)
+
+    def pending_text_index_partitions(self) -> dict[str, int]:
+        """未同期行のあるOracle Text索引パーティションと件数。"""
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT pnd_partition_name, COUNT(*)
+                FROM ctx_user_pending
+                WHERE pnd_index_name=:index_name
+                GROUP BY pnd_partition_name
+                """,
+                {"index_name": TEXT_INDEX_NAME},
+            )
+            return {str(row[0]): int(row[1]) for row in cursor.fetchall()}
+
+    def sync_text_index(self, partition: str, *, memory: str | None = None) -> None:
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                """
+                BEGIN
+                    CTX_DDL.SYNC_INDEX(
+                        idx_name => :index_name, memory => :memory, part_name => :part
+                    );
+                END;
+                """,
+                {"index_name": TEXT_INDEX_NAME, "memory": memory, "part": partition},
+            )
+            # 同期した行がキーワード検索に現れるため、結果キャッシュを切り替える。
+            bump_serving_epoch(cursor)
+            connection.commit()
+
+    def set_text_index_sync_mode(self, mode: str) -> bool:
+        """Oracle Text索引の同期方式（MANUAL / ON COMMIT）を変える。変えたらTrueを返す。"""
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT idx_sync_type FROM ctx_user_indexes WHERE idx_name=:index_name",
+                {"index_name": TEXT_INDEX_NAME},
+            )
+            row = cursor.fetchone()
+            if not row or str(row[0] or "MANUAL").upper() == mode:
+                return False
+            # 索引の作り直しを伴わないメタデータの置き換え。
+            cursor.execute(
+                f"ALTER INDEX {TEXT_INDEX_NAME} PARAMETERS ('REPLACE METADATA SYNC ({mode})')"
+            )
+            return True
+
+    def optimize_text_index(self, partition: str, *, max_minutes: int) -> None:
+        """断片化したパーティションを時間制限付きでFULL最適化する。"""
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                """
+                BEGIN
+                    CTX_DDL.OPTIMIZE_INDEX(
+                        idx_name => :index_name, optlevel => 'FULL',
+                        maxtime => :maxtime, part_name => :part
+                    );
+                END;
+                """,
+                {"index_name": TEXT_INDEX_NAME, "maxtime": max_minutes, "part": partition},
+            )
+
     def delete_document_by_object(self, *, bucket: str, object_name: str) -> int:
+        # プロセス内索引はこのモジュールを参照するため、ここで読み込む。
+        from app.rag.local_keyword_index import local_keyword_index
+        from app.rag.local_vector_index import local_vector_index
+
         with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT document_id FROM sds_documents "
+                "WHERE bucket=:bucket AND object_name=:object_name",
+                {"bucket": bucket, "object_name": object_name},
+            )
+            document_ids = [str(row[0]) for row in cursor.fetchall()]
             # SDS_DOCUMENTS and SDS_INDEX_RELEASES intentionally have a
             # bidirectional pointer (serving/draft release on the document,
             # document_id on the release).  Null the pointers first so
@@ -818,8 +1500,15 @@ class OracleRagRepository:
                 {"bucket": bucket, "object_name": object_name},
             )
             count = int(cursor.rowcount)
+            if count:
+                bump_serving_epoch(cursor)
             connection.commit()
-            return count
+        if count:
+            search_result_cache.bump_epoch("document_deleted")
+            document_access_cache.bump_epoch("document_deleted")
+            local_vector_index.forget_documents(document_ids)
+            local_keyword_index.forget_documents(document_ids)
+        return count
 
     def list_documents_for_settings(self, limit: int = 100) -> list[dict[str, Any]]:
         limit = max(1, min(limit, 500))
@@ -842,39 +1531,58 @@ class OracleRagRepository:
             )
             if cursor.rowcount != 1:
                 raise LookupError("document was not found")
+            sync_serving_document(cursor, document_id)
+            bump_serving_epoch(cursor)
             connection.commit()
+        search_result_cache.bump_epoch("document_type_updated")
 
     def unreferenced_serving_assets(self, document_id: str) -> list[str]:
         # ponytail: retain revisioned assets until a measured storage problem justifies GC.
         return []
 
+    @staticmethod
+    def search_audit_binds(*, trace_id: str, query_hash: str, user_hash: str | None,
+                           profile_slots: list[int], diagnostics: dict[str, Any],
+                           result_count: int, elapsed_ms: int) -> dict[str, Any]:
+        return {
+            "trace": trace_id,
+            "user_hash": user_hash,
+            "query_hash": query_hash,
+            "profiles": json.dumps(profile_slots),
+            "diagnostics": json.dumps(diagnostics),
+            "result_count": result_count,
+            "elapsed_ms": elapsed_ms,
+        }
+
     def record_search_audit(self, *, trace_id: str, query_hash: str, user_hash: str | None,
                             profile_slots: list[int], diagnostics: dict[str, Any],
                             result_count: int, elapsed_ms: int) -> None:
         try:
-            with self.connection() as connection, connection.cursor() as cursor:
-                cursor.execute(
-                    """
-                    INSERT INTO sds_search_audit
-                        (trace_id, user_id_hash, query_hash, profile_slots_json,
-                         diagnostics_json, result_count, elapsed_ms)
-                    VALUES (:trace, :user_hash, :query_hash, :profiles,
-                            :diagnostics, :result_count, :elapsed_ms)
-                    """,
-                    {
-                        "trace": trace_id,
-                        "user_hash": user_hash,
-                        "query_hash": query_hash,
-                        "profiles": json.dumps(profile_slots),
-                        "diagnostics": json.dumps(diagnostics),
-                        "result_count": result_count,
-                        "elapsed_ms": elapsed_ms,
-                    },
+            self.record_search_audits([
+                self.search_audit_binds(
+                    trace_id=trace_id,
+                    query_hash=query_hash,
+                    user_hash=user_hash,
+                    profile_slots=profile_slots,
+                    diagnostics=diagnostics,
+                    result_count=result_count,
+                    elapsed_ms=elapsed_ms,
                 )
-                connection.commit()
+            ])
         except Exception:
             return
 
+    def search_trace_exists(self, trace_id: str) -> bool:
+        with self.connection() as connection, connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sds_search_audit WHERE trace_id=:trace", {"trace": trace_id}
+            )
+            return cursor.fetchone() is not None
+
+    def record_search_audits(self, rows: list[dict[str, Any]]) -> int:
+        """監査行をexecutemanyで一括登録し、登録できなかった行数を返す。"""
+        return self._insert_many(SEARCH_AUDIT_INSERT_SQL, rows)
+
     def create_ingestion_job(self, job_id: str, total_items: int) -> None:
         with self.connection() as connection, connection.cursor() as cursor:
             cursor.execute(
@@ -902,26 +1610,49 @@ class OracleRagRepository:
             )
             connection.commit()
 
+    @staticmethod
+    def search_feedback_binds(*, feedback_id: str, trace_id: str, document_id: str | None,
+                              evidence_id: str | None, action: str,
+                              user_hash: str | None) -> dict[str, Any]:
+        return {
+            "feedback": feedback_id,
+            "trace": trace_id,
+            "document": document_id,
+            "artifact": evidence_id,
+            "action": action,
+            "user_hash": user_hash,
+        }
+
     def record_search_feedback(self, *, feedback_id: str, trace_id: str,
                                document_id: str | None, evidence_id: str | None,
                                action: str, user_hash: str | None) -> None:
         with self.connection() as connection, connection.cursor() as cursor:
             cursor.execute(
-                """
-                INSERT INTO sds_search_feedback
-                    (feedback_id, trace_id, document_id, artifact_id, action, user_id_hash)
-                VALUES (:feedback, :trace, :document, :artifact, :action, :user_hash)
-                """,
-                {
-                    "feedback": feedback_id,
-                    "trace": trace_id,
-                    "document": document_id,
-                    "artifact": evidence_id,
-                    "action": action,
-                    "user_hash": user_hash,
-                },
+                SEARCH_FEEDBACK_INSERT_SQL,
+                self.search_feedback_binds(
+                    feedback_id=feedback_id,
+                    trace_id=trace_id,
+                    document_id=document_id,
+                    evidence_id=evidence_id,
+                    action=action,
+                    user_hash=user_hash,
+                ),
             )
             connection.commit()
 
+    def record_search_feedbacks(self, rows: list[dict[str, Any]]) -> int:
+        """フィードバック行を一括登録し、参照先の監査行がない等で失敗した行数を返す。"""
+        return self._insert_many(SEARCH_FEEDBACK_INSERT_SQL, rows)
+
+    def _insert_many(self, sql: str, rows: list[dict[str, Any]]) -> int:
+        if not rows:
+            return 0
+        with self.connection() as connection, connection.cursor() as cursor:
+            # 1行の制約違反でバッチ全体を失わないよう、行単位のエラーとして受け取る。
+            cursor.executemany(sql, rows, batcherrors=True)
+            failed = len(cursor.getbatcherrors())
+            connection.commit()
+        return failed
+
 
 rag_repository = OracleRagRepository()
@@ -14,11 +14,22 @@ from uuid import uuid4
 from dotenv import load_dotenv
 
 from app.rag.models import initial_profiles
+from app.rag.vector_shadow import (
+    VECTOR_SHADOW_FORMATS,
+    VectorShadowFormat,
+    float_vector_index_enabled,
+    shadow_vector,
+    vector_shadow_column,
+    vector_shadow_format,
+    vector_shadow_index,
+    vector_shadow_metric,
+)
 from app.services.database_service import database_service
 
 
-SCHEMA_VERSION = "20260714_004"
-MIGRATION_CONFIRMATION = "MIGRATE_TO_20260714_004"
+# DDL（schema_digestの対象）を変えたら上げる。既存環境は --upgrade-in-place で追従する。
+SCHEMA_VERSION = "20261017_006"
+MIGRATION_CONFIRMATION = f"MIGRATE_TO_{SCHEMA_VERSION}"
 LEGACY_TABLES = (
     "SDS_SEARCH_FEEDBACK",
     "SDS_SEARCH_AUDIT",
@@ -37,6 +48,96 @@ LEGACY_TABLES = (
     "SDS_SCHEMA_VERSION",
 )
 
+# SDS_EMBEDDINGSはレシピ別のLIST自動パーティションとし、ベクトル索引もLOCALにする。
+# レシピごとに近傍グラフが分かれ、利用の少ないレシピも他レシピの近傍に埋もれない。
+# VECTOR_VALUEは次元数を固定せず、パーティション（レシピ）ごとにレシピの次元数で揃える。
+EMBEDDING_PARTITION_CLAUSE = (
+    "PARTITION BY LIST (RECIPE_CODE) AUTOMATIC "
+    "(PARTITION SDS_EMBEDDINGS_CHUNK_TEXT VALUES ('chunk_text'))"
+)
+EMBEDDING_VECTOR_INDEX_DDL = """
+        CREATE VECTOR INDEX SDS_EMBEDDING_HNSW_IDX ON SDS_EMBEDDINGS (VECTOR_VALUE)
+        ORGANIZATION INMEMORY NEIGHBOR GRAPH DISTANCE COSINE WITH TARGET ACCURACY 95
+        PARAMETERS (TYPE HNSW, NEIGHBORS 32, EFCONSTRUCTION 500)
+        LOCAL
+        """
+VECTOR_SHADOW_BACKFILL_BATCH_SIZE = 500
+
+
+def vector_shadow_index_ddl(shadow_format: VectorShadowFormat) -> str:
+    """影列のLOCAL HNSW索引。INT8は1/4、BINARYは1/32の大きさになる。"""
+    return f"""
+        CREATE VECTOR INDEX {vector_shadow_index(shadow_format)}
+        ON SDS_EMBEDDINGS ({vector_shadow_column(shadow_format)})
+        ORGANIZATION INMEMORY NEIGHBOR GRAPH
+        DISTANCE {vector_shadow_metric(shadow_format)} WITH TARGET ACCURACY 95
+        PARAMETERS (TYPE HNSW, NEIGHBORS 32, EFCONSTRUCTION 500)
+        LOCAL
+        """
+
+# 公開Releaseの検索対象を平坦化した投影表（app.rag.serving_projectionが公開時に更新）。
+# Oracle Text索引は履歴Releaseを含むSDS_ARTIFACTSではなく、この表にだけ張る。
+# Artifact種別ごとのLIST自動パーティションとし、Oracle Text索引もLOCALにする。
+# VLM_TEXT検索はVLM_TEXTパーティションの索引だけを走査する。
+SERVING_ARTIFACT_PARTITION_CLAUSE = (
+    "PARTITION BY LIST (ARTIFACT_KIND) AUTOMATIC "
+    "(PARTITION SDS_SERVING_PAGE_TEXT VALUES ('PAGE_TEXT'))"
+)
+SERVING_PROJECTION_DDL = (
+    """
+        CREATE TABLE SDS_SERVING_COMPONENTS (
+            DOCUMENT_ID VARCHAR2(64) NOT NULL REFERENCES SDS_DOCUMENTS(DOCUMENT_ID) ON DELETE CASCADE,
+            RELEASE_ID VARCHAR2(64) NOT NULL REFERENCES SDS_INDEX_RELEASES(RELEASE_ID) ON DELETE CASCADE,
+            DOCUMENT_REVISION_ID VARCHAR2(64) NOT NULL,
+            COMPONENT_KEY VARCHAR2(200) NOT NULL,
+            STAGE_RUN_ID VARCHAR2(64) NOT NULL,
+            PRIMARY KEY (DOCUMENT_ID, COMPONENT_KEY)
+        )
+        """,
+    f"""
+        CREATE TABLE SDS_SERVING_ARTIFACTS (
+            DOCUMENT_ID VARCHAR2(64) NOT NULL REFERENCES SDS_DOCUMENTS(DOCUMENT_ID) ON DELETE CASCADE,
+            RELEASE_ID VARCHAR2(64) NOT NULL REFERENCES SDS_INDEX_RELEASES(RELEASE_ID) ON DELETE CASCADE,
+            DOCUMENT_REVISION_ID VARCHAR2(64) NOT NULL,
+            COMPONENT_KEY VARCHAR2(200) NOT NULL,
+            ARTIFACT_ID VARCHAR2(64) NOT NULL REFERENCES SDS_ARTIFACTS(ARTIFACT_ID) ON DELETE CASCADE,
+            ARTIFACT_KIND VARCHAR2(40) NOT NULL,
+            PAGE_NUMBER NUMBER,
+            SOURCE_LOCATOR VARCHAR2(512) NOT NULL,
+            BBOX_JSON CLOB CHECK (BBOX_JSON IS JSON),
+            RAW_TEXT CLOB,
+            SEARCH_TEXT CLOB,
+            ASSET_OBJECT_NAME VARCHAR2(1024),
+            FILE_NAME VARCHAR2(1024) NOT NULL,
+            OBJECT_NAME VARCHAR2(1024) NOT NULL,
+            BUCKET VARCHAR2(128) NOT NULL,
+            DOCUMENT_TYPE VARCHAR2(120),
+            IS_CURRENT NUMBER(1) NOT NULL
+        ) {SERVING_ARTIFACT_PARTITION_CLAUSE}
+        """,
+    "CREATE INDEX SDS_SERVING_COMPONENT_RUN_IDX ON SDS_SERVING_COMPONENTS (STAGE_RUN_ID)",
+    "CREATE INDEX SDS_SERVING_ARTIFACT_IDX ON SDS_SERVING_ARTIFACTS (ARTIFACT_ID, DOCUMENT_ID)",
+    "CREATE INDEX SDS_SERVING_DOCUMENT_IDX ON SDS_SERVING_ARTIFACTS (DOCUMENT_ID, COMPONENT_KEY)",
+)
+# 検索結果に影響する書き込みと同じトランザクションで進める公開状態の世代（1行だけ）。
+# 検索結果キャッシュはこの値だけを読み、別プロセスでの公開・削除を検出する。
+SERVING_EPOCH_DDL = (
+    """
+        CREATE TABLE SDS_SERVING_EPOCH (
+            EPOCH_ID NUMBER(1) DEFAULT 1 PRIMARY KEY CHECK (EPOCH_ID=1),
+            EPOCH NUMBER DEFAULT 0 NOT NULL,
+            UPDATED_AT TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL
+        )
+        """,
+    "INSERT INTO SDS_SERVING_EPOCH (EPOCH_ID, EPOCH) VALUES (1, 0)",
+)
+# 同期はコミット時ではなくapp.rag.text_index_maintenanceがパーティション単位で行う。
+SERVING_TEXT_INDEX_DDL = """
+        CREATE INDEX SDS_SERVING_TEXT_IDX ON SDS_SERVING_ARTIFACTS (SEARCH_TEXT)
+        INDEXTYPE IS CTXSYS.CONTEXT LOCAL
+        PARAMETERS ('LEXER SDS_WORLD_LEXER STOPLIST SDS_SEARCH_STOPLIST SYNC (MANUAL)')
+        """
+
 
 def _sql_text(value: str) -> str:
     return value.replace("'", "''")
@@ -371,7 +472,7 @@ def schema_statements() -> list[str]:
             REVISION_NO NUMBER NOT NULL,
             CONFIG_HASH CHAR(64) NOT NULL,
             MODEL_ID VARCHAR2(256) NOT NULL,
-            OUTPUT_DIMENSIONS NUMBER NOT NULL CHECK (OUTPUT_DIMENSIONS=1536),
+            OUTPUT_DIMENSIONS NUMBER NOT NULL CHECK (OUTPUT_DIMENSIONS IN (256, 512, 1024, 1536)),
             TARGET_SCOPE VARCHAR2(16) NOT NULL CHECK (TARGET_SCOPE IN ('PAGE', 'CHUNK')),
             MISSING_INPUT_POLICY VARCHAR2(24) DEFAULT 'SKIP_TARGET' NOT NULL
                 CHECK (MISSING_INPUT_POLICY IN ('SKIP_TARGET', 'FAIL_RUN')),
@@ -397,7 +498,7 @@ def schema_statements() -> list[str]:
             UNIQUE (REVISION_ID, SOURCE_TYPE, SOURCE_REF)
         )
         """,
-        """
+        f"""
         CREATE TABLE SDS_EMBEDDINGS (
             EMBEDDING_ID VARCHAR2(64) PRIMARY KEY,
             STAGE_RUN_ID VARCHAR2(64) NOT NULL REFERENCES SDS_STAGE_RUNS(STAGE_RUN_ID) ON DELETE CASCADE,
@@ -405,12 +506,14 @@ def schema_statements() -> list[str]:
                 REFERENCES SDS_DOCUMENT_REVISIONS(REVISION_ID) ON DELETE CASCADE,
             RECIPE_REVISION_ID VARCHAR2(64) NOT NULL
                 REFERENCES SDS_EMBEDDING_RECIPE_REVISIONS(REVISION_ID),
+            RECIPE_CODE VARCHAR2(64) NOT NULL,
             TARGET_ARTIFACT_ID VARCHAR2(64) NOT NULL REFERENCES SDS_ARTIFACTS(ARTIFACT_ID) ON DELETE CASCADE,
             INPUT_HASH CHAR(64) NOT NULL,
-            VECTOR_VALUE VECTOR(1536, FLOAT32) NOT NULL,
+            VECTOR_VALUE VECTOR(*, FLOAT32) NOT NULL,
             CREATED_AT TIMESTAMP DEFAULT SYSTIMESTAMP NOT NULL,
             UNIQUE (STAGE_RUN_ID, TARGET_ARTIFACT_ID)
         )
+        {EMBEDDING_PARTITION_CLAUSE}
         """,
         """
         CREATE TABLE SDS_EMBEDDING_INPUTS (
@@ -448,6 +551,8 @@ def schema_statements() -> list[str]:
             PRIMARY KEY (RELEASE_ID, COMPONENT_KEY)
         )
         """,
+        *SERVING_PROJECTION_DDL,
+        *SERVING_EPOCH_DDL,
         """
         ALTER TABLE SDS_DOCUMENTS ADD CONSTRAINT FK_SDS_DOCUMENT_SERVING_RELEASE
         FOREIGN KEY (SERVING_RELEASE_ID) REFERENCES SDS_INDEX_RELEASES(RELEASE_ID)
@@ -524,16 +629,8 @@ def schema_statements() -> list[str]:
             IF V_COUNT=0 THEN CTX_DDL.CREATE_STOPLIST('SDS_SEARCH_STOPLIST', 'BASIC_STOPLIST'); END IF;
         END;
         """,
-        """
-        CREATE INDEX SDS_ARTIFACT_TEXT_IDX ON SDS_ARTIFACTS (SEARCH_TEXT)
-        INDEXTYPE IS CTXSYS.CONTEXT
-        PARAMETERS ('LEXER SDS_WORLD_LEXER STOPLIST SDS_SEARCH_STOPLIST SYNC (ON COMMIT)')
-        """,
-        """
-        CREATE VECTOR INDEX SDS_EMBEDDING_HNSW_IDX ON SDS_EMBEDDINGS (VECTOR_VALUE)
-        ORGANIZATION INMEMORY NEIGHBOR GRAPH DISTANCE COSINE WITH TARGET ACCURACY 95
-        PARAMETERS (TYPE HNSW, NEIGHBORS 32, EFCONSTRUCTION 500)
-        """,
+        SERVING_TEXT_INDEX_DDL,
+        EMBEDDING_VECTOR_INDEX_DDL,
     ]
     return [statement.strip() for statement in statements]
 
@@ -1022,6 +1119,348 @@ def migrate_to_v4(
     }
 
 
+def migrate_embedding_partitions() -> dict[str, object]:
+    """既存のSDS_EMBEDDINGSをレシピ別パーティションへ非破壊で移行する。
+
+    RECIPE_CODE列の追加・埋め戻し、全体HNSW索引の削除、オンラインでの
+    パーティション化、LOCALベクトル索引の再作成を順に行う。途中で失敗しても
+    再実行で続きから進む。
+    """
+    if not database_service._ensure_pool_initialized():
+        raise RuntimeError("database connection is not configured")
+    steps: list[str] = []
+    backfilled = 0
+    with database_service.pool_manager.acquire_connection() as connection:
+        with connection.cursor() as cursor:
+            if not _existing_tables(cursor, ("SDS_EMBEDDINGS",)):
+                raise RuntimeError("SDS_EMBEDDINGSが存在しません。先にスキーマを作成してください")
+            cursor.execute(
+                "SELECT COUNT(*) FROM USER_PART_TABLES WHERE TABLE_NAME='SDS_EMBEDDINGS'"
+            )
+            partitioned = bool(cursor.fetchone()[0])
+            if not partitioned:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM USER_TAB_COLUMNS "
+                    "WHERE TABLE_NAME='SDS_EMBEDDINGS' AND COLUMN_NAME='RECIPE_CODE'"
+                )
+                if not cursor.fetchone()[0]:
+                    cursor.execute("ALTER TABLE SDS_EMBEDDINGS ADD (RECIPE_CODE VARCHAR2(64))")
+                    steps.append("add_recipe_code")
+                cursor.execute(
+                    """
+                    UPDATE SDS_EMBEDDINGS e
+                    SET RECIPE_CODE=(
+                        SELECT r.CODE
+                        FROM SDS_EMBEDDING_RECIPE_REVISIONS rr
+                        JOIN SDS_EMBEDDING_RECIPES r ON r.RECIPE_ID=rr.RECIPE_ID
+                        WHERE rr.REVISION_ID=e.RECIPE_REVISION_ID
+                    )
+                    WHERE RECIPE_CODE IS NULL
+                    """
+                )
+                backfilled = int(cursor.rowcount or 0)
+                connection.commit()
+                steps.append("backfill_recipe_code")
+                cursor.execute(
+                    "SELECT NULLABLE FROM USER_TAB_COLUMNS "
+                    "WHERE TABLE_NAME='SDS_EMBEDDINGS' AND COLUMN_NAME='RECIPE_CODE'"
+                )
+                if str(cursor.fetchone()[0]) == "Y":
+                    cursor.execute("ALTER TABLE SDS_EMBEDDINGS MODIFY (RECIPE_CODE NOT NULL)")
+            cursor.execute(
+                "SELECT PARTITIONED FROM USER_INDEXES WHERE INDEX_NAME='SDS_EMBEDDING_HNSW_IDX'"
+            )
+            row = cursor.fetchone()
+            index_local = row is not None and str(row[0]) == "YES"
+            if row is not None and not index_local:
+                # 全体索引があるとパーティション化できないため先に削除する。
+                cursor.execute("DROP INDEX SDS_EMBEDDING_HNSW_IDX")
+                steps.append("drop_global_vector_index")
+            if not partitioned:
+                cursor.execute(
+                    f"ALTER TABLE SDS_EMBEDDINGS MODIFY {EMBEDDING_PARTITION_CLAUSE} ONLINE"
+                )
+                steps.append("partition_by_recipe")
+            if not index_local and float_vector_index_enabled():
+                cursor.execute(EMBEDDING_VECTOR_INDEX_DDL.strip())
+                steps.append("create_local_vector_index")
+        connection.commit()
+    return {
+        "steps": steps,
+        "backfilled_rows": backfilled,
+        "already_partitioned": not steps,
+    }
+
+
+def migrate_embedding_dimensions() -> dict[str, object]:
+    """1536次元固定の既存スキーマを、レシピごとの次元数（256〜1536）に対応させる。
+
+    ベクトル列は索引があると型を変更できないため、FLOAT32と影列の索引を削除してから
+    次元数可変（``VECTOR(*, ...)``）に変え、レシピ版のCHECK制約を差し替える。
+    FLOAT32の索引はここで作り直し、影列の索引はbuild_vector_shadowが作り直す。
+    """
+    if not database_service._ensure_pool_initialized():
+        raise RuntimeError("database connection is not configured")
+    steps: list[str] = []
+    with database_service.pool_manager.acquire_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT CONSTRAINT_NAME, SEARCH_CONDITION_VC FROM USER_CONSTRAINTS "
+                "WHERE TABLE_NAME='SDS_EMBEDDING_RECIPE_REVISIONS' AND CONSTRAINT_TYPE='C'"
+            )
+            fixed = [
+                str(row[0])
+                for row in cursor.fetchall()
+                if re.sub(r"\s+", "", str(row[1] or "")).upper() == "OUTPUT_DIMENSIONS=1536"
+            ]
+            if not fixed:
+                return {"steps": steps, "already_flexible": True}
+            shadow_columns = {
+                vector_shadow_column(item): item for item in VECTOR_SHADOW_FORMATS
+            }
+            cursor.execute(
+                "SELECT COLUMN_NAME FROM USER_TAB_COLUMNS "
+                "WHERE TABLE_NAME='SDS_EMBEDDINGS' AND COLUMN_NAME IN ("
+                + ", ".join(f"'{name}'" for name in shadow_columns)
+                + ")"
+            )
+            existing_shadow = [str(row[0]) for row in cursor.fetchall()]
+            indexes = _existing_indexes(
+                cursor,
+                (
+                    "SDS_EMBEDDING_HNSW_IDX",
+                    *(vector_shadow_index(item) for item in VECTOR_SHADOW_FORMATS),
+                ),
+            )
+            for index in sorted(indexes):
+                cursor.execute(f"DROP INDEX {index}")
+                steps.append(f"drop:{index}")
+            cursor.execute("ALTER TABLE SDS_EMBEDDINGS MODIFY (VECTOR_VALUE VECTOR(*, FLOAT32))")
+            steps.append("modify:VECTOR_VALUE")
+            for column in existing_shadow:
+                cursor.execute(
+                    f"ALTER TABLE SDS_EMBEDDINGS MODIFY "
+                    f"({column} VECTOR(*, {shadow_columns[column]}))"
+                )
+                steps.append(f"modify:{column}")
+            for name in fixed:
+                cursor.execute(
+                    f"ALTER TABLE SDS_EMBEDDING_RECIPE_REVISIONS DROP CONSTRAINT {name}"
+                )
+            cursor.execute(
+                "ALTER TABLE SDS_EMBEDDING_RECIPE_REVISIONS ADD "
+                "CHECK (OUTPUT_DIMENSIONS IN (256, 512, 1024, 1536))"
+            )
+            steps.append("replace:OUTPUT_DIMENSIONS_CHECK")
+            if "SDS_EMBEDDING_HNSW_IDX" in indexes and float_vector_index_enabled():
+                cursor.execute(EMBEDDING_VECTOR_INDEX_DDL.strip())
+                steps.append("create:SDS_EMBEDDING_HNSW_IDX")
+        connection.commit()
+    return {"steps": steps, "already_flexible": False}
+
+
+def build_vector_shadow(
+    *, batch_size: int = VECTOR_SHADOW_BACKFILL_BATCH_SIZE
+) -> dict[str, object]:
+    """SDS_EMBEDDINGSに圧縮ベクトルの影列を追加し、既存行を埋め戻して近似索引を作る。
+
+    形式は ``VECTOR_SHADOW_FORMAT`` （INT8 / BINARY）で選ぶ。量子化はstore_embeddingsと
+    同じ関数で行うため、埋め戻した行と新しい行の値は一致する。
+    ``VECTOR_FLOAT_INDEX_ENABLED=false`` ではFLOAT32のHNSW索引を削除し、ベクトルメモリ
+    プールには影列の索引だけを載せる。再実行すると未処理の行から続ける。
+    """
+    shadow_format = vector_shadow_format()
+    if shadow_format is None:
+        return {"format": None, "steps": [], "backfilled_rows": 0}
+    if not database_service._ensure_pool_initialized():
+        raise RuntimeError("database connection is not configured")
+    column = vector_shadow_column(shadow_format)
+    index = vector_shadow_index(shadow_format)
+    steps: list[str] = []
+    backfilled = 0
+    with database_service.pool_manager.acquire_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT COLUMN_NAME FROM USER_TAB_COLUMNS "
+                "WHERE TABLE_NAME='SDS_EMBEDDINGS' AND COLUMN_NAME=:name",
+                {"name": column},
+            )
+            if not cursor.fetchall():
+                cursor.execute(
+                    f"ALTER TABLE SDS_EMBEDDINGS ADD ({column} VECTOR(*, {shadow_format}))"
+                )
+                steps.append(f"add:{column}")
+            while True:
+                cursor.execute(
+                    f"SELECT EMBEDDING_ID, VECTOR_VALUE FROM SDS_EMBEDDINGS "
+                    f"WHERE {column} IS NULL FETCH FIRST {max(1, batch_size)} ROWS ONLY"
+                )
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                cursor.executemany(
+                    f"UPDATE SDS_EMBEDDINGS SET {column}=:shadow WHERE EMBEDDING_ID=:id",
+                    [
+                        {"id": str(row[0]), "shadow": shadow_vector(list(row[1]), shadow_format)}
+                        for row in rows
+                    ],
+                )
+                connection.commit()
+                backfilled += len(rows)
+            if backfilled:
+                steps.append(f"backfill:{column}")
+            indexes = _existing_indexes(cursor, (index, "SDS_EMBEDDING_HNSW_IDX"))
+            if index not in indexes:
+                # 埋め戻し後に作成し、行ごとの索引更新を避ける。
+                cursor.execute(vector_shadow_index_ddl(shadow_format).strip())
+                steps.append(f"create:{index}")
+            if "SDS_EMBEDDING_HNSW_IDX" in indexes and not float_vector_index_enabled():
+                cursor.execute("DROP INDEX SDS_EMBEDDING_HNSW_IDX")
+                steps.append("drop:SDS_EMBEDDING_HNSW_IDX")
+        connection.commit()
+    return {"format": shadow_format, "steps": steps, "backfilled_rows": backfilled}
+
+
+def _existing_indexes(cursor: Any, names: tuple[str, ...]) -> set[str]:
+    binds = {f"index_{index}": name for index, name in enumerate(names)}
+    placeholders = ", ".join(f":index_{index}" for index in range(len(names)))
+    cursor.execute(
+        f"SELECT INDEX_NAME FROM USER_INDEXES WHERE INDEX_NAME IN ({placeholders})", binds
+    )
+    return {str(row[0]).upper() for row in cursor.fetchall()}
+
+
+def _is_partitioned(cursor: Any, view: str, column: str, name: str) -> bool:
+    cursor.execute(f"SELECT {column} FROM {view} WHERE {column}=:name", {"name": name})
+    return bool(cursor.fetchall())
+
+
+def build_serving_projection() -> dict[str, object]:
+    """公開Release投影表を作成し、既存の公開Releaseから埋め戻す。
+
+    作成済みの表・索引は飛ばすため再実行できる。旧SDS_ARTIFACT_TEXT_IDXと
+    コミット同期の全体索引は、種別パーティションのLOCAL索引に置き換える。
+    """
+    from app.rag.serving_projection import refresh_serving_projection
+
+    if not database_service._ensure_pool_initialized():
+        raise RuntimeError("database connection is not configured")
+    steps: list[str] = []
+    with database_service.pool_manager.acquire_connection() as connection:
+        with connection.cursor() as cursor:
+            tables = _existing_tables(cursor, ("SDS_SERVING_COMPONENTS", "SDS_SERVING_ARTIFACTS"))
+            indexes = _existing_indexes(
+                cursor,
+                (
+                    "SDS_SERVING_COMPONENT_RUN_IDX",
+                    "SDS_SERVING_ARTIFACT_IDX",
+                    "SDS_SERVING_DOCUMENT_IDX",
+                    "SDS_SERVING_TEXT_IDX",
+                    "SDS_ARTIFACT_TEXT_IDX",
+                ),
+            )
+            artifacts_partitioned = "SDS_SERVING_ARTIFACTS" not in tables or _is_partitioned(
+                cursor, "USER_PART_TABLES", "TABLE_NAME", "SDS_SERVING_ARTIFACTS"
+            )
+            text_index_local = "SDS_SERVING_TEXT_IDX" in indexes and _is_partitioned(
+                cursor, "USER_PART_INDEXES", "INDEX_NAME", "SDS_SERVING_TEXT_IDX"
+            )
+            for statement in SERVING_PROJECTION_DDL:
+                name = statement.split()[2]
+                if name in tables or name in indexes:
+                    continue
+                cursor.execute(statement.strip())
+                steps.append(f"create:{name}")
+            if "SDS_SERVING_TEXT_IDX" in indexes and not (
+                text_index_local and artifacts_partitioned
+            ):
+                # コミット同期の全体索引は種別パーティションのLOCAL索引に作り直す。
+                cursor.execute("DROP INDEX SDS_SERVING_TEXT_IDX")
+                steps.append("drop:SDS_SERVING_TEXT_IDX")
+                indexes.discard("SDS_SERVING_TEXT_IDX")
+            if not artifacts_partitioned:
+                cursor.execute(
+                    f"ALTER TABLE SDS_SERVING_ARTIFACTS MODIFY {SERVING_ARTIFACT_PARTITION_CLAUSE} ONLINE"
+                )
+                steps.append("partition:SDS_SERVING_ARTIFACTS")
+            if "SDS_ARTIFACT_TEXT_IDX" in indexes:
+                cursor.execute("DROP INDEX SDS_ARTIFACT_TEXT_IDX")
+                steps.append("drop:SDS_ARTIFACT_TEXT_IDX")
+            cursor.execute(
+                "SELECT document_id, serving_release_id FROM sds_documents "
+                "WHERE serving_release_id IS NOT NULL"
+            )
+            serving = [(str(row[0]), str(row[1])) for row in cursor.fetchall()]
+            for document_id, release_id in serving:
+                refresh_serving_projection(
+                    cursor, document_id=document_id, release_id=release_id
+                )
+                connection.commit()
+            if "SDS_SERVING_TEXT_IDX" not in indexes:
+                # 埋め戻し後に作成し、行ごとの同期を避ける。作成時点の行は索引済みになる。
+                cursor.execute(SERVING_TEXT_INDEX_DDL.strip())
+                steps.append("create:SDS_SERVING_TEXT_IDX")
+        connection.commit()
+    return {"steps": steps, "backfilled_documents": len(serving)}
+
+
+def build_serving_epoch() -> dict[str, object]:
+    """公開状態の世代表を作成する。作成済みなら何もしない。"""
+    if not database_service._ensure_pool_initialized():
+        raise RuntimeError("database connection is not configured")
+    with database_service.pool_manager.acquire_connection() as connection:
+        with connection.cursor() as cursor:
+            if _existing_tables(cursor, ("SDS_SERVING_EPOCH",)):
+                return {"created": False}
+            for statement in SERVING_EPOCH_DDL:
+                cursor.execute(statement.strip())
+        connection.commit()
+    return {"created": True}
+
+
+def upgrade_schema_in_place() -> dict[str, object]:
+    """破壊的マイグレーションなしで現行スキーマへ追従する。
+
+    各手順は辞書ビューを確認してから実行するため、途中で失敗しても再実行できる。
+    すべて完了した後に現行のスキーマ版の行を登録（再実行時はDDLダイジェストを更新）する。
+    """
+    partitions = migrate_embedding_partitions()
+    dimensions = migrate_embedding_dimensions()
+    shadow = build_vector_shadow()
+    projection = build_serving_projection()
+    serving_epoch = build_serving_epoch()
+    with database_service.pool_manager.acquire_connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                MERGE INTO SDS_SCHEMA_VERSION v
+                USING (SELECT :version version_id FROM dual) s
+                ON (v.VERSION_ID=s.version_id)
+                WHEN MATCHED THEN UPDATE SET v.DDL_SHA256=:digest
+                WHEN NOT MATCHED THEN
+                    INSERT (VERSION_ID, DDL_SHA256, DETAILS_JSON)
+                    VALUES (:version, :digest, :details)
+                """,
+                {
+                    "version": SCHEMA_VERSION,
+                    "digest": schema_digest(),
+                    "details": json.dumps(
+                        {"migration": SCHEMA_VERSION, "upgraded_in_place": True},
+                        ensure_ascii=False,
+                    ),
+                },
+            )
+        connection.commit()
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "embedding_partitions": partitions,
+        "embedding_dimensions": dimensions,
+        "vector_shadow": shadow,
+        "serving_projection": projection,
+        "serving_epoch": serving_epoch,
+    }
+
+
 def enqueue_full_rebuild() -> dict[str, object]:
     """Register every source object and enqueue durable FULL pipeline jobs."""
     from app.rag.pipeline_models import PipelineJobRequest
@@ -1090,11 +1529,14 @@ def main() -> None:
     parser.add_argument("--backup-dir", type=Path, default=Path("var/schema-backups"))
     parser.add_argument("--resume-profile-backup", type=Path)
     parser.add_argument("--enqueue-rebuild", action="store_true")
+    parser.add_argument("--upgrade-in-place", action="store_true")
     args = parser.parse_args()
     if args.output:
         args.output.write_text(schema_sql(), encoding="utf-8")
     if args.plan:
         print(json.dumps(migration_plan(), ensure_ascii=False, indent=2))
+    if args.upgrade_in_place:
+        print(json.dumps(upgrade_schema_in_place(), ensure_ascii=False, indent=2))
     if args.enqueue_rebuild:
         print(json.dumps(enqueue_full_rebuild(), ensure_ascii=False, indent=2))
     elif args.migrate:
@@ -1112,7 +1554,7 @@ def main() -> None:
         )
     elif args.apply:
         apply_schema()
-    elif not args.output and not args.plan:
+    elif not args.output and not args.plan and not args.upgrade_in_place:
         print(schema_sql())
 
 
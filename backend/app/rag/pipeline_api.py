@@ -7,6 +7,7 @@ from typing import Annotated, Any, Literal
 from fastapi import APIRouter, Header, HTTPException, Query
 from fastapi.responses import Response, StreamingResponse
 
+from app.rag.oracle_schema import SCHEMA_VERSION
 from app.rag.pipeline_dispatcher import pipeline_dispatcher
 from app.rag.pipeline_models import (
     DocumentProcessingStatus,
@@ -32,7 +33,7 @@ def _require_schema() -> None:
     if not pipeline_repository.schema_ready():
         raise HTTPException(
             status_code=503,
-            detail="文書処理スキーマが未構築です。20260714_004を適用してください。",
+            detail=f"文書処理スキーマが未構築です。{SCHEMA_VERSION}を適用してください。",
         )
 
 
@@ -9,6 +9,7 @@ from uuid import uuid4
 
 from app.rag.pipeline_engine import pipeline_engine, pipeline_max_concurrent_files
 from app.rag.pipeline_repository import pipeline_repository
+from app.rag.text_index_maintenance import text_index_maintainer
 
 logger = logging.getLogger(__name__)
 
@@ -62,6 +63,7 @@ class PipelineDispatcher:
                         if not task.done():
                             continue
                         active_jobs.pop(task, None)
+                        text_index_maintainer.wake()
                         try:
                             task.result()
                         except Exception:
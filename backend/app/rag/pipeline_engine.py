@@ -1112,6 +1112,7 @@ class PipelineEngine:
                 vector = await embedding_client.contents(
                     ordered_contents=ordered,
                     input_type="SEARCH_DOCUMENT",
+                    dimensions=recipe.output_dimensions,
                 )
             return (
                 str(target["artifact_id"]),
@@ -1130,7 +1131,9 @@ class PipelineEngine:
             run_id=run_id,
             revision_id=context.revision.revision_id,
             recipe_revision_id=recipe.current_revision_id,
+            recipe_code=recipe.code,
             values=stored,
+            dimensions=recipe.output_dimensions,
         )
         total = len(targets)
         return len(stored), len(stored) / max(1, total), {
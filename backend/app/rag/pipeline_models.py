@@ -29,6 +29,10 @@ TargetScope = Literal["PAGE", "CHUNK"]
 PublishMode = Literal["DRAFT", "AUTO"]
 PipelineMode = Literal["FULL", "CUSTOM"]
 PageImageReleaseSelector = Literal["latest", "draft", "serving"]
+# Cohere Embed 4が返せる次元数。小さい次元は1536次元の先頭部分（Matryoshka表現）。
+EmbeddingDimensions = Literal[256, 512, 1024, 1536]
+EMBEDDING_OUTPUT_DIMENSIONS: tuple[int, ...] = (256, 512, 1024, 1536)
+EMBEDDING_FULL_DIMENSIONS = 1536
 
 
 class PipelineStepSelector(BaseModel):
@@ -177,6 +181,7 @@ class EmbeddingRecipeUpsert(BaseModel):
     search_weight: float = Field(default=1.0, ge=0, le=10)
     target_scope: TargetScope
     inputs: list[EmbeddingRecipeInput] = Field(min_length=1, max_length=10)
+    output_dimensions: EmbeddingDimensions = EMBEDDING_FULL_DIMENSIONS
 
     @field_validator("name", "description")
     @classmethod
@@ -208,7 +213,6 @@ class EmbeddingRecipe(EmbeddingRecipeUpsert):
     revision_no: int
     config_hash: str
     model_id: str = "cohere.embed-v4.0"
-    output_dimensions: int = 1536
 
 
 class PageImageReleaseSummary(BaseModel):
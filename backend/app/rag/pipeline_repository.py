@@ -10,13 +10,28 @@ from pathlib import PurePosixPath
 from typing import Any, Iterator, Sequence
 from uuid import uuid4
 
+from app.rag.access_cache import document_access_cache
+from app.rag.local_keyword_index import local_keyword_index
+from app.rag.local_vector_index import local_vector_index
 from app.rag.oracle_schema import SCHEMA_VERSION, schema_digest
-from app.rag.pipeline_models import EmbeddingRecipe, EmbeddingRecipeInput, EmbeddingRecipeUpsert
+from app.rag.pipeline_models import (
+    EMBEDDING_FULL_DIMENSIONS,
+    EmbeddingRecipe,
+    EmbeddingRecipeInput,
+    EmbeddingRecipeUpsert,
+)
 from app.rag.pipeline_repository_types import (
     embedding_input_fingerprint,
     stable_hash_value,
 )
+from app.rag.search_cache import search_result_cache
 from app.rag.service_settings import retrieval_service_settings
+from app.rag.serving_projection import (
+    bump_serving_epoch,
+    refresh_serving_projection,
+    sync_serving_document,
+)
+from app.rag.vector_shadow import shadow_vector, vector_shadow_column, vector_shadow_format
 from app.services.database_service import database_service
 
 
@@ -212,7 +227,7 @@ class OraclePipelineRepository:
     def upsert_recipe(self, value: EmbeddingRecipeUpsert) -> EmbeddingRecipe:
         config = {
             "model_id": "cohere.embed-v4.0",
-            "output_dimensions": 1536,
+            "output_dimensions": value.output_dimensions,
             "target_scope": value.target_scope,
             "inputs": [item.model_dump(mode="json") for item in value.inputs],
         }
@@ -281,13 +296,14 @@ class OraclePipelineRepository:
                         (revision_id, recipe_id, revision_no, config_hash, model_id,
                          output_dimensions, target_scope, missing_input_policy)
                     VALUES (:revision, :id, :revision_no, :hash, 'cohere.embed-v4.0',
-                            1536, :scope, 'SKIP_TARGET')
+                            :dimensions, :scope, 'SKIP_TARGET')
                     """,
                     {
                         "revision": revision_id,
                         "id": recipe_id,
                         "revision_no": revision_no,
                         "hash": digest,
+                        "dimensions": value.output_dimensions,
                         "scope": value.target_scope,
                     },
                 )
@@ -322,7 +338,9 @@ class OraclePipelineRepository:
                     """,
                     {"component": f"embedding:{value.code}"},
                 )
+            bump_serving_epoch(cursor)
             connection.commit()
+        search_result_cache.bump_epoch("recipe_updated")
         return self.get_recipe(value.code)
 
     def register_revision(
@@ -446,7 +464,10 @@ class OraclePipelineRepository:
                 """,
                 {"document": document_id, "principal": "0" * 64},
             )
+            sync_serving_document(cursor, document_id)
+            bump_serving_epoch(cursor)
             connection.commit()
+        document_access_cache.bump_epoch("document_revision_registered")
         return RevisionRecord(
             document_id=document_id,
             revision_id=revision_id,
@@ -1749,29 +1770,43 @@ class OraclePipelineRepository:
         run_id: str,
         revision_id: str,
         recipe_revision_id: str,
+        recipe_code: str,
         values: Sequence[tuple[str, str, Sequence[float], Sequence[tuple[str, str, int]]]],
+        dimensions: int = EMBEDDING_FULL_DIMENSIONS,
     ) -> None:
+        # 影列（圧縮ベクトル）はoracle_schema.build_vector_shadowで追加してから有効にする。
+        shadow_format = vector_shadow_format()
+        shadow_column = f", {vector_shadow_column(shadow_format)}" if shadow_format else ""
+        shadow_bind = ", :shadow" if shadow_format else ""
         with self.connection() as connection, connection.cursor() as cursor:
             for target_artifact_id, input_hash, vector, inputs in values:
-                if len(vector) != 1536:
-                    raise ValueError(f"Embeddingの次元数が不正です: {len(vector)}")
+                if len(vector) != dimensions:
+                    raise ValueError(
+                        f"Embeddingの次元数が不正です: {len(vector)}（期待値: {dimensions}）"
+                    )
                 embedding_id = uuid4().hex
+                binds = {
+                    "id": embedding_id,
+                    "run": run_id,
+                    "revision": revision_id,
+                    "recipe": recipe_revision_id,
+                    "recipe_code": recipe_code,
+                    "target": target_artifact_id,
+                    "hash": input_hash,
+                    "vector": array("f", vector),
+                }
+                if shadow_format:
+                    binds["shadow"] = shadow_vector(vector, shadow_format)
                 cursor.execute(
-                    """
+                    f"""
                     INSERT INTO sds_embeddings
                         (embedding_id, stage_run_id, document_revision_id,
-                         recipe_revision_id, target_artifact_id, input_hash, vector_value)
-                    VALUES (:id, :run, :revision, :recipe, :target, :hash, :vector)
+                         recipe_revision_id, recipe_code, target_artifact_id,
+                         input_hash, vector_value{shadow_column})
+                    VALUES (:id, :run, :revision, :recipe, :recipe_code, :target,
+                            :hash, :vector{shadow_bind})
                     """,
-                    {
-                        "id": embedding_id,
-                        "run": run_id,
-                        "revision": revision_id,
-                        "recipe": recipe_revision_id,
-                        "target": target_artifact_id,
-                        "hash": input_hash,
-                        "vector": array("f", vector),
-                    },
+                    binds,
                 )
                 for artifact_id, role, ordinal in inputs:
                     cursor.execute(
@@ -2094,8 +2129,13 @@ class OraclePipelineRepository:
                 """,
                 {"release": release_id, "document": document_id},
             )
+            refresh_serving_projection(cursor, document_id=document_id, release_id=release_id)
+            bump_serving_epoch(cursor)
             connection.commit()
-            return {"document_id": document_id, "release_id": release_id, "previous_release_id": previous}
+        search_result_cache.bump_epoch("publish_release")
+        local_vector_index.notify_published(document_id)
+        local_keyword_index.notify_published(document_id)
+        return {"document_id": document_id, "release_id": release_id, "previous_release_id": previous}
 
     @staticmethod
     def _page_image_summary_for_release(
@@ -8,6 +8,8 @@ from uuid import uuid4
 from app.rag.models import ProfileConfig, initial_profiles
 from app.rag.oracle_schema import SCHEMA_VERSION, schema_digest
 from app.rag.profile_validation import profile_hash
+from app.rag.search_cache import search_result_cache
+from app.rag.serving_projection import bump_serving_epoch
 from app.services.database_service import database_service
 from app.services.oci_service import oci_service
 
@@ -230,7 +232,9 @@ class OracleProfileRepository:
                 """,
                 {"slot_ref": str(profile.slot_no)},
             )
+            bump_serving_epoch(cursor)
             connection.commit()
+        search_result_cache.bump_epoch("profile_applied")
         return self.get_profile(profile.slot_no)
 
     def set_apply_status(self, slot_no: int, status: str) -> None:
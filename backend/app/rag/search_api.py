@@ -16,9 +16,13 @@ from app.rag.models import (
     FieldFilter,
     RetrievalMode,
     RetrievalModeOption,
+    SearchV2BatchRequest,
+    SearchV2BatchResponse,
     SearchV2Request,
     SearchV2Response,
+    VectorAccuracyMode,
 )
+from app.rag.search_deadline import search_deadline_ms
 from app.rag.search_pipeline import (
     available_retrieval_modes,
     principal_hash,
@@ -176,6 +180,7 @@ def _search_events(
     image: bytes | None = None,
     image_media_type: str = "image/png",
     retrieval_modes: list[RetrievalMode] | None = None,
+    vector_accuracy: VectorAccuracyMode | None = None,
     verify: bool = False,
     debug: bool = False,
 ) -> StreamingResponse:
@@ -218,9 +223,11 @@ def _search_events(
                     image=image,
                     image_media_type=image_media_type,
                     retrieval_modes=retrieval_modes,
+                    vector_accuracy=vector_accuracy,
                     verify=verify,
                     debug=debug,
                     progress=emit,
+                    deadline_ms=search_deadline_ms("search"),
                 )
                 result_json = result.model_dump(mode="json")
                 await emit({
@@ -308,6 +315,9 @@ async def dify_retrieval(
         document_types=[],
         current_version_only=True,
         user_hash=principal_hash(getattr(request.state, "auth_username", None)),
+        # Difyは応答時間を優先し、近似検索の精度を下げる。
+        vector_accuracy="fast",
+        deadline_ms=search_deadline_ms("dify"),
     )
     response.headers["X-Score-Threshold-Deprecated"] = "true"
     records: list[dict[str, object]] = []
@@ -335,17 +345,35 @@ async def dify_retrieval(
 
 @router.post("/search/v2/feedback")
 async def search_v2_feedback(payload: SearchFeedbackRequest, request: Request) -> dict[str, object]:
+    from app.rag.audit_writer import search_audit_writer
     from app.rag.oracle_repository import rag_repository
 
+    feedback = {
+        "feedback_id": uuid4().hex,
+        "trace_id": payload.trace_id,
+        "document_id": payload.document_id,
+        "evidence_id": payload.evidence_id,
+        "action": payload.action,
+        "user_hash": principal_hash(getattr(request.state, "auth_username", None)),
+    }
+    if search_audit_writer.running:
+        # キュー経由でも未知のtrace_idは409で拒否する。監査行がキューに残っている検索は
+        # 書き込み順（監査行が先）で参照先が満たされるため、DBを確認せずに受け付ける。
+        if not search_audit_writer.has_pending_trace(payload.trace_id):
+            try:
+                exists = await asyncio.to_thread(
+                    rag_repository.search_trace_exists, payload.trace_id
+                )
+            except Exception as error:
+                raise HTTPException(status_code=503, detail=str(error)) from error
+            if not exists:
+                raise HTTPException(status_code=409, detail="trace_id was not found")
+        row = rag_repository.search_feedback_binds(**feedback)
+        if not search_audit_writer.submit_feedback(row):
+            raise HTTPException(status_code=503, detail="フィードバックの書き込みキューが満杯です")
+        return {"success": True}
     try:
-        rag_repository.record_search_feedback(
-            feedback_id=uuid4().hex,
-            trace_id=payload.trace_id,
-            document_id=payload.document_id,
-            evidence_id=payload.evidence_id,
-            action=payload.action,
-            user_hash=principal_hash(getattr(request.state, "auth_username", None)),
-        )
+        rag_repository.record_search_feedback(**feedback)
     except Exception as error:
         raise HTTPException(status_code=409, detail=str(error)) from error
     return {"success": True}
@@ -364,13 +392,43 @@ async def search_v2(payload: SearchV2Request, request: Request) -> SearchV2Respo
             user_hash=principal_hash(getattr(request.state, "auth_username", None)),
             filename_filter=payload.filename_filter,
             retrieval_modes=payload.retrieval_modes,
+            vector_accuracy=payload.vector_accuracy,
             verify=payload.verify,
             debug=payload.debug,
+            deadline_ms=search_deadline_ms("search"),
         )
     except ValueError as error:
         raise HTTPException(status_code=422, detail=str(error)) from error
 
 
+@router.post("/search/v2/batch", response_model=SearchV2BatchResponse)
+async def search_v2_batch(
+    payload: SearchV2BatchRequest, request: Request
+) -> SearchV2BatchResponse:
+    """複数クエリを一括検索する。失敗したクエリは結果の ``error`` に入る。"""
+    user_hash = principal_hash(getattr(request.state, "auth_username", None))
+    return await search_pipeline.search_batch(
+        [
+            {
+                "query": item.query,
+                "top_k": item.top_k,
+                "min_score": item.min_score,
+                "field_filters": item.field_filters,
+                "document_types": item.document_types,
+                "current_version_only": item.current_version_only,
+                "user_hash": user_hash,
+                "filename_filter": item.filename_filter,
+                "retrieval_modes": item.retrieval_modes,
+                "vector_accuracy": item.vector_accuracy,
+                "verify": item.verify,
+                "debug": item.debug,
+            }
+            for item in payload.queries
+        ],
+        deadline_ms=search_deadline_ms("batch"),
+    )
+
+
 @router.post("/search/v2/events")
 async def search_v2_events(payload: SearchV2Request, request: Request) -> StreamingResponse:
     return _search_events(
@@ -383,6 +441,7 @@ async def search_v2_events(payload: SearchV2Request, request: Request) -> Stream
         current_version_only=payload.current_version_only,
         filename_filter=payload.filename_filter,
         retrieval_modes=payload.retrieval_modes,
+        vector_accuracy=payload.vector_accuracy,
         verify=payload.verify,
         debug=payload.debug,
     )
@@ -429,6 +488,7 @@ async def search_v2_image(
             retrieval_modes=modes,
             verify=verify,
             debug=debug,
+            deadline_ms=search_deadline_ms("search"),
         )
     except ValueError as error:
         raise HTTPException(status_code=422, detail=str(error)) from error
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from app.rag.embedding_cache import normalize_embedding_text
+from app.rag.env import env_bool, env_int
+from app.rag.models import SearchV2Response
+
+SEARCH_RESULT_CACHE_DEFAULT_MAX_ENTRIES = 512
+SEARCH_RESULT_CACHE_DEFAULT_TTL_SECONDS = 300
+SEARCH_RESULT_CACHE_DEFAULT_EPOCH_TTL_MS = 1000
+
+
+class SearchResultCache:
+    """SearchV2Responseのプロセス内LRU/TTLキャッシュ。
+
+    キーには公開状態を表す「serving epoch」を含める。Releaseの公開、文書削除、
+    検索設定・プロファイル変更で ``bump_epoch`` が呼ばれると旧epochの結果は
+    二度と参照されない。別プロセスでの変更はDBの世代行（SDS_SERVING_EPOCH）で検出し、
+    その値は ``SEARCH_RESULT_CACHE_EPOCH_TTL_MS`` の間だけ使い回す。
+    ``SEARCH_RESULT_CACHE_MAX_ENTRIES=0`` で無効化する。
+    """
+
+    def __init__(self) -> None:
+        self._entries: OrderedDict[str, tuple[float, float, SearchV2Response]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+        # (期限, DBの世代, 取得時のプロセス内epoch)
+        self._serving_epoch: tuple[float, int, int] | None = None
+        self._last_invalidation: str | None = None
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def max_entries() -> int:
+        return env_int(
+            "SEARCH_RESULT_CACHE_MAX_ENTRIES", SEARCH_RESULT_CACHE_DEFAULT_MAX_ENTRIES
+        )
+
+    @staticmethod
+    def ttl_seconds() -> int:
+        return env_int(
+            "SEARCH_RESULT_CACHE_TTL_SECONDS", SEARCH_RESULT_CACHE_DEFAULT_TTL_SECONDS
+        )
+
+    @staticmethod
+    def epoch_ttl_seconds() -> float:
+        return env_int(
+            "SEARCH_RESULT_CACHE_EPOCH_TTL_MS", SEARCH_RESULT_CACHE_DEFAULT_EPOCH_TTL_MS
+        ) / 1000
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries() > 0 and self.ttl_seconds() > 0
+
+    @property
+    def epoch(self) -> int:
+        with self._lock:
+            return self._epoch
+
+    def bump_epoch(self, reason: str) -> int:
+        """公開状態が変わったことを記録し、既存エントリをすべて破棄する。"""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._serving_epoch = None
+            self._invalidations += 1
+            self._last_invalidation = reason
+            return self._epoch
+
+    def cached_serving_epoch(self) -> int | None:
+        """期限内のDB世代。未取得・期限切れ・プロセス内で変更があった場合はNone。"""
+        with self._lock:
+            cached = self._serving_epoch
+            if cached is None or cached[0] <= time.monotonic() or cached[2] != self._epoch:
+                return None
+            return cached[1]
+
+    def store_serving_epoch(self, value: int, *, epoch: int) -> None:
+        """取得開始時のプロセス内epochが変わっていなければDB世代を保持する。"""
+        ttl = self.epoch_ttl_seconds()
+        if ttl <= 0:
+            return
+        with self._lock:
+            if epoch == self._epoch:
+                self._serving_epoch = (time.monotonic() + ttl, value, epoch)
+
+    @staticmethod
+    def key(*, query: str, **parts: Any) -> str:
+        material = json.dumps(
+            {"query": normalize_embedding_text(query), **parts},
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, key: str) -> tuple[SearchV2Response, float] | None:
+        """(結果のコピー, 経過秒) を返す。期限切れ・未登録はNone。"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            _, stored_at, response = entry
+        return response.model_copy(deep=True), now - stored_at
+
+    def put(self, key: str, response: SearchV2Response, *, epoch: int) -> bool:
+        """検索開始時のepochが現在と一致する場合だけ保存する。"""
+        limit = self.max_entries()
+        ttl = self.ttl_seconds()
+        if limit <= 0 or ttl <= 0:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            # 検索中に公開状態が変わった結果は保存しない。
+            if epoch != self._epoch:
+                return False
+            self._entries[key] = (now + ttl, now, response.model_copy(deep=True))
+            self._entries.move_to_end(key)
+            while len(self._entries) > limit:
+                self._entries.popitem(last=False)
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "epoch": self._epoch,
+                "size": len(self._entries),
+                "max_entries": self.max_entries(),
+                "ttl_seconds": self.ttl_seconds(),
+                "serving_epoch": None if self._serving_epoch is None else self._serving_epoch[1],
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations,
+                "last_invalidation": self._last_invalidation,
+            }
+
+
+@dataclass
+class SingleFlightOutcome:
+    response: SearchV2Response
+    leader: bool
+    # 先行実行の結果を待った後続リクエスト数（先行側のみ）。
+    followers: int = 0
+
+
+class _LeaderCancelled(Exception):
+    """先行実行が取り消された。後続は自分で検索し直す。"""
+
+
+class SearchSingleFlight:
+    """実行中の同一検索をまとめ、後続リクエストに先行実行の結果を共有する。
+
+    キーは検索結果キャッシュと同じ（利用者・serving epoch込み）。先行実行が
+    例外で終わった場合は後続にも同じ例外を返す。先行の接続切断などで取り消された
+    場合だけ、後続はそれぞれ自分で検索する。``SEARCH_SINGLE_FLIGHT_ENABLED=false``
+    で無効化する。
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[str, tuple[asyncio.Future[SearchV2Response], list[int]]] = {}
+        self._leaders = 0
+        self._followers = 0
+
+    @property
+    def enabled(self) -> bool:
+        return env_bool("SEARCH_SINGLE_FLIGHT_ENABLED", True)
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def run(
+        self, key: str, execute: Callable[[], Awaitable[SearchV2Response]]
+    ) -> SingleFlightOutcome:
+        if not self.enabled:
+            return SingleFlightOutcome(await execute(), leader=True)
+        entry = self._inflight.get(key)
+        if entry is not None:
+            future, followers = entry
+            followers[0] += 1
+            self._followers += 1
+            try:
+                # 後続側の取り消しで先行実行を巻き込まないようshieldする。
+                response = await asyncio.shield(future)
+            except _LeaderCancelled:
+                return SingleFlightOutcome(await execute(), leader=True)
+            return SingleFlightOutcome(response.model_copy(deep=True), leader=False)
+        future = asyncio.get_running_loop().create_future()
+        followers = [0]
+        self._inflight[key] = (future, followers)
+        self._leaders += 1
+        try:
+            response = await execute()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            raise
+        else:
+            # 先行側は返却後に診断情報を書き足すため、共有するのはコピーにする。
+            future.set_result(response.model_copy(deep=True))
+        finally:
+            self._inflight.pop(key, None)
+            if future.done() and not future.cancelled():
+                # 後続がいない場合の「例外が取得されていない」警告を抑える。
+                future.exception()
+        return SingleFlightOutcome(response, leader=True, followers=followers[0])
+
+    def stats(self) -> dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "inflight": self.inflight,
+            "leaders": self._leaders,
+            "followers": self._followers,
+        }
+
+
+search_result_cache = SearchResultCache()
+search_single_flight = SearchSingleFlight()
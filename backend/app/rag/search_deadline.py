@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, TypeVar
+
+T = TypeVar("T")
+
+# 検索全体の期限に対する各ステージの配分（割合）。
+SEARCH_STAGE_DEFAULT_BUDGETS: dict[str, float] = {
+    "embedding": 0.15,
+    "retrieval": 0.35,
+    "rerank": 0.2,
+    "llm_judge": 0.25,
+    "verify": 0.5,
+}
+# 残り時間がこれ未満ならステージ自体を実行しない。
+SEARCH_STAGE_DEFAULT_MIN_MS: dict[str, int] = {
+    "rerank": 300,
+    "llm_judge": 1000,
+    "verify": 2000,
+}
+
+
+def _env_int(name: str) -> int | None:
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return None
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return None
+
+
+def search_deadline_ms(endpoint: str) -> int | None:
+    """エンドポイント別の期限(ms)。``SEARCH_DEADLINE_MS_<ENDPOINT>`` を優先する。
+
+    0または未設定は期限なし。
+    """
+    value = _env_int(f"SEARCH_DEADLINE_MS_{endpoint.upper()}")
+    if value is None:
+        value = _env_int("SEARCH_DEADLINE_MS")
+    return value or None
+
+
+def _stage_budgets() -> dict[str, float]:
+    budgets = dict(SEARCH_STAGE_DEFAULT_BUDGETS)
+    raw = os.environ.get("SEARCH_STAGE_BUDGETS")
+    if raw:
+        try:
+            parsed = json.loads(raw)
+        except (TypeError, ValueError, json.JSONDecodeError):
+            parsed = None
+        if isinstance(parsed, dict):
+            for stage, share in parsed.items():
+                if isinstance(share, (int, float)) and 0 < share <= 1:
+                    budgets[str(stage)] = float(share)
+    return budgets
+
+
+def _stage_min_ms(stage: str) -> int:
+    value = _env_int(f"SEARCH_STAGE_MIN_MS_{stage.upper()}")
+    return SEARCH_STAGE_DEFAULT_MIN_MS.get(stage, 0) if value is None else value
+
+
+class SearchDeadline:
+    """1回の検索リクエストの期限とステージ別予算。
+
+    ``total_ms`` がNoneの場合は期限なしとして振る舞い、``run`` は単にawaitする。
+    各ステージの予算は「全体期限 × 配分」と「残り時間」の小さい方。
+    """
+
+    def __init__(self, total_ms: int | None) -> None:
+        self.total_ms = total_ms if total_ms and total_ms > 0 else None
+        self.started = time.perf_counter()
+        self.expires_at = (
+            self.started + self.total_ms / 1000 if self.total_ms is not None else None
+        )
+        self._budgets = _stage_budgets() if self.total_ms is not None else {}
+        self.stages: dict[str, dict[str, Any]] = {}
+        self.timed_out_channels: list[dict[str, Any]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.total_ms is not None
+
+    def remaining(self) -> float | None:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.perf_counter())
+
+    def budget(self, stage: str) -> float | None:
+        """ステージに使える秒数。期限なしはNone。"""
+        remaining = self.remaining()
+        if remaining is None or self.total_ms is None:
+            return None
+        share = self._budgets.get(stage)
+        if share is None:
+            return remaining
+        return min(remaining, self.total_ms / 1000 * share)
+
+    def allows(self, stage: str) -> bool:
+        """残り予算がステージの最小実行時間以上あるか。"""
+        budget = self.budget(stage)
+        if budget is None:
+            return True
+        if budget * 1000 >= _stage_min_ms(stage):
+            return True
+        self.record(stage, status="skipped", budget=budget, elapsed=0.0)
+        return False
+
+    def record(
+        self, stage: str, *, status: str, budget: float | None, elapsed: float
+    ) -> None:
+        if not self.enabled:
+            return
+        self.stages[stage] = {
+            "status": status,
+            "budget_ms": round(budget * 1000) if budget is not None else None,
+            "elapsed_ms": round(elapsed * 1000),
+        }
+
+    async def run(self, stage: str, awaitable: Awaitable[T]) -> T:
+        """ステージ予算内で実行する。超過時はキャンセルしてTimeoutErrorを送出する。"""
+        budget = self.budget(stage)
+        started = time.perf_counter()
+        try:
+            if budget is None:
+                result = await awaitable
+            else:
+                result = await asyncio.wait_for(awaitable, timeout=budget)
+        except asyncio.TimeoutError:
+            self.record(
+                stage, status="timeout", budget=budget, elapsed=time.perf_counter() - started
+            )
+            raise
+        self.record(stage, status="ok", budget=budget, elapsed=time.perf_counter() - started)
+        return result
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "deadline_ms": self.total_ms,
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000),
+            "stages": self.stages,
+            "timed_out_channels": self.timed_out_channels,
+        }
@@ -3,38 +3,72 @@ from __future__ import annotations
 import asyncio
 import hashlib
 import json
+import logging
 import re
 import time
 from collections import defaultdict
-from dataclasses import dataclass, field
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
 from typing import Any, Awaitable, Callable
 from uuid import uuid4
 
+import numpy as np
 from pydantic import BaseModel, ConfigDict, Field
 
-from app.rag.clients import embedding_client, rerank_client, vlm_client
+from app.rag.access_cache import DocumentAccess, document_access_cache
+from app.rag.audit_writer import search_audit_writer
+from app.rag.clients import embedding_client, rerank_client, truncate_embedding, vlm_client
+from app.rag.embedding_cache import query_embedding_cache
+from app.rag.env import env_bool, env_int
+from app.rag.local_keyword_index import local_keyword_enabled, local_keyword_index
+from app.rag.local_vector_index import local_vector_index, local_vector_recipes
 from app.rag.models import (
     RETRIEVAL_MODES,
     DocumentSearchResult,
     EvidenceResult,
     FieldFilter,
+    JudgeGateSettings,
+    QueryExpansionSettings,
     RetrievalMode,
     RetrievalWeights,
+    SearchV2BatchItem,
+    SearchV2BatchResponse,
     SearchV2Response,
+    VectorAccuracyMode,
 )
 from app.rag.oracle_repository import (
+    VECTOR_TARGET_ACCURACY_EXACT,
+    ChannelQuery,
     RetrievalHit,
+    db_call_timeout,
+    evidence_preview_chars,
     oracle_text_max_terms,
     oracle_text_terms,
     rag_repository,
+    vector_rescore_recipes,
+    vector_target_accuracy,
 )
 from app.rag.pipeline_repository import pipeline_repository
 from app.rag.profile_repository import profile_repository
+from app.rag.search_cache import search_result_cache, search_single_flight
+from app.rag.search_deadline import SearchDeadline
 from app.rag.service_settings import retrieval_service_settings
+from app.rag.vector_shadow import vector_shadow_search_format
 from app.services.oci_service import oci_service
 
+logger = logging.getLogger(__name__)
+
 RERANK_BATCH_SIZE = 100
 RERANK_FINALIST_COUNT = 100
+RERANK_DEFAULT_CONCURRENCY = 4
+CANDIDATE_TEXT_CHARS = 6000
+JUDGE_TEXT_CHARS = 1500
+EVIDENCE_EXCERPT_CHARS = 500
+VERIFY_CANDIDATE_COUNT = 20
+VERIFY_DEFAULT_CONCURRENCY = 4
+SEARCH_BATCH_DEFAULT_CONCURRENCY = 4
+VECTOR_FALLBACK_DEFAULT_MIN_RETURN_PERCENT = 50
+QUERY_EXPANSION_LLM_DEADLINE_MS = 1500
 WHITESPACE_PATTERN = re.compile(r"\s+")
 UPLOAD_PREFIX_PATTERN = re.compile(r"^\d{8}_\d{6}_[0-9a-f]{8}_")
 FILENAME_AFFINITY_THRESHOLD = 0.4
@@ -142,6 +176,9 @@ class RankedHit:
     channel_scores: dict[str, float] = field(default_factory=dict)
     text_rerank_rank: int | None = None
     verification_status: str = "not_requested"
+    # raw_text/captionの取得元evidence_id。RRF統合で別ヒットの本文を採用した場合に使う。
+    text_source_id: str = ""
+    caption_source_id: str = ""
 
 
 def _normalize_query(query: str) -> str:
@@ -190,21 +227,20 @@ def _deterministic_query_variants(
     ])[:max_variants]
 
 
-async def _query_plan(query: str) -> QueryPlan:
-    expansion = retrieval_service_settings.get_query_expansion()
-    fallback_variants = _deterministic_query_variants(
+def _deterministic_plan(query: str, expansion: QueryExpansionSettings) -> QueryPlan:
+    variants = _deterministic_query_variants(
         query,
         enabled=expansion.enabled,
         max_variants=expansion.max_variants,
         synonym_groups=expansion.synonym_groups,
     )
     source = "deterministic" if query.strip() and expansion.enabled else "off"
-    fallback = QueryPlan(variants=fallback_variants, query_expansion_source=source)
-    if not fallback_variants:
-        return fallback
-    use_llm_variants = expansion.enabled and expansion.llm_enabled
-    if not use_llm_variants:
-        return fallback
+    return QueryPlan(variants=variants, query_expansion_source=source)
+
+
+async def _llm_plan(
+    query: str, expansion: QueryExpansionSettings, fallback: QueryPlan
+) -> QueryPlan:
     prompt = f"{expansion.llm_prompt}\n\nユーザーの問い合わせ:\n{query}"
     try:
         output = _QueryOutput.model_validate(await vlm_client.generate_json(prompt=prompt))
@@ -212,11 +248,40 @@ async def _query_plan(query: str) -> QueryPlan:
         return fallback
     variants = _dedupe_strings([query, *output.query_variants])[:expansion.max_variants]
     return QueryPlan(
-        variants=variants or fallback_variants,
-        query_expansion_source="llm" if variants else source,
+        variants=variants or fallback.variants,
+        query_expansion_source="llm" if variants else fallback.query_expansion_source,
     )
 
 
+async def _query_plan(query: str) -> QueryPlan:
+    expansion = retrieval_service_settings.get_query_expansion()
+    fallback = _deterministic_plan(query, expansion)
+    if not fallback.variants:
+        return fallback
+    use_llm_variants = expansion.enabled and expansion.llm_enabled
+    if not use_llm_variants:
+        return fallback
+    return await _llm_plan(query, expansion, fallback)
+
+
+def _speculative_expansion_enabled() -> bool:
+    return env_bool("RAG_QUERY_EXPANSION_SPECULATIVE", True)
+
+
+def _llm_expansion_deadline_seconds() -> float:
+    return env_int("RAG_QUERY_EXPANSION_LLM_DEADLINE_MS", QUERY_EXPANSION_LLM_DEADLINE_MS) / 1000
+
+
+async def _await_speculative_plan(
+    task: asyncio.Task[QueryPlan], deadline: float
+) -> QueryPlan | None:
+    """期限までに返らなかったLLM展開はキャンセルしてNoneを返す。"""
+    try:
+        return await asyncio.wait_for(task, timeout=max(0.0, deadline - time.perf_counter()))
+    except asyncio.TimeoutError:
+        return None
+
+
 SANE_CHAR_PATTERN = re.compile(r"[0-9A-Za-zぁ-んァ-ヶ一-龯々ー\s]")
 
 
@@ -229,17 +294,81 @@ def _text_quality(text: str) -> tuple[bool, int]:
     return (sane / len(text) >= 0.5, len(text))
 
 
+def _fusion_key(hit: RetrievalHit) -> tuple[Any, ...]:
+    """``canonical_key`` と同じ同一性をJSON化せずに表すキー。"""
+    return (hit.document_id, hit.page_number, hit.source_locator, tuple(hit.bbox or ()))
+
+
 def _weighted_rrf(
-    ranked_lists: list[tuple[list[RetrievalHit], float]], constant: int = 60
+    ranked_lists: list[tuple[list[RetrievalHit], float]],
+    constant: int = 60,
+    *,
+    limit: int | None = None,
+    pure_image_channels: set[str] | None = None,
+    image_channels: set[str] | None = None,
 ) -> list[RankedHit]:
-    fused: dict[str, RankedHit] = {}
+    """チャンネル別ランキングを重み付きRRFで統合する。
+
+    各ヒットの同一性キーを1回だけ引いて連番にし、RRF得点・画像類似度は
+    ヒット単位の列（NumPy配列）で集計する。``RankedHit`` は並べ替え後の
+    上位 ``limit`` 件だけ作る。``image_channels`` を渡すと ``_image_sort_key``
+    と同じ順（画像類似度→RRF）で並べる。
+    """
+    key_index: dict[tuple[Any, ...], int] = {}
+    entry_keys: list[int] = []
+    entry_hits: list[RetrievalHit] = []
+    entry_ranks: list[int] = []
+    entry_weights: list[float] = []
     for ranked, weight in ranked_lists:
         if weight <= 0:
             continue
         for rank, hit in enumerate(ranked, start=1):
-            key = hit.canonical_key
-            item = fused.setdefault(key, RankedHit(hit=hit, rrf_score=0.0))
-            item.rrf_score += weight / (constant + rank)
+            entry_keys.append(key_index.setdefault(_fusion_key(hit), len(key_index)))
+            entry_hits.append(hit)
+            entry_ranks.append(rank)
+            entry_weights.append(weight)
+    if not entry_hits:
+        return []
+    keys = np.asarray(entry_keys, dtype=np.int64)
+    contributions = np.asarray(entry_weights, dtype=np.float64) / (
+        constant + np.asarray(entry_ranks, dtype=np.float64)
+    )
+    # bincountはヒット順に足し込むため、逐次加算と同じ浮動小数点の結果になる。
+    rrf = np.bincount(keys, weights=contributions, minlength=len(key_index))
+    first_seen = np.arange(len(key_index))
+    if image_channels is not None:
+        similarity = np.full(len(key_index), -np.inf)
+        preferred = np.full(len(key_index), -np.inf)
+        channels = [hit.channel for hit in entry_hits]
+        scores = np.asarray([hit.score for hit in entry_hits], dtype=np.float64)
+        image_mask = np.fromiter((channel in image_channels for channel in channels), bool)
+        pure_mask = np.fromiter(
+            (channel in (pure_image_channels or set()) for channel in channels), bool
+        )
+        np.maximum.at(similarity, keys[image_mask], scores[image_mask])
+        np.maximum.at(preferred, keys[pure_mask], scores[pure_mask])
+        has_preferred = np.zeros(len(key_index), dtype=bool)
+        has_preferred[keys[pure_mask]] = True
+        has_image = np.zeros(len(key_index), dtype=bool)
+        has_image[keys[image_mask]] = True
+        similarity = np.where(has_preferred, preferred, similarity)
+        order = np.lexsort((first_seen, -rrf, -similarity, ~has_image))
+    else:
+        order = np.lexsort((first_seen, -rrf))
+    if limit is not None:
+        order = order[:max(0, limit)]
+    # 選ばれたキーのヒットだけを元の順で取り出して候補を組み立てる。
+    selected = np.zeros(len(key_index), dtype=bool)
+    selected[order] = True
+    members: dict[int, list[int]] = defaultdict(list)
+    for entry in np.flatnonzero(selected[keys]).tolist():
+        members[entry_keys[entry]].append(entry)
+    results: list[RankedHit] = []
+    for key in order.tolist():
+        entries = members[key]
+        item = RankedHit(hit=entry_hits[entries[0]], rrf_score=float(rrf[key]))
+        for entry in entries:
+            hit, rank = entry_hits[entry], entry_ranks[entry]
             if hit.slot_no:
                 item.profile_slots.add(hit.slot_no)
             item.channels.add(hit.channel)
@@ -247,11 +376,16 @@ def _weighted_rrf(
             item.channel_scores[hit.channel] = max(
                 hit.score, item.channel_scores.get(hit.channel, hit.score)
             )
+            if hit is item.hit:
+                continue
             if _text_quality(hit.raw_text) > _text_quality(item.hit.raw_text):
                 item.hit.raw_text = hit.raw_text
+                item.text_source_id = hit.evidence_id
             if hit.caption and not item.hit.caption:
                 item.hit.caption = hit.caption
-    return sorted(fused.values(), key=lambda item: item.rrf_score, reverse=True)
+                item.caption_source_id = hit.evidence_id
+        results.append(item)
+    return results
 
 
 def _cross_profile_rrf(
@@ -316,13 +450,44 @@ def _image_sort_key(
     )
 
 
+async def _hydrate_evidence(items: list[RankedHit], *, min_chars: int) -> bool:
+    """プレビューで切り詰められた本文・キャプションを、必要な候補だけ全文に差し替える。
+
+    検索時はDBMS_LOB.SUBSTRのプレビューだけを取得しているため、min_chars文字まで
+    読む後段（リランク・LLM判定・VLM確認・結果整形）の直前に呼ぶ。失敗時はFalseを返し、
+    プレビューのまま続行する。
+    """
+    preview = evidence_preview_chars()
+    if preview <= 0 or preview >= min_chars:
+        return True
+    wanted: dict[str, list[tuple[RankedHit, str]]] = defaultdict(list)
+    for item in items:
+        if len(item.hit.raw_text) >= preview:
+            wanted[item.text_source_id or item.hit.evidence_id].append((item, "raw_text"))
+        if len(item.hit.caption) >= preview:
+            wanted[item.caption_source_id or item.hit.evidence_id].append((item, "caption"))
+    if not wanted:
+        return True
+    try:
+        texts = await asyncio.to_thread(rag_repository.evidence_texts, list(wanted))
+    except Exception:
+        return False
+    for evidence_id, targets in wanted.items():
+        text = texts.get(evidence_id)
+        if not text:
+            continue
+        for item, attribute in targets:
+            setattr(item.hit, attribute, text)
+    return True
+
+
 def _candidate_text(item: RankedHit) -> str:
     return json.dumps(
         {
             "file_name": item.hit.file_name,
             "page_number": item.hit.page_number,
             "source_locator": item.hit.source_locator,
-            "text": item.hit.raw_text[:6000],
+            "text": item.hit.raw_text[:CANDIDATE_TEXT_CHARS],
             "vlm_summary": item.hit.caption[:2000],
             "vlm_profile_slots": sorted(item.profile_slots),
             "retrieval_channels": sorted(item.channels),
@@ -332,6 +497,23 @@ def _candidate_text(item: RankedHit) -> str:
     )
 
 
+# バッチ検索中だけ設定する共有資源。クエリごとのタスクへコンテキストごと引き継がれる。
+_batch_query_embeddings: ContextVar[dict[str, list[float]] | None] = ContextVar(
+    "batch_query_embeddings", default=None
+)
+_batch_rerank_semaphore: ContextVar[asyncio.Semaphore | None] = ContextVar(
+    "batch_rerank_semaphore", default=None
+)
+
+
+def _rerank_concurrency() -> int:
+    return max(1, env_int("RERANK_CONCURRENCY", RERANK_DEFAULT_CONCURRENCY))
+
+
+def _search_batch_concurrency() -> int:
+    return max(1, env_int("SEARCH_BATCH_CONCURRENCY", SEARCH_BATCH_DEFAULT_CONCURRENCY))
+
+
 async def _rerank_text(
     query: str, candidates: list[RankedHit], *, has_image: bool
 ) -> list[RankedHit]:
@@ -353,10 +535,20 @@ async def _rerank_text(
         )
         return [(items[result.index], result.score) for result in ranks]
 
+    # バッチ検索ではクエリ間で同時リランク数の上限を共有する。
+    semaphore = _batch_rerank_semaphore.get() or asyncio.Semaphore(_rerank_concurrency())
+
+    async def rank_batch(items: list[RankedHit]) -> list[tuple[RankedHit, float]]:
+        async with semaphore:
+            return await rank(items)
+
+    batches = [
+        selected[start:start + RERANK_BATCH_SIZE]
+        for start in range(0, len(selected), RERANK_BATCH_SIZE)
+    ]
     try:
-        batch_scores = []
-        for start in range(0, len(selected), RERANK_BATCH_SIZE):
-            batch_scores.extend(await rank(selected[start:start + RERANK_BATCH_SIZE]))
+        batch_results = await asyncio.gather(*(rank_batch(batch) for batch in batches))
+        batch_scores = [pair for result in batch_results for pair in result]
         if not batch_scores:
             return candidates
         if has_image:
@@ -366,13 +558,16 @@ async def _rerank_text(
                 item.rerank_score = score
                 item.text_rerank_rank = rank_index
             return candidates
-        finalists = [
-            item
-            for item, _ in sorted(batch_scores, key=lambda result: result[1], reverse=True)[
-                : RERANK_FINALIST_COUNT
-            ]
-        ]
-        final_scores = await rank(finalists) if len(selected) > RERANK_BATCH_SIZE else batch_scores
+        ordered = sorted(batch_scores, key=lambda result: result[1], reverse=True)
+        finalists = [item for item, _ in ordered[:RERANK_FINALIST_COUNT]]
+        batch_of = {
+            id(item): index for index, result in enumerate(batch_results) for item, _ in result
+        }
+        # 上位top_nが1バッチに収まっていれば、同じ組の再採点になる最終パスは省く。
+        single_batch = len({batch_of[id(item)] for item, _ in ordered[: settings.top_n]}) <= 1
+        final_scores = (
+            await rank_batch(finalists) if len(batches) > 1 and not single_batch else batch_scores
+        )
         if not final_scores:
             return candidates
     except Exception:
@@ -394,7 +589,7 @@ def _judge_candidate_text(item: RankedHit) -> str:
         {
             "file_name": UPLOAD_PREFIX_PATTERN.sub("", item.hit.file_name),
             "page_number": item.hit.page_number,
-            "text": item.hit.raw_text[:1500],
+            "text": item.hit.raw_text[:JUDGE_TEXT_CHARS],
             "vlm_summary": item.hit.caption[:1200],
         },
         ensure_ascii=False,
@@ -402,6 +597,51 @@ def _judge_candidate_text(item: RankedHit) -> str:
     )
 
 
+def _judge_gate(
+    query: str, candidates: list[RankedHit], settings: JudgeGateSettings
+) -> dict[str, Any]:
+    """リランク順位がすでに明確ならLLM最終判定を省く。
+
+    次のいずれかを満たせば明確とみなす。
+    - 1位と2位のリランクスコア差がmin_rerank_margin以上
+    - 1位候補がmin_channel_agreement個以上の検索チャンネルで1位
+    - 1位候補だけが文書名をmin_filename_affinity以上で名指しされている
+    """
+    top, runner_up = candidates[0], candidates[1]
+    margin = (
+        round(top.rerank_score - runner_up.rerank_score, 6)
+        if top.rerank_score is not None and runner_up.rerank_score is not None
+        else None
+    )
+    agreement = sum(1 for rank in top.channel_ranks.values() if rank == 1)
+    affinity = round(_filename_affinity(query, top.hit.file_name), 6)
+    runner_up_affinity = (
+        affinity
+        if runner_up.hit.document_id == top.hit.document_id
+        else _filename_affinity(query, runner_up.hit.file_name)
+    )
+    reason: str | None = None
+    if settings.enabled:
+        if margin is not None and margin >= settings.min_rerank_margin:
+            reason = "rerank_margin"
+        elif agreement >= settings.min_channel_agreement:
+            reason = "channel_agreement"
+        elif (
+            affinity >= settings.min_filename_affinity
+            and runner_up_affinity < FILENAME_AFFINITY_THRESHOLD
+        ):
+            reason = "filename_affinity"
+    return {
+        "enabled": settings.enabled,
+        "decisive": reason is not None,
+        "reason": reason,
+        "rerank_margin": margin,
+        "channel_agreement": agreement,
+        "filename_affinity": affinity,
+        "thresholds": settings.model_dump(exclude={"enabled"}),
+    }
+
+
 async def _llm_judge_best(query: str, candidates: list[RankedHit]) -> int | None:
     """リランク上位からクエリの全条件に最も合致する1件をLLMに選ばせる。
 
@@ -435,33 +675,63 @@ async def _llm_judge_best(query: str, candidates: list[RankedHit]) -> int | None
     return index if 0 <= index < len(top) else None
 
 
+def _verify_concurrency() -> int:
+    return max(1, env_int("VLM_VERIFY_CONCURRENCY", VERIFY_DEFAULT_CONCURRENCY))
+
+
+def _verified_prefix_documents(verifiable: list[RankedHit]) -> int:
+    """上位から途切れずに判定済みの候補のうち、検証済みの文書数。"""
+    documents: set[str] = set()
+    for item in verifiable:
+        if item.verification_status == "not_requested":
+            break
+        if item.verification_status == "verified":
+            documents.add(item.hit.document_id)
+    return len(documents)
+
+
 async def _verify_candidates(
     query: str,
     candidates: list[RankedHit],
     query_image: bytes | None,
     query_image_media_type: str,
     progress: Callable[[dict[str, Any]], Awaitable[None]] | None = None,
-) -> None:
+    *,
+    target_documents: int | None = None,
+) -> dict[str, Any]:
+    """上位候補をVLMで並列に確認し、判定を確定順にSTATE_DELTAで通知する。
+
+    候補画像のダウンロードはVLMの空きを待たずに先行させる。上位から途切れずに
+    判定済みの候補だけでtarget_documents件の文書が検証済みになった時点で、
+    残りの確認は打ち切る（未確認の候補はnot_requestedのまま）。
+    """
     settings = retrieval_service_settings.get_vlm()
-    verifiable = [item for item in candidates[:20] if item.hit.asset_object_name]
+    verifiable = [
+        item for item in candidates[:VERIFY_CANDIDATE_COUNT] if item.hit.asset_object_name
+    ]
     total = len(verifiable)
-    for index, item in enumerate(verifiable, 1):
-        if progress:
-            await progress({
-                "type": "STATE_DELTA",
-                "delta": [
-                    {"op": "replace", "path": "/status", "value": "verify"},
-                    {
-                        "op": "replace",
-                        "path": "/message",
-                        "value": f"VLM確認 {index}/{total}（時間がかかります）",
-                    },
-                ],
-            })
-        try:
-            image = await asyncio.to_thread(
+    verdicts: list[dict[str, Any]] = []
+    summary: dict[str, Any] = {
+        "candidate_count": total,
+        "completed": 0,
+        "stopped_early": False,
+        "verdicts": verdicts,
+    }
+    if not verifiable:
+        return summary
+    concurrency = _verify_concurrency()
+    download_slots = asyncio.Semaphore(concurrency * 2)
+    vlm_slots = asyncio.Semaphore(concurrency)
+
+    async def download(item: RankedHit) -> bytes | None:
+        async with download_slots:
+            return await asyncio.to_thread(
                 oci_service.download_object, item.hit.asset_object_name
             )
+
+    async def verify(rank: int, item: RankedHit, image_task: asyncio.Task[bytes | None]) -> None:
+        try:
+            image = await image_task
             if not image:
                 raise RuntimeError("candidate image is unavailable")
             prompt = (
@@ -473,12 +743,209 @@ async def _verify_candidates(
             if query_image is not None:
                 prompt += "\n画像1は問い合わせの参照画像です。画像2は候補画像です。"
                 images = [(query_image, query_image_media_type), (image, "image/png")]
-            result = _VerifyOutput.model_validate(
-                await vlm_client.generate_json(prompt=prompt, images=images)
-            )
+            async with vlm_slots:
+                output = await vlm_client.generate_json(prompt=prompt, images=images)
+            result = _VerifyOutput.model_validate(output)
             item.verification_status = "verified" if result.verified else "unverified"
         except Exception:
             item.verification_status = "failed"
+        verdicts.append({
+            "rank": rank,
+            "evidence_id": item.hit.evidence_id,
+            "document_id": item.hit.document_id,
+            "file_name": item.hit.file_name,
+            "page_number": item.hit.page_number,
+            "status": item.verification_status,
+        })
+        summary["completed"] = len(verdicts)
+        if progress:
+            await progress({
+                "type": "STATE_DELTA",
+                "delta": [
+                    {"op": "replace", "path": "/status", "value": "verify"},
+                    {
+                        "op": "replace",
+                        "path": "/message",
+                        "value": f"VLM確認 {len(verdicts)}/{total}",
+                    },
+                    {
+                        "op": "replace",
+                        "path": "/verifySummary",
+                        "value": {**summary, "verdicts": list(verdicts)},
+                    },
+                ],
+            })
+
+    downloads = [asyncio.create_task(download(item)) for item in verifiable]
+    tasks = [
+        asyncio.create_task(verify(rank, item, image_task))
+        for rank, (item, image_task) in enumerate(zip(verifiable, downloads), start=1)
+    ]
+    try:
+        pending: set[asyncio.Task[None]] = set(tasks)
+        while pending:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if (
+                pending
+                and target_documents
+                and _verified_prefix_documents(verifiable) >= target_documents
+            ):
+                summary["stopped_early"] = True
+                break
+    finally:
+        for task in [*tasks, *downloads]:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, *downloads, return_exceptions=True)
+    return summary
+
+
+def _combined_retrieval_enabled() -> bool:
+    return env_bool("RETRIEVAL_COMBINED_QUERY", True)
+
+
+def _merged_text_query_enabled() -> bool:
+    return env_bool("RETRIEVAL_MERGED_TEXT_QUERY", True)
+
+
+def _vector_fallback_min_return_percent() -> int:
+    return min(100, env_int(
+        "VECTOR_FALLBACK_MIN_RETURN_PERCENT", VECTOR_FALLBACK_DEFAULT_MIN_RETURN_PERCENT
+    ))
+
+
+def _channel_search(query: ChannelQuery, **filters: Any) -> list[RetrievalHit]:
+    if query.kind == "recipe_vector":
+        return rag_repository.recipe_vector_search(
+            recipe_code=query.recipe_code,
+            embedding=query.embedding,
+            channel=query.channel,
+            min_score=query.min_score,
+            target_accuracy=query.target_accuracy,
+            rescore_recipe_code=query.rescore_recipe_code,
+            rescore_embedding=query.rescore_embedding,
+            **filters,
+        )
+    if query.kind == "facet_keyword":
+        return rag_repository.facet_keyword_search(
+            profile=query.profile, query=query.query, variants=query.variants, **filters
+        )
+    return rag_repository.keyword_search(query=query.query, variants=query.variants, **filters)
+
+
+def _local_channel_search(
+    queries: list[ChannelQuery], **filters: Any
+) -> dict[int, list[RetrievalHit]]:
+    return {
+        **local_vector_index.search_channels(queries, **filters),
+        **local_keyword_index.search_channels(queries, **filters),
+    }
+
+
+async def _retrieve_channels(
+    queries: list[ChannelQuery], *, timeout: float | None = None, **filters: Any
+) -> tuple[list[list[RetrievalHit] | BaseException], str]:
+    """全チャンネルを1往復で取得する。失敗時はチャンネル単位に分けて再実行する。
+
+    結合SQLは1チャンネルの失敗（Oracle Text構文エラー等）で全体が失敗するため、
+    フォールバックで失敗チャンネルだけをdegradedとして切り分ける。
+    ``timeout`` を超えたチャンネルは待たずにTimeoutErrorとして返す。
+    プロセス内の索引（ベクトル・キーワード）で検索できるチャンネルはOracleへ送らない。
+    """
+    local: dict[int, list[RetrievalHit]] = {}
+    if local_vector_recipes() or local_keyword_enabled():
+        try:
+            local = await asyncio.to_thread(_local_channel_search, queries, **filters)
+        except Exception:
+            # プロセス内の検索に失敗した場合は全チャンネルをOracleで検索する。
+            local = {}
+    if local:
+        remote = [index for index in range(len(queries)) if index not in local]
+        results: list[list[RetrievalHit] | BaseException] = [[] for _ in queries]
+        for index, hits in local.items():
+            results[index] = hits
+        if not remote:
+            return results, "local"
+        remote_results, round_trip = await _retrieve_remote_channels(
+            [queries[index] for index in remote], timeout=timeout, **filters
+        )
+        for index, result in zip(remote, remote_results):
+            results[index] = result
+        return results, round_trip
+    return await _retrieve_remote_channels(queries, timeout=timeout, **filters)
+
+
+async def _retrieve_remote_channels(
+    queries: list[ChannelQuery], *, timeout: float | None = None, **filters: Any
+) -> tuple[list[list[RetrievalHit] | BaseException], str]:
+    # 待機の打ち切りに合わせ、スレッド上のSQLも接続のcall_timeoutで止める。
+    with db_call_timeout(timeout):
+        return await _query_remote_channels(queries, timeout=timeout, **filters)
+
+
+async def _query_remote_channels(
+    queries: list[ChannelQuery], *, timeout: float | None, **filters: Any
+) -> tuple[list[list[RetrievalHit] | BaseException], str]:
+    fallback = False
+    if len(queries) > 1 and _combined_retrieval_enabled():
+        try:
+            results = await asyncio.wait_for(
+                asyncio.to_thread(
+                    rag_repository.multi_channel_search, channels=queries, **filters
+                ),
+                timeout=timeout,
+            )
+            return list(results), "combined"
+        except asyncio.TimeoutError:
+            # 予算を使い切っているため個別再実行はしない。
+            return [asyncio.TimeoutError() for _ in queries], "combined"
+        except Exception:
+            logger.warning(
+                "結合検索SQLに失敗したためチャネル別に再実行します: %s件", len(queries),
+                exc_info=True,
+            )
+            fallback = True
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(
+                asyncio.to_thread(_channel_search, query, **filters), timeout=timeout
+            )
+            for query in queries
+        ),
+        return_exceptions=True,
+    )
+    return list(results), "per_channel_fallback" if fallback else "per_channel"
+
+
+async def _record_search_audit(**audit: Any) -> None:
+    """監査行を書き込みキューへ渡す。キュー未起動時（CLI等）は従来どおり直接書き込む。"""
+    if search_audit_writer.running:
+        search_audit_writer.submit_audit(rag_repository.search_audit_binds(**audit))
+        return
+    await asyncio.to_thread(rag_repository.record_search_audit, **audit)
+
+
+async def _document_access(user_hash: str | None) -> tuple[DocumentAccess | None, dict[str, Any]]:
+    """利用者のアクセス可能文書集合をキャッシュ経由で解決する。
+
+    解決できない場合はNoneを返し、検索SQLは行ごとのEXISTS判定を使う。
+    """
+    if not user_hash or not document_access_cache.enabled:
+        return None, {"mode": "exists", "cached": False}
+    access = document_access_cache.get(user_hash)
+    cached = access is not None
+    if access is None:
+        epoch = document_access_cache.epoch
+        try:
+            access = await asyncio.to_thread(rag_repository.document_access, user_hash)
+        except Exception:
+            return None, {"mode": "exists", "cached": False, "degraded": True}
+        document_access_cache.put(user_hash, access, epoch=epoch)
+    return access, {
+        "mode": access.mode,
+        "cached": cached,
+        "document_count": len(access.document_ids),
+    }
 
 
 class SearchPipeline:
@@ -496,9 +963,240 @@ class SearchPipeline:
         image: bytes | None = None,
         image_media_type: str = "image/png",
         retrieval_modes: list[RetrievalMode] | None = None,
+        vector_accuracy: VectorAccuracyMode | None = None,
+        verify: bool = False,
+        debug: bool = False,
+        progress: Callable[[dict[str, Any]], Awaitable[None]] | None = None,
+        deadline_ms: int | None = None,
+    ) -> SearchV2Response:
+        """検索を実行する。
+
+        画像なしの検索は公開状態（serving epoch）単位でキャッシュし、実行中の
+        同一検索には相乗りする。
+        """
+        arguments: dict[str, Any] = {
+            "query": query,
+            "top_k": top_k,
+            "min_score": min_score,
+            "field_filters": field_filters,
+            "document_types": document_types,
+            "current_version_only": current_version_only,
+            "user_hash": user_hash,
+            "filename_filter": filename_filter,
+            "image": image,
+            "image_media_type": image_media_type,
+            "retrieval_modes": retrieval_modes,
+            "vector_accuracy": vector_accuracy,
+            "verify": verify,
+            "debug": debug,
+            "progress": progress,
+            "deadline_ms": deadline_ms,
+        }
+        if image is not None or field_filters or not (
+            search_result_cache.enabled or search_single_flight.enabled
+        ):
+            return await self._search(**arguments)
+        started = time.perf_counter()
+        epoch = search_result_cache.epoch
+        # 別プロセス（パイプラインワーカー）での公開・削除もキーに反映する。
+        serving_epoch = search_result_cache.cached_serving_epoch()
+        try:
+            if serving_epoch is None:
+                serving_epoch = await asyncio.to_thread(rag_repository.serving_epoch)
+                search_result_cache.store_serving_epoch(serving_epoch, epoch=epoch)
+        except Exception:
+            response = await self._search(**arguments)
+            response.diagnostics["result_cache"] = {
+                "hit": False,
+                "stored": False,
+                "epoch": epoch,
+                "bypass": "serving_epoch_unavailable",
+            }
+            return response
+        key = search_result_cache.key(
+            query=query,
+            top_k=top_k,
+            min_score=min_score,
+            document_types=sorted(document_types),
+            filename_filter=filename_filter,
+            current_version_only=current_version_only,
+            retrieval_modes=None if retrieval_modes is None else sorted(retrieval_modes),
+            vector_accuracy=vector_accuracy,
+            verify=verify,
+            debug=debug,
+            user_hash=user_hash,
+            # 期限の異なる検索は共有しない（短い期限の後続が期限なしの先行を待たず、
+            # 期限で打ち切られた結果が期限なしの検索へ渡らない）。
+            deadline_ms=deadline_ms,
+            epoch=epoch,
+            serving_epoch=serving_epoch,
+        )
+        cached = search_result_cache.get(key)
+        if cached is None:
+            async def execute() -> SearchV2Response:
+                response = await self._search(**arguments)
+                response.diagnostics["result_cache"] = {
+                    "hit": False,
+                    "stored": False,
+                    "epoch": epoch,
+                }
+                if not response.diagnostics.get("degraded"):
+                    response.diagnostics["result_cache"]["stored"] = search_result_cache.put(
+                        key, response, epoch=epoch
+                    )
+                return response
+
+            # 実行中の同一検索があればその結果を待つ（LLM展開・リランク・判定を共有する）。
+            outcome = await search_single_flight.run(key, execute)
+            response = outcome.response
+            if outcome.leader:
+                if outcome.followers:
+                    response.diagnostics["single_flight"] = {
+                        "role": "leader",
+                        "followers": outcome.followers,
+                    }
+                return response
+            step_name, message = "single_flight", "実行中の同一検索の結果を返しています"
+            response.diagnostics["single_flight"] = {
+                "role": "follower",
+                "source_trace_id": response.trace_id,
+            }
+        else:
+            response, age = cached
+            step_name, message = "result_cache", "キャッシュ済みの検索結果を返しています"
+            response.diagnostics["result_cache"] = {
+                "hit": True,
+                "epoch": epoch,
+                "age_seconds": round(age, 3),
+                "source_trace_id": response.trace_id,
+            }
+        if progress:
+            await progress({"type": "STEP_STARTED", "stepName": step_name, "message": message})
+            await progress({"type": "STEP_FINISHED", "stepName": step_name})
+        elapsed = time.perf_counter() - started
+        response.trace_id = uuid4().hex
+        response.processing_time = elapsed
+        await _record_search_audit(
+            trace_id=response.trace_id,
+            query_hash=hashlib.sha256(query.encode()).hexdigest(),
+            user_hash=user_hash,
+            profile_slots=response.diagnostics.get("enabled_vlm_profiles", []),
+            diagnostics=response.diagnostics,
+            result_count=len(response.results),
+            elapsed_ms=round(elapsed * 1000),
+        )
+        return response
+
+    async def search_batch(
+        self, requests: list[dict[str, Any]], *, deadline_ms: int | None = None
+    ) -> SearchV2BatchResponse:
+        """複数クエリをまとめて検索し、クエリごとの結果と診断情報を返す。
+
+        同一条件のクエリは1回だけ実行する。全クエリの決定的バリエーションは
+        1回のEmbedding要求にまとめて各検索で共有する。同時に実行するクエリ数は
+        ``SEARCH_BATCH_CONCURRENCY``、リランクの同時要求数はクエリ間で合計
+        ``RERANK_CONCURRENCY`` までに抑え、DB接続とリランク枠の奪い合いを防ぐ。
+        ``deadline_ms`` はクエリごとの期限として扱う。
+        """
+        started = time.perf_counter()
+        unique: dict[str, int] = {}
+        unique_requests: list[dict[str, Any]] = []
+        first_index: list[int] = []
+        owners: list[int] = []
+        for index, arguments in enumerate(requests):
+            key = _batch_request_key(arguments)
+            if key not in unique:
+                unique[key] = len(unique_requests)
+                unique_requests.append(arguments)
+                first_index.append(index)
+            owners.append(unique[key])
+
+        shared: dict[str, list[float]] = {}
+        embedding_summary: dict[str, Any] = {"variants": 0, "status": "skipped"}
+        try:
+            profiles, recipes = await asyncio.to_thread(_load_search_configuration)
+            configured_modes = available_retrieval_modes(
+                weights=retrieval_service_settings.get_weights(),
+                profiles=profiles,
+                recipes=recipes,
+            )
+        except Exception:
+            configured_modes = set()
+        expansion = retrieval_service_settings.get_query_expansion()
+        variants: list[str] = []
+        for arguments in unique_requests:
+            modes = arguments.get("retrieval_modes")
+            requested = set(RETRIEVAL_MODES if modes is None else modes)
+            if VECTOR_RETRIEVAL_MODES.intersection(configured_modes, requested):
+                variants.extend(_deterministic_plan(arguments["query"], expansion).variants)
+        texts = _dedupe_strings(variants)
+        if texts:
+            try:
+                shared = dict(zip(texts, await embedding_client.query(texts)))
+                embedding_summary = {"variants": len(texts), "status": "ok"}
+            except Exception:
+                # 共有できなければ各検索が個別にEmbeddingし、degradedを記録する。
+                embedding_summary = {"variants": len(texts), "status": "failed"}
+
+        query_semaphore = asyncio.Semaphore(_search_batch_concurrency())
+
+        async def run(arguments: dict[str, Any]) -> SearchV2Response:
+            async with query_semaphore:
+                return await self.search(**arguments, deadline_ms=deadline_ms)
+
+        embeddings_token = _batch_query_embeddings.set(shared)
+        rerank_token = _batch_rerank_semaphore.set(asyncio.Semaphore(_rerank_concurrency()))
+        try:
+            outcomes = await asyncio.gather(
+                *(run(arguments) for arguments in unique_requests), return_exceptions=True
+            )
+        finally:
+            _batch_rerank_semaphore.reset(rerank_token)
+            _batch_query_embeddings.reset(embeddings_token)
+
+        items: list[SearchV2BatchItem] = []
+        for index, owner in enumerate(owners):
+            outcome = outcomes[owner]
+            if isinstance(outcome, BaseException):
+                items.append(SearchV2BatchItem(index=index, error=str(outcome)))
+                continue
+            duplicate_of = first_index[owner] if first_index[owner] != index else None
+            response = outcome if duplicate_of is None else outcome.model_copy(deep=True)
+            response.diagnostics["batch"] = {"index": index, "duplicate_of": duplicate_of}
+            items.append(SearchV2BatchItem(index=index, response=response))
+        return SearchV2BatchResponse(
+            success=all(item.error is None for item in items),
+            results=items,
+            processing_time=time.perf_counter() - started,
+            diagnostics={
+                "query_count": len(requests),
+                "unique_queries": len(unique_requests),
+                "failed_queries": sum(item.error is not None for item in items),
+                "shared_embedding": embedding_summary,
+                "query_concurrency": _search_batch_concurrency(),
+                "rerank_concurrency": _rerank_concurrency(),
+            },
+        )
+
+    async def _search(
+        self,
+        *,
+        query: str,
+        top_k: int,
+        min_score: float = 0.0,
+        field_filters: list[FieldFilter],
+        document_types: list[str],
+        current_version_only: bool,
+        user_hash: str | None,
+        filename_filter: str | None = None,
+        image: bytes | None = None,
+        image_media_type: str = "image/png",
+        retrieval_modes: list[RetrievalMode] | None = None,
+        vector_accuracy: VectorAccuracyMode | None = None,
         verify: bool = False,
         debug: bool = False,
         progress: Callable[[dict[str, Any]], Awaitable[None]] | None = None,
+        deadline_ms: int | None = None,
     ) -> SearchV2Response:
         async def step(name: str, message: str):
             if not progress:
@@ -529,6 +1227,7 @@ class SearchPipeline:
         if unknown_modes:
             raise ValueError(f"未対応の検索方式です: {', '.join(sorted(unknown_modes))}")
         started = time.perf_counter()
+        deadline = SearchDeadline(deadline_ms)
         trace_id = uuid4().hex
         await step("initialization", "検索を準備しています")
         profiles, recipes = await asyncio.to_thread(_load_search_configuration)
@@ -547,164 +1246,439 @@ class SearchPipeline:
             )
         await finish_step("initialization")
         await step("query_variants", "検索バリエーションを生成しています")
-        plan = await _query_plan(query)
-        query_variants = plan.variants or _dedupe_strings([query])
-        query_text = " ".join(query_variants)
-        query_plan = {
-            "variants": query_variants,
-            "query_expansion_source": plan.query_expansion_source,
-        }
-        if progress:
-            await progress({
-                "type": "STATE_DELTA",
-                "delta": [{"op": "replace", "path": "/queryPlan", "value": query_plan}],
-            })
-        await finish_step("query_variants")
-
-        keyword_terms: list[str] = []
-        keyword_plan = {
-            "terms": keyword_terms,
-            "target": "Oracle Text",
-            "max_terms": oracle_text_max_terms(),
-        }
-        if active_modes.intersection(KEYWORD_RETRIEVAL_MODES):
-            await step("keyword_plan", "検索キーワードを生成しています")
-            keyword_terms = oracle_text_terms(query_text)
-            keyword_plan["terms"] = keyword_terms
+        expansion = retrieval_service_settings.get_query_expansion()
+        llm_task: asyncio.Task[QueryPlan] | None = None
+        llm_deadline = 0.0
+        if (
+            query.strip()
+            and expansion.enabled
+            and expansion.llm_enabled
+            and _speculative_expansion_enabled()
+        ):
+            # LLM展開の応答を待たずに決定的バリエーションで検索を始め、
+            # 期限内に返ったLLMバリエーションだけを追加の検索波で統合する。
+            plan = _deterministic_plan(query, expansion)
+            if plan.variants:
+                llm_deadline = time.perf_counter() + _llm_expansion_deadline_seconds()
+                llm_task = asyncio.create_task(_llm_plan(query, expansion, plan))
+        else:
+            plan = await _query_plan(query)
+        try:
+            query_variants = plan.variants or _dedupe_strings([query])
+            query_text = " ".join(query_variants)
+            query_plan: dict[str, Any] = {
+                "variants": query_variants,
+                "query_expansion_source": plan.query_expansion_source,
+            }
+            if llm_task is not None:
+                query_plan["speculative"] = {
+                    "status": "pending",
+                    "deadline_ms": round(_llm_expansion_deadline_seconds() * 1000),
+                    "llm_variants": [],
+                }
             if progress:
                 await progress({
                     "type": "STATE_DELTA",
-                    "delta": [
-                        {"op": "replace", "path": "/keywordPlan", "value": keyword_plan}
-                    ],
+                    "delta": [{"op": "replace", "path": "/queryPlan", "value": query_plan}],
                 })
-            await finish_step("keyword_plan")
-
-        degraded: list[str] = []
-        variant_embeddings: list[tuple[str, list[float]]] = []
-        image_embedding: list[float] | None = None
-        if active_modes.intersection(VECTOR_RETRIEVAL_MODES):
-            await step("embedding", "検索ベクトルを作成しています")
-            if query_variants:
-                try:
-                    embeddings = await embedding_client.query(query_variants)
-                    variant_embeddings = list(zip(query_variants, embeddings))
-                except Exception:
-                    degraded.append("text_embedding")
-            if image is not None:
+            await finish_step("query_variants")
+
+            keyword_terms: list[str] = []
+            keyword_plan = {
+                "terms": keyword_terms,
+                "target": "Oracle Text",
+                "max_terms": oracle_text_max_terms(),
+            }
+            if active_modes.intersection(KEYWORD_RETRIEVAL_MODES):
+                await step("keyword_plan", "検索キーワードを生成しています")
+                keyword_terms = oracle_text_terms(query_text)
+                keyword_plan["terms"] = keyword_terms
+                if progress:
+                    await progress({
+                        "type": "STATE_DELTA",
+                        "delta": [
+                            {"op": "replace", "path": "/keywordPlan", "value": keyword_plan}
+                        ],
+                    })
+                await finish_step("keyword_plan")
+
+            degraded: list[str] = []
+            variant_embeddings: list[tuple[str, list[float]]] = []
+            image_embedding: list[float] | None = None
+            embedding_cache: dict[str, Any] = {"hits": 0, "shared_hits": 0, "misses": 0}
+
+            async def embed_variants(variants: list[str]) -> list[tuple[str, list[float]]]:
+                vectors: list[tuple[str, list[float]]] = []
+                shared = _batch_query_embeddings.get() or {}
+                pending = [variant for variant in variants if variant not in shared]
+                with query_embedding_cache.track() as cache_usage:
+                    try:
+                        embeddings = (
+                            await deadline.run("embedding", embedding_client.query(pending))
+                            if pending else []
+                        )
+                        found = {**shared, **dict(zip(pending, embeddings))}
+                        vectors = [(variant, found[variant]) for variant in variants]
+                    except Exception:
+                        if "text_embedding" not in degraded:
+                            degraded.append("text_embedding")
+                for key, value in cache_usage.as_dict().items():
+                    embedding_cache[key] = embedding_cache.get(key, 0) + value
+                if shared:
+                    embedding_cache["batch_shared"] = embedding_cache.get(
+                        "batch_shared", 0
+                    ) + len(variants) - len(pending)
+                return vectors
+
+            if active_modes.intersection(VECTOR_RETRIEVAL_MODES):
+                await step("embedding", "検索ベクトルを作成しています")
+                if query_variants:
+                    variant_embeddings = await embed_variants(query_variants)
+                if image is not None:
+                    try:
+                        # Query vectors must use the query input mode. Indexed image
+                        # (and image+text) recipes use SEARCH_DOCUMENT, while this
+                        # branch represents the user's visual query.
+                        image_embedding = await deadline.run(
+                            "embedding",
+                            embedding_client.image(
+                                image, image_media_type, input_type="SEARCH_QUERY"
+                            ),
+                        )
+                    except Exception:
+                        degraded.append("visual_embedding")
+                await finish_step("embedding")
+
+            await step("retrieval", "複数チャンネルから候補を取得しています")
+            rerank_settings = retrieval_service_settings.get_rerank()
+            branch_k = max(rerank_settings.candidate_count, min(500, top_k * 5))
+            image_channels: set[str] = set()
+            pure_image_channels: set[str] = set()
+            vlm_profile_count = max(1, len(profiles))
+            # 低次元レシピを候補取得に使い、対応する全次元レシピで再採点する組。
+            # 厳密検索のレシピは全次元レシピ自身のチャンネルで検索する。
+            recipes_by_code = {recipe.code: recipe for recipe in recipes}
+            rescore_pairs = {
+                source: recipes_by_code[target]
+                for source, target in vector_rescore_recipes().items()
+                if source in recipes_by_code
+                and target in recipes_by_code
+                and recipes_by_code[source].output_dimensions
+                < recipes_by_code[target].output_dimensions
+                and recipes_by_code[source].search_weight > 0
+                and recipe_retrieval_mode(recipes_by_code[source]) in active_modes
+                and vector_target_accuracy(source, vector_accuracy)
+                < VECTOR_TARGET_ACCURACY_EXACT
+            }
+            rescored_codes = {recipe.code for recipe in rescore_pairs.values()}
+
+            def channel_specs(
+                variants: list[str], vectors: list[list[float]]
+            ) -> list[tuple[float, ChannelQuery]]:
+                """(バリエーション数で割る前の重み, チャンネル) の一覧を返す。"""
+                specs: list[tuple[float, ChannelQuery]] = []
+                # 統合時はバリエーションを重み付きの1式にまとめ、種別ごとに1チャンネルにする。
+                text_groups = (
+                    [variants] if _merged_text_query_enabled() else [[item] for item in variants]
+                ) if variants else []
+                if "oracle_text" in active_modes:
+                    for group in text_groups:
+                        specs.append((
+                            weights.oracle_text,
+                            ChannelQuery(
+                                kind="keyword",
+                                channel="keyword:page_text",
+                                query=" ".join(group),
+                                variants=list(group),
+                            ),
+                        ))
+                if vectors:
+                    for recipe in recipes:
+                        source_types = {item.source_type for item in recipe.inputs}
+                        mode = recipe_retrieval_mode(recipe)
+                        if mode not in active_modes:
+                            continue
+                        channel_weight = getattr(weights, mode)
+                        if channel_weight <= 0 or recipe.search_weight <= 0:
+                            continue
+                        if recipe.code in rescored_codes:
+                            # 低次元レシピのチャンネルが候補取得と再採点を兼ねる。
+                            continue
+                        rescore_recipe = rescore_pairs.get(recipe.code)
+                        channel = f"vector:{recipe.code}"
+                        if "PAGE_IMAGE" in source_types:
+                            image_channels.add(channel)
+                            if source_types == {"PAGE_IMAGE"}:
+                                pure_image_channels.add(channel)
+                        for embedding in vectors:
+                            specs.append((
+                                channel_weight * recipe.search_weight,
+                                ChannelQuery(
+                                    kind="recipe_vector",
+                                    channel=channel,
+                                    recipe_code=recipe.code,
+                                    embedding=truncate_embedding(
+                                        embedding, recipe.output_dimensions
+                                    ),
+                                    min_score=min_score,
+                                    target_accuracy=vector_target_accuracy(
+                                        recipe.code, vector_accuracy
+                                    ),
+                                    rescore_recipe_code=(
+                                        rescore_recipe.code if rescore_recipe else None
+                                    ),
+                                    rescore_embedding=(
+                                        truncate_embedding(
+                                            embedding, rescore_recipe.output_dimensions
+                                        )
+                                        if rescore_recipe
+                                        else None
+                                    ),
+                                ),
+                            ))
+                for profile in profiles:
+                    if "vlm_text" in active_modes:
+                        for group in text_groups:
+                            specs.append((
+                                weights.vlm_text / vlm_profile_count,
+                                ChannelQuery(
+                                    kind="facet_keyword",
+                                    channel=f"keyword:vlm_text_slot_{profile.slot_no}",
+                                    query=" ".join(group),
+                                    variants=list(group),
+                                    profile=profile,
+                                ),
+                            ))
+                return specs
+
+            spec_elapsed: list[float] = []
+
+            async def retrieve_wave(
+                wave: list[tuple[float, ChannelQuery]],
+            ) -> tuple[list[list[RetrievalHit] | BaseException], str]:
+                budget = deadline.budget("retrieval")
+                wave_started = time.perf_counter()
+                results, wave_round_trip = await _retrieve_channels(
+                    [channel_query for _, channel_query in wave], timeout=budget, **filters
+                )
+                elapsed = time.perf_counter() - wave_started
+                spec_elapsed.extend([elapsed] * len(wave))
+                timed_out = any(isinstance(item, asyncio.TimeoutError) for item in results)
+                deadline.record(
+                    "retrieval",
+                    status="timeout" if timed_out else "ok",
+                    budget=budget,
+                    elapsed=elapsed,
+                )
+                await refill_sparse_vector_results(wave, results)
+                return results, wave_round_trip
+
+            vector_fallback_percent = _vector_fallback_min_return_percent()
+            vector_stats: dict[int, dict[str, Any]] = {}
+            shadow_format = vector_shadow_search_format()
+
+            async def refill_sparse_vector_results(
+                wave: list[tuple[float, ChannelQuery]],
+                results: list[list[RetrievalHit] | BaseException],
+            ) -> None:
+                """絞り込み付きの近似検索が要求件数を大きく下回ったチャンネルを厳密検索で取り直す。
+
+                近似索引は絞り込み条件を索引走査の後で適用するため、条件に合う行が
+                あっても ``top_k`` に届かないことがある。
+                """
+                sparse: list[int] = []
+                for index, ((_, channel_query), result) in enumerate(zip(wave, results)):
+                    if channel_query.kind != "recipe_vector" or not isinstance(result, list):
+                        continue
+                    vector_stats[id(channel_query)] = {
+                        "target_accuracy": channel_query.target_accuracy,
+                        "requested": branch_k,
+                        "returned": len(result),
+                    }
+                    if local_vector_index.serves(
+                        channel_query,
+                        user_hash=filters["user_hash"],
+                        access=filters.get("access"),
+                    ):
+                        # プロセス内索引は候補不足時に自前で全件走査へ切り替える。
+                        vector_stats[id(channel_query)]["backend"] = "local"
+                        continue
+                    if channel_query.rescore_recipe_code:
+                        # 低次元レシピで候補を取り、全次元レシピで再採点した。
+                        vector_stats[id(channel_query)]["rescored_by"] = (
+                            channel_query.rescore_recipe_code
+                        )
+                    elif (
+                        shadow_format
+                        and channel_query.target_accuracy < VECTOR_TARGET_ACCURACY_EXACT
+                    ):
+                        # 影列で候補を取りFLOAT32で再採点した。
+                        vector_stats[id(channel_query)]["first_pass"] = shadow_format
+                    if (
+                        vector_filtered
+                        and vector_fallback_percent > 0
+                        and channel_query.target_accuracy < VECTOR_TARGET_ACCURACY_EXACT
+                        and len(result) * 100 < branch_k * vector_fallback_percent
+                    ):
+                        sparse.append(index)
+                budget = deadline.budget("retrieval")
+                if not sparse or (budget is not None and budget <= 0):
+                    return
                 try:
-                    # Query vectors must use the query input mode. Indexed image
-                    # (and image+text) recipes use SEARCH_DOCUMENT, while this
-                    # branch represents the user's visual query.
-                    image_embedding = await embedding_client.image(
-                        image, image_media_type, input_type="SEARCH_QUERY"
+                    row_counts = await asyncio.to_thread(
+                        rag_repository.recipe_row_counts,
+                        sorted({str(wave[index][1].recipe_code) for index in sparse}),
                     )
                 except Exception:
-                    degraded.append("visual_embedding")
-            await finish_step("embedding")
-
-        await step("retrieval", "複数チャンネルから候補を取得しています")
-        rerank_settings = retrieval_service_settings.get_rerank()
-        branch_k = max(rerank_settings.candidate_count, min(500, top_k * 5))
-        tasks: list[tuple[str, float, Any]] = []
-        image_channels: set[str] = set()
-        pure_image_channels: set[str] = set()
-
-        def route_name(name: str, index: int, total: int) -> str:
-            return name if total == 1 else f"{name}_{index}"
-
-        if query_variants and "oracle_text" in active_modes:
-            weight = weights.oracle_text / len(query_variants)
-            for index, variant in enumerate(query_variants, start=1):
-                tasks.append(
-                    (
-                        route_name("keyword:page_text", index, len(query_variants)),
-                        weight,
-                        asyncio.to_thread(
-                            rag_repository.keyword_search,
-                            query=variant,
-                            top_k=branch_k,
-                            user_hash=user_hash,
-                            current_version_only=current_version_only,
-                            document_types=document_types,
-                            filename_filter=filename_filter,
-                        ),
-                    )
-                )
-        recipe_vectors = (
-            [("image", image_embedding)]
-            if image_embedding is not None
-            else variant_embeddings
-        )
-        if recipe_vectors:
-            for recipe in recipes:
-                source_types = {item.source_type for item in recipe.inputs}
-                mode = recipe_retrieval_mode(recipe)
-                if mode not in active_modes:
-                    continue
-                channel_weight = getattr(weights, mode)
-                if channel_weight <= 0 or recipe.search_weight <= 0:
-                    continue
-                weight = (
-                    channel_weight
-                    * recipe.search_weight
-                    / len(recipe_vectors)
+                    # 行数が分からなければ従来どおり取り直す。
+                    row_counts = None
+                if row_counts is not None:
+                    # レシピの全行数まで返っていれば、厳密検索でもそれ以上は増えない。
+                    covered = {
+                        index
+                        for index in sparse
+                        if len(results[index])
+                        >= row_counts.get(str(wave[index][1].recipe_code), 0)
+                    }
+                    for index in covered:
+                        vector_stats[id(wave[index][1])]["fallback_skipped"] = "row_count"
+                    sparse = [index for index in sparse if index not in covered]
+                    if not sparse:
+                        return
+                fallback_started = time.perf_counter()
+                retried, _ = await _retrieve_channels(
+                    [
+                        replace(wave[index][1], target_accuracy=VECTOR_TARGET_ACCURACY_EXACT)
+                        for index in sparse
+                    ],
+                    timeout=budget,
+                    **filters,
                 )
-                for index, (_, embedding) in enumerate(recipe_vectors, start=1):
-                    channel = f"vector:{recipe.code}"
-                    if "PAGE_IMAGE" in source_types:
-                        image_channels.add(channel)
-                        if source_types == {"PAGE_IMAGE"}:
-                            pure_image_channels.add(channel)
-                    tasks.append(
-                        (
-                            route_name(channel, index, len(recipe_vectors)),
-                            weight,
-                            asyncio.to_thread(
-                                rag_repository.recipe_vector_search,
-                                recipe_code=recipe.code,
-                                embedding=embedding,
-                                channel=channel,
-                                top_k=branch_k,
-                                user_hash=user_hash,
-                                current_version_only=current_version_only,
-                                document_types=document_types,
-                                filename_filter=filename_filter,
-                                min_score=min_score,
-                            ),
+                elapsed_ms = round((time.perf_counter() - fallback_started) * 1000)
+                for index, result in zip(sparse, retried):
+                    fallback: dict[str, Any] = {
+                        "target_accuracy": VECTOR_TARGET_ACCURACY_EXACT,
+                        "elapsed_ms": elapsed_ms,
+                    }
+                    if isinstance(result, list):
+                        fallback["returned"] = len(result)
+                        if len(result) > len(results[index]):
+                            results[index] = result
+                    else:
+                        # 取り直しの失敗は近似検索の結果をそのまま使う。
+                        fallback["status"] = (
+                            "timeout" if isinstance(result, asyncio.TimeoutError) else "failed"
                         )
+                    vector_stats[id(wave[index][1])]["fallback"] = fallback
+
+            filters: dict[str, Any] = {
+                "top_k": branch_k,
+                "user_hash": user_hash,
+                "current_version_only": current_version_only,
+                "document_types": document_types,
+                "filename_filter": filename_filter,
+            }
+            document_access, access_summary = await _document_access(user_hash)
+            if document_access is not None:
+                filters["access"] = document_access
+            # 実際にSQLへ載る絞り込みだけを数える。全文書を読める利用者のACLは条件にならず、
+            # 類似度の下限（min_score）で減った分は取り直しても増えないため対象外。
+            vector_filtered = bool(
+                document_types
+                or filename_filter
+                or (
+                    user_hash
+                    and (document_access is None or not document_access.unrestricted)
+                )
+            )
+            specs = channel_specs(
+                query_variants,
+                [image_embedding]
+                if image_embedding is not None
+                else [embedding for _, embedding in variant_embeddings],
+            )
+            if not specs:
+                raise ValueError(
+                    "選択した検索方式で実行可能な検索ルートを作成できませんでした"
+                )
+            raw_results, round_trip = await retrieve_wave(specs)
+
+            if llm_task is not None:
+                llm_plan = await _await_speculative_plan(
+                    llm_task,
+                    llm_deadline
+                    if deadline.expires_at is None
+                    else min(llm_deadline, deadline.expires_at),
+                )
+                known = {variant.casefold() for variant in query_variants}
+                llm_variants = [
+                    variant
+                    for variant in (llm_plan.variants if llm_plan else [])
+                    if variant.casefold() not in known
+                ]
+                if llm_plan is None:
+                    status = "deadline_exceeded"
+                elif llm_plan.query_expansion_source != "llm":
+                    status = "failed"
+                else:
+                    status = "merged" if llm_variants else "no_new_variants"
+                if llm_variants:
+                    new_vectors: list[tuple[str, list[float]]] = []
+                    if image_embedding is None and active_modes.intersection(
+                        VECTOR_RETRIEVAL_MODES
+                    ):
+                        new_vectors = await embed_variants(llm_variants)
+                        variant_embeddings.extend(new_vectors)
+                    wave = channel_specs(
+                        llm_variants, [embedding for _, embedding in new_vectors]
                     )
-        vlm_profile_count = max(1, len(profiles))
-        for profile in profiles:
-            if query_variants and "vlm_text" in active_modes:
-                weight = weights.vlm_text / (vlm_profile_count * len(query_variants))
-                for index, variant in enumerate(query_variants, start=1):
-                    tasks.append(
-                        (
-                            route_name(f"keyword:vlm_text_slot_{profile.slot_no}", index, len(query_variants)),
-                            weight,
-                            asyncio.to_thread(
-                                rag_repository.facet_keyword_search,
-                                profile=profile,
-                                query=variant,
-                                top_k=branch_k,
-                                user_hash=user_hash,
-                                current_version_only=current_version_only,
-                                document_types=document_types,
-                                filename_filter=filename_filter,
-                            ),
+                    wave_results, wave_round_trip = await retrieve_wave(wave)
+                    specs.extend(wave)
+                    raw_results.extend(wave_results)
+                    if "per_channel_fallback" in (round_trip, wave_round_trip):
+                        round_trip = "per_channel_fallback"
+                    elif wave_round_trip != round_trip:
+                        round_trip = "per_channel"
+                    query_variants = [*query_variants, *llm_variants]
+                    query_text = " ".join(query_variants)
+                    query_plan["variants"] = query_variants
+                    query_plan["query_expansion_source"] = "llm"
+                    if active_modes.intersection(KEYWORD_RETRIEVAL_MODES):
+                        keyword_terms = oracle_text_terms(query_text)
+                        keyword_plan["terms"] = keyword_terms
+                query_plan["speculative"].update(
+                    status=status, llm_variants=llm_variants
+                )
+                if progress:
+                    delta = [{"op": "replace", "path": "/queryPlan", "value": query_plan}]
+                    if llm_variants and keyword_terms:
+                        delta.append(
+                            {"op": "replace", "path": "/keywordPlan", "value": keyword_plan}
                         )
-                    )
-        if not tasks:
-            raise ValueError(
-                "選択した検索方式で実行可能な検索ルートを作成できませんでした"
-            )
-        raw_results = await asyncio.gather(
-            *(task for _, _, task in tasks), return_exceptions=True
-        )
+                    await progress({"type": "STATE_DELTA", "delta": delta})
+        finally:
+            if llm_task is not None and not llm_task.done():
+                llm_task.cancel()
+
+        def route_name(name: str, index: int, total: int) -> str:
+            return name if total == 1 else f"{name}_{index}"
+
+        # 重みとルート名は全検索波のバリエーション数が確定してから決める。
+        route_totals: dict[str, int] = defaultdict(int)
+        for _, channel_query in specs:
+            route_totals[channel_query.channel] += 1
+        route_indexes: dict[str, int] = defaultdict(int)
         ranked_lists: list[tuple[list[RetrievalHit], float]] = []
         channel_summaries: list[dict[str, object]] = []
-        for (channel, weight, _), result in zip(tasks, raw_results):
+        for (base_weight, channel_query), result, elapsed in zip(
+            specs, raw_results, spec_elapsed
+        ):
+            total = route_totals[channel_query.channel]
+            route_indexes[channel_query.channel] += 1
+            channel = route_name(
+                channel_query.channel, route_indexes[channel_query.channel], total
+            )
+            weight = base_weight / total
             if isinstance(result, list):
                 ranked_lists.append((result, weight))
                 channel_summaries.append({
@@ -712,6 +1686,20 @@ class SearchPipeline:
                     "status": "ok",
                     "count": len(result),
                     "weight": weight,
+                    **({"vector": vector_stats[id(channel_query)]}
+                       if id(channel_query) in vector_stats else {}),
+                })
+            elif isinstance(result, asyncio.TimeoutError):
+                degraded.append(channel)
+                deadline.timed_out_channels.append(
+                    {"channel": channel, "elapsed_ms": round(elapsed * 1000)}
+                )
+                channel_summaries.append({
+                    "channel": channel,
+                    "status": "timeout",
+                    "count": 0,
+                    "weight": weight,
+                    "elapsed_ms": round(elapsed * 1000),
                 })
             else:
                 degraded.append(channel)
@@ -729,6 +1717,13 @@ class SearchPipeline:
             "document_types": document_types,
             "current_version_only": current_version_only,
             "filename_filter": filename_filter,
+            "round_trip": round_trip,
+            "access": access_summary,
+            "vector_accuracy": {
+                "mode": vector_accuracy or "balanced",
+                "fallback_min_return_percent": vector_fallback_percent,
+                "fallbacks": sum("fallback" in item for item in vector_stats.values()),
+            },
         }
         if progress:
             await progress({
@@ -737,18 +1732,149 @@ class SearchPipeline:
             })
         await finish_step("retrieval")
 
+        def rank_documents(items: list[RankedHit]) -> list[list[RankedHit]]:
+            """候補を最終順に並べ替え（``items`` をその場で並べ替える）、文書単位にまとめる。"""
+            if image is not None:
+                items.sort(
+                    key=lambda item: _image_sort_key(
+                        item,
+                        pure_image_channels=pure_image_channels,
+                        image_channels=image_channels,
+                    ),
+                    reverse=True,
+                )
+            else:
+                items.sort(
+                    key=lambda item: (
+                        item.verification_status == "verified",
+                        item.rerank_score if item.rerank_score is not None else item.rrf_score,
+                    ),
+                    reverse=True,
+                )
+            documents: dict[str, list[RankedHit]] = defaultdict(list)
+            for item in items:
+                if len(documents[item.hit.document_id]) < 3:
+                    documents[item.hit.document_id].append(item)
+            if image is not None:
+                ranked_documents = sorted(
+                    documents.values(),
+                    key=lambda values: _image_sort_key(
+                        values[0],
+                        pure_image_channels=pure_image_channels,
+                        image_channels=image_channels,
+                    ),
+                    reverse=True,
+                )[:top_k]
+            else:
+                ranked_documents = sorted(
+                    documents.values(),
+                    key=lambda values: _boosted_document_score(query, values),
+                    reverse=True,
+                )[:top_k]
+            return ranked_documents
+
+        def document_results(
+            ranked_documents: list[list[RankedHit]],
+        ) -> list[DocumentSearchResult]:
+            results: list[DocumentSearchResult] = []
+            for values in ranked_documents:
+                first = values[0]
+                image_similarity_scores = [
+                    _image_similarity_score(
+                        item,
+                        pure_image_channels=pure_image_channels,
+                        image_channels=image_channels,
+                    )
+                    if image is not None
+                    else None
+                    for item in values
+                ]
+                evidence = [
+                    EvidenceResult(
+                        evidence_id=item.hit.evidence_id,
+                        document_id=item.hit.document_id,
+                        profile_slots=sorted(item.profile_slots),
+                        page_number=item.hit.page_number,
+                        unit_kind=item.hit.unit_kind,
+                        source_locator=item.hit.source_locator,
+                        bbox=item.hit.bbox,
+                        text_excerpt=item.hit.raw_text[:EVIDENCE_EXCERPT_CHARS],
+                        caption=item.hit.caption[:EVIDENCE_EXCERPT_CHARS],
+                        asset_url=item.hit.asset_object_name,
+                        score=item.rrf_score,
+                        rerank_score=item.rerank_score,
+                        image_similarity_score=image_similarity_score,
+                        visual_rank=min(
+                            (
+                                rank
+                                for channel, rank in item.channel_ranks.items()
+                                if channel.startswith("vector:page_image")
+                            ),
+                            default=None,
+                        ),
+                        text_rerank_rank=item.text_rerank_rank,
+                        retrieval_channels=sorted(item.channels),
+                        verification_status=item.verification_status,  # type: ignore[arg-type]
+                        match_reasons=sorted(item.channels),
+                    )
+                    for item, image_similarity_score in zip(values, image_similarity_scores)
+                ]
+                results.append(
+                    DocumentSearchResult(
+                        document_id=first.hit.document_id,
+                        file_name=first.hit.file_name,
+                        object_name=first.hit.object_name,
+                        bucket=first.hit.bucket,
+                        score=(
+                            first.rerank_score
+                            if first.rerank_score is not None
+                            else first.rrf_score
+                        ),
+                        rerank_score=first.rerank_score,
+                        image_similarity_score=max(
+                            (score for score in image_similarity_scores if score is not None),
+                            default=None,
+                        ),
+                        profile_slots=sorted(
+                            set().union(*(item.profile_slots for item in values))
+                        ),
+                        evidence=evidence,
+                    )
+                )
+            return results
+
+        async def emit_provisional(stage: str, items: list[RankedHit]) -> None:
+            """確定前の並びで文書一覧を送る。本文はプレビューのまま使い、全文は取得しない。"""
+            if not progress or not items:
+                return
+            provisional = document_results(rank_documents(list(items)))
+            await progress({
+                "type": "STATE_DELTA",
+                "delta": [{
+                    "op": "replace",
+                    "path": "/provisionalResult",
+                    "value": {
+                        "stage": stage,
+                        "trace_id": trace_id,
+                        "query": query,
+                        "results": [item.model_dump(mode="json") for item in provisional],
+                        "total_documents": len(provisional),
+                        "total_evidence": sum(len(item.evidence) for item in provisional),
+                        "processing_time": time.perf_counter() - started,
+                    },
+                }],
+            })
+
         await step("candidate_merge", "候補を統合しています")
-        candidates = _weighted_rrf(ranked_lists)
-        if image is not None:
-            candidates.sort(
-                key=lambda item: _image_sort_key(
-                    item,
-                    pure_image_channels=pure_image_channels,
-                    image_channels=image_channels,
-                ),
-                reverse=True,
-            )
-        candidates = candidates[: rerank_settings.candidate_count]
+        candidates = _weighted_rrf(
+            ranked_lists,
+            limit=rerank_settings.candidate_count,
+            **(
+                {"pure_image_channels": pure_image_channels, "image_channels": image_channels}
+                if image is not None
+                else {}
+            ),
+        )
         candidate_merge = {
             "method": "weighted_rrf",
             "source_lists": len(ranked_lists),
@@ -761,17 +1887,33 @@ class SearchPipeline:
                 "delta": [{"op": "replace", "path": "/candidateMerge", "value": candidate_merge}],
             })
         await finish_step("candidate_merge")
+        # 重い後段を待たずに、RRF順の暫定結果を先に表示できるようにする。
+        await emit_provisional("candidate_merge", candidates)
 
         await step("rerank", "候補を再ランキングしています")
         pre_rerank_document_ids = list(dict.fromkeys(item.hit.document_id for item in candidates))[
             : rerank_settings.candidate_count
         ]
         pre_rerank_count = len(candidates)
-        candidates = await _rerank_text(query, candidates, has_image=image is not None)
+        needs_rerank = bool(query.strip() and candidates and rerank_settings.enabled)
+        if needs_rerank and not deadline.allows("rerank"):
+            # 残り予算ではリランク結果を待てないため、RRF順のまま返す。
+            degraded.append("deadline:rerank")
+        else:
+            # リランカーへは候補ごとにCANDIDATE_TEXT_CHARS文字まで渡すため、対象分だけ全文にする。
+            if needs_rerank and not await _hydrate_evidence(
+                candidates[: rerank_settings.candidate_count], min_chars=CANDIDATE_TEXT_CHARS
+            ):
+                degraded.append("evidence_hydration")
+            try:
+                candidates = await deadline.run(
+                    "rerank", _rerank_text(query, candidates, has_image=image is not None)
+                )
+            except asyncio.TimeoutError:
+                degraded.append("deadline:rerank")
         if (
-            query.strip()
-            and candidates
-            and rerank_settings.enabled
+            needs_rerank
+            and "deadline:rerank" not in degraded
             and not any(item.rerank_score is not None for item in candidates)
         ):
             degraded.append("rerank")
@@ -780,7 +1922,7 @@ class SearchPipeline:
             "skipped": bool(image is not None and not query.strip()),
             "candidate_count": pre_rerank_count,
             "top_n": rerank_settings.top_n,
-            "degraded": "rerank" in degraded,
+            "degraded": "rerank" in degraded or "deadline:rerank" in degraded,
         }
         if progress:
             await progress({
@@ -788,11 +1930,34 @@ class SearchPipeline:
                 "delta": [{"op": "replace", "path": "/rerankSummary", "value": rerank_summary}],
             })
         await finish_step("rerank")
+        if needs_rerank and not rerank_summary["degraded"]:
+            await emit_provisional("rerank", candidates)
 
         judge_summary: dict[str, Any] = {"applied": False, "candidate_count": 0}
-        if query.strip() and len(candidates) >= 2:
+        verify_summary: dict[str, Any] | None = None
+        judge_needed = bool(query.strip() and len(candidates) >= 2)
+        if judge_needed:
+            gate = _judge_gate(query, candidates, retrieval_service_settings.get_judge_gate())
+            judge_summary["gate"] = gate
+            if gate["decisive"]:
+                judge_needed = False
+                judge_summary["skipped"] = "decisive_ranking"
+        if judge_needed and not deadline.allows("llm_judge"):
+            degraded.append("deadline:llm_judge")
+            judge_summary["skipped"] = "deadline"
+        elif judge_needed:
             await step("llm_judge", "LLMが最終候補を判定しています")
-            judge_index = await _llm_judge_best(query, candidates)
+            if not await _hydrate_evidence(
+                candidates[:JUDGE_CANDIDATE_COUNT], min_chars=JUDGE_TEXT_CHARS
+            ):
+                degraded.append("evidence_hydration")
+            try:
+                judge_index = await deadline.run(
+                    "llm_judge", _llm_judge_best(query, candidates)
+                )
+            except asyncio.TimeoutError:
+                judge_index = None
+                degraded.append("deadline:llm_judge")
             judge_summary["candidate_count"] = min(len(candidates), JUDGE_CANDIDATE_COUNT)
             if judge_index is not None:
                 chosen = candidates[judge_index]
@@ -811,109 +1976,42 @@ class SearchPipeline:
                     picked_page=chosen.hit.page_number,
                 )
             await finish_step("llm_judge")
-
-        if verify:
-            await step("verify", "VLMで候補を確認しています（時間がかかります）")
-            await _verify_candidates(query, candidates, image, image_media_type, progress)
+            if judge_summary["applied"]:
+                await emit_provisional("llm_judge", candidates)
+
+        if verify and not deadline.allows("verify"):
+            degraded.append("deadline:verify")
+        elif verify:
+            await step("verify", "VLMで候補を並列に確認しています")
+            if not await _hydrate_evidence(
+                candidates[:VERIFY_CANDIDATE_COUNT], min_chars=CANDIDATE_TEXT_CHARS
+            ):
+                degraded.append("evidence_hydration")
+            try:
+                verify_summary = await deadline.run(
+                    "verify",
+                    _verify_candidates(
+                        query,
+                        candidates,
+                        image,
+                        image_media_type,
+                        progress,
+                        target_documents=top_k,
+                    ),
+                )
+            except asyncio.TimeoutError:
+                # 期限までに確認できた候補のスコアだけを使う。
+                degraded.append("deadline:verify")
             await finish_step("verify")
 
         await step("format_results", "検索結果を整形しています")
-        if image is not None:
-            candidates.sort(
-                key=lambda item: _image_sort_key(
-                    item,
-                    pure_image_channels=pure_image_channels,
-                    image_channels=image_channels,
-                ),
-                reverse=True,
-            )
-        else:
-            candidates.sort(
-                key=lambda item: (
-                    item.verification_status == "verified",
-                    item.rerank_score if item.rerank_score is not None else item.rrf_score,
-                ),
-                reverse=True,
-            )
-        documents: dict[str, list[RankedHit]] = defaultdict(list)
-        for item in candidates:
-            if len(documents[item.hit.document_id]) < 3:
-                documents[item.hit.document_id].append(item)
-        if image is not None:
-            ranked_documents = sorted(
-                documents.values(),
-                key=lambda values: _image_sort_key(
-                    values[0],
-                    pure_image_channels=pure_image_channels,
-                    image_channels=image_channels,
-                ),
-                reverse=True,
-            )[:top_k]
-        else:
-            ranked_documents = sorted(
-                documents.values(),
-                key=lambda values: _boosted_document_score(query, values),
-                reverse=True,
-            )[:top_k]
-        results: list[DocumentSearchResult] = []
-        for values in ranked_documents:
-            first = values[0]
-            image_similarity_scores = [
-                _image_similarity_score(
-                    item,
-                    pure_image_channels=pure_image_channels,
-                    image_channels=image_channels,
-                )
-                if image is not None
-                else None
-                for item in values
-            ]
-            evidence = [
-                EvidenceResult(
-                    evidence_id=item.hit.evidence_id,
-                    document_id=item.hit.document_id,
-                    profile_slots=sorted(item.profile_slots),
-                    page_number=item.hit.page_number,
-                    unit_kind=item.hit.unit_kind,
-                    source_locator=item.hit.source_locator,
-                    bbox=item.hit.bbox,
-                    text_excerpt=item.hit.raw_text[:500],
-                    caption=item.hit.caption[:500],
-                    asset_url=item.hit.asset_object_name,
-                    score=item.rrf_score,
-                    rerank_score=item.rerank_score,
-                    image_similarity_score=image_similarity_score,
-                    visual_rank=min(
-                        (
-                            rank
-                            for channel, rank in item.channel_ranks.items()
-                            if channel.startswith("vector:page_image")
-                        ),
-                        default=None,
-                    ),
-                    text_rerank_rank=item.text_rerank_rank,
-                    retrieval_channels=sorted(item.channels),
-                    verification_status=item.verification_status,  # type: ignore[arg-type]
-                    match_reasons=sorted(item.channels),
-                )
-                for item, image_similarity_score in zip(values, image_similarity_scores)
-            ]
-            results.append(
-                DocumentSearchResult(
-                    document_id=first.hit.document_id,
-                    file_name=first.hit.file_name,
-                    object_name=first.hit.object_name,
-                    bucket=first.hit.bucket,
-                    score=first.rerank_score if first.rerank_score is not None else first.rrf_score,
-                    rerank_score=first.rerank_score,
-                    image_similarity_score=max(
-                        (score for score in image_similarity_scores if score is not None),
-                        default=None,
-                    ),
-                    profile_slots=sorted(set().union(*(item.profile_slots for item in values))),
-                    evidence=evidence,
-                )
-            )
+        ranked_documents = rank_documents(candidates)
+        if not await _hydrate_evidence(
+            [item for values in ranked_documents for item in values],
+            min_chars=EVIDENCE_EXCERPT_CHARS,
+        ):
+            degraded.append("evidence_hydration")
+        results = document_results(ranked_documents)
         format_summary = {
             "total_documents": len(results),
             "total_evidence": sum(len(result.evidence) for result in results),
@@ -928,7 +2026,7 @@ class SearchPipeline:
             "enabled_vlm_profiles": [profile.slot_no for profile in profiles],
             "requested_retrieval_modes": ordered_retrieval_modes(requested_modes),
             "active_retrieval_modes": ordered_retrieval_modes(active_modes),
-            "retrieval_channels": [channel for channel, _, _ in tasks],
+            "retrieval_channels": [item["channel"] for item in channel_summaries],
             "pure_image_rerank_skipped": bool(image is not None and not query.strip()),
             "degraded": sorted(set(degraded)),
             "query_plan": query_plan,
@@ -940,15 +2038,19 @@ class SearchPipeline:
             "rerank_summary": rerank_summary,
             "judge_summary": judge_summary,
             "format_summary": format_summary,
+            "embedding_cache": {**embedding_cache, "totals": query_embedding_cache.stats()},
             "vlm_verify_requested": verify,
         }
+        if verify_summary is not None:
+            diagnostics["verify_summary"] = verify_summary
+        if deadline.enabled:
+            diagnostics["deadline"] = deadline.summary()
         if debug:
             diagnostics.update(
                 candidate_count=len(candidates),
                 pre_rerank_document_ids=pre_rerank_document_ids,
             )
-        await asyncio.to_thread(
-            rag_repository.record_search_audit,
+        await _record_search_audit(
             trace_id=trace_id,
             query_hash=hashlib.sha256(query.encode()).hexdigest(),
             user_hash=user_hash,
@@ -969,6 +2071,22 @@ class SearchPipeline:
         )
 
 
+def _batch_request_key(arguments: dict[str, Any]) -> str:
+    image = arguments.get("image")
+    material = {
+        **arguments,
+        "image": hashlib.sha256(image).hexdigest() if image is not None else None,
+    }
+    return json.dumps(
+        material,
+        sort_keys=True,
+        ensure_ascii=False,
+        default=lambda value: (
+            value.model_dump(mode="json") if isinstance(value, BaseModel) else str(value)
+        ),
+    )
+
+
 def principal_hash(value: str | None) -> str | None:
     return hashlib.sha256(value.encode()).hexdigest() if value else None
 
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 import json
+import logging
 from pathlib import Path
 
 from dotenv import dotenv_values, set_key
@@ -9,6 +10,7 @@ from dotenv import dotenv_values, set_key
 from app.rag.models import (
     LEGACY_VLM_VERIFY_PROMPT,
     GlobalVlmSettings,
+    JudgeGateSettings,
     MinerUSettings,
     OcrEngineSettings,
     OcrSettings,
@@ -16,6 +18,10 @@ from app.rag.models import (
     RerankSettings,
     RetrievalWeights,
 )
+from app.rag.oracle_repository import rag_repository
+from app.rag.search_cache import search_result_cache
+
+logger = logging.getLogger(__name__)
 
 MASK = "[CONFIGURED]"
 ROOT = Path(__file__).parents[3]
@@ -68,6 +74,13 @@ class RetrievalServiceSettingsStore:
         except (TypeError, ValueError):
             return default
 
+    @staticmethod
+    def _float(values: dict[str, str], key: str, default: float) -> float:
+        try:
+            return float(values.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
     def get_mineru(self) -> MinerUSettings:
         values = self._values()
         return MinerUSettings(
@@ -146,6 +159,23 @@ class RetrievalServiceSettingsStore:
             synonym_groups=synonym_groups,
         )
 
+    def get_judge_gate(self) -> JudgeGateSettings:
+        values = self._values()
+        defaults = JudgeGateSettings()
+        margin = self._float(values, "JUDGE_GATE_MIN_RERANK_MARGIN", defaults.min_rerank_margin)
+        agreement = self._int(
+            values, "JUDGE_GATE_MIN_CHANNEL_AGREEMENT", defaults.min_channel_agreement
+        )
+        affinity = self._float(
+            values, "JUDGE_GATE_MIN_FILENAME_AFFINITY", defaults.min_filename_affinity
+        )
+        return JudgeGateSettings(
+            enabled=self._bool(values, "JUDGE_GATE_ENABLED", defaults.enabled),
+            min_rerank_margin=max(0.0, min(margin, 1.0)),
+            min_channel_agreement=max(1, min(agreement, 20)),
+            min_filename_affinity=max(0.0, min(affinity, 1.0)),
+        )
+
     def get_weights(self) -> RetrievalWeights:
         values = self._values()
 
@@ -170,6 +200,12 @@ class RetrievalServiceSettingsStore:
                 continue
             set_key(TARGET_ENV, key, str(value).lower() if isinstance(value, bool) else str(value))
             os.environ[key] = str(value)
+        # 他ワーカーの結果キャッシュもDBの公開世代で失効させる。
+        try:
+            rag_repository.advance_serving_epoch("service_settings_saved")
+        except Exception:
+            logger.warning("設定保存後に公開世代を進められませんでした", exc_info=True)
+            search_result_cache.bump_epoch("service_settings_saved")
 
     def save_mineru(self, settings: MinerUSettings) -> MinerUSettings:
         self._save(
@@ -237,6 +273,17 @@ class RetrievalServiceSettingsStore:
         )
         return self.get_query_expansion()
 
+    def save_judge_gate(self, settings: JudgeGateSettings) -> JudgeGateSettings:
+        self._save(
+            {
+                "JUDGE_GATE_ENABLED": settings.enabled,
+                "JUDGE_GATE_MIN_RERANK_MARGIN": settings.min_rerank_margin,
+                "JUDGE_GATE_MIN_CHANNEL_AGREEMENT": settings.min_channel_agreement,
+                "JUDGE_GATE_MIN_FILENAME_AFFINITY": settings.min_filename_affinity,
+            }
+        )
+        return self.get_judge_gate()
+
     def save_weights(self, settings: RetrievalWeights) -> RetrievalWeights:
         self._save(
             {
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Any
+
+# 公開Releaseの検索対象を1行1Artifactに平坦化した投影表。
+# 検索SQLはReleaseやコンポーネントを辿らずにこの表だけを読む。
+# 公開Releaseは不変なので、公開時に文書単位で作り直せば整合性が保たれる。
+
+_BUMP_SERVING_EPOCH_SQL = (
+    "UPDATE sds_serving_epoch SET epoch=epoch+1, updated_at=SYSTIMESTAMP WHERE epoch_id=1"
+)
+
+_DELETE_ARTIFACTS_SQL = "DELETE FROM sds_serving_artifacts WHERE document_id=:document"
+_DELETE_COMPONENTS_SQL = "DELETE FROM sds_serving_components WHERE document_id=:document"
+
+_INSERT_COMPONENTS_SQL = """
+    INSERT INTO sds_serving_components
+        (document_id, release_id, document_revision_id, component_key, stage_run_id)
+    SELECT rel.document_id, rel.release_id, rel.document_revision_id,
+           rc.component_key, rc.stage_run_id
+    FROM sds_index_releases rel
+    JOIN sds_index_release_components rc
+      ON rc.release_id=rel.release_id AND rc.is_stale=0
+    WHERE rel.release_id=:release
+"""
+
+_INSERT_ARTIFACTS_SQL = """
+    INSERT INTO sds_serving_artifacts
+        (document_id, release_id, document_revision_id, component_key, artifact_id,
+         artifact_kind, page_number, source_locator, bbox_json, raw_text, search_text,
+         asset_object_name, file_name, object_name, bucket, document_type, is_current)
+    SELECT d.document_id, rel.release_id, rel.document_revision_id, rc.component_key,
+           a.artifact_id, a.artifact_kind, a.page_number, a.source_locator, a.bbox_json,
+           NVL(a.raw_text, page_text.raw_text), a.search_text,
+           NVL(a.object_name, page_image.object_name),
+           d.file_name, d.object_name, d.bucket, d.document_type, d.is_current
+    FROM sds_index_releases rel
+    JOIN sds_documents d ON d.document_id=rel.document_id
+    JOIN sds_index_release_components rc
+      ON rc.release_id=rel.release_id AND rc.is_stale=0
+    JOIN sds_artifacts a ON a.stage_run_id=rc.stage_run_id
+    LEFT JOIN sds_index_release_components nc
+      ON nc.release_id=rel.release_id AND nc.component_key='normalize'
+         AND nc.is_stale=0
+    LEFT JOIN sds_artifacts page_text
+      ON page_text.stage_run_id=nc.stage_run_id
+         AND page_text.artifact_kind='PAGE_TEXT'
+         AND page_text.page_number=a.page_number
+    LEFT JOIN sds_index_release_components ic
+      ON ic.release_id=rel.release_id AND ic.component_key='render'
+         AND ic.is_stale=0
+    LEFT JOIN sds_artifacts page_image
+      ON page_image.stage_run_id=ic.stage_run_id
+         AND page_image.artifact_kind='PAGE_IMAGE'
+         AND page_image.page_number=a.page_number
+    WHERE rel.release_id=:release
+"""
+
+_SYNC_DOCUMENT_SQL = """
+    UPDATE sds_serving_artifacts s
+    SET (file_name, object_name, bucket, document_type, is_current)=(
+        SELECT d.file_name, d.object_name, d.bucket, d.document_type, d.is_current
+        FROM sds_documents d WHERE d.document_id=s.document_id
+    )
+    WHERE s.document_id=:document
+"""
+
+
+def refresh_serving_projection(cursor: Any, *, document_id: str, release_id: str) -> None:
+    """文書の投影行を公開Releaseの内容で置き換える。呼び出し側のトランザクションで実行する。"""
+    binds = {"document": document_id}
+    cursor.execute(_DELETE_ARTIFACTS_SQL, binds)
+    cursor.execute(_DELETE_COMPONENTS_SQL, binds)
+    cursor.execute(_INSERT_COMPONENTS_SQL, {"release": release_id})
+    cursor.execute(_INSERT_ARTIFACTS_SQL, {"release": release_id})
+
+
+def sync_serving_document(cursor: Any, document_id: str) -> None:
+    """文書名・文書種別など文書側の属性だけを投影行へ反映する。"""
+    cursor.execute(_SYNC_DOCUMENT_SQL, {"document": document_id})
+
+
+def bump_serving_epoch(cursor: Any) -> None:
+    """検索結果を変える書き込みと同じトランザクションで公開状態の世代を進める。
+
+    各プロセスの検索結果キャッシュはこの値をキーに含め、別プロセスでの公開・削除も
+    検出する。行ロックを短くするため、コミット直前に呼ぶ。
+    """
+    cursor.execute(_BUMP_SERVING_EPOCH_SQL)
@@ -12,6 +12,7 @@ from app.rag.clients import mineru_client, ocr_client, rerank_client, vlm_client
 from app.rag.index_pipeline import INDEX_OUTPUT_CONTRACT
 from app.rag.models import (
     GlobalVlmSettings,
+    JudgeGateSettings,
     MinerUSettings,
     OcrSettings,
     ProfileConfig,
@@ -65,6 +66,7 @@ def get_retrieval_settings() -> RetrievalSettingsResponse:
         rerank=retrieval_service_settings.get_rerank(),
         vlm=retrieval_service_settings.get_vlm(),
         query_expansion=retrieval_service_settings.get_query_expansion(),
+        judge_gate=retrieval_service_settings.get_judge_gate(),
         weights=retrieval_service_settings.get_weights(),
         vlm_model=enterprise.model or "",
     )
@@ -347,6 +349,16 @@ async def save_query_expansion_settings(
     return retrieval_service_settings.save_query_expansion(settings)
 
 
+@router.get("/judge-gate", response_model=JudgeGateSettings)
+async def get_judge_gate_settings() -> JudgeGateSettings:
+    return retrieval_service_settings.get_judge_gate()
+
+
+@router.put("/judge-gate", response_model=JudgeGateSettings)
+async def save_judge_gate_settings(settings: JudgeGateSettings) -> JudgeGateSettings:
+    return retrieval_service_settings.save_judge_gate(settings)
+
+
 @router.get("/weights", response_model=RetrievalWeights)
 async def get_weights() -> RetrievalWeights:
     return retrieval_service_settings.get_weights()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+from app.rag.background import BackgroundRefresher
+from app.rag.env import env_int
+from app.rag.oracle_repository import rag_repository
+from app.rag.pipeline_repository import pipeline_repository
+
+ORACLE_TEXT_SYNC_DEFAULT_INTERVAL_SECONDS = 5
+ORACLE_TEXT_OPTIMIZE_DEFAULT_INTERVAL_SECONDS = 3600
+ORACLE_TEXT_OPTIMIZE_DEFAULT_MAX_MINUTES = 10
+# 周期同期を無効にしたとき、索引がコミット時同期になっているかを確かめる間隔。
+ORACLE_TEXT_SYNC_MODE_CHECK_SECONDS = 60
+
+
+class TextIndexMaintainer(BackgroundRefresher):
+    """公開Release投影表のOracle Text索引をパーティション単位で同期・最適化する。
+
+    索引はコミット時に同期しないため、公開処理のコミットは索引更新を待たない。
+    APIのlifespanが起動・停止を管理し、パイプラインDispatcherがJob完了時に ``wake`` で
+    即時同期を促す。``ORACLE_TEXT_SYNC_INTERVAL_SECONDS=0`` では周期同期をやめ、
+    索引をコミット時同期（SYNC (ON COMMIT)）へ切り替える。
+    """
+
+    task_name = "text-index-maintenance"
+    failure_message = "Oracle Text索引の同期に失敗しました"
+
+    def __init__(self) -> None:
+        super().__init__()
+        # 前回の最適化以降に同期したパーティションと行数。
+        self._synced: dict[str, int] = {}
+        self._last_optimized = time.monotonic()
+        self._sync_mode_checked = False
+
+    @staticmethod
+    def sync_interval_seconds() -> int:
+        return env_int(
+            "ORACLE_TEXT_SYNC_INTERVAL_SECONDS", ORACLE_TEXT_SYNC_DEFAULT_INTERVAL_SECONDS
+        )
+
+    @staticmethod
+    def optimize_interval_seconds() -> int:
+        return env_int(
+            "ORACLE_TEXT_OPTIMIZE_INTERVAL_SECONDS",
+            ORACLE_TEXT_OPTIMIZE_DEFAULT_INTERVAL_SECONDS,
+        )
+
+    @staticmethod
+    def optimize_max_minutes() -> int:
+        return max(1, env_int(
+            "ORACLE_TEXT_OPTIMIZE_MAX_MINUTES", ORACLE_TEXT_OPTIMIZE_DEFAULT_MAX_MINUTES
+        ))
+
+    @staticmethod
+    def sync_memory() -> str | None:
+        return os.environ.get("ORACLE_TEXT_SYNC_MEMORY") or None
+
+    def sync_mode(self) -> str:
+        return "MANUAL" if self.sync_interval_seconds() > 0 else "ON COMMIT"
+
+    def interval_seconds(self) -> float:
+        return self.sync_interval_seconds() or ORACLE_TEXT_SYNC_MODE_CHECK_SECONDS
+
+    def apply_sync_mode(self) -> bool:
+        """索引の同期方式を設定に合わせる。切り替えたらTrueを返す。"""
+        mode = self.sync_mode()
+        changed = rag_repository.set_text_index_sync_mode(mode)
+        if changed and mode == "ON COMMIT":
+            # 切り替え前にコミットされた未同期行は、コミット時同期の対象にならない。
+            self.sync_pending()
+        self._sync_mode_checked = True
+        return changed
+
+    def sync_pending(self) -> dict[str, int]:
+        """未同期行のあるパーティションだけを同期し、同期した行数を返す。"""
+        pending = rag_repository.pending_text_index_partitions()
+        memory = self.sync_memory()
+        for partition, count in pending.items():
+            rag_repository.sync_text_index(partition, memory=memory)
+            self._synced[partition] = self._synced.get(partition, 0) + count
+        return pending
+
+    def optimize_synced(self) -> list[str]:
+        """前回の最適化以降に同期したパーティションを最適化する。"""
+        partitions = sorted(self._synced)
+        max_minutes = self.optimize_max_minutes()
+        for partition in partitions:
+            rag_repository.optimize_text_index(partition, max_minutes=max_minutes)
+            self._synced.pop(partition, None)
+        self._last_optimized = time.monotonic()
+        return partitions
+
+    def optimize_due(self) -> bool:
+        interval = self.optimize_interval_seconds()
+        return (
+            interval > 0
+            and bool(self._synced)
+            and time.monotonic() - self._last_optimized >= interval
+        )
+
+    async def tick(self) -> None:
+        # スキーマ作成前は静かに待つ。
+        if not await asyncio.to_thread(pipeline_repository.schema_ready):
+            return
+        if not self._sync_mode_checked or self.sync_mode() == "ON COMMIT":
+            # コミット時同期では投影の作り直しで戻った手動同期の索引も切り替え直す。
+            await asyncio.to_thread(self.apply_sync_mode)
+        if self.sync_mode() == "MANUAL":
+            await asyncio.to_thread(self.sync_pending)
+        if self.optimize_due():
+            await asyncio.to_thread(self.optimize_synced)
+
+
+text_index_maintainer = TextIndexMaintainer()
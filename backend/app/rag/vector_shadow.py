@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import os
+from array import array
+from typing import Literal, Sequence
+
+from app.rag.env import env_bool, env_int
+
+VectorShadowFormat = Literal["INT8", "BINARY"]
+VECTOR_SHADOW_FORMATS: tuple[VectorShadowFormat, ...] = ("INT8", "BINARY")
+VECTOR_SHADOW_DEFAULT_CANDIDATE_FACTOR = 4
+VECTOR_SHADOW_MAX_CANDIDATES = 2000
+
+
+def vector_shadow_format() -> VectorShadowFormat | None:
+    """``VECTOR_SHADOW_FORMAT`` （INT8 / BINARY）。未設定・不明な値は影列なし。"""
+    value = os.environ.get("VECTOR_SHADOW_FORMAT", "").strip().upper()
+    return value if value in VECTOR_SHADOW_FORMATS else None  # type: ignore[return-value]
+
+
+def vector_shadow_search_format() -> VectorShadowFormat | None:
+    """二段階検索（影列で候補取得→FLOAT32で再採点）に使う形式。"""
+    if not env_bool("VECTOR_SHADOW_SEARCH", True):
+        return None
+    return vector_shadow_format()
+
+
+def vector_shadow_candidate_count(top_k: int) -> int:
+    factor = max(1, env_int(
+        "VECTOR_SHADOW_CANDIDATE_FACTOR", VECTOR_SHADOW_DEFAULT_CANDIDATE_FACTOR
+    ))
+    return max(top_k, min(top_k * factor, VECTOR_SHADOW_MAX_CANDIDATES))
+
+
+def float_vector_index_enabled() -> bool:
+    """FALSEでFLOAT32のHNSW索引を持たず、近似検索は影列の索引だけを使う。"""
+    return env_bool("VECTOR_FLOAT_INDEX_ENABLED", True)
+
+
+def vector_shadow_column(shadow_format: VectorShadowFormat) -> str:
+    return f"VECTOR_{shadow_format}"
+
+
+def vector_shadow_index(shadow_format: VectorShadowFormat) -> str:
+    return f"SDS_EMBEDDING_{shadow_format}_IDX"
+
+
+def vector_shadow_metric(shadow_format: VectorShadowFormat) -> str:
+    # BINARYは符号ビットのみを持つためハミング距離で比較する。
+    return "HAMMING" if shadow_format == "BINARY" else "COSINE"
+
+
+def quantize_int8(values: Sequence[float]) -> array:
+    """ベクトルごとに最大絶対値で-127〜127へ拡大して丸める。
+
+    コサイン距離は定数倍に依存しないため、ベクトルごとの倍率は保存しない。
+    """
+    peak = max((abs(float(value)) for value in values), default=0.0)
+    scale = 127 / peak if peak else 0.0
+    return array("b", (max(-127, min(127, round(float(value) * scale))) for value in values))
+
+
+def quantize_binary(values: Sequence[float]) -> array:
+    """正の成分を1とする符号ビットを先頭から8次元ずつ1バイトに詰める。"""
+    packed = array("B", bytes((len(values) + 7) // 8))
+    for index, value in enumerate(values):
+        if float(value) > 0:
+            packed[index // 8] |= 0x80 >> (index % 8)
+    return packed
+
+
+def shadow_vector(values: Sequence[float], shadow_format: VectorShadowFormat) -> array:
+    return quantize_binary(values) if shadow_format == "BINARY" else quantize_int8(values)
@@ -0,0 +1,201 @@
+"""テストで共有する証跡・レシピ・パッチ・DB接続のフェイク。"""
+
+from __future__ import annotations
+
+from contextlib import ExitStack, contextmanager
+from typing import Any, Iterable, Iterator
+from unittest.mock import MagicMock, patch
+
+from app.rag.models import RerankSettings, RetrievalWeights
+from app.rag.oracle_repository import RetrievalHit
+from app.rag.pipeline_models import EmbeddingRecipe, EmbeddingRecipeInput
+
+
+async def run_sync_immediately(function: Any, *args: Any, **kwargs: Any) -> Any:
+    return function(*args, **kwargs)
+
+
+def retrieval_hit(
+    evidence_id: str,
+    *,
+    document_id: str = "d1",
+    slot_no: int = 0,
+    revision_id: str = "",
+    file_name: str | None = None,
+    object_name: str | None = None,
+    raw_text: str = "source text",
+    caption: str = "",
+    unit_kind: str = "PAGE_TEXT",
+    page_number: int = 1,
+    source_locator: str | None = None,
+    asset_object_name: str | None = None,
+    score: float = 0.5,
+    channel: str = "keyword:page_text",
+) -> RetrievalHit:
+    """検索SQLが返す1行分の証跡。ファイル名は既定で ``<document_id>.pdf`` 。"""
+    file_name = file_name or f"{document_id}.pdf"
+    return RetrievalHit(
+        evidence_id=evidence_id,
+        document_id=document_id,
+        slot_no=slot_no,
+        revision_id=revision_id,
+        page_number=page_number,
+        unit_kind=unit_kind,
+        source_locator=source_locator or f"page:{evidence_id}",
+        bbox=None,
+        raw_text=raw_text,
+        caption=caption,
+        asset_object_name=asset_object_name,
+        file_name=file_name,
+        object_name=object_name or file_name,
+        bucket="bucket",
+        score=score,
+        channel=channel,
+    )
+
+
+def chunk_recipe(code: str = "chunk_text", **overrides: Any) -> EmbeddingRecipe:
+    """CHUNK_TEXTを埋め込む有効なレシピ。"""
+    values: dict[str, Any] = {
+        "recipe_id": code,
+        "code": code,
+        "name": code,
+        "enabled": True,
+        "search_weight": 1,
+        "target_scope": "CHUNK",
+        "inputs": [EmbeddingRecipeInput(source_type="CHUNK_TEXT", required=True)],
+        "current_revision_id": f"{code}_v1",
+        "revision_no": 1,
+        "config_hash": "a" * 64,
+    }
+    values.update(overrides)
+    return EmbeddingRecipe(**values)
+
+
+def fake_connection(
+    rows: list[tuple[Any, ...]], columns: list[str] | None = None
+) -> tuple[MagicMock, MagicMock, MagicMock]:
+    """``rag_repository.connection`` の代わりに渡す (context, connection, cursor) 。"""
+    context = MagicMock()
+    connection = context.__enter__.return_value
+    cursor = connection.cursor.return_value.__enter__.return_value
+    cursor.description = [(column,) for column in columns or []]
+    cursor.fetchall.return_value = rows
+    return context, connection, cursor
+
+
+class ScriptedCursor:
+    """実行したSQLを ``statements`` に残し、SQL中の目印ごとに決めた応答を返すカーソル。
+
+    ``rows`` は ``fetchall`` 、``one`` は ``fetchone`` の応答で、関数なら取得のたびに呼ぶ。
+    ``rowcounts`` は目印に一致したSQLの ``rowcount`` 、``executemany`` の行は ``updates`` に残す。
+    """
+
+    def __init__(
+        self,
+        rows: dict[str, Any] | None = None,
+        *,
+        one: dict[str, Any] | None = None,
+        rowcounts: dict[str, int] | None = None,
+    ) -> None:
+        self.rows = rows if rows is not None else {}
+        self.one = one or {}
+        self.rowcounts = rowcounts or {}
+        self.statements: list[str] = []
+        self.updates: list[dict[str, Any]] = []
+        self.rowcount = 0
+        self._last = ""
+
+    def __enter__(self) -> "ScriptedCursor":
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        return None
+
+    def execute(self, sql: str, binds: dict[str, Any] | None = None) -> None:
+        self._last = " ".join(sql.split())
+        self.statements.append(self._last)
+        self.rowcount = self._answer(self.rowcounts, 0)
+
+    def executemany(self, sql: str, rows: list[dict[str, Any]]) -> None:
+        self.updates.extend(rows)
+
+    def fetchone(self) -> Any:
+        return self._answer(self.one, None)
+
+    def fetchall(self) -> list[tuple[Any, ...]]:
+        return self._answer(self.rows, [])
+
+    def _answer(self, answers: dict[str, Any], default: Any) -> Any:
+        for marker, answer in answers.items():
+            if marker in self._last:
+                return answer() if callable(answer) else answer
+        return default
+
+
+def scripted_database(cursor: ScriptedCursor) -> MagicMock:
+    """``database_service`` の代わりに渡す、常に ``cursor`` を開く接続プール。"""
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+    database = MagicMock()
+    database._ensure_pool_initialized.return_value = True
+    database.pool_manager.acquire_connection.return_value.__enter__.return_value = connection
+    return database
+
+
+def search_patches(
+    *,
+    recipes: Iterable[EmbeddingRecipe] = (),
+    weights: RetrievalWeights | None = None,
+    rerank: RerankSettings | None = None,
+    to_thread: Any = run_sync_immediately,
+    **repository: Any,
+) -> list[Any]:
+    """検索パイプラインの設定・リポジトリ・スレッド実行を差し替えるパッチ一式。
+
+    ``repository`` のキーワード引数は ``rag_repository`` の同名メソッドを差し替える。
+    監査の書き込みは常に無効化し、結果キャッシュは公開状態を読めない扱いで迂回する。
+    """
+    repository.setdefault("record_search_audit", MagicMock())
+    repository.setdefault("serving_epoch", MagicMock(side_effect=RuntimeError))
+    return [
+        patch("app.rag.search_pipeline.profile_repository.enabled_profiles", return_value=[]),
+        patch(
+            "app.rag.search_pipeline.pipeline_repository.enabled_recipes",
+            return_value=list(recipes),
+        ),
+        patch(
+            "app.rag.search_pipeline.retrieval_service_settings.get_weights",
+            return_value=weights or RetrievalWeights(vlm_text=0, vlm_vector=0, visual_vector=0),
+        ),
+        patch(
+            "app.rag.search_pipeline.retrieval_service_settings.get_rerank",
+            return_value=rerank or RerankSettings(enabled=False, candidate_count=10, top_n=5),
+        ),
+        *(
+            patch(f"app.rag.search_pipeline.rag_repository.{name}", value)
+            for name, value in repository.items()
+        ),
+        patch("app.rag.search_pipeline.asyncio.to_thread", new=to_thread),
+    ]
+
+
+@contextmanager
+def applied(patches: Iterable[Any]) -> Iterator[None]:
+    with ExitStack() as stack:
+        for item in patches:
+            stack.enter_context(item)
+        yield
+
+
+def search_arguments(**overrides: Any) -> dict[str, Any]:
+    """``SearchPipeline.search`` / ``_search`` の最小の引数。"""
+    return {
+        "query": "ceiling light",
+        "top_k": 5,
+        "field_filters": [],
+        "document_types": [],
+        "current_version_only": True,
+        "user_hash": None,
+        **overrides,
+    }
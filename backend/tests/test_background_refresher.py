@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from app.rag.background import BackgroundRefresher
+
+
+class CountingRefresher(BackgroundRefresher):
+    task_name = "counting-refresher"
+
+    def __init__(self, *, fail: bool = False) -> None:
+        super().__init__()
+        self.ticks = 0
+        self.fail = fail
+
+    def interval_seconds(self) -> float:
+        return 60
+
+    async def tick(self) -> None:
+        self.ticks += 1
+        if self.fail:
+            raise RuntimeError("database connection is not configured")
+
+
+async def wait_for_ticks(refresher: CountingRefresher, count: int) -> None:
+    for _ in range(100):
+        if refresher.ticks >= count:
+            return
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_wake_from_another_thread_runs_the_next_tick() -> None:
+    refresher = CountingRefresher(fail=True)
+    await refresher.start()
+    await wait_for_ticks(refresher, 1)
+
+    # 失敗したtickの後もループは続き、別スレッドからの起床で次の周期がすぐ始まる。
+    thread = threading.Thread(target=refresher.wake)
+    thread.start()
+    thread.join()
+    await wait_for_ticks(refresher, 2)
+    await refresher.stop()
+
+    assert refresher.ticks == 2
+    assert refresher.running is False
+    refresher.wake()
+
+
+@pytest.mark.asyncio
+async def test_disabled_refresher_does_not_start() -> None:
+    refresher = CountingRefresher()
+    refresher.enabled = lambda: False  # type: ignore[method-assign]
+
+    await refresher.start()
+
+    assert refresher.running is False and refresher.ticks == 0
+    await refresher.stop()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.rag.search_pipeline import RankedHit, _verify_candidates
+from tests.search_helpers import retrieval_hit, run_sync_immediately
+
+
+def candidate(index: int) -> RankedHit:
+    return RankedHit(
+        hit=retrieval_hit(
+            f"e{index}",
+            document_id=f"d{index}",
+            unit_kind="PAGE_IMAGE",
+            page_number=index,
+            source_locator=f"page:{index}",
+            asset_object_name=f"pages/page_{index:03d}.png",
+            channel="vector:page_image",
+        ),
+        rrf_score=1 / index,
+    )
+
+
+@pytest.mark.asyncio
+async def test_verification_runs_concurrently_and_streams_each_verdict(monkeypatch) -> None:
+    monkeypatch.setenv("VLM_VERIFY_CONCURRENCY", "2")
+    candidates = [candidate(index) for index in range(1, 5)]
+    in_flight = 0
+    peak = 0
+    events: list[dict[str, Any]] = []
+
+    async def generate_json(**kwargs: Any) -> dict[str, Any]:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"verified": "page_002" not in str(kwargs["images"]), "confidence": 0.9}
+
+    async def progress(event: dict[str, Any]) -> None:
+        events.append(event)
+
+    download = MagicMock(side_effect=lambda name: name.encode())
+    with (
+        patch("app.rag.search_pipeline.oci_service.download_object", download),
+        patch("app.rag.search_pipeline.vlm_client.generate_json", side_effect=generate_json),
+        patch("app.rag.search_pipeline.asyncio.to_thread", new=run_sync_immediately),
+    ):
+        summary = await _verify_candidates("ceiling light", candidates, None, "image/png", progress)
+
+    assert peak == 2
+    assert download.call_count == 4
+    assert [item.verification_status for item in candidates] == [
+        "verified", "unverified", "verified", "verified"
+    ]
+    streamed = [
+        operation["value"]["completed"]
+        for event in events
+        for operation in event["delta"]
+        if operation["path"] == "/verifySummary"
+    ]
+    assert streamed == [1, 2, 3, 4]
+    assert summary["stopped_early"] is False
+    assert sorted(verdict["rank"] for verdict in summary["verdicts"]) == [1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_verification_stops_once_top_candidates_fill_top_k() -> None:
+    candidates = [candidate(index) for index in range(1, 6)]
+    cancelled: list[str] = []
+
+    async def generate_json(**kwargs: Any) -> dict[str, Any]:
+        name = str(kwargs["images"])
+        if "page_001" in name or "page_002" in name:
+            return {"verified": True, "confidence": 0.9}
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(name)
+            raise
+        return {"verified": True, "confidence": 0.9}
+
+    with (
+        patch("app.rag.search_pipeline.oci_service.download_object", side_effect=lambda name: name.encode()),
+        patch("app.rag.search_pipeline.vlm_client.generate_json", side_effect=generate_json),
+        patch("app.rag.search_pipeline.asyncio.to_thread", new=run_sync_immediately),
+    ):
+        summary = await _verify_candidates(
+            "ceiling light", candidates, None, "image/png", target_documents=2
+        )
+
+    assert summary["stopped_early"] is True
+    assert summary["completed"] == 2
+    assert [item.verification_status for item in candidates] == [
+        "verified", "verified", "not_requested", "not_requested", "not_requested"
+    ]
+    assert cancelled
+
+
+@pytest.mark.asyncio
+async def test_early_stop_waits_for_higher_ranked_candidates() -> None:
+    candidates = [candidate(index) for index in range(1, 4)]
+    release_first = asyncio.Event()
+
+    async def generate_json(**kwargs: Any) -> dict[str, Any]:
+        if "page_001" in str(kwargs["images"]):
+            await release_first.wait()
+            return {"verified": False, "confidence": 0.9}
+        release_first.set()
+        return {"verified": True, "confidence": 0.9}
+
+    with (
+        patch("app.rag.search_pipeline.oci_service.download_object", side_effect=lambda name: name.encode()),
+        patch("app.rag.search_pipeline.vlm_client.generate_json", side_effect=generate_json),
+        patch("app.rag.search_pipeline.asyncio.to_thread", new=run_sync_immediately),
+    ):
+        summary = await _verify_candidates(
+            "ceiling light", candidates, None, "image/png", target_documents=1
+        )
+
+    # 上位1件目の判定が出るまでは、下位の検証済み候補だけで打ち切らない。
+    assert candidates[0].verification_status == "unverified"
+    assert summary["completed"] >= 2
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.rag.access_cache import DocumentAccess, DocumentAccessCache
+from app.rag.oracle_repository import ChannelQuery, rag_repository
+from app.rag.search_pipeline import _document_access
+from tests.search_helpers import fake_connection, run_sync_immediately
+
+
+def search_with_access(access: DocumentAccess | None) -> tuple[str, dict[str, Any], MagicMock]:
+    context, connection, cursor = fake_connection([])
+    with patch.object(rag_repository, "connection", return_value=context):
+        rag_repository.multi_channel_search(
+            channels=[
+                ChannelQuery(kind="keyword", channel="keyword:page_text", query="ceiling light"),
+                ChannelQuery(
+                    kind="recipe_vector",
+                    channel="vector:chunk_text",
+                    recipe_code="chunk_text",
+                    embedding=[0.1],
+                ),
+            ],
+            top_k=10,
+            user_hash="a" * 64,
+            current_version_only=True,
+            document_types=[],
+            access=access,
+        )
+    sql, binds = cursor.execute.call_args.args
+    return " ".join(sql.split()), binds, connection
+
+
+def test_resolved_access_set_replaces_the_correlated_exists() -> None:
+    sql, binds, connection = search_with_access(DocumentAccess(frozenset({"d2", "d1"})))
+
+    assert "sds_document_acl" not in sql
+    assert sql.count("a.document_id IN (SELECT COLUMN_VALUE FROM TABLE(:access_ids))") == 2
+    connection.gettype.assert_called_once_with("SYS.ODCIVARCHAR2LIST")
+    connection.gettype.return_value.newobject.assert_called_once_with(["d1", "d2"])
+    assert binds["access_ids"] is connection.gettype.return_value.newobject.return_value
+    assert "user_hash" not in binds
+
+
+def test_unrestricted_or_empty_access_needs_no_acl_lookup() -> None:
+    unrestricted_sql, unrestricted_binds, _ = search_with_access(
+        DocumentAccess(frozenset({"d1"}), unrestricted=True)
+    )
+    empty_sql, _, _ = search_with_access(DocumentAccess(frozenset()))
+
+    assert "sds_document_acl" not in unrestricted_sql and "access_ids" not in unrestricted_binds
+    assert "1=1" in unrestricted_sql
+    assert "1=0" in empty_sql
+
+
+def test_unresolved_access_keeps_the_exists_filter() -> None:
+    sql, binds, connection = search_with_access(None)
+
+    assert "EXISTS ( SELECT 1 FROM sds_document_acl acl" in sql
+    assert binds["user_hash"] == "a" * 64
+    connection.gettype.assert_not_called()
+
+
+def test_document_access_marks_fully_readable_corpus_as_unrestricted() -> None:
+    context, _, cursor = fake_connection([("d1", 1), ("d2", 1)])
+    with patch.object(rag_repository, "connection", return_value=context):
+        full = rag_repository.document_access("a" * 64)
+    cursor.fetchall.return_value = [("d1", 1), ("d2", 0)]
+    with patch.object(rag_repository, "connection", return_value=context):
+        partial = rag_repository.document_access("a" * 64)
+
+    assert full == DocumentAccess(frozenset({"d1", "d2"}), unrestricted=True)
+    assert partial == DocumentAccess(frozenset({"d1"}))
+    assert rag_repository.document_access(None) == DocumentAccess(frozenset())
+
+
+@pytest.mark.asyncio
+async def test_access_set_is_cached_per_user_until_acl_changes() -> None:
+    cache = DocumentAccessCache()
+    resolve = MagicMock(side_effect=lambda user_hash: DocumentAccess(frozenset({user_hash[:2]})))
+    with (
+        patch("app.rag.search_pipeline.document_access_cache", cache),
+        patch("app.rag.search_pipeline.rag_repository.document_access", resolve),
+        patch("app.rag.search_pipeline.asyncio.to_thread", new=run_sync_immediately),
+    ):
+        first, first_summary = await _document_access("a" * 64)
+        second, second_summary = await _document_access("a" * 64)
+        await _document_access("b" * 64)
+        cache.bump_epoch("document_upserted")
+        await _document_access("a" * 64)
+        anonymous, anonymous_summary = await _document_access(None)
+
+    assert first == second == DocumentAccess(frozenset({"aa"}))
+    assert (first_summary["cached"], second_summary["cached"]) == (False, True)
+    assert second_summary["mode"] == "document_ids"
+    assert [call.args[0][:1] for call in resolve.call_args_list] == ["a", "b", "a"]
+    assert anonymous is None and anonymous_summary["mode"] == "exists"
+
+
+@pytest.mark.asyncio
+async def test_failed_resolution_falls_back_to_exists_and_is_not_cached() -> None:
+    cache = DocumentAccessCache()
+    with (
+        patch("app.rag.search_pipeline.document_access_cache", cache),
+        patch(
+            "app.rag.search_pipeline.rag_repository.document_access",
+            side_effect=RuntimeError("database connection is not configured"),
+        ),
+        patch("app.rag.search_pipeline.asyncio.to_thread", new=run_sync_immediately),
+    ):
+        access, summary = await _document_access("a" * 64)
+
+    assert access is None
+    assert summary == {"mode": "exists", "cached": False, "degraded": True}
+    assert cache.stats()["size"] == 0
+
+
+def test_access_resolved_during_an_acl_change_is_not_stored() -> None:
+    cache = DocumentAccessCache()
+    epoch = cache.epoch
+    cache.bump_epoch("document_deleted")
+
+    assert cache.put("a" * 64, DocumentAccess(frozenset()), epoch=epoch) is False
+    assert cache.get("a" * 64) is None
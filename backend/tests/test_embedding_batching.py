@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.rag.clients import EmbeddingClient
+
+
+class BatchLimitError(Exception):
+    status = 400
+
+
+def fake_request_texts(calls: list[list[str]], *, limit: int | None = None):
+    lock = threading.Lock()
+
+    def request(self, *, texts: list[str], input_type: str) -> list[list[float]]:
+        with lock:
+            calls.append(list(texts))
+        if limit is not None and len(texts) > limit:
+            raise BatchLimitError("too many inputs")
+        return [[float(text.removeprefix("q"))] for text in texts]
+
+    return request
+
+
+@pytest.mark.asyncio
+async def test_text_batches_inputs_and_preserves_order(monkeypatch) -> None:
+    monkeypatch.setenv("OCI_EMBEDDING_TEXT_BATCH_SIZE", "4")
+    calls: list[list[str]] = []
+    values = [f"q{index}" for index in range(10)]
+    with patch.object(EmbeddingClient, "_request_texts", fake_request_texts(calls)):
+        vectors = await EmbeddingClient().text(values, input_type="SEARCH_QUERY")
+
+    assert vectors == [[float(index)] for index in range(10)]
+    assert sorted(len(call) for call in calls) == [2, 4, 4]
+
+
+@pytest.mark.asyncio
+async def test_text_splits_batch_rejected_by_request_limit(monkeypatch) -> None:
+    monkeypatch.setenv("OCI_EMBEDDING_TEXT_BATCH_SIZE", "8")
+    calls: list[list[str]] = []
+    values = [f"q{index}" for index in range(8)]
+    with patch.object(EmbeddingClient, "_request_texts", fake_request_texts(calls, limit=2)):
+        vectors = await EmbeddingClient().text(values)
+
+    assert vectors == [[float(index)] for index in range(8)]
+    assert sum(1 for call in calls if len(call) <= 2) == 4
+
+
+@pytest.mark.asyncio
+async def test_text_runs_batches_concurrently_up_to_limit(monkeypatch) -> None:
+    monkeypatch.setenv("OCI_EMBEDDING_TEXT_BATCH_SIZE", "1")
+    monkeypatch.setenv("OCI_EMBEDDING_CONCURRENCY", "3")
+    active = {"now": 0, "peak": 0}
+
+    async def contents(self, *, texts=None, image=None, input_type="SEARCH_DOCUMENT"):
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        return [float(texts[0].removeprefix("q"))]
+
+    with patch.object(EmbeddingClient, "contents", contents):
+        started = time.perf_counter()
+        vectors = await EmbeddingClient().text([f"q{index}" for index in range(6)])
+
+    assert vectors == [[float(index)] for index in range(6)]
+    assert active["peak"] == 3
+    assert time.perf_counter() - started < 0.05
+
+
+@pytest.mark.asyncio
+async def test_text_rejects_blank_values_before_calling_api() -> None:
+    with patch.object(EmbeddingClient, "_request_texts") as request:
+        with pytest.raises(ValueError):
+            await EmbeddingClient().text(["lighting", "  "])
+    request.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_other_bad_requests_are_not_split(monkeypatch) -> None:
+    monkeypatch.setenv("OCI_EMBEDDING_TEXT_BATCH_SIZE", "8")
+    calls: list[list[str]] = []
+
+    def request(self, *, texts: list[str], input_type: str) -> list[list[float]]:
+        calls.append(list(texts))
+        raise BatchLimitError("invalid compartment id")
+
+    with patch.object(EmbeddingClient, "_request_texts", request):
+        with pytest.raises(BatchLimitError):
+            await EmbeddingClient().text([f"q{index}" for index in range(8)])
+
+    assert calls == [[f"q{index}" for index in range(8)]]
+
+
+@pytest.mark.asyncio
+async def test_split_requests_stay_within_the_concurrency_limit(monkeypatch) -> None:
+    monkeypatch.setenv("OCI_EMBEDDING_TEXT_BATCH_SIZE", "8")
+    monkeypatch.setenv("OCI_EMBEDDING_CONCURRENCY", "1")
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+
+    def request(self, *, texts: list[str], input_type: str) -> list[list[float]]:
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        try:
+            time.sleep(0.005)
+            if len(texts) > 1:
+                raise BatchLimitError("too many inputs")
+            return [[float(texts[0].removeprefix("q"))]]
+        finally:
+            with lock:
+                active["now"] -= 1
+
+    with patch.object(EmbeddingClient, "_request_texts", request):
+        vectors = await EmbeddingClient().text([f"q{index}" for index in range(4)])
+
+    assert vectors == [[float(index)] for index in range(4)]
+    assert active["peak"] == 1
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import math
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pydantic import ValidationError
+
+from app.rag import oracle_schema
+from app.rag.clients import EmbeddingClient, truncate_embedding
+from app.rag.models import QueryExpansionSettings, RerankSettings
+from app.rag.oracle_repository import rag_repository
+from app.rag.oracle_schema import migrate_embedding_dimensions
+from app.rag.pipeline_models import (
+    EmbeddingRecipeInput,
+    EmbeddingRecipeUpsert,
+)
+from app.rag.pipeline_repository import pipeline_repository
+from app.rag.search_pipeline import SearchPipeline
+from tests.search_helpers import (
+    ScriptedCursor,
+    applied,
+    chunk_recipe,
+    scripted_database,
+    search_arguments,
+    search_patches,
+)
+
+
+class _Model:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def request_embedding(dimensions: int, returned: int) -> tuple[list[float], Any]:
+    models = SimpleNamespace(
+        EmbedTextContent=_Model,
+        EmbedImageContent=_Model,
+        ImageUrl=_Model,
+        EmbedTextDetails=_Model,
+        OnDemandServingMode=_Model,
+    )
+    response = SimpleNamespace(data=SimpleNamespace(embeddings=[[0.25] * returned]))
+    with (
+        patch("app.rag.clients.image_vectorizer.genai_client", MagicMock()),
+        patch(
+            "app.rag.clients.image_vectorizer._retry_embedding_api_call",
+            return_value=response,
+        ) as call,
+        patch("app.rag.clients.importlib.import_module", return_value=models),
+    ):
+        value = EmbeddingClient()._request(
+            ordered_contents=[("TEXT", "page text", "text/plain")],
+            input_type="SEARCH_DOCUMENT",
+            dimensions=dimensions,
+        )
+    return value, call.call_args.args[1]
+
+
+def test_recipe_dimensions_are_requested_and_validated() -> None:
+    value, details = request_embedding(256, 256)
+
+    assert len(value) == 256 and details.output_dimensions == 256
+    with pytest.raises(ValueError, match="期待値: 512"):
+        request_embedding(512, 1536)
+    with pytest.raises(ValueError, match="未対応"):
+        request_embedding(300, 300)
+    inputs = [EmbeddingRecipeInput(source_type="CHUNK_TEXT")]
+    assert EmbeddingRecipeUpsert(
+        code="chunk_text_256", name="n", target_scope="CHUNK", inputs=inputs,
+        output_dimensions=256,
+    ).output_dimensions == 256
+    with pytest.raises(ValidationError):
+        EmbeddingRecipeUpsert(
+            code="chunk_text_300", name="n", target_scope="CHUNK", inputs=inputs,
+            output_dimensions=300,
+        )
+
+
+def test_truncated_query_vector_is_a_unit_prefix() -> None:
+    vector = [3.0, 4.0] + [1.0] * 254
+
+    reduced = truncate_embedding(vector, 2)
+
+    assert reduced == pytest.approx([0.6, 0.8])
+    assert math.isclose(sum(value * value for value in reduced), 1.0)
+    assert truncate_embedding(vector, 1536) is vector
+
+
+def test_store_embeddings_checks_the_recipe_dimensions(monkeypatch) -> None:
+    monkeypatch.delenv("VECTOR_SHADOW_FORMAT", raising=False)
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+
+    def store(vector: list[float]) -> None:
+        pipeline_repository.store_embeddings(
+            run_id="run-1",
+            revision_id="rev-1",
+            recipe_revision_id="chunk_text_256_v1",
+            recipe_code="chunk_text_256",
+            values=[("artifact-1", "h" * 64, vector, [])],
+            dimensions=256,
+        )
+
+    with patch.object(pipeline_repository, "connection", return_value=context):
+        store([0.1] * 256)
+        with pytest.raises(ValueError, match="期待値: 256"):
+            store([0.1] * 1536)
+
+    assert len(cursor.execute.call_args_list[0].args[1]["vector"]) == 256
+
+
+def test_rescore_branch_joins_the_full_dimension_recipe(monkeypatch) -> None:
+    monkeypatch.setenv("VECTOR_SHADOW_FORMAT", "BINARY")
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.description = [("EVIDENCE_ID",)]
+    cursor.fetchall.return_value = []
+    with patch.object(rag_repository, "connection", return_value=context):
+        rag_repository.recipe_vector_search(
+            recipe_code="chunk_text_256",
+            embedding=[0.1] * 256,
+            channel="vector:chunk_text_256",
+            top_k=20,
+            user_hash=None,
+            current_version_only=True,
+            document_types=[],
+            target_accuracy=90,
+            rescore_recipe_code="chunk_text",
+            rescore_embedding=[0.1] * 1536,
+        )
+
+    sql, binds = cursor.execute.call_args.args
+    sql = " ".join(sql.split())
+    assert "FETCH APPROX FIRST 80 ROWS ONLY WITH TARGET ACCURACY 90" in sql
+    # 結合したscrにもdocument_idがあるため、外側の列はshortlistで修飾する（ORA-00918回避）。
+    assert sql.startswith(
+        "SELECT shortlist.evidence_id, shortlist.document_id, shortlist.slot_no,"
+    )
+    outer = sql[:sql.index(" FROM (")]
+    assert " document_id" not in outer.replace("shortlist.document_id", "")
+    assert "LEFT JOIN sds_embeddings evr ON evr.recipe_code=:rescore_recipe" in sql
+    assert sql.endswith(
+        "ORDER BY NVL(1 - VECTOR_DISTANCE(evr.vector_value, :rescore_embedding, COSINE), "
+        "shortlist.stage_score) DESC, shortlist.embedding_id FETCH FIRST 20 ROWS ONLY"
+    )
+    assert "VECTOR_BINARY" not in sql and "shadow_embedding" not in binds
+    assert binds["rescore_recipe"] == "chunk_text"
+    assert len(binds["embedding"]) == 256 and len(binds["rescore_embedding"]) == 1536
+
+
+async def vector_channels(vector_accuracy: str | None) -> list[Any]:
+    async def query_embeddings(values: list[str]) -> list[list[float]]:
+        return [[0.1] * 1536 for _ in values]
+
+    search = MagicMock(side_effect=lambda channels, **_: [[] for _ in channels])
+    patches = [
+        *search_patches(
+            recipes=[
+                chunk_recipe("chunk_text", output_dimensions=1536),
+                chunk_recipe("chunk_text_256", output_dimensions=256),
+            ],
+            rerank=RerankSettings(enabled=False, candidate_count=20, top_n=5),
+            multi_channel_search=search,
+            evidence_texts=MagicMock(return_value={}),
+        ),
+        patch(
+            "app.rag.search_pipeline.retrieval_service_settings.get_query_expansion",
+            return_value=QueryExpansionSettings(enabled=False),
+        ),
+        patch("app.rag.search_pipeline.embedding_client.query", new=query_embeddings),
+    ]
+    with applied(patches):
+        await SearchPipeline().search(**search_arguments(vector_accuracy=vector_accuracy))
+    return [
+        item for item in search.call_args.kwargs["channels"] if item.kind == "recipe_vector"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_low_dimension_recipe_replaces_the_full_channel_as_first_stage(monkeypatch) -> None:
+    monkeypatch.setenv("VECTOR_RESCORE_RECIPES", '{"chunk_text_256": "chunk_text"}')
+
+    channels = await vector_channels(None)
+
+    assert [item.channel for item in channels] == ["vector:chunk_text_256"]
+    assert len(channels[0].embedding) == 256
+    assert channels[0].rescore_recipe_code == "chunk_text"
+    assert len(channels[0].rescore_embedding) == 1536
+
+    precise = await vector_channels("precise")
+
+    assert [(item.channel, len(item.embedding), item.rescore_recipe_code) for item in precise] == [
+        ("vector:chunk_text", 1536, None),
+        ("vector:chunk_text_256", 256, None),
+    ]
+
+
+def dimension_cursor(*, condition: str) -> ScriptedCursor:
+    return ScriptedCursor({
+        "USER_CONSTRAINTS": [("SYS_C001", '"RECIPE_ID" IS NOT NULL'), ("SYS_C002", condition)],
+        "USER_TAB_COLUMNS": [("VECTOR_INT8",)],
+        "USER_INDEXES": [("SDS_EMBEDDING_HNSW_IDX",), ("SDS_EMBEDDING_INT8_IDX",)],
+    })
+
+
+def run_migration(cursor: ScriptedCursor) -> dict[str, Any]:
+    with patch.object(oracle_schema, "database_service", scripted_database(cursor)):
+        return migrate_embedding_dimensions()
+
+
+def test_fixed_dimension_schema_is_migrated_once(monkeypatch) -> None:
+    monkeypatch.delenv("VECTOR_FLOAT_INDEX_ENABLED", raising=False)
+    cursor = dimension_cursor(condition="OUTPUT_DIMENSIONS = 1536")
+
+    result = run_migration(cursor)
+
+    assert result == {
+        "steps": [
+            "drop:SDS_EMBEDDING_HNSW_IDX",
+            "drop:SDS_EMBEDDING_INT8_IDX",
+            "modify:VECTOR_VALUE",
+            "modify:VECTOR_INT8",
+            "replace:OUTPUT_DIMENSIONS_CHECK",
+            "create:SDS_EMBEDDING_HNSW_IDX",
+        ],
+        "already_flexible": False,
+    }
+    assert "DROP CONSTRAINT SYS_C002" in " ".join(cursor.statements)
+    assert "MODIFY (VECTOR_INT8 VECTOR(*, INT8))" in " ".join(cursor.statements)
+    assert run_migration(
+        dimension_cursor(condition="OUTPUT_DIMENSIONS IN (256, 512, 1024, 1536)")
+    ) == {"steps": [], "already_flexible": True}
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from contextlib import ExitStack
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+from app.rag import oracle_schema
+from app.rag.oracle_repository import rag_repository
+from app.rag.oracle_schema import (
+    SCHEMA_VERSION,
+    migrate_embedding_partitions,
+    schema_digest,
+    schema_sql,
+    upgrade_schema_in_place,
+)
+from tests.search_helpers import ScriptedCursor, scripted_database
+
+
+def migration_cursor(answers: dict[str, Any]) -> ScriptedCursor:
+    """USER_*ビューへの問い合わせにだけ既定の応答を返すカーソル。"""
+    return ScriptedCursor(
+        {"USER_TABLES": [("SDS_EMBEDDINGS",)]},
+        one=answers,
+        rowcounts={"UPDATE SDS_EMBEDDINGS": 3},
+    )
+
+
+def run_migration(cursor: ScriptedCursor) -> dict[str, Any]:
+    with patch.object(oracle_schema, "database_service", scripted_database(cursor)):
+        return migrate_embedding_partitions()
+
+
+def test_embeddings_are_partitioned_by_recipe_with_a_local_vector_index() -> None:
+    ddl = " ".join(schema_sql().split())
+
+    assert "RECIPE_CODE VARCHAR2(64) NOT NULL" in ddl
+    assert "PARTITION BY LIST (RECIPE_CODE) AUTOMATIC" in ddl
+    assert "PARAMETERS (TYPE HNSW, NEIGHBORS 32, EFCONSTRUCTION 500) LOCAL;" in ddl
+
+
+def test_recipe_search_prunes_to_its_own_partition() -> None:
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.description = []
+    cursor.fetchall.return_value = []
+    with patch.object(rag_repository, "connection", return_value=context):
+        rag_repository.recipe_vector_search(
+            recipe_code="vlm_text_slot_2",
+            embedding=[0.1],
+            channel="vector:vlm_text_slot_2",
+            top_k=10,
+            user_hash="a" * 64,
+            current_version_only=True,
+            document_types=[],
+        )
+
+    sql, binds = cursor.execute.call_args.args
+    assert "ev.recipe_code=:recipe_code" in " ".join(sql.split())
+    assert binds["recipe_code"] == "vlm_text_slot_2"
+
+
+def test_existing_table_is_migrated_in_place() -> None:
+    cursor = migration_cursor({
+        "USER_PART_TABLES": (0,),
+        "COLUMN_NAME='RECIPE_CODE'": (0,),
+        "SELECT NULLABLE": ("Y",),
+        "USER_INDEXES": ("NO",),
+    })
+
+    result = run_migration(cursor)
+
+    assert result["steps"] == [
+        "add_recipe_code",
+        "backfill_recipe_code",
+        "drop_global_vector_index",
+        "partition_by_recipe",
+        "create_local_vector_index",
+    ]
+    assert result["backfilled_rows"] == 3
+    statements = cursor.statements
+    assert any(item.startswith("ALTER TABLE SDS_EMBEDDINGS MODIFY PARTITION BY LIST") and
+               item.endswith("ONLINE") for item in statements)
+    assert statements[-1].startswith("CREATE VECTOR INDEX SDS_EMBEDDING_HNSW_IDX")
+    assert statements.index("DROP INDEX SDS_EMBEDDING_HNSW_IDX") < next(
+        index for index, item in enumerate(statements) if "PARTITION BY LIST" in item
+    )
+
+
+def test_migration_is_a_no_op_once_partitioned() -> None:
+    cursor = migration_cursor({"USER_PART_TABLES": (1,), "USER_INDEXES": ("YES",)})
+
+    result = run_migration(cursor)
+
+    assert result["already_partitioned"] is True
+    assert not any(item.startswith(("ALTER", "DROP", "CREATE")) for item in cursor.statements)
+
+
+def test_upgrade_in_place_registers_the_current_schema_version() -> None:
+    connection = MagicMock()
+    cursor = connection.cursor.return_value.__enter__.return_value
+    database = MagicMock()
+    database.pool_manager.acquire_connection.return_value.__enter__.return_value = connection
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(oracle_schema, "database_service", database))
+        for name in (
+            "migrate_embedding_partitions",
+            "migrate_embedding_dimensions",
+            "build_vector_shadow",
+            "build_serving_projection",
+            "build_serving_epoch",
+        ):
+            stack.enter_context(patch.object(oracle_schema, name, return_value={"steps": []}))
+        result = upgrade_schema_in_place()
+
+    sql, binds = cursor.execute.call_args.args
+    # 旧版の行しかない環境でも、現行版の行を追加して schema_ready を満たす。
+    assert " ".join(sql.split()).startswith("MERGE INTO SDS_SCHEMA_VERSION")
+    assert (binds["version"], binds["digest"]) == (SCHEMA_VERSION, schema_digest())
+    assert result["schema_version"] == SCHEMA_VERSION
+    connection.commit.assert_called_once()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.rag.models import RerankSettings
+from app.rag.oracle_repository import (
+    EVIDENCE_PREVIEW_MAX_CHARS,
+    RetrievalHit,
+    evidence_preview_chars,
+    rag_repository,
+)
+from app.rag.search_pipeline import (
+    CANDIDATE_TEXT_CHARS,
+    QueryPlan,
+    RankedHit,
+    SearchPipeline,
+    _hydrate_evidence,
+    _weighted_rrf,
+)
+from tests.search_helpers import (
+    applied,
+    retrieval_hit,
+    run_sync_immediately,
+    search_arguments,
+    search_patches,
+)
+
+
+def text_hit(evidence_id: str, raw_text: str, *, caption: str = "") -> RetrievalHit:
+    # 同じページの証跡として融合されるよう、位置とファイルを揃える。
+    return retrieval_hit(
+        evidence_id,
+        raw_text=raw_text,
+        caption=caption,
+        source_locator="page:1",
+        file_name="source.pdf",
+    )
+
+
+def captured_sql(method: str, **kwargs: Any) -> str:
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.description = []
+    cursor.fetchall.return_value = []
+    with patch.object(rag_repository, "connection", return_value=context):
+        getattr(rag_repository, method)(**kwargs)
+    return " ".join(cursor.execute.call_args.args[0].split())
+
+
+def test_retrieval_selects_text_previews_instead_of_full_clobs(monkeypatch) -> None:
+    monkeypatch.setenv("RETRIEVAL_EVIDENCE_PREVIEW_CHARS", "800")
+    sql = captured_sql(
+        "keyword_search",
+        query="ceiling light",
+        top_k=10,
+        user_hash=None,
+        current_version_only=True,
+        document_types=[],
+    )
+    assert "DBMS_LOB.SUBSTR(a.raw_text, 800, 1) raw_text" in sql
+
+    monkeypatch.setenv("RETRIEVAL_EVIDENCE_PREVIEW_CHARS", "0")
+    sql = captured_sql(
+        "keyword_search",
+        query="ceiling light",
+        top_k=10,
+        user_hash=None,
+        current_version_only=True,
+        document_types=[],
+    )
+    assert "DBMS_LOB.SUBSTR" not in sql
+    assert "a.raw_text raw_text" in sql
+
+
+def test_preview_is_clamped_below_the_varchar2_byte_limit(monkeypatch) -> None:
+    # 4000バイトを超える日本語プレビューはORA-06502になるため、設定値を上限で切り詰める。
+    monkeypatch.setenv("RETRIEVAL_EVIDENCE_PREVIEW_CHARS", "6000")
+    assert evidence_preview_chars() == EVIDENCE_PREVIEW_MAX_CHARS
+    assert EVIDENCE_PREVIEW_MAX_CHARS * 3 <= 4000
+    sql = captured_sql(
+        "keyword_search",
+        query="ceiling light",
+        top_k=10,
+        user_hash=None,
+        current_version_only=True,
+        document_types=[],
+    )
+    assert f"DBMS_LOB.SUBSTR(a.raw_text, {EVIDENCE_PREVIEW_MAX_CHARS}, 1) raw_text" in sql
+
+
+@pytest.mark.asyncio
+async def test_hydration_fetches_full_text_from_the_merged_text_source(monkeypatch) -> None:
+    monkeypatch.setenv("RETRIEVAL_EVIDENCE_PREVIEW_CHARS", "4")
+    garbled = text_hit("native", "����")
+    clean = text_hit("ocr", "ceil")
+    short = text_hit("short", "abc")
+    [merged] = _weighted_rrf([([garbled], 1.0), ([clean], 1.0)])
+    untouched = RankedHit(hit=short, rrf_score=0.1)
+    evidence_texts = MagicMock(return_value={"ocr": "ceiling light catalog page"})
+
+    with (
+        patch("app.rag.search_pipeline.rag_repository.evidence_texts", evidence_texts),
+        patch("app.rag.search_pipeline.asyncio.to_thread", new=run_sync_immediately),
+    ):
+        assert await _hydrate_evidence([merged, untouched], min_chars=500) is True
+
+    evidence_texts.assert_called_once_with(["ocr"])
+    assert merged.hit.raw_text == "ceiling light catalog page"
+    assert untouched.hit.raw_text == "abc"
+
+
+@pytest.mark.asyncio
+async def test_hydration_is_skipped_when_preview_already_covers_the_consumer(monkeypatch) -> None:
+    monkeypatch.setenv("RETRIEVAL_EVIDENCE_PREVIEW_CHARS", "1000")
+    item = RankedHit(hit=text_hit("e1", "x" * 1000), rrf_score=0.1)
+    evidence_texts = MagicMock()
+
+    with patch("app.rag.search_pipeline.rag_repository.evidence_texts", evidence_texts):
+        assert await _hydrate_evidence([item], min_chars=500) is True
+
+    evidence_texts.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_hydration_failure_keeps_previews(monkeypatch) -> None:
+    monkeypatch.setenv("RETRIEVAL_EVIDENCE_PREVIEW_CHARS", "4")
+    item = RankedHit(hit=text_hit("e1", "abcd", caption="vlm "), rrf_score=0.1)
+
+    with (
+        patch(
+            "app.rag.search_pipeline.rag_repository.evidence_texts",
+            side_effect=RuntimeError("database connection is not configured"),
+        ),
+        patch("app.rag.search_pipeline.asyncio.to_thread", new=run_sync_immediately),
+    ):
+        assert await _hydrate_evidence([item], min_chars=500) is False
+
+    assert (item.hit.raw_text, item.hit.caption) == ("abcd", "vlm ")
+
+
+def test_evidence_texts_reads_only_requested_artifacts() -> None:
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.description = [("EVIDENCE_ID",), ("RAW_TEXT",)]
+    cursor.fetchall.return_value = [("e1", "full text")]
+
+    with patch.object(rag_repository, "connection", return_value=context):
+        assert rag_repository.evidence_texts(["e1", "e2", "e1"]) == {"e1": "full text"}
+
+    sql, binds = cursor.execute.call_args.args
+    assert "a.artifact_id IN (:evidence_0, :evidence_1)" in sql
+    assert binds == {"evidence_0": "e1", "evidence_1": "e2"}
+
+
+@pytest.mark.asyncio
+async def test_rerank_candidates_are_hydrated_before_the_reranker(monkeypatch) -> None:
+    monkeypatch.setenv("RETRIEVAL_EVIDENCE_PREVIEW_CHARS", "4")
+    full_text = "ceiling light " * 100
+    rerank = AsyncMock(return_value=[SimpleNamespace(index=0, score=0.9)])
+    evidence_texts = MagicMock(return_value={"k1": full_text})
+    patches = [
+        *search_patches(
+            rerank=RerankSettings(enabled=True, candidate_count=10, top_n=5),
+            multi_channel_search=MagicMock(return_value=[[text_hit("k1", "ceil")]]),
+            keyword_search=MagicMock(return_value=[text_hit("k1", "ceil")]),
+            evidence_texts=evidence_texts,
+        ),
+        patch(
+            "app.rag.search_pipeline._query_plan",
+            new=AsyncMock(return_value=QueryPlan(["ceiling light"], "off")),
+        ),
+        patch("app.rag.search_pipeline.embedding_client.query", new=AsyncMock(return_value=[[0.1]])),
+        patch("app.rag.search_pipeline.rerank_client.rerank", rerank),
+    ]
+    with applied(patches):
+        await SearchPipeline()._search(**search_arguments())
+
+    [document] = rerank.await_args.kwargs["documents"]
+    assert full_text[:CANDIDATE_TEXT_CHARS] in document
+    evidence_texts.assert_called_with(["k1"])
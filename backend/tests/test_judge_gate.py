@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.rag import service_settings
+from app.rag.models import JudgeGateSettings, RerankSettings, RetrievalWeights
+from app.rag.oracle_repository import RetrievalHit
+from app.rag.search_pipeline import QueryPlan, RankedHit, SearchPipeline, _judge_gate
+from tests.search_helpers import applied, retrieval_hit, search_arguments, search_patches
+
+
+def page_hit(evidence_id: str, file_name: str) -> RetrievalHit:
+    return retrieval_hit(evidence_id, document_id=file_name, file_name=file_name)
+
+
+def ranked(
+    file_name: str,
+    *,
+    rerank_score: float | None = None,
+    channel_ranks: dict[str, int] | None = None,
+) -> RankedHit:
+    return RankedHit(
+        hit=page_hit(file_name, file_name),
+        rrf_score=0.1,
+        rerank_score=rerank_score,
+        channel_ranks=channel_ranks or {},
+    )
+
+
+def test_gate_skips_judge_on_a_wide_rerank_margin() -> None:
+    gate = _judge_gate(
+        "ceiling light",
+        [ranked("a.pdf", rerank_score=0.9), ranked("b.pdf", rerank_score=0.5)],
+        JudgeGateSettings(min_rerank_margin=0.3),
+    )
+
+    assert gate["decisive"] is True
+    assert gate["reason"] == "rerank_margin"
+    assert gate["rerank_margin"] == pytest.approx(0.4)
+    assert gate["thresholds"]["min_rerank_margin"] == 0.3
+
+
+def test_gate_skips_judge_when_channels_agree_on_the_top_hit() -> None:
+    top = ranked(
+        "a.pdf",
+        rerank_score=0.61,
+        channel_ranks={"keyword:page_text": 1, "vector:chunk_text": 1, "vector:page_image": 4},
+    )
+    gate = _judge_gate("ceiling light", [top, ranked("b.pdf", rerank_score=0.6)], JudgeGateSettings())
+
+    assert (gate["decisive"], gate["reason"], gate["channel_agreement"]) == (
+        True, "channel_agreement", 2
+    )
+
+
+def test_gate_skips_judge_when_only_the_top_hit_is_named_in_the_query() -> None:
+    candidates = [
+        ranked("20260401_120000_0123abcd_戸建アイテムカタログ.pdf", rerank_score=0.5),
+        ranked("集合住宅カタログ.pdf", rerank_score=0.49),
+    ]
+
+    gate = _judge_gate("戸建アイテムカタログのダウンライト", candidates, JudgeGateSettings())
+
+    assert gate["decisive"] is True
+    assert gate["reason"] == "filename_affinity"
+    assert gate["filename_affinity"] == 1.0
+
+
+def test_gate_keeps_judge_for_close_or_disabled_rankings() -> None:
+    candidates = [ranked("a.pdf", rerank_score=0.9), ranked("b.pdf", rerank_score=0.85)]
+
+    close = _judge_gate("ceiling light", candidates, JudgeGateSettings())
+    disabled = _judge_gate(
+        "ceiling light",
+        [ranked("a.pdf", rerank_score=0.9), ranked("b.pdf", rerank_score=0.1)],
+        JudgeGateSettings(enabled=False),
+    )
+
+    assert (close["decisive"], close["reason"]) == (False, None)
+    assert (disabled["decisive"], disabled["rerank_margin"]) == (False, pytest.approx(0.8))
+
+
+def test_judge_gate_settings_read_env_values() -> None:
+    with patch.object(
+        service_settings.RetrievalServiceSettingsStore,
+        "_values",
+        return_value={
+            "JUDGE_GATE_ENABLED": "false",
+            "JUDGE_GATE_MIN_RERANK_MARGIN": "0.35",
+            "JUDGE_GATE_MIN_CHANNEL_AGREEMENT": "99",
+            "JUDGE_GATE_MIN_FILENAME_AFFINITY": "bad",
+        },
+    ):
+        settings = service_settings.RetrievalServiceSettingsStore().get_judge_gate()
+
+    assert settings == JudgeGateSettings(
+        enabled=False,
+        min_rerank_margin=0.35,
+        min_channel_agreement=20,
+        min_filename_affinity=0.8,
+    )
+
+
+async def run_search(rerank_scores: list[float], generate_json: AsyncMock) -> Any:
+    async def rerank(**kwargs: Any) -> list[SimpleNamespace]:
+        return [
+            SimpleNamespace(index=index, score=score)
+            for index, score in enumerate(rerank_scores[: len(kwargs["documents"])])
+        ]
+
+    patches = [
+        *search_patches(
+            weights=RetrievalWeights(text_vector=0, vlm_text=0, vlm_vector=0, visual_vector=0),
+            rerank=RerankSettings(enabled=True, candidate_count=10, top_n=5),
+            keyword_search=MagicMock(
+                return_value=[page_hit("k1", "a.pdf"), page_hit("k2", "b.pdf")]
+            ),
+        ),
+        patch(
+            "app.rag.search_pipeline._query_plan",
+            new=AsyncMock(return_value=QueryPlan(["ceiling light"], "off")),
+        ),
+        patch(
+            "app.rag.search_pipeline.retrieval_service_settings.get_judge_gate",
+            return_value=JudgeGateSettings(),
+        ),
+        patch("app.rag.search_pipeline.rerank_client.rerank", new=rerank),
+        patch("app.rag.search_pipeline.vlm_client.generate_json", generate_json),
+    ]
+    with applied(patches):
+        return await SearchPipeline()._search(**search_arguments())
+
+
+@pytest.mark.asyncio
+async def test_decisive_ranking_saves_the_llm_round_trip() -> None:
+    generate_json = AsyncMock(return_value={"best": 2})
+
+    result = await run_search([0.95, 0.3], generate_json)
+
+    generate_json.assert_not_awaited()
+    judge_summary = result.diagnostics["judge_summary"]
+    assert judge_summary["applied"] is False
+    assert judge_summary["skipped"] == "decisive_ranking"
+    assert judge_summary["gate"]["reason"] == "rerank_margin"
+    assert result.diagnostics["degraded"] == []
+
+
+@pytest.mark.asyncio
+async def test_close_ranking_still_asks_the_llm_judge() -> None:
+    generate_json = AsyncMock(return_value={"best": 2})
+
+    result = await run_search([0.81, 0.8], generate_json)
+
+    generate_json.assert_awaited_once()
+    judge_summary = result.diagnostics["judge_summary"]
+    assert judge_summary["applied"] is True
+    assert judge_summary["picked_file"] == "b.pdf"
+    assert judge_summary["gate"]["decisive"] is False
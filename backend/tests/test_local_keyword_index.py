@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.rag.access_cache import DocumentAccess
+from app.rag.local_keyword_index import LocalKeywordIndex, keyword_tokens, term_tokens
+from app.rag.models import ProfileConfig
+from app.rag.oracle_repository import ChannelQuery, RetrievalHit, rag_repository
+from app.rag.search_pipeline import _retrieve_channels
+from tests.search_helpers import retrieval_hit
+
+UNRESTRICTED = DocumentAccess(document_ids=frozenset(), unrestricted=True)
+
+
+def hit(evidence_id: str, document_id: str, kind: str, file_name: str) -> RetrievalHit:
+    return retrieval_hit(
+        evidence_id,
+        document_id=document_id,
+        revision_id=f"{document_id}-rev",
+        file_name=file_name,
+        object_name=f"docs/{file_name}",
+        raw_text=f"raw {evidence_id}",
+        unit_kind=kind,
+        source_locator=evidence_id,
+        score=0.0,
+        channel="",
+    )
+
+
+class FakeServing:
+    """``serving_document_versions`` / ``local_keyword_rows`` を文書単位で返す。"""
+
+    def __init__(self) -> None:
+        self.documents: dict[str, dict[str, Any]] = {}
+        self.fetched: list[list[str]] = []
+
+    def publish(
+        self,
+        document_id: str,
+        token: str,
+        rows: list[tuple[str, str, str]],
+        *,
+        file_name: str = "manual.pdf",
+        document_type: str = "PDF",
+        is_current: bool = True,
+    ) -> None:
+        self.documents[document_id] = {
+            "token": token,
+            "rows": rows,
+            "file_name": file_name,
+            "document_type": document_type,
+            "is_current": is_current,
+        }
+
+    def versions(self) -> dict[str, str]:
+        return {key: value["token"] for key, value in self.documents.items()}
+
+    def rows(self, *, document_ids: list[str]) -> list[tuple[Any, ...]]:
+        self.fetched.append(list(document_ids))
+        result = []
+        for document_id in document_ids:
+            document = self.documents[document_id]
+            for evidence_id, component_key, text in document["rows"]:
+                kind = "VLM_TEXT" if component_key.startswith("vlm:") else "PAGE_TEXT"
+                result.append((
+                    hit(evidence_id, document_id, kind, document["file_name"]),
+                    component_key,
+                    text,
+                    document["document_type"],
+                    document["is_current"],
+                ))
+        return result
+
+
+def refresh(index: LocalKeywordIndex, serving: FakeServing) -> dict[str, Any]:
+    with (
+        patch.object(rag_repository, "serving_document_versions", side_effect=serving.versions),
+        patch.object(rag_repository, "local_keyword_rows", side_effect=serving.rows),
+    ):
+        return index.refresh()
+
+
+@pytest.fixture
+def local_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("LOCAL_KEYWORD_ENABLED", "true")
+    monkeypatch.setenv("LOCAL_KEYWORD_DIR", str(tmp_path))
+    monkeypatch.delenv("LOCAL_KEYWORD_MAX_SEGMENTS", raising=False)
+    monkeypatch.delenv("ORACLE_TEXT_MAX_TERMS", raising=False)
+    return tmp_path
+
+
+def keyword(index: LocalKeywordIndex, query: str, **overrides: Any) -> list[str]:
+    arguments: dict[str, Any] = {
+        "query": query,
+        "top_k": 10,
+        "user_hash": "user",
+        "current_version_only": True,
+        "document_types": [],
+        "access": UNRESTRICTED,
+    }
+    arguments.update(overrides)
+    return [item.evidence_id for item in index.keyword_search(**arguments)]
+
+
+def test_tokens_follow_the_oracle_text_runs_as_bigrams() -> None:
+    assert keyword_tokens("天井照明のLEDランプ v1.2") == [
+        "天井", "井照", "照明", "led", "ラン", "ンプ", "v1.2",
+    ]
+    assert term_tokens("天井照明") == ["天井", "井照", "照明"]
+    assert term_tokens("LED") == ["led"]
+
+
+def test_bm25_ranks_and_filters_in_memory(local_env) -> None:
+    serving = FakeServing()
+    serving.publish("d1", "r1", [
+        ("p1", "normalize", "天井照明の交換手順。天井照明は LED を使う"),
+        ("p2", "normalize", "壁面照明の配線"),
+    ])
+    serving.publish("d2", "r1", [("p3", "normalize", "天井の点検")], file_name="Spec.xlsx",
+                    document_type="XLSX")
+    serving.publish("d3", "r1", [("p4", "normalize", "天井照明 旧版")], is_current=False)
+    index = LocalKeywordIndex()
+    refresh(index, serving)
+
+    # 「天井照明」は全bigramを含む行だけに一致する（「天井」だけのp3は一致しない）。
+    assert keyword(index, "天井照明") == ["p1"]
+    # 短い行ほど出現1回あたりの寄与が大きい（BM25の文書長正規化）。
+    assert keyword(index, "天井照明", current_version_only=False) == ["p4", "p1"]
+    assert keyword(index, "天井 照明") == ["p1", "p3", "p2"]
+    assert keyword(index, "天井", document_types=["xlsx"]) == ["p3"]
+    assert keyword(index, "天井", filename_filter="spec") == ["p3"]
+    restricted = DocumentAccess(document_ids=frozenset({"d2"}), unrestricted=False)
+    assert keyword(index, "天井", access=restricted) == ["p3"]
+    assert keyword(index, "天井", user_hash=None, access=None) == []
+    hits = index.keyword_search(
+        query="led", top_k=5, user_hash="user", current_version_only=True,
+        document_types=[], access=UNRESTRICTED,
+    )
+    assert hits[0].channel == "keyword:page_text" and 0 < hits[0].score < 1
+
+
+def test_facet_search_uses_the_profile_slot(local_env) -> None:
+    serving = FakeServing()
+    serving.publish("d1", "r1", [
+        ("p1", "normalize", "配電盤の図面"),
+        ("v1", "vlm:1", "配電盤 写真"),
+        ("v2", "vlm:2", "配電盤 図面"),
+    ])
+    index = LocalKeywordIndex()
+    refresh(index, serving)
+    profile = ProfileConfig(
+        slot_no=2, name="図面", extraction_prompt="図面を説明する", current_revision_id="rev-2"
+    )
+
+    hits = index.facet_keyword_search(
+        profile=profile, query="配電盤", top_k=5, user_hash="user",
+        current_version_only=True, document_types=[], access=UNRESTRICTED,
+    )
+
+    assert [(item.evidence_id, item.slot_no, item.caption) for item in hits] == [
+        ("v2", 2, "raw v2")
+    ]
+    assert hits[0].channel == "keyword:vlm_text_slot_2"
+    assert index.facet_keyword_search(
+        profile=profile.model_copy(update={"current_revision_id": None}), query="配電盤",
+        top_k=5, user_hash="user", current_version_only=True, document_types=[],
+        access=UNRESTRICTED,
+    ) == []
+    assert keyword(index, "配電盤") == ["p1", "v1", "v2"]
+
+
+def test_publish_adds_segments_and_merges_them(local_env, monkeypatch) -> None:
+    monkeypatch.setenv("LOCAL_KEYWORD_MAX_SEGMENTS", "2")
+    serving = FakeServing()
+    serving.publish("d1", "r1", [("p1", "normalize", "照明器具")])
+    serving.publish("d2", "r1", [("p2", "normalize", "空調設備")] + [
+        (f"p2-{number}", "normalize", "予備の頁") for number in range(4)
+    ])
+    index = LocalKeywordIndex()
+    refresh(index, serving)
+
+    serving.publish("d1", "r2", [("p1b", "normalize", "空調の照明")])
+    summary = refresh(index, serving)
+
+    assert serving.fetched[-1] == ["d1"]
+    assert summary["segments"] == 2 and summary["merged"] is False
+    assert keyword(index, "照明") == ["p1b"]
+    assert keyword(index, "空調") == ["p1b", "p2"]
+
+    serving.publish("d3", "r1", [("p3", "normalize", "照明の点検")])
+    del serving.documents["d2"]
+    summary = refresh(index, serving)
+
+    # セグメント数が上限を超えたため、削除済みのd2を除いて1つに統合する。
+    assert summary["merged"] is True and summary["segments"] == 1 and summary["rows"] == 2
+    assert keyword(index, "照明") == ["p1b", "p3"]
+    assert keyword(index, "空調") == ["p1b"]
+    assert sorted(path.name for path in local_env.iterdir()) == ["manifest.json", "segment-000004"]
+
+
+def test_deleted_document_is_dropped_before_the_next_refresh(local_env) -> None:
+    serving = FakeServing()
+    serving.publish("d1", "r1", [("p1", "normalize", "照明器具")])
+    serving.publish("d2", "r1", [("p2", "normalize", "照明の点検")])
+    index = LocalKeywordIndex()
+    refresh(index, serving)
+    stale = index._state
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [("d1",)]
+    cursor.rowcount = 1
+
+    with (
+        patch.object(rag_repository, "connection", return_value=context),
+        patch("app.rag.local_keyword_index.local_keyword_index", index),
+    ):
+        assert rag_repository.delete_document_by_object(bucket="bucket", object_name="docs/a") == 1
+
+    assert keyword(index, "照明") == ["p2"]
+    # 削除前の版一覧を読んだ更新が後から差し替えても、削除済みの文書は戻らない。
+    index._publish(stale)
+    assert keyword(index, "照明") == ["p2"]
+    del serving.documents["d1"]
+    assert refresh(index, serving)["rows"] == 1
+
+
+def test_saved_segments_are_memory_mapped_on_restart(local_env) -> None:
+    serving = FakeServing()
+    serving.publish("d1", "r1", [("p1", "normalize", "非常用照明")])
+    refresh(LocalKeywordIndex(), serving)
+
+    reloaded = LocalKeywordIndex()
+    summary = refresh(reloaded, serving)
+
+    assert summary["loaded_from_disk"] is True and summary["documents_updated"] == 0
+    assert len(serving.fetched) == 1
+    assert type(reloaded._state.segments[0].posting_rows).__name__ == "memmap"
+    assert keyword(reloaded, "照明") == ["p1"]
+
+
+@pytest.mark.asyncio
+async def test_keyword_channels_skip_oracle(local_env, monkeypatch) -> None:
+    monkeypatch.delenv("LOCAL_VECTOR_RECIPES", raising=False)
+    serving = FakeServing()
+    serving.publish("d1", "r1", [("p1", "normalize", "照明器具")])
+    index = LocalKeywordIndex()
+    refresh(index, serving)
+    text = ChannelQuery(kind="keyword", channel="keyword:page_text", query="照明")
+    vector = ChannelQuery(
+        kind="recipe_vector", channel="vector:chunk_text", recipe_code="chunk_text",
+        embedding=[0.1] * 4,
+    )
+    oracle = MagicMock(side_effect=lambda channels, **_: [[] for _ in channels])
+    filters = {
+        "top_k": 5,
+        "user_hash": "user",
+        "current_version_only": True,
+        "document_types": [],
+        "filename_filter": None,
+        "access": UNRESTRICTED,
+    }
+    with (
+        patch("app.rag.search_pipeline.local_keyword_index", index),
+        patch("app.rag.search_pipeline.rag_repository.multi_channel_search", oracle),
+        patch("app.rag.search_pipeline.rag_repository.recipe_vector_search", return_value=[]),
+    ):
+        results, round_trip = await _retrieve_channels([text, vector], **filters)
+
+    assert [item.evidence_id for item in results[0]] == ["p1"]
+    assert round_trip == "per_channel" and not oracle.called
@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from app.rag.access_cache import DocumentAccess
+from app.rag.local_vector_index import LocalVectorIndex, _RecipeMatrix
+from app.rag.oracle_repository import ChannelQuery, RetrievalHit, rag_repository
+from app.rag.search_pipeline import _retrieve_channels
+from tests.search_helpers import retrieval_hit
+
+
+def hit(evidence_id: str, document_id: str, file_name: str = "manual.pdf") -> RetrievalHit:
+    return retrieval_hit(
+        evidence_id,
+        document_id=document_id,
+        slot_no=1,
+        revision_id=f"{document_id}-rev",
+        file_name=file_name,
+        object_name=f"docs/{file_name}",
+        raw_text=f"text {evidence_id}",
+        unit_kind="CHUNK",
+        source_locator=evidence_id,
+        score=0.0,
+        channel="",
+    )
+
+
+def vector(*values: float) -> list[float]:
+    return list(values) + [0.0] * (4 - len(values))
+
+
+class FakeServing:
+    """``serving_document_versions`` / ``local_vector_rows`` を文書単位で返す。"""
+
+    def __init__(self) -> None:
+        self.documents: dict[str, tuple[str, str, bool, list[tuple[str, list[float]]]]] = {}
+        self.fetched: list[list[str]] = []
+
+    def publish(
+        self,
+        document_id: str,
+        token: str,
+        rows: list[tuple[str, list[float]]],
+        *,
+        file_name: str = "manual.pdf",
+        document_type: str = "PDF",
+        is_current: bool = True,
+    ) -> None:
+        self.documents[document_id] = (token, file_name, is_current, rows, document_type)  # type: ignore[assignment]
+
+    def versions(self) -> dict[str, str]:
+        return {key: value[0] for key, value in self.documents.items()}
+
+    def rows(self, *, recipe_code: str, document_ids: list[str]) -> list[tuple[Any, ...]]:
+        self.fetched.append(list(document_ids))
+        result = []
+        for document_id in document_ids:
+            _, file_name, is_current, rows, document_type = self.documents[document_id]  # type: ignore[misc]
+            for evidence_id, values in rows:
+                result.append((hit(evidence_id, document_id, file_name), document_type, is_current, values))
+        return result
+
+
+def refresh(index: LocalVectorIndex, serving: FakeServing) -> dict[str, Any]:
+    with (
+        patch.object(rag_repository, "serving_document_versions", side_effect=serving.versions),
+        patch.object(rag_repository, "local_vector_rows", side_effect=serving.rows),
+    ):
+        return index.refresh()
+
+
+@pytest.fixture
+def local_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("LOCAL_VECTOR_RECIPES", "chunk_text")
+    monkeypatch.setenv("LOCAL_VECTOR_DIR", str(tmp_path))
+    monkeypatch.delenv("LOCAL_VECTOR_DTYPE", raising=False)
+    monkeypatch.delenv("LOCAL_VECTOR_IVF_MIN_ROWS", raising=False)
+    return tmp_path
+
+
+def search(index: LocalVectorIndex, query: list[float], **overrides: Any) -> list[RetrievalHit]:
+    arguments: dict[str, Any] = {
+        "recipe_code": "chunk_text",
+        "embedding": query,
+        "channel": "vector:chunk_text",
+        "top_k": 10,
+        "user_hash": "user",
+        "current_version_only": True,
+        "document_types": [],
+        "access": DocumentAccess(document_ids=frozenset(), unrestricted=True),
+    }
+    arguments.update(overrides)
+    return index.recipe_vector_search(**arguments)
+
+
+def test_search_filters_in_memory_and_matches_oracle_semantics(local_env) -> None:
+    serving = FakeServing()
+    serving.publish("d1", "r1", [("e1", vector(1, 0)), ("e2", vector(0.6, 0.8))])
+    serving.publish("d2", "r2", [("e3", vector(0.8, 0.6))], file_name="Spec.xlsx", document_type="XLSX")
+    serving.publish("d3", "r3", [("e4", vector(1, 0.1))], is_current=False)
+    index = LocalVectorIndex()
+    refresh(index, serving)
+
+    results = search(index, vector(2, 0))
+
+    assert [item.evidence_id for item in results] == ["e1", "e3", "e2"]
+    assert results[0].score == pytest.approx(1.0) and results[0].channel == "vector:chunk_text"
+    assert [item.evidence_id for item in search(index, vector(1, 0), current_version_only=False)][:2] == [
+        "e1", "e4",
+    ]
+    assert [item.evidence_id for item in search(index, vector(1, 0), document_types=["xlsx"])] == ["e3"]
+    assert [item.evidence_id for item in search(index, vector(1, 0), filename_filter="spec")] == ["e3"]
+    restricted = DocumentAccess(document_ids=frozenset({"d2"}), unrestricted=False)
+    assert [item.evidence_id for item in search(index, vector(1, 0), access=restricted)] == ["e3"]
+    assert [item.evidence_id for item in search(index, vector(1, 0), min_score=0.9)] == ["e1"]
+    assert search(index, vector(1, 0), user_hash=None, access=None) == []
+
+
+def test_deleted_document_is_masked_before_the_next_refresh(local_env) -> None:
+    serving = FakeServing()
+    serving.publish("d1", "r1", [("e1", vector(1, 0))])
+    serving.publish("d2", "r1", [("e2", vector(0.8, 0.6))])
+    index = LocalVectorIndex()
+    refresh(index, serving)
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [("d1",)]
+    cursor.rowcount = 1
+
+    with (
+        patch.object(rag_repository, "connection", return_value=context),
+        patch("app.rag.local_vector_index.local_vector_index", index),
+    ):
+        assert rag_repository.delete_document_by_object(bucket="bucket", object_name="docs/a") == 1
+
+    assert [item.evidence_id for item in search(index, vector(1, 0))] == ["e2"]
+    # 削除前の版一覧を読んだ更新が後から差し替えても、削除済みの文書は戻らない。
+    stale = index._matrices["chunk_text"].with_documents({"d1": "r1"}, {"d1": [
+        (hit("e1", "d1"), "PDF", True, vector(1, 0))
+    ]})
+    index._publish("chunk_text", stale)
+    assert [item.evidence_id for item in search(index, vector(1, 0))] == ["e2"]
+    del serving.documents["d1"]
+    assert refresh(index, serving)["recipes"]["chunk_text"]["rows"] == 1
+
+
+def test_publish_replaces_only_the_changed_document(local_env) -> None:
+    serving = FakeServing()
+    serving.publish("d1", "r1", [("e1", vector(1, 0))])
+    serving.publish("d2", "r1", [("e2", vector(0, 1))])
+    index = LocalVectorIndex()
+    refresh(index, serving)
+
+    serving.publish("d1", "r2", [("e1b", vector(0, 0, 1)), ("e1c", vector(0, 0, 0.9, 0.1))])
+    summary = refresh(index, serving)
+
+    assert serving.fetched[-1] == ["d1"]
+    assert summary["recipes"]["chunk_text"]["documents_updated"] == 1
+    assert [item.evidence_id for item in search(index, vector(0, 0, 1))] == ["e1b", "e1c", "e2"]
+
+    del serving.documents["d2"]
+    refresh(index, serving)
+
+    assert [item.evidence_id for item in search(index, vector(0, 1, 0, 1))] == ["e1c", "e1b"]
+    assert refresh(index, serving)["recipes"]["chunk_text"]["documents_updated"] == 0
+
+
+def test_saved_matrix_is_memory_mapped_and_only_new_versions_are_fetched(local_env) -> None:
+    serving = FakeServing()
+    serving.publish("d1", "r1", [("e1", vector(1, 0)), ("e2", vector(0, 1))])
+    refresh(LocalVectorIndex(), serving)
+
+    reloaded = LocalVectorIndex()
+    serving.publish("d2", "r1", [("e3", vector(0.7, 0.7))])
+    summary = refresh(reloaded, serving)["recipes"]["chunk_text"]
+
+    assert summary["loaded_from_disk"] is True
+    assert serving.fetched[-1] == ["d2"]
+    matrix = _RecipeMatrix.load("chunk_text", local_env / "chunk_text", "float32")
+    assert isinstance(matrix.segments[0], np.memmap)
+    assert [item.evidence_id for item in search(reloaded, vector(1, 1))][:1] == ["e3"]
+    # 量子化形式が変わった保存データは使わない。
+    assert _RecipeMatrix.load("chunk_text", local_env / "chunk_text", "int8") is None
+
+
+def test_ivf_probes_clusters_and_exact_accuracy_scans_everything(local_env, monkeypatch) -> None:
+    monkeypatch.setenv("LOCAL_VECTOR_IVF_MIN_ROWS", "1")
+    monkeypatch.setenv("LOCAL_VECTOR_DTYPE", "int8")
+    generator = np.random.default_rng(7)
+    serving = FakeServing()
+    for document in range(40):
+        serving.publish(
+            f"d{document}",
+            "r1",
+            [(f"e{document}_{row}", generator.normal(size=16).tolist()) for row in range(10)],
+        )
+    index = LocalVectorIndex()
+    refresh(index, serving)
+    matrix = index._matrices["chunk_text"]
+    query = generator.normal(size=16).tolist()
+
+    approximate = search(index, query, top_k=5, target_accuracy=90)
+    exact = search(index, query, top_k=5, target_accuracy=100)
+
+    assert matrix.centroids is not None and len(matrix.ivf_lists) == 20
+    assert matrix.segments[0].dtype == np.int8
+    assert len(approximate) == 5 and index.stats()["searches"]["ivf"] == 1
+    assert index.stats()["searches"]["exact"] == 1
+    vectors = np.asarray([values for item in serving.documents.values() for _, values in item[3]])
+    cosine = vectors @ np.asarray(query) / np.linalg.norm(vectors, axis=1) / np.linalg.norm(query)
+    names = [name for item in serving.documents.values() for name, _ in item[3]]
+    assert [item.evidence_id for item in exact] == [names[i] for i in np.argsort(-cosine)[:5]]
+
+
+@pytest.mark.asyncio
+async def test_local_channels_skip_oracle(local_env, monkeypatch) -> None:
+    serving = FakeServing()
+    serving.publish("d1", "r1", [("e1", vector(1, 0))])
+    index = LocalVectorIndex()
+    refresh(index, serving)
+    keyword = ChannelQuery(kind="keyword", channel="keyword:text", query="ceiling")
+    local = ChannelQuery(
+        kind="recipe_vector", channel="vector:chunk_text", recipe_code="chunk_text",
+        embedding=vector(1, 0),
+    )
+    remote = ChannelQuery(
+        kind="recipe_vector", channel="vector:page_image", recipe_code="page_image",
+        embedding=vector(1, 0),
+    )
+    oracle = MagicMock(side_effect=lambda channels, **_: [[] for _ in channels])
+    monkeypatch.delenv("RETRIEVAL_COMBINED_QUERY", raising=False)
+    filters = {
+        "top_k": 5,
+        "user_hash": "user",
+        "current_version_only": True,
+        "document_types": [],
+        "filename_filter": None,
+        "access": DocumentAccess(document_ids=frozenset({"d1"}), unrestricted=False),
+    }
+    with (
+        patch("app.rag.search_pipeline.local_vector_index", index),
+        patch("app.rag.search_pipeline.rag_repository.multi_channel_search", oracle),
+    ):
+        results, round_trip = await _retrieve_channels([keyword, local, remote], **filters)
+        only_local, local_round_trip = await _retrieve_channels([local], **filters)
+        # アクセス可能文書集合がない検索はOracleのEXISTS判定に任せる。
+        await _retrieve_channels([keyword, local], **{**filters, "access": None})
+
+    assert [item.evidence_id for item in results[1]] == ["e1"] and round_trip == "combined"
+    assert oracle.call_args_list[0].kwargs["channels"] == [keyword, remote]
+    assert [item.evidence_id for item in only_local[0]] == ["e1"] and local_round_trip == "local"
+    assert oracle.call_args_list[1].kwargs["channels"] == [keyword, local]
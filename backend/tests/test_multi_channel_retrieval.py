@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import logging
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.rag.models import ProfileConfig
+from app.rag.oracle_repository import ChannelQuery, rag_repository
+from app.rag.search_pipeline import QueryPlan, SearchPipeline
+from tests.search_helpers import (
+    applied,
+    chunk_recipe,
+    fake_connection,
+    retrieval_hit,
+    search_arguments,
+    search_patches,
+)
+
+
+def hit_row(branch_no: int, rank: int, evidence_id: str, score: float) -> tuple[Any, ...]:
+    return (
+        branch_no, rank, evidence_id, "d1", 0, "r1", 1, "PAGE_TEXT", "page:1", None,
+        "text", None, None, "source.pdf", "source.pdf", "bucket", score,
+    )
+
+
+HIT_COLUMNS = [
+    "BRANCH_NO", "BRANCH_RANK", "EVIDENCE_ID", "DOCUMENT_ID", "SLOT_NO", "REVISION_ID",
+    "PAGE_NUMBER", "UNIT_KIND", "SOURCE_LOCATOR", "BBOX_JSON", "RAW_TEXT", "CAPTION",
+    "ASSET_OBJECT_NAME", "FILE_NAME", "OBJECT_NAME", "BUCKET", "SCORE",
+]
+
+
+def test_multi_channel_search_runs_every_channel_in_one_statement() -> None:
+    profile = ProfileConfig(
+        slot_no=2,
+        name="visual",
+        enabled=True,
+        extraction_prompt="extract",
+        current_revision_id="p2",
+    )
+    channels = [
+        ChannelQuery(kind="keyword", channel="keyword:page_text", query="ceiling light"),
+        ChannelQuery(
+            kind="recipe_vector",
+            channel="vector:chunk_text",
+            recipe_code="chunk_text",
+            embedding=[0.1, 0.2],
+            min_score=0.3,
+        ),
+        ChannelQuery(
+            kind="facet_keyword",
+            channel="keyword:vlm_text_slot_2",
+            query="ceiling light",
+            profile=profile,
+        ),
+        ChannelQuery(kind="keyword", channel="keyword:page_text", query="!!"),
+    ]
+    context, _, cursor = fake_connection(
+        [
+            hit_row(0, 1, "k1", 0.9),
+            hit_row(0, 2, "k2", 0.5),
+            hit_row(1, 1, "v1", 0.8),
+            hit_row(2, 1, "f1", 0.7),
+        ],
+        HIT_COLUMNS,
+    )
+
+    with patch.object(rag_repository, "connection", return_value=context) as connection:
+        results = rag_repository.multi_channel_search(
+            channels=channels,
+            top_k=50,
+            user_hash="a" * 64,
+            current_version_only=True,
+            document_types=[],
+        )
+
+    connection.assert_called_once()
+    cursor.execute.assert_called_once()
+    sql, binds = cursor.execute.call_args.args
+    normalized_sql = " ".join(sql.split())
+    assert normalized_sql.count("UNION ALL") == 2
+    assert "CONTAINS(a.search_text, :text_query_0, 1)>0" in normalized_sql
+    assert ":embedding_1" in normalized_sql and ">= :min_score_1" in normalized_sql
+    assert "TO_CHAR(:slot_2)" in normalized_sql
+    assert normalized_sql.endswith("ORDER BY branch_no, branch_rank")
+    assert "text_query_3" not in binds
+    assert binds["recipe_code_1"] == "chunk_text"
+    assert binds["slot_2"] == 2
+    assert [[hit.evidence_id for hit in result] for result in results] == [
+        ["k1", "k2"],
+        ["v1"],
+        ["f1"],
+        [],
+    ]
+    assert [result[0].channel for result in results[:3]] == [
+        "keyword:page_text",
+        "vector:chunk_text",
+        "keyword:vlm_text_slot_2",
+    ]
+
+
+def pipeline_patches(multi_channel_search: MagicMock, keyword_search: MagicMock) -> list[Any]:
+    return [
+        *search_patches(
+            recipes=[chunk_recipe()],
+            multi_channel_search=multi_channel_search,
+            keyword_search=keyword_search,
+            recipe_vector_search=MagicMock(return_value=[]),
+        ),
+        patch(
+            "app.rag.search_pipeline._query_plan",
+            new=AsyncMock(return_value=QueryPlan(["ceiling light", "downlight"], "llm")),
+        ),
+        patch(
+            "app.rag.search_pipeline.embedding_client.query",
+            new=AsyncMock(return_value=[[0.1], [0.2]]),
+        ),
+    ]
+
+
+async def run_search(patches: list[Any]) -> Any:
+    with applied(patches):
+        return await SearchPipeline().search(**search_arguments())
+
+
+@pytest.mark.asyncio
+async def test_search_pipeline_retrieves_all_channels_in_one_repository_call() -> None:
+    multi_channel_search = MagicMock(return_value=[[retrieval_hit("k1")], [], []])
+    keyword_search = MagicMock(return_value=[])
+    result = await run_search(pipeline_patches(multi_channel_search, keyword_search))
+
+    multi_channel_search.assert_called_once()
+    keyword_search.assert_not_called()
+    channels = multi_channel_search.call_args.kwargs["channels"]
+    assert [item.kind for item in channels] == ["keyword", "recipe_vector", "recipe_vector"]
+    assert channels[0].variants == ["ceiling light", "downlight"]
+    assert multi_channel_search.call_args.kwargs["top_k"] == 25
+    assert result.diagnostics["retrieval_summary"]["round_trip"] == "combined"
+    assert result.total_documents == 1
+
+
+@pytest.mark.asyncio
+async def test_combined_retrieval_failure_falls_back_to_isolated_channels(caplog) -> None:
+    multi_channel_search = MagicMock(side_effect=RuntimeError("DRG-50901"))
+    keyword_search = MagicMock(side_effect=RuntimeError("DRG-50901"))
+    with caplog.at_level(logging.WARNING, logger="app.rag.search_pipeline"):
+        result = await run_search(pipeline_patches(multi_channel_search, keyword_search))
+
+    keyword_search.assert_called_once()
+    assert keyword_search.call_args.kwargs["variants"] == ["ceiling light", "downlight"]
+    summary = result.diagnostics["retrieval_summary"]
+    assert summary["round_trip"] == "per_channel_fallback"
+    assert [item["status"] for item in summary["channels"]] == ["failed", "ok", "ok"]
+    assert result.diagnostics["degraded"] == ["keyword:page_text"]
+    assert any(record.exc_info for record in caplog.records)
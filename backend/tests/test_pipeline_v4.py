@@ -331,7 +331,7 @@ def test_v4_schema_contains_new_model_and_excludes_legacy_tables() -> None:
         "SDS_INDEX_RELEASES",
         "SDS_INDEX_RELEASE_COMPONENTS",
     }
-    assert SCHEMA_VERSION == "20260714_004"
+    assert SCHEMA_VERSION == "20261017_006"
     assert required <= names
     assert {
         "SDS_FILES",
@@ -342,7 +342,7 @@ def test_v4_schema_contains_new_model_and_excludes_legacy_tables() -> None:
         "SDS_VLM_FACETS",
     }.isdisjoint(names)
     ddl = schema_sql()
-    assert "VECTOR(1536, FLOAT32)" in ddl
+    assert "VECTOR(*, FLOAT32)" in ddl
     assert "DISTANCE COSINE" in ddl
     assert "LEASE_GENERATION NUMBER DEFAULT 0 NOT NULL" in ddl
     assert "OUTPUT_HASH CHAR(64)" in ddl
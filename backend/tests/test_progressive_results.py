@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.rag.models import JudgeGateSettings, RerankSettings, RetrievalWeights
+from app.rag.oracle_repository import RetrievalHit
+from app.rag.search_pipeline import QueryPlan, SearchPipeline
+from tests.search_helpers import applied, retrieval_hit, search_arguments, search_patches
+
+
+def page_hit(evidence_id: str, file_name: str) -> RetrievalHit:
+    return retrieval_hit(
+        evidence_id, document_id=file_name, file_name=file_name, raw_text="preview text"
+    )
+
+
+async def run_search(
+    rerank_scores: list[float], judge: dict[str, Any]
+) -> tuple[Any, list[dict[str, Any]], MagicMock]:
+    events: list[dict[str, Any]] = []
+
+    async def progress(event: dict[str, Any]) -> None:
+        events.append(event)
+
+    async def rerank(**kwargs: Any) -> list[SimpleNamespace]:
+        return [
+            SimpleNamespace(index=index, score=score)
+            for index, score in enumerate(rerank_scores[: len(kwargs["documents"])])
+        ]
+
+    evidence_texts = MagicMock(return_value={})
+    patches = [
+        *search_patches(
+            weights=RetrievalWeights(text_vector=0, vlm_text=0, vlm_vector=0, visual_vector=0),
+            rerank=RerankSettings(enabled=True, candidate_count=10, top_n=5),
+            keyword_search=MagicMock(return_value=[
+                page_hit("k1", "a.pdf"), page_hit("k2", "b.pdf"), page_hit("k3", "c.pdf")
+            ]),
+            evidence_texts=evidence_texts,
+        ),
+        patch(
+            "app.rag.search_pipeline._query_plan",
+            new=AsyncMock(return_value=QueryPlan(["ceiling light"], "off")),
+        ),
+        patch(
+            "app.rag.search_pipeline.retrieval_service_settings.get_judge_gate",
+            return_value=JudgeGateSettings(),
+        ),
+        patch("app.rag.search_pipeline.rerank_client.rerank", new=rerank),
+        patch("app.rag.search_pipeline.vlm_client.generate_json", AsyncMock(return_value=judge)),
+    ]
+    with applied(patches):
+        result = await SearchPipeline()._search(**search_arguments(progress=progress))
+    return result, events, evidence_texts
+
+
+def provisional_events(events: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return [
+        operation["value"]
+        for event in events
+        if event["type"] == "STATE_DELTA"
+        for operation in event["delta"]
+        if operation["path"] == "/provisionalResult"
+    ]
+
+
+def files(value: dict[str, Any]) -> list[str]:
+    return [item["file_name"] for item in value["results"]]
+
+
+@pytest.mark.asyncio
+async def test_rrf_order_is_streamed_before_rerank_and_refined_after_each_stage() -> None:
+    result, events, _ = await run_search([0.2, 0.81, 0.8], {"best": 2})
+
+    provisional = provisional_events(events)
+    assert [item["stage"] for item in provisional] == ["candidate_merge", "rerank", "llm_judge"]
+    assert files(provisional[0]) == ["a.pdf", "b.pdf", "c.pdf"]
+    assert files(provisional[1]) == ["b.pdf", "c.pdf", "a.pdf"]
+    assert files(provisional[2]) == ["c.pdf", "b.pdf", "a.pdf"]
+    assert [item.file_name for item in result.results] == files(provisional[2])
+    assert all(item["trace_id"] == result.trace_id for item in provisional)
+    assert provisional[0]["results"][0]["evidence"][0]["text_excerpt"] == "preview text"
+    assert provisional[0]["results"][0]["rerank_score"] is None
+
+    started = [event.get("stepName") for event in events if event["type"] == "STEP_STARTED"]
+    first_provisional = next(
+        index for index, event in enumerate(events)
+        if event["type"] == "STATE_DELTA" and event["delta"][0]["path"] == "/provisionalResult"
+    )
+    rerank_started = next(
+        index for index, event in enumerate(events)
+        if event["type"] == "STEP_STARTED" and event["stepName"] == "rerank"
+    )
+    assert "rerank" in started and first_provisional < rerank_started
+
+
+@pytest.mark.asyncio
+async def test_skipped_judge_sends_no_extra_refinement() -> None:
+    _, events, _ = await run_search([0.95, 0.3, 0.2], {"best": 2})
+
+    assert [item["stage"] for item in provisional_events(events)] == [
+        "candidate_merge", "rerank"
+    ]
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.rag import embedding_cache
+from app.rag.clients import EmbeddingClient
+from app.rag.embedding_cache import QueryEmbeddingCache, embedding_cache_key
+
+
+class FakeSharedTier:
+    def __init__(self, values: dict[str, list[float]] | None = None) -> None:
+        self.values = dict(values or {})
+        self.writes: list[dict[str, list[float]]] = []
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        return {key: self.values[key] for key in keys if key in self.values}
+
+    def set_many(self, values: dict[str, list[float]], ttl_seconds: int) -> None:
+        self.writes.append(dict(values))
+        self.values.update(values)
+
+
+def test_cache_key_normalizes_whitespace_and_separates_model_settings() -> None:
+    base = embedding_cache_key(
+        "ceiling  light ", model_id="m", dimensions=1536, input_type="SEARCH_QUERY"
+    )
+    assert base == embedding_cache_key(
+        "ceiling light", model_id="m", dimensions=1536, input_type="SEARCH_QUERY"
+    )
+    assert base != embedding_cache_key(
+        "ceiling light", model_id="m", dimensions=1024, input_type="SEARCH_QUERY"
+    )
+    assert base != embedding_cache_key(
+        "ceiling light", model_id="other", dimensions=1536, input_type="SEARCH_QUERY"
+    )
+    assert base != embedding_cache_key(
+        "ceiling light", model_id="m", dimensions=1536, input_type="SEARCH_DOCUMENT"
+    )
+
+
+@pytest.mark.asyncio
+async def test_repeated_query_skips_embedding_request_and_counts_hits() -> None:
+    cache = QueryEmbeddingCache()
+    text = AsyncMock(side_effect=lambda values, **_: [[float(len(v))] for v in values])
+    with (
+        patch("app.rag.clients.query_embedding_cache", cache),
+        patch.object(EmbeddingClient, "text", text),
+    ):
+        client = EmbeddingClient()
+        with cache.track() as first:
+            assert await client.query(["ab", "abc"]) == [[2.0], [3.0]]
+        with cache.track() as second:
+            assert await client.query(["abc", "abcd"]) == [[3.0], [4.0]]
+
+    assert [call.args[0] for call in text.await_args_list] == [["ab", "abc"], ["abcd"]]
+    assert first.as_dict() == {"hits": 0, "shared_hits": 0, "misses": 2}
+    assert second.as_dict() == {"hits": 1, "shared_hits": 0, "misses": 1}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used_and_expired_entries(monkeypatch) -> None:
+    monkeypatch.setenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "2")
+    clock = {"now": 100.0}
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: clock["now"])
+    cache = QueryEmbeddingCache()
+    await cache.put_many({"a": [1.0], "b": [2.0]})
+    assert await cache.get_many(["a"]) == {"a": [1.0]}
+    await cache.put_many({"c": [3.0]})
+
+    assert await cache.get_many(["a", "b", "c"]) == {"a": [1.0], "c": [3.0]}
+    assert cache.stats()["evictions"] == 1
+
+    clock["now"] = 100.0 + embedding_cache.QUERY_EMBEDDING_CACHE_DEFAULT_TTL_SECONDS + 1
+    assert await cache.get_many(["a", "c"]) == {}
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_fills_local_misses_and_receives_new_vectors() -> None:
+    shared = FakeSharedTier({"warm": [0.5]})
+    cache = QueryEmbeddingCache(shared=shared)
+    with cache.track() as usage:
+        assert await cache.get_many(["warm", "cold"]) == {"warm": [0.5]}
+    await cache.put_many({"cold": [0.7]})
+
+    assert usage.as_dict() == {"hits": 0, "shared_hits": 1, "misses": 1}
+    assert shared.writes == [{"cold": [0.7]}]
+    with cache.track() as usage:
+        assert await cache.get_many(["warm", "cold"]) == {"warm": [0.5], "cold": [0.7]}
+    assert usage.hits == 2
+
+
+@pytest.mark.asyncio
+async def test_disabled_cache_always_embeds(monkeypatch) -> None:
+    monkeypatch.setenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "0")
+    cache = QueryEmbeddingCache()
+    text = AsyncMock(return_value=[[1.0]])
+    with (
+        patch("app.rag.clients.query_embedding_cache", cache),
+        patch.object(EmbeddingClient, "text", text),
+    ):
+        await EmbeddingClient().query(["lighting"])
+        await EmbeddingClient().query(["lighting"])
+
+    assert text.await_count == 2
+    assert cache.stats()["size"] == 0
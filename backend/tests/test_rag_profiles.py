@@ -58,6 +58,7 @@ from app.rag.search_pipeline import (
     QueryPlan,
     RankedHit,
     SearchPipeline,
+    _batch_rerank_semaphore,
     _candidate_text,
     _image_similarity_score,
     _image_sort_key,
@@ -757,7 +758,8 @@ def run_search_pipeline_for_verify(
     return result, verify_candidates, events
 
 
-def test_search_pipeline_runs_each_variant_as_own_route() -> None:
+def test_search_pipeline_runs_each_variant_as_own_route(monkeypatch) -> None:
+    monkeypatch.setenv("RETRIEVAL_MERGED_TEXT_QUERY", "false")
     events: list[dict[str, Any]] = []
 
     async def progress(event: dict[str, Any]) -> None:
@@ -1160,7 +1162,7 @@ def test_schema_uses_release_artifact_and_recipe_vector_model() -> None:
     assert "CREATE TABLE SDS_EMBEDDINGS" in ddl
     assert "CREATE TABLE SDS_INDEX_RELEASES" in ddl
     assert "SDS_EMBEDDING_HNSW_IDX" in ddl
-    assert "VECTOR(1536, FLOAT32)" in ddl
+    assert "VECTOR(*, FLOAT32)" in ddl
     assert "CREATE TABLE SDS_DOCUMENT_INDEX_RUNS" not in ddl
     assert "CREATE TABLE SDS_VLM_FACETS" not in ddl
     assert "SDS_PROFILE_SCOPE_RULES" not in ddl
@@ -1701,6 +1703,85 @@ def test_rerank_batches_500_candidates_then_reranks_100_finalists() -> None:
     assert all(item.rerank_score is not None for item in result)
 
 
+def test_rerank_skips_finalist_pass_when_one_batch_holds_top_n(monkeypatch) -> None:
+    monkeypatch.setenv("RERANK_CONCURRENCY", "2")
+    candidates = [RankedHit(hit=retrieval_hit(), rrf_score=1 / (index + 1)) for index in range(300)]
+    active = {"now": 0, "peak": 0}
+    batch_sizes: list[int] = []
+
+    async def rerank(**kwargs: object) -> list[SimpleNamespace]:
+        documents = kwargs["documents"]
+        assert isinstance(documents, list)
+        batch_sizes.append(len(documents))
+        first_batch = len(batch_sizes) == 1
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        return [
+            SimpleNamespace(index=index, score=(10.0 if first_batch else 0.0) + index / 100)
+            for index in range(30)
+        ]
+
+    with (
+        patch("app.rag.search_pipeline.retrieval_service_settings.get_rerank", return_value=RerankSettings()),
+        patch("app.rag.search_pipeline.rerank_client.rerank", new=rerank),
+    ):
+        result = asyncio.run(_rerank_text("query", candidates, has_image=False))
+
+    assert batch_sizes == [100, 100, 100]
+    assert active["peak"] == 2
+    assert result[0] is candidates[29]
+    assert all(item in candidates[:100] for item in result)
+
+
+def test_rerank_finalist_pass_stays_within_shared_concurrency_limit() -> None:
+    active = {"now": 0, "peak": 0}
+    batch_sizes: list[int] = []
+
+    async def rerank(**kwargs: object) -> list[SimpleNamespace]:
+        documents = kwargs["documents"]
+        assert isinstance(documents, list)
+        batch_sizes.append(len(documents))
+        active["now"] += 1
+        active["peak"] = max(active["peak"], active["now"])
+        await asyncio.sleep(0.01)
+        active["now"] -= 1
+        # 各バッチの先頭に高得点を与え、上位top_nを複数バッチに散らして最終パスを走らせる。
+        return [
+            SimpleNamespace(index=index, score=1.0 / (index + 1)) for index in range(30)
+        ]
+
+    async def run_queries() -> list[list[RankedHit]]:
+        token = _batch_rerank_semaphore.set(asyncio.Semaphore(2))
+        try:
+            return await asyncio.gather(
+                *(
+                    _rerank_text(
+                        f"query {query}",
+                        [
+                            RankedHit(hit=retrieval_hit(), rrf_score=1 / (index + 1))
+                            for index in range(200)
+                        ],
+                        has_image=False,
+                    )
+                    for query in range(3)
+                )
+            )
+        finally:
+            _batch_rerank_semaphore.reset(token)
+
+    with (
+        patch("app.rag.search_pipeline.retrieval_service_settings.get_rerank", return_value=RerankSettings()),
+        patch("app.rag.search_pipeline.rerank_client.rerank", new=rerank),
+    ):
+        results = asyncio.run(run_queries())
+
+    assert sorted(batch_sizes) == [60, 60, 60, 100, 100, 100, 100, 100, 100]
+    assert active["peak"] == 2
+    assert all(len(result) == 30 for result in results)
+
+
 def test_empty_rerank_response_falls_back_to_rrf() -> None:
     candidates = [RankedHit(hit=retrieval_hit(), rrf_score=1.0)]
     with (
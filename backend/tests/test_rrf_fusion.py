@@ -0,0 +1,172 @@
+"""重み付きRRF統合の互換性テストとマイクロベンチマーク。
+
+ベンチマークは ``PYTHONPATH=. python tests/test_rrf_fusion.py`` （backend直下）で実行する。
+"""
+
+from __future__ import annotations
+
+import copy
+import random
+import time
+from typing import Any
+
+from app.rag.oracle_repository import RetrievalHit
+from app.rag.search_pipeline import RankedHit, _image_sort_key, _text_quality, _weighted_rrf
+
+
+def legacy_weighted_rrf(
+    ranked_lists: list[tuple[list[RetrievalHit], float]], constant: int = 60
+) -> list[RankedHit]:
+    """ヒットごとに ``canonical_key`` を作り直して辞書で集計していた以前の実装（比較用）。"""
+    fused: dict[str, RankedHit] = {}
+    for ranked, weight in ranked_lists:
+        if weight <= 0:
+            continue
+        for rank, hit in enumerate(ranked, start=1):
+            key = hit.canonical_key
+            item = fused.setdefault(key, RankedHit(hit=hit, rrf_score=0.0))
+            item.rrf_score += weight / (constant + rank)
+            if hit.slot_no:
+                item.profile_slots.add(hit.slot_no)
+            item.channels.add(hit.channel)
+            item.channel_ranks[hit.channel] = min(rank, item.channel_ranks.get(hit.channel, rank))
+            item.channel_scores[hit.channel] = max(
+                hit.score, item.channel_scores.get(hit.channel, hit.score)
+            )
+            if _text_quality(hit.raw_text) > _text_quality(item.hit.raw_text):
+                item.hit.raw_text = hit.raw_text
+                item.text_source_id = hit.evidence_id
+            if hit.caption and not item.hit.caption:
+                item.hit.caption = hit.caption
+                item.caption_source_id = hit.evidence_id
+    return sorted(fused.values(), key=lambda item: item.rrf_score, reverse=True)
+
+
+IMAGE_CHANNELS = {"vector:page_image", "vector:page_image_text"}
+PURE_IMAGE_CHANNELS = {"vector:page_image"}
+
+
+def synthetic_lists(
+    *, channels: int, depth: int, pool: int, seed: int = 7
+) -> list[tuple[list[RetrievalHit], float]]:
+    """同じ証跡が複数チャンネルに重複して現れるランキング群を作る。"""
+    generator = random.Random(seed)
+    names = ["vector:page_image", "vector:page_image_text", "keyword:page_text"] + [
+        f"keyword:vlm_text_slot_{index % 3 + 1}" if index % 2 else f"vector:recipe_{index}"
+        for index in range(max(0, channels - 3))
+    ]
+    lists: list[tuple[list[RetrievalHit], float]] = []
+    for channel in names[:channels]:
+        picks = generator.sample(range(pool), depth)
+        hits = []
+        for position, value in enumerate(picks):
+            slot = int(channel[-1]) if channel.startswith("keyword:vlm") else 0
+            hits.append(RetrievalHit(
+                evidence_id=f"{channel}:{value}",
+                document_id=f"doc-{value % (pool // 4)}",
+                slot_no=slot,
+                revision_id="rev",
+                page_number=value % 40,
+                unit_kind="PAGE",
+                source_locator=f"page:{value}",
+                bbox=[0.0, 0.0, 1.0, float(value % 3)] if value % 5 else None,
+                raw_text=("本文" * generator.randint(1, 20)) if position % 3 else "",
+                caption=f"caption {value}" if slot else "",
+                asset_object_name=None,
+                file_name="manual.pdf",
+                object_name="docs/manual.pdf",
+                bucket="bucket",
+                score=round(generator.random(), 3),
+                channel=channel,
+            ))
+        lists.append((hits, generator.choice([0.0, 0.5, 1.0, 1.5])))
+    return lists
+
+
+def summary(items: list[RankedHit]) -> list[tuple[Any, ...]]:
+    return [
+        (
+            item.hit.evidence_id,
+            item.rrf_score,
+            sorted(item.profile_slots),
+            sorted(item.channels),
+            item.channel_ranks,
+            item.channel_scores,
+            item.hit.raw_text,
+            item.hit.caption,
+            item.text_source_id,
+            item.caption_source_id,
+        )
+        for item in items
+    ]
+
+
+def test_vectorized_fusion_matches_the_per_hit_loop() -> None:
+    lists = synthetic_lists(channels=12, depth=150, pool=600)
+
+    expected = legacy_weighted_rrf(copy.deepcopy(lists))
+    actual = _weighted_rrf(copy.deepcopy(lists))
+
+    assert summary(actual) == summary(expected)
+    assert summary(_weighted_rrf(copy.deepcopy(lists), limit=25)) == summary(expected[:25])
+    assert _weighted_rrf([]) == [] and _weighted_rrf([(lists[0][0], 0.0)]) == []
+
+
+def test_image_order_matches_the_image_sort_key() -> None:
+    lists = synthetic_lists(channels=8, depth=100, pool=300, seed=11)
+    expected = legacy_weighted_rrf(copy.deepcopy(lists))
+    expected.sort(
+        key=lambda item: _image_sort_key(
+            item, pure_image_channels=PURE_IMAGE_CHANNELS, image_channels=IMAGE_CHANNELS
+        ),
+        reverse=True,
+    )
+
+    actual = _weighted_rrf(
+        copy.deepcopy(lists),
+        limit=60,
+        pure_image_channels=PURE_IMAGE_CHANNELS,
+        image_channels=IMAGE_CHANNELS,
+    )
+
+    assert summary(actual) == summary(expected[:60])
+
+
+def benchmark(*, channels: int = 24, depth: int = 500, limit: int = 100, repeat: int = 20) -> None:
+    lists = synthetic_lists(channels=channels, depth=depth, pool=depth * 4)
+    copies = [copy.deepcopy(lists) for _ in range(repeat * 2)]
+
+    def measure(function: Any) -> float:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            function(copies.pop())
+        return (time.perf_counter() - started) / repeat * 1000
+
+    def legacy(value: list[tuple[list[RetrievalHit], float]]) -> list[RankedHit]:
+        fused = legacy_weighted_rrf(value)
+        fused.sort(
+            key=lambda item: _image_sort_key(
+                item, pure_image_channels=PURE_IMAGE_CHANNELS, image_channels=IMAGE_CHANNELS
+            ),
+            reverse=True,
+        )
+        return fused[:limit]
+
+    def vectorized(value: list[tuple[list[RetrievalHit], float]]) -> list[RankedHit]:
+        return _weighted_rrf(
+            value,
+            limit=limit,
+            pure_image_channels=PURE_IMAGE_CHANNELS,
+            image_channels=IMAGE_CHANNELS,
+        )
+
+    before, after = measure(legacy), measure(vectorized)
+    print(
+        f"{channels} channels x {depth} hits, top {limit}: "
+        f"per-hit loop {before:.1f} ms, vectorized {after:.1f} ms ({before / after:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    benchmark()
+    benchmark(channels=8, depth=200)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from app.rag.audit_writer import SearchAuditWriter
+from app.rag.oracle_repository import rag_repository
+from app.rag.search_api import SearchFeedbackRequest, search_v2_feedback
+from app.rag.search_pipeline import _record_search_audit
+
+
+def audit_row(trace_id: str) -> dict[str, Any]:
+    return rag_repository.search_audit_binds(
+        trace_id=trace_id,
+        query_hash="q" * 64,
+        user_hash=None,
+        profile_slots=[1],
+        diagnostics={"degraded": []},
+        result_count=1,
+        elapsed_ms=12,
+    )
+
+
+def feedback_row(trace_id: str) -> dict[str, Any]:
+    return rag_repository.search_feedback_binds(
+        feedback_id=f"f-{trace_id}",
+        trace_id=trace_id,
+        document_id="d1",
+        evidence_id=None,
+        action="click",
+        user_hash=None,
+    )
+
+
+@pytest.fixture
+def repository():
+    calls: list[tuple[str, list[str]]] = []
+    repository = MagicMock()
+    repository.record_search_audits.side_effect = lambda rows: calls.append(
+        ("audit", [row["trace"] for row in rows])
+    ) or 0
+    repository.record_search_feedbacks.side_effect = lambda rows: calls.append(
+        ("feedback", [row["trace"] for row in rows])
+    ) or 0
+    with patch("app.rag.audit_writer.rag_repository", repository):
+        yield repository, calls
+
+
+@pytest.mark.asyncio
+async def test_rows_are_batched_and_feedback_follows_its_audit(repository, monkeypatch) -> None:
+    _, calls = repository
+    monkeypatch.setenv("SEARCH_AUDIT_WRITER_BATCH_SIZE", "2")
+    writer = SearchAuditWriter()
+
+    writer.submit_feedback(feedback_row("t1"))
+    for trace_id in ("t1", "t2", "t3"):
+        writer.submit_audit(audit_row(trace_id))
+    await writer.flush()
+
+    assert calls == [
+        ("audit", ["t1", "t2"]),
+        ("audit", ["t3"]),
+        ("feedback", ["t1"]),
+    ]
+    assert writer.stats()["written"] == {"audit": 3, "feedback": 1}
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_drops_new_rows_and_keeps_accepted_ones(repository, monkeypatch) -> None:
+    _, calls = repository
+    monkeypatch.setenv("SEARCH_AUDIT_WRITER_MAX_BUFFER", "2")
+    writer = SearchAuditWriter()
+
+    accepted = [writer.submit_audit(audit_row(trace_id)) for trace_id in ("t1", "t2", "t3")]
+    rejected_feedback = writer.submit_feedback(feedback_row("t1"))
+    await writer.flush()
+
+    assert accepted == [True, True, False] and rejected_feedback is False
+    assert calls == [("audit", ["t1", "t2"])]
+    assert writer.stats()["dropped"] == {"audit": 1, "feedback": 1}
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_counted_and_not_retried(repository) -> None:
+    repo, _ = repository
+    repo.record_search_audits.side_effect = RuntimeError("ORA-03113")
+    repo.record_search_feedbacks.side_effect = lambda rows: 1
+    writer = SearchAuditWriter()
+
+    writer.submit_audit(audit_row("t1"))
+    writer.submit_feedback(feedback_row("missing"))
+    writer.submit_feedback(feedback_row("t2"))
+    await writer.flush()
+    await writer.flush()
+
+    assert repo.record_search_audits.call_count == 1
+    assert writer.stats()["failed"] == {"audit": 1, "feedback": 1}
+    assert writer.stats()["written"] == {"audit": 0, "feedback": 1}
+
+
+@pytest.mark.asyncio
+async def test_interval_flush_and_shutdown_drain(repository, monkeypatch) -> None:
+    _, calls = repository
+    monkeypatch.setenv("SEARCH_AUDIT_WRITER_FLUSH_INTERVAL_MS", "10")
+    writer = SearchAuditWriter()
+    await writer.start()
+
+    writer.submit_audit(audit_row("t1"))
+    for _ in range(50):
+        if calls:
+            break
+        await asyncio.sleep(0.01)
+    writer.submit_audit(audit_row("t2"))
+    await writer.stop()
+
+    assert [trace for _, traces in calls for trace in traces] == ["t1", "t2"]
+    assert writer.running is False and writer.buffered == 0
+    assert writer.submit_audit(audit_row("t3")) is False
+
+
+@pytest.mark.asyncio
+async def test_search_audit_is_queued_while_the_writer_runs() -> None:
+    writer = MagicMock(running=True)
+    direct = MagicMock()
+    with (
+        patch("app.rag.search_pipeline.search_audit_writer", writer),
+        patch("app.rag.search_pipeline.rag_repository.record_search_audit", direct),
+    ):
+        await _record_search_audit(
+            trace_id="t1",
+            query_hash="q" * 64,
+            user_hash=None,
+            profile_slots=[],
+            diagnostics={},
+            result_count=0,
+            elapsed_ms=5,
+        )
+
+    direct.assert_not_called()
+    assert writer.submit_audit.call_args.args[0]["trace"] == "t1"
+    assert writer.submit_audit.call_args.args[0]["diagnostics"] == "{}"
+
+
+@pytest.mark.asyncio
+async def test_queued_feedback_still_rejects_unknown_traces(repository, monkeypatch) -> None:
+    monkeypatch.setenv("SEARCH_AUDIT_WRITER_FLUSH_INTERVAL_MS", "60000")
+    writer = SearchAuditWriter()
+    stored = MagicMock(side_effect=lambda trace_id: trace_id == "stored")
+    request = SimpleNamespace(state=SimpleNamespace(auth_username=None))
+
+    async def send(trace_id: str) -> dict[str, object]:
+        payload = SearchFeedbackRequest(trace_id=trace_id, action="opened")
+        return await search_v2_feedback(payload, request)  # type: ignore[arg-type]
+
+    with (
+        patch("app.rag.audit_writer.search_audit_writer", writer),
+        patch.object(rag_repository, "search_trace_exists", stored),
+    ):
+        await writer.start()
+        writer.submit_audit(audit_row("queued"))
+        # 監査行がまだキューにある検索はDBを確認せずに受け付ける。
+        assert await send("queued") == {"success": True}
+        stored.assert_not_called()
+        assert await send("stored") == {"success": True}
+        with pytest.raises(HTTPException) as rejected:
+            await send("missing")
+        await writer.stop()
+
+    assert rejected.value.status_code == 409
+    assert [call.args[0] for call in stored.call_args_list] == ["stored", "missing"]
+    assert writer.stats()["written"] == {"audit": 1, "feedback": 2}
+    assert writer.has_pending_trace("queued") is False
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.rag.models import QueryExpansionSettings, RerankSettings
+from app.rag.oracle_repository import RetrievalHit
+from app.rag.search_pipeline import SearchPipeline
+from tests.search_helpers import (
+    applied,
+    chunk_recipe,
+    retrieval_hit,
+    search_arguments,
+    search_patches,
+)
+
+
+def page_hit(query: str) -> RetrievalHit:
+    return retrieval_hit(
+        f"e-{query}",
+        document_id=f"d-{query}",
+        file_name=f"{query}.pdf",
+        raw_text="preview text",
+        source_locator="page:1",
+    )
+
+
+def request(query: str) -> dict[str, Any]:
+    return search_arguments(query=query)
+
+
+async def run_batch(
+    requests: list[dict[str, Any]], *, rerank_enabled: bool = False
+) -> tuple[Any, list[list[str]], dict[str, int]]:
+    embedded: list[list[str]] = []
+    rerank_load = {"active": 0, "peak": 0}
+
+    async def query_embeddings(values: list[str]) -> list[list[float]]:
+        embedded.append(list(values))
+        return [[0.1] for _ in values]
+
+    async def rerank(**kwargs: Any) -> list[SimpleNamespace]:
+        rerank_load["active"] += 1
+        rerank_load["peak"] = max(rerank_load["peak"], rerank_load["active"])
+        await asyncio.sleep(0.01)
+        rerank_load["active"] -= 1
+        return [SimpleNamespace(index=0, score=0.9)]
+
+    patches = [
+        *search_patches(
+            recipes=[chunk_recipe()],
+            rerank=RerankSettings(enabled=rerank_enabled, candidate_count=10, top_n=5),
+            multi_channel_search=MagicMock(
+                side_effect=lambda channels, **_: [[page_hit(channels[0].query)], []]
+            ),
+            evidence_texts=MagicMock(return_value={}),
+        ),
+        patch(
+            "app.rag.search_pipeline.retrieval_service_settings.get_query_expansion",
+            return_value=QueryExpansionSettings(enabled=False),
+        ),
+        patch("app.rag.search_pipeline.embedding_client.query", new=query_embeddings),
+        patch("app.rag.search_pipeline.rerank_client.rerank", new=rerank),
+    ]
+    with applied(patches):
+        response = await SearchPipeline().search_batch(requests)
+    return response, embedded, rerank_load
+
+
+@pytest.mark.asyncio
+async def test_batch_embeds_every_variant_once_and_dedupes_identical_queries() -> None:
+    response, embedded, _ = await run_batch(
+        [request("ceiling light"), request("downlight"), request("ceiling light")]
+    )
+
+    assert embedded == [["ceiling light", "downlight"]]
+    assert response.success is True
+    assert response.diagnostics["unique_queries"] == 2
+    assert response.diagnostics["shared_embedding"] == {"variants": 2, "status": "ok"}
+    first, second, duplicate = (item.response for item in response.results)
+    assert [item.file_name for item in second.results] == ["downlight.pdf"]
+    assert first.diagnostics["embedding_cache"]["batch_shared"] == 1
+    assert duplicate.trace_id == first.trace_id
+    assert duplicate.diagnostics["batch"] == {"index": 2, "duplicate_of": 0}
+    assert first.diagnostics["batch"] == {"index": 0, "duplicate_of": None}
+
+
+@pytest.mark.asyncio
+async def test_failed_query_is_reported_without_failing_the_batch() -> None:
+    response, _, _ = await run_batch([request("   "), request("downlight")])
+
+    assert response.success is False
+    assert response.diagnostics["failed_queries"] == 1
+    assert response.results[0].response is None and response.results[0].error
+    assert response.results[1].response.results[0].file_name == "downlight.pdf"
+
+
+@pytest.mark.asyncio
+async def test_rerank_concurrency_is_shared_across_batched_queries(monkeypatch) -> None:
+    monkeypatch.setenv("RERANK_CONCURRENCY", "1")
+    monkeypatch.setenv("SEARCH_BATCH_CONCURRENCY", "3")
+
+    response, _, rerank_load = await run_batch(
+        [request("ceiling light"), request("downlight"), request("spotlight")],
+        rerank_enabled=True,
+    )
+
+    assert response.success is True
+    assert rerank_load["peak"] == 1
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.rag.models import RerankSettings
+from app.rag.oracle_repository import RetrievalHit, rag_repository
+from app.rag.search_deadline import SearchDeadline, search_deadline_ms
+from app.rag.search_pipeline import (
+    QueryPlan,
+    SearchPipeline,
+    _channel_search,
+    _retrieve_remote_channels,
+)
+from tests.search_helpers import (
+    applied,
+    chunk_recipe,
+    retrieval_hit,
+    search_arguments,
+    search_patches,
+)
+
+
+def page_hit(evidence_id: str, document_id: str) -> RetrievalHit:
+    return retrieval_hit(evidence_id, document_id=document_id)
+
+
+async def slow_vector_channels(function: Any, *args: Any, **kwargs: Any) -> Any:
+    # ベクトル検索だけが予算内に返らないDBを模す。
+    if function is _channel_search and args[0].kind == "recipe_vector":
+        await asyncio.sleep(5)
+    return function(*args, **kwargs)
+
+
+def pipeline_patches(*, rerank: AsyncMock, generate_json: AsyncMock) -> list[Any]:
+    return [
+        *search_patches(
+            recipes=[chunk_recipe()],
+            rerank=RerankSettings(enabled=True, candidate_count=10, top_n=5),
+            to_thread=slow_vector_channels,
+            keyword_search=MagicMock(return_value=[page_hit("k1", "d1"), page_hit("k2", "d2")]),
+            recipe_vector_search=MagicMock(return_value=[]),
+        ),
+        patch(
+            "app.rag.search_pipeline._query_plan",
+            new=AsyncMock(return_value=QueryPlan(["ceiling light"], "off")),
+        ),
+        patch("app.rag.search_pipeline.embedding_client.query", new=AsyncMock(return_value=[[0.1]])),
+        patch("app.rag.search_pipeline.rerank_client.rerank", rerank),
+        patch("app.rag.search_pipeline.vlm_client.generate_json", generate_json),
+    ]
+
+
+async def run_search(patches: list[Any], *, deadline_ms: int | None) -> Any:
+    with applied(patches):
+        return await SearchPipeline()._search(**search_arguments(deadline_ms=deadline_ms))
+
+
+def test_deadline_can_be_set_per_endpoint(monkeypatch) -> None:
+    monkeypatch.delenv("SEARCH_DEADLINE_MS", raising=False)
+    monkeypatch.delenv("SEARCH_DEADLINE_MS_DIFY", raising=False)
+    monkeypatch.delenv("SEARCH_DEADLINE_MS_SEARCH", raising=False)
+    assert search_deadline_ms("dify") is None
+
+    monkeypatch.setenv("SEARCH_DEADLINE_MS", "8000")
+    monkeypatch.setenv("SEARCH_DEADLINE_MS_DIFY", "3000")
+    assert search_deadline_ms("dify") == 3000
+    assert search_deadline_ms("search") == 8000
+
+
+def test_stage_budget_is_capped_by_share_and_remaining_time(monkeypatch) -> None:
+    monkeypatch.setenv("SEARCH_STAGE_BUDGETS", '{"retrieval": 0.5}')
+    deadline = SearchDeadline(2000)
+
+    assert deadline.budget("retrieval") == pytest.approx(1.0, abs=0.05)
+    assert deadline.budget("format_results") == pytest.approx(2.0, abs=0.05)
+    assert SearchDeadline(None).budget("retrieval") is None
+    assert SearchDeadline(None).allows("llm_judge") is True
+
+
+@pytest.mark.asyncio
+async def test_slow_channel_is_cancelled_and_reported_with_its_timing(monkeypatch) -> None:
+    monkeypatch.setenv("RETRIEVAL_COMBINED_QUERY", "false")
+    monkeypatch.setenv("SEARCH_STAGE_BUDGETS", '{"retrieval": 0.01}')
+    rerank = AsyncMock(
+        return_value=[SimpleNamespace(index=0, score=0.9), SimpleNamespace(index=1, score=0.5)]
+    )
+    result = await run_search(
+        pipeline_patches(rerank=rerank, generate_json=AsyncMock(return_value={"best": 1})),
+        deadline_ms=5000,
+    )
+
+    assert result.diagnostics["degraded"] == ["vector:chunk_text"]
+    channels = result.diagnostics["retrieval_summary"]["channels"]
+    assert [(item["channel"], item["status"]) for item in channels] == [
+        ("keyword:page_text", "ok"),
+        ("vector:chunk_text", "timeout"),
+    ]
+    assert channels[1]["elapsed_ms"] >= 40
+    deadline = result.diagnostics["deadline"]
+    assert deadline["deadline_ms"] == 5000
+    assert deadline["stages"]["retrieval"]["status"] == "timeout"
+    assert deadline["stages"]["retrieval"]["budget_ms"] == 50
+    assert [item["channel"] for item in deadline["timed_out_channels"]] == ["vector:chunk_text"]
+    assert result.total_documents == 2
+
+
+@pytest.mark.asyncio
+async def test_rerank_and_judge_are_skipped_when_budget_is_too_small(monkeypatch) -> None:
+    monkeypatch.setenv("SEARCH_STAGE_MIN_MS_RERANK", "60000")
+    monkeypatch.setenv("SEARCH_STAGE_MIN_MS_LLM_JUDGE", "60000")
+    rerank = AsyncMock(return_value=[])
+    generate_json = AsyncMock(return_value={"best": 2})
+    with patch("app.rag.search_pipeline.rag_repository.multi_channel_search", MagicMock(
+        return_value=[[page_hit("k1", "d1"), page_hit("k2", "d2")], []]
+    )):
+        result = await run_search(
+            pipeline_patches(rerank=rerank, generate_json=generate_json), deadline_ms=5000
+        )
+
+    rerank.assert_not_awaited()
+    generate_json.assert_not_awaited()
+    assert result.diagnostics["degraded"] == ["deadline:llm_judge", "deadline:rerank"]
+    assert result.diagnostics["rerank_summary"]["degraded"] is True
+    judge_summary = result.diagnostics["judge_summary"]
+    assert (judge_summary["applied"], judge_summary["skipped"]) == (False, "deadline")
+    assert judge_summary["gate"]["decisive"] is False
+    stages = result.diagnostics["deadline"]["stages"]
+    assert stages["rerank"]["status"] == "skipped"
+    assert stages["llm_judge"]["status"] == "skipped"
+    assert [item.document_id for item in result.results] == ["d1", "d2"]
+
+
+@pytest.mark.asyncio
+async def test_search_without_deadline_reports_no_deadline_diagnostics() -> None:
+    rerank = AsyncMock(return_value=[])
+    with patch("app.rag.search_pipeline.rag_repository.multi_channel_search", MagicMock(
+        return_value=[[page_hit("k1", "d1")], []]
+    )):
+        result = await run_search(
+            pipeline_patches(rerank=rerank, generate_json=AsyncMock(return_value={})),
+            deadline_ms=None,
+        )
+
+    rerank.assert_awaited_once()
+    assert "deadline" not in result.diagnostics
+
+
+@pytest.mark.asyncio
+async def test_remote_channels_stop_database_calls_at_the_stage_budget() -> None:
+    connection = MagicMock()
+    connection.call_timeout = 0
+    database = MagicMock()
+    database.pool_manager.acquire_connection.return_value.__enter__.return_value = connection
+    seen: list[int] = []
+
+    def multi_channel_search(**_: Any) -> list[list[RetrievalHit]]:
+        with rag_repository.connection() as current:
+            seen.append(current.call_timeout)
+        return [[], []]
+
+    queries = [
+        SimpleNamespace(kind="keyword", channel="keyword:page_text"),
+        SimpleNamespace(kind="keyword", channel="keyword:vlm_text_slot_1"),
+    ]
+    with (
+        patch("app.rag.oracle_repository.database_service", database),
+        patch.object(rag_repository, "multi_channel_search", multi_channel_search),
+    ):
+        await _retrieve_remote_channels(queries, timeout=0.25, top_k=5)
+        await _retrieve_remote_channels(queries, timeout=None, top_k=5)
+
+    # wait_forの打ち切りだけではスレッド上のSQLが止まらないため、接続側で打ち切る。
+    # 予算なしの検索には設定せず、プールへ返す接続は元の値に戻す。
+    assert seen == [250, 0]
+    assert connection.call_timeout == 0
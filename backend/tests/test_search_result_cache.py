@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from app.rag import service_settings
+from app.rag.models import DocumentSearchResult, RetrievalWeights, SearchV2Response
+from app.rag.search_cache import SearchResultCache, SearchSingleFlight
+from app.rag.search_pipeline import SearchPipeline
+from tests.search_helpers import fake_connection, run_sync_immediately, search_arguments
+
+
+def search_response(*, degraded: list[str] | None = None) -> SearchV2Response:
+    return SearchV2Response(
+        trace_id=uuid4().hex,
+        query="ceiling light",
+        results=[
+            DocumentSearchResult(
+                document_id="doc-1",
+                file_name="catalog.pdf",
+                object_name="catalog.pdf",
+                bucket="documents",
+                score=0.9,
+                profile_slots=[],
+                evidence=[],
+            )
+        ],
+        total_documents=1,
+        total_evidence=0,
+        processing_time=2.5,
+        diagnostics={"degraded": degraded or [], "enabled_vlm_profiles": []},
+    )
+
+
+async def run_search(**overrides: Any) -> SearchV2Response:
+    return await SearchPipeline().search(**search_arguments(**{"user_hash": "a" * 64, **overrides}))
+
+
+@pytest.fixture
+def cached_pipeline():
+    cache = SearchResultCache()
+    inner = AsyncMock(side_effect=lambda **_: search_response())
+    serving_epoch = MagicMock(return_value=1)
+    with (
+        patch("app.rag.search_pipeline.search_result_cache", cache),
+        patch("app.rag.search_pipeline.search_single_flight", SearchSingleFlight()),
+        patch.object(SearchPipeline, "_search", inner),
+        patch("app.rag.search_pipeline.rag_repository.serving_epoch", serving_epoch),
+        patch("app.rag.search_pipeline.rag_repository.record_search_audit") as audit,
+        patch("app.rag.search_pipeline.asyncio.to_thread", new=run_sync_immediately),
+    ):
+        yield cache, inner, serving_epoch, audit
+
+
+@pytest.mark.asyncio
+async def test_identical_search_is_served_from_cache(cached_pipeline) -> None:
+    cache, inner, _, audit = cached_pipeline
+
+    first = await run_search()
+    second = await run_search(query="  ceiling   light ")
+
+    assert inner.await_count == 1
+    assert first.diagnostics["result_cache"] == {"hit": False, "stored": True, "epoch": 0}
+    assert second.diagnostics["result_cache"]["hit"] is True
+    assert second.diagnostics["result_cache"]["source_trace_id"] == first.trace_id
+    assert second.trace_id != first.trace_id
+    assert second.processing_time < first.processing_time
+    assert [item.document_id for item in second.results] == ["doc-1"]
+    assert audit.call_args.kwargs["trace_id"] == second.trace_id
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_key_separates_principals_and_request_options(cached_pipeline) -> None:
+    _, inner, _, _ = cached_pipeline
+
+    await run_search()
+    await run_search(user_hash="b" * 64)
+    await run_search(top_k=6)
+    await run_search(retrieval_modes=["oracle_text"])
+    await run_search(current_version_only=False)
+    await run_search(document_types=["catalog"])
+    await run_search(deadline_ms=3000)
+
+    assert inner.await_count == 7
+
+
+@pytest.mark.asyncio
+async def test_epoch_bump_and_serving_change_invalidate_results(cached_pipeline) -> None:
+    cache, inner, serving_epoch, _ = cached_pipeline
+
+    await run_search()
+    cache.bump_epoch("publish_release")
+    after_publish = await run_search()
+    serving_epoch.return_value = 2
+    within_epoch_ttl = await run_search()
+    later = time.monotonic() + 2
+    with patch("app.rag.search_cache.time.monotonic", return_value=later):
+        after_remote_publish = await run_search()
+
+    # DBの世代はTTLの間だけ使い回し、期限後に読み直して別プロセスの公開を検出する。
+    assert inner.await_count == 3
+    assert serving_epoch.call_count == 3
+    assert after_publish.diagnostics["result_cache"]["hit"] is False
+    assert within_epoch_ttl.diagnostics["result_cache"]["hit"] is True
+    assert after_remote_publish.diagnostics["result_cache"]["hit"] is False
+    assert cache.stats()["last_invalidation"] == "publish_release"
+    assert cache.stats()["serving_epoch"] == 2
+
+
+@pytest.mark.asyncio
+async def test_degraded_results_and_unknown_serving_state_are_not_cached(
+    cached_pipeline, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    cache, inner, serving_epoch, _ = cached_pipeline
+    monkeypatch.setenv("SEARCH_RESULT_CACHE_EPOCH_TTL_MS", "0")
+    inner.side_effect = lambda **_: search_response(degraded=["text_embedding"])
+
+    degraded = await run_search()
+    serving_epoch.side_effect = RuntimeError("database connection is not configured")
+    bypassed = await run_search()
+
+    assert inner.await_count == 2
+    assert degraded.diagnostics["result_cache"]["stored"] is False
+    assert bypassed.diagnostics["result_cache"]["bypass"] == "serving_epoch_unavailable"
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_searches_share_one_execution(cached_pipeline) -> None:
+    _, inner, _, audit = cached_pipeline
+    release = asyncio.Event()
+
+    async def slow_search(**_: Any) -> SearchV2Response:
+        await release.wait()
+        return search_response()
+
+    inner.side_effect = slow_search
+    leader = asyncio.create_task(run_search())
+    followers = [asyncio.create_task(run_search()) for _ in range(2)]
+    other_principal = asyncio.create_task(run_search(user_hash="b" * 64))
+    # 期限付きの検索は期限なしの先行実行を待たずに自分で検索する。
+    deadline_bound = asyncio.create_task(run_search(deadline_ms=3000))
+    await asyncio.sleep(0)
+    release.set()
+    first, *copies = await asyncio.gather(leader, *followers)
+    await other_principal
+    assert "single_flight" not in (await deadline_bound).diagnostics
+
+    assert inner.await_count == 3
+    assert first.diagnostics["single_flight"] == {"role": "leader", "followers": 2}
+    for copy in copies:
+        assert copy.diagnostics["single_flight"]["role"] == "follower"
+        assert copy.diagnostics["single_flight"]["source_trace_id"] == first.trace_id
+        assert copy.trace_id != first.trace_id
+    assert {call.kwargs["trace_id"] for call in audit.call_args_list} == {
+        copy.trace_id for copy in copies
+    }
+
+
+@pytest.mark.asyncio
+async def test_followers_receive_the_leader_error_and_cancelled_leaders_are_retried() -> None:
+    flight = SearchSingleFlight()
+    started = asyncio.Event()
+
+    async def failing() -> SearchV2Response:
+        started.set()
+        await asyncio.sleep(0.01)
+        raise RuntimeError("ORA-03113")
+
+    leader = asyncio.create_task(flight.run("key", failing))
+    await started.wait()
+    follower = asyncio.create_task(flight.run("key", failing))
+    results = await asyncio.gather(leader, follower, return_exceptions=True)
+
+    assert [str(item) for item in results] == ["ORA-03113", "ORA-03113"]
+    assert flight.inflight == 0
+
+    started.clear()
+
+    async def hanging() -> SearchV2Response:
+        started.set()
+        await asyncio.Event().wait()
+        raise AssertionError
+
+    async def fresh() -> SearchV2Response:
+        return search_response()
+
+    leader = asyncio.create_task(flight.run("key", hanging))
+    await started.wait()
+    follower = asyncio.create_task(flight.run("key", fresh))
+    await asyncio.sleep(0)
+    leader.cancel()
+    outcome = await follower
+
+    assert outcome.leader is True and outcome.response.query == "ceiling light"
+    assert flight.stats()["followers"] == 2
+
+
+def test_result_computed_across_an_epoch_bump_is_not_stored() -> None:
+    cache = SearchResultCache()
+    epoch = cache.epoch
+    cache.bump_epoch("document_deleted")
+
+    assert cache.put("key", search_response(), epoch=epoch) is False
+    assert cache.get("key") is None
+
+
+def save_retrieval_weights(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(service_settings, "TARGET_ENV", tmp_path / ".env")
+    monkeypatch.setattr(service_settings, "CHALLENGE_ENV", tmp_path / "challenge.env")
+    for key in (
+        "RETRIEVAL_WEIGHT_ORACLE_TEXT",
+        "RETRIEVAL_WEIGHT_TEXT_VECTOR",
+        "RETRIEVAL_WEIGHT_VISUAL_VECTOR",
+        "RETRIEVAL_WEIGHT_VLM_TEXT",
+        "RETRIEVAL_WEIGHT_VLM_VECTOR",
+    ):
+        monkeypatch.setenv(key, "1")
+    service_settings.RetrievalServiceSettingsStore().save_weights(
+        RetrievalWeights(oracle_text=0.5)
+    )
+
+
+def test_saving_retrieval_settings_bumps_database_serving_epoch(monkeypatch, tmp_path) -> None:
+    context, connection, cursor = fake_connection([])
+    cache = SearchResultCache()
+    cache.put("key", search_response(), epoch=cache.epoch)
+
+    with (
+        patch("app.rag.oracle_repository.rag_repository.connection", return_value=context),
+        patch("app.rag.oracle_repository.search_result_cache", cache),
+    ):
+        save_retrieval_weights(monkeypatch, tmp_path)
+
+    assert "UPDATE sds_serving_epoch" in cursor.execute.call_args.args[0]
+    connection.commit.assert_called_once()
+    assert cache.get("key") is None
+    assert cache.stats()["last_invalidation"] == "service_settings_saved"
+
+
+def test_saving_retrieval_settings_without_database_bumps_local_epoch(
+    monkeypatch, tmp_path
+) -> None:
+    cache = SearchResultCache()
+    cache.put("key", search_response(), epoch=cache.epoch)
+    monkeypatch.setattr(service_settings, "search_result_cache", cache)
+
+    with patch(
+        "app.rag.service_settings.rag_repository.advance_serving_epoch",
+        side_effect=RuntimeError("database connection is not configured"),
+    ):
+        save_retrieval_weights(monkeypatch, tmp_path)
+
+    assert cache.epoch == 1
+    assert cache.get("key") is None
+    assert cache.stats()["last_invalidation"] == "service_settings_saved"
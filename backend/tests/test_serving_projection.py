@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from unittest.mock import MagicMock, call, patch
+
+from app.rag import oracle_schema
+from app.rag.models import ProfileConfig
+from app.rag.oracle_repository import ChannelQuery, rag_repository
+from app.rag.oracle_schema import build_serving_epoch, build_serving_projection, schema_sql
+from app.rag.serving_projection import refresh_serving_projection
+from tests.search_helpers import ScriptedCursor, scripted_database
+
+
+def test_search_sql_reads_only_the_serving_projection() -> None:
+    profile = ProfileConfig(
+        slot_no=2, name="visual", enabled=True, extraction_prompt="extract", current_revision_id="p2"
+    )
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.description = []
+    cursor.fetchall.return_value = []
+    with patch.object(rag_repository, "connection", return_value=context):
+        rag_repository.multi_channel_search(
+            channels=[
+                ChannelQuery(kind="keyword", channel="keyword:page_text", query="ceiling light"),
+                ChannelQuery(
+                    kind="recipe_vector",
+                    channel="vector:chunk_text",
+                    recipe_code="chunk_text",
+                    embedding=[0.1],
+                ),
+                ChannelQuery(
+                    kind="facet_keyword",
+                    channel="keyword:vlm_text_slot_2",
+                    query="ceiling light",
+                    profile=profile,
+                ),
+            ],
+            top_k=10,
+            user_hash="a" * 64,
+            current_version_only=True,
+            document_types=["catalog"],
+            filename_filter="light",
+        )
+
+    sql = " ".join(cursor.execute.call_args.args[0].split()).lower()
+    for table in ("sds_documents", "sds_index_releases", "sds_index_release_components"):
+        assert table not in sql
+    assert sql.count("from sds_serving_artifacts a") == 2
+    assert "from sds_serving_components sc join sds_embeddings ev" in sql
+    assert "a.is_current=1" in sql and "lower(a.document_type) in" in sql
+
+
+def test_publish_refresh_replaces_the_document_rows() -> None:
+    cursor = MagicMock()
+
+    refresh_serving_projection(cursor, document_id="doc-1", release_id="release-2")
+
+    statements = [" ".join(item.args[0].split()) for item in cursor.execute.call_args_list]
+    assert statements[0].startswith("DELETE FROM sds_serving_artifacts")
+    assert statements[1].startswith("DELETE FROM sds_serving_components")
+    assert statements[2].startswith("INSERT INTO sds_serving_components")
+    assert statements[3].startswith("INSERT INTO sds_serving_artifacts")
+    assert "NVL(a.raw_text, page_text.raw_text)" in statements[3]
+    assert [item.args[1] for item in cursor.execute.call_args_list] == [
+        {"document": "doc-1"},
+        {"document": "doc-1"},
+        {"release": "release-2"},
+        {"release": "release-2"},
+    ]
+
+
+def test_projection_ddl_moves_the_text_index_off_historical_artifacts() -> None:
+    ddl = schema_sql()
+
+    assert "CREATE TABLE SDS_SERVING_ARTIFACTS" in ddl
+    assert "CREATE INDEX SDS_SERVING_TEXT_IDX ON SDS_SERVING_ARTIFACTS (SEARCH_TEXT)" in ddl
+    assert "SDS_ARTIFACT_TEXT_IDX" not in ddl
+
+
+def test_existing_deployment_backfills_before_indexing_text() -> None:
+    cursor = ScriptedCursor({
+        "USER_TABLES": [],
+        "USER_INDEXES": [("SDS_ARTIFACT_TEXT_IDX",)],
+        "serving_release_id IS NOT NULL": [("doc-1", "rel-1"), ("doc-2", "rel-2")],
+    })
+    with (
+        patch.object(oracle_schema, "database_service", scripted_database(cursor)),
+        patch("app.rag.serving_projection.refresh_serving_projection") as refresh,
+    ):
+        result = build_serving_projection()
+
+    assert result["backfilled_documents"] == 2
+    assert refresh.call_args_list == [
+        call(cursor, document_id="doc-1", release_id="rel-1"),
+        call(cursor, document_id="doc-2", release_id="rel-2"),
+    ]
+    assert result["steps"][:2] == [
+        "create:SDS_SERVING_COMPONENTS",
+        "create:SDS_SERVING_ARTIFACTS",
+    ]
+    assert result["steps"][-2:] == [
+        "drop:SDS_ARTIFACT_TEXT_IDX",
+        "create:SDS_SERVING_TEXT_IDX",
+    ]
+    assert cursor.statements[-1].startswith("CREATE INDEX SDS_SERVING_TEXT_IDX")
+
+
+def test_serving_epoch_table_is_created_once_with_its_single_row() -> None:
+    cursor = ScriptedCursor({"USER_TABLES": []})
+    with patch.object(oracle_schema, "database_service", scripted_database(cursor)):
+        created = build_serving_epoch()
+        cursor.rows["USER_TABLES"] = [("SDS_SERVING_EPOCH",)]
+        existing = build_serving_epoch()
+
+    assert (created, existing) == ({"created": True}, {"created": False})
+    assert cursor.statements[1].startswith("CREATE TABLE SDS_SERVING_EPOCH")
+    assert cursor.statements[2] == "INSERT INTO SDS_SERVING_EPOCH (EPOCH_ID, EPOCH) VALUES (1, 0)"
+    assert len(cursor.statements) == 4
+    assert "CREATE TABLE SDS_SERVING_EPOCH" in schema_sql()
+
+
+def test_document_writes_bump_the_serving_epoch_before_commit() -> None:
+    context = MagicMock()
+    connection = context.__enter__.return_value
+    cursor = connection.cursor.return_value.__enter__.return_value
+    cursor.rowcount = 1
+    with patch.object(rag_repository, "connection", return_value=context):
+        rag_repository.update_document_type("doc-1", "catalog")
+
+    # 別プロセスの検索キャッシュが読む世代は、書き込みと同じトランザクションで進む。
+    statements = [" ".join(item.args[0].split()) for item in cursor.execute.call_args_list]
+    assert statements[-1].startswith("UPDATE sds_serving_epoch SET epoch=epoch+1")
+    connection.commit.assert_called_once()
+
+
+def test_serving_epoch_reads_the_single_row() -> None:
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = (42,)
+    with patch.object(rag_repository, "connection", return_value=context):
+        value = rag_repository.serving_epoch()
+
+    assert value == 42
+    assert cursor.execute.call_args.args[0] == (
+        "SELECT epoch FROM sds_serving_epoch WHERE epoch_id=1"
+    )
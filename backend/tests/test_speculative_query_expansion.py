@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.rag.models import QueryExpansionSettings
+from app.rag.oracle_repository import RetrievalHit
+from app.rag.search_pipeline import SearchPipeline
+from tests.search_helpers import (
+    applied,
+    chunk_recipe,
+    retrieval_hit,
+    search_arguments,
+    search_patches,
+)
+
+
+def pipeline_patches(
+    multi_channel_search: MagicMock, generate_json: AsyncMock, embedding_query: AsyncMock
+) -> list[Any]:
+    return [
+        *search_patches(recipes=[chunk_recipe()], multi_channel_search=multi_channel_search),
+        patch(
+            "app.rag.search_pipeline.retrieval_service_settings.get_query_expansion",
+            return_value=QueryExpansionSettings(
+                enabled=True, llm_enabled=True, llm_prompt="expand", synonym_groups=[]
+            ),
+        ),
+        patch("app.rag.search_pipeline.vlm_client.generate_json", generate_json),
+        patch("app.rag.search_pipeline.embedding_client.query", embedding_query),
+    ]
+
+
+def channel_results(**kwargs: Any) -> list[list[RetrievalHit]]:
+    return [
+        [retrieval_hit(f"{query.kind}-{index}", file_name="source.pdf")]
+        for index, query in enumerate(kwargs["channels"])
+    ]
+
+
+async def run_search(patches: list[Any]) -> Any:
+    with applied(patches):
+        return await SearchPipeline().search(**search_arguments())
+
+
+@pytest.mark.asyncio
+async def test_retrieval_starts_before_llm_expansion_and_merges_its_variants() -> None:
+    first_wave_done = asyncio.Event()
+
+    def retrieve(**kwargs: Any) -> list[list[RetrievalHit]]:
+        first_wave_done.set()
+        return channel_results(**kwargs)
+
+    async def expand(**_: Any) -> dict[str, Any]:
+        # LLMは1回目の検索が終わるまで返らない。
+        await first_wave_done.wait()
+        return {"query_variants": ["downlight"]}
+
+    multi_channel_search = MagicMock(side_effect=retrieve)
+    embedding_query = AsyncMock(side_effect=lambda texts: [[0.1] for _ in texts])
+    result = await run_search(
+        pipeline_patches(multi_channel_search, AsyncMock(side_effect=expand), embedding_query)
+    )
+
+    assert [call.args[0] for call in embedding_query.await_args_list] == [
+        ["ceiling light"],
+        ["downlight"],
+    ]
+    waves = [call.kwargs["channels"] for call in multi_channel_search.call_args_list]
+    assert [[(item.kind, item.query) for item in wave] for wave in waves] == [
+        [("keyword", "ceiling light"), ("recipe_vector", None)],
+        [("keyword", "downlight"), ("recipe_vector", None)],
+    ]
+    query_plan = result.diagnostics["query_plan"]
+    assert query_plan["variants"] == ["ceiling light", "downlight"]
+    assert query_plan["query_expansion_source"] == "llm"
+    assert query_plan["speculative"]["status"] == "merged"
+    assert query_plan["speculative"]["llm_variants"] == ["downlight"]
+    summary = result.diagnostics["retrieval_summary"]
+    assert [(item["channel"], item["weight"]) for item in summary["channels"]] == [
+        ("keyword:page_text_1", 0.5),
+        ("vector:chunk_text_1", 0.5),
+        ("keyword:page_text_2", 0.5),
+        ("vector:chunk_text_2", 0.5),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_llm_variants_missing_the_deadline_are_dropped(monkeypatch) -> None:
+    monkeypatch.setenv("RAG_QUERY_EXPANSION_LLM_DEADLINE_MS", "10")
+    cancelled = asyncio.Event()
+
+    async def expand(*, prompt: str, **_: Any) -> dict[str, Any]:
+        if not prompt.startswith("expand"):
+            return {}
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return {"query_variants": ["downlight"]}
+
+    multi_channel_search = MagicMock(side_effect=channel_results)
+    embedding_query = AsyncMock(side_effect=lambda texts: [[0.1] for _ in texts])
+    result = await run_search(
+        pipeline_patches(multi_channel_search, AsyncMock(side_effect=expand), embedding_query)
+    )
+
+    multi_channel_search.assert_called_once()
+    embedding_query.assert_awaited_once_with(["ceiling light"])
+    assert cancelled.is_set()
+    query_plan = result.diagnostics["query_plan"]
+    assert query_plan["variants"] == ["ceiling light"]
+    assert query_plan["speculative"] == {
+        "status": "deadline_exceeded",
+        "deadline_ms": 10,
+        "llm_variants": [],
+    }
+    assert [item["channel"] for item in result.diagnostics["retrieval_summary"]["channels"]] == [
+        "keyword:page_text",
+        "vector:chunk_text",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_speculative_expansion_can_be_disabled(monkeypatch) -> None:
+    monkeypatch.setenv("RAG_QUERY_EXPANSION_SPECULATIVE", "false")
+    multi_channel_search = MagicMock(side_effect=channel_results)
+    generate_json = AsyncMock(return_value={"query_variants": ["downlight"]})
+    embedding_query = AsyncMock(side_effect=lambda texts: [[0.1] for _ in texts])
+    result = await run_search(
+        pipeline_patches(multi_channel_search, generate_json, embedding_query)
+    )
+
+    multi_channel_search.assert_called_once()
+    embedding_query.assert_awaited_once_with(["ceiling light", "downlight"])
+    assert "speculative" not in result.diagnostics["query_plan"]
+    assert result.diagnostics["query_plan"]["variants"] == ["ceiling light", "downlight"]
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.rag import oracle_schema
+from app.rag.oracle_repository import rag_repository
+from app.rag.oracle_schema import build_serving_projection, schema_sql
+from app.rag.text_index_maintenance import TextIndexMaintainer
+from tests.search_helpers import ScriptedCursor, scripted_database
+
+
+def run_build(cursor: ScriptedCursor) -> dict[str, Any]:
+    with (
+        patch.object(oracle_schema, "database_service", scripted_database(cursor)),
+        patch("app.rag.serving_projection.refresh_serving_projection"),
+    ):
+        return build_serving_projection()
+
+
+def test_serving_text_index_is_local_per_artifact_kind_and_synced_manually() -> None:
+    ddl = " ".join(schema_sql().split())
+
+    assert "PARTITION BY LIST (ARTIFACT_KIND) AUTOMATIC" in ddl
+    assert "INDEXTYPE IS CTXSYS.CONTEXT LOCAL" in ddl
+    assert "SYNC (MANUAL)" in ddl and "SYNC (ON COMMIT)" not in ddl
+
+
+def test_commit_synced_global_index_is_rebuilt_on_partitioned_projection() -> None:
+    cursor = ScriptedCursor({
+        "USER_TABLES": [("SDS_SERVING_COMPONENTS",), ("SDS_SERVING_ARTIFACTS",)],
+        "FROM USER_INDEXES": [
+            ("SDS_SERVING_COMPONENT_RUN_IDX",),
+            ("SDS_SERVING_ARTIFACT_IDX",),
+            ("SDS_SERVING_DOCUMENT_IDX",),
+            ("SDS_SERVING_TEXT_IDX",),
+        ],
+    })
+
+    result = run_build(cursor)
+
+    assert result["steps"] == [
+        "drop:SDS_SERVING_TEXT_IDX",
+        "partition:SDS_SERVING_ARTIFACTS",
+        "create:SDS_SERVING_TEXT_IDX",
+    ]
+    partition = next(item for item in cursor.statements if item.startswith("ALTER TABLE"))
+    assert "PARTITION BY LIST (ARTIFACT_KIND)" in partition and partition.endswith("ONLINE")
+    assert "CTXSYS.CONTEXT LOCAL" in cursor.statements[-1]
+
+
+def test_partitioned_projection_with_local_index_is_left_alone() -> None:
+    cursor = ScriptedCursor({
+        "USER_TABLES": [("SDS_SERVING_COMPONENTS",), ("SDS_SERVING_ARTIFACTS",)],
+        "FROM USER_INDEXES": [
+            ("SDS_SERVING_COMPONENT_RUN_IDX",),
+            ("SDS_SERVING_ARTIFACT_IDX",),
+            ("SDS_SERVING_DOCUMENT_IDX",),
+            ("SDS_SERVING_TEXT_IDX",),
+        ],
+        "USER_PART_TABLES": [("SDS_SERVING_ARTIFACTS",)],
+        "USER_PART_INDEXES": [("SDS_SERVING_TEXT_IDX",)],
+    })
+
+    assert run_build(cursor)["steps"] == []
+
+
+def test_only_pending_partitions_are_synced_and_later_optimized(monkeypatch) -> None:
+    monkeypatch.setenv("ORACLE_TEXT_OPTIMIZE_INTERVAL_SECONDS", "0")
+    monkeypatch.setenv("ORACLE_TEXT_SYNC_MEMORY", "64M")
+    maintainer = TextIndexMaintainer()
+    repository = MagicMock()
+    repository.pending_text_index_partitions.side_effect = [
+        {"SDS_SERVING_PAGE_TEXT": 12, "SYS_P2041": 3},
+        {"SYS_P2041": 1},
+    ]
+    with patch("app.rag.text_index_maintenance.rag_repository", repository):
+        maintainer.sync_pending()
+        maintainer.sync_pending()
+        assert maintainer.optimize_due() is False
+        monkeypatch.setenv("ORACLE_TEXT_OPTIMIZE_INTERVAL_SECONDS", "1")
+        maintainer._last_optimized -= 1
+        assert maintainer.optimize_due() is True
+        optimized = maintainer.optimize_synced()
+
+    assert [call.args[0] for call in repository.sync_text_index.call_args_list] == [
+        "SDS_SERVING_PAGE_TEXT", "SYS_P2041", "SYS_P2041"
+    ]
+    assert repository.sync_text_index.call_args.kwargs == {"memory": "64M"}
+    assert optimized == ["SDS_SERVING_PAGE_TEXT", "SYS_P2041"]
+    assert repository.optimize_text_index.call_args.kwargs == {"max_minutes": 10}
+    assert maintainer.optimize_due() is False
+
+
+def test_zero_interval_switches_the_index_to_commit_time_sync(monkeypatch) -> None:
+    monkeypatch.setenv("ORACLE_TEXT_SYNC_INTERVAL_SECONDS", "0")
+    maintainer = TextIndexMaintainer()
+    repository = MagicMock()
+    repository.set_text_index_sync_mode.return_value = True
+    repository.pending_text_index_partitions.return_value = {"SYS_P2041": 2}
+
+    with patch("app.rag.text_index_maintenance.rag_repository", repository):
+        assert maintainer.apply_sync_mode() is True
+
+    repository.set_text_index_sync_mode.assert_called_once_with("ON COMMIT")
+    # 切り替え前の未同期行は一度だけ手動で同期する。
+    assert [call.args[0] for call in repository.sync_text_index.call_args_list] == ["SYS_P2041"]
+    assert maintainer.interval_seconds() == 60
+
+
+def test_sync_mode_is_replaced_only_when_it_differs() -> None:
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.fetchone.return_value = ("MANUAL",)
+
+    with patch.object(rag_repository, "connection", return_value=context):
+        assert rag_repository.set_text_index_sync_mode("MANUAL") is False
+        assert rag_repository.set_text_index_sync_mode("ON COMMIT") is True
+
+    assert cursor.execute.call_args.args[0] == (
+        "ALTER INDEX SDS_SERVING_TEXT_IDX PARAMETERS ('REPLACE METADATA SYNC (ON COMMIT)')"
+    )
+
+
+@pytest.mark.asyncio
+async def test_maintainer_runs_without_the_dispatcher(monkeypatch) -> None:
+    monkeypatch.setenv("ORACLE_TEXT_SYNC_INTERVAL_SECONDS", "5")
+    maintainer = TextIndexMaintainer()
+    repository = MagicMock()
+    repository.set_text_index_sync_mode.return_value = False
+    synced = asyncio.Event()
+    repository.pending_text_index_partitions.side_effect = lambda: synced.set() or {}
+
+    with (
+        patch("app.rag.text_index_maintenance.rag_repository", repository),
+        patch("app.rag.text_index_maintenance.pipeline_repository.schema_ready", return_value=True),
+    ):
+        await maintainer.start()
+        await asyncio.wait_for(synced.wait(), timeout=1)
+        await maintainer.stop()
+
+    repository.set_text_index_sync_mode.assert_called_once_with("MANUAL")
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.rag.access_cache import DocumentAccess
+from app.rag.models import QueryExpansionSettings, RerankSettings
+from app.rag.oracle_repository import (
+    ChannelQuery,
+    RetrievalHit,
+    rag_repository,
+    vector_target_accuracy,
+)
+from app.rag.search_pipeline import SearchPipeline
+from tests.search_helpers import (
+    applied,
+    chunk_recipe,
+    retrieval_hit,
+    search_arguments,
+    search_patches,
+)
+
+
+def vector_hit(evidence_id: str) -> RetrievalHit:
+    return retrieval_hit(
+        evidence_id,
+        document_id=f"d-{evidence_id}",
+        file_name=f"{evidence_id}.pdf",
+        unit_kind="CHUNK_TEXT",
+        raw_text="preview text",
+        source_locator="page:1",
+        score=0.8,
+        channel="vector:chunk_text",
+    )
+
+
+def test_target_accuracy_follows_channel_overrides_and_request_mode(monkeypatch) -> None:
+    monkeypatch.setenv("VECTOR_TARGET_ACCURACY_CHANNELS", '{"page_image": 90}')
+    monkeypatch.setenv("VECTOR_TARGET_ACCURACY_FAST", "70")
+
+    assert vector_target_accuracy("chunk_text") == 95
+    assert vector_target_accuracy("page_image") == 90
+    assert vector_target_accuracy("page_image", "fast") == 70
+    assert vector_target_accuracy("page_image", "precise") == 100
+
+
+def test_vector_branch_uses_channel_accuracy_and_exact_fetch() -> None:
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.description = [("EVIDENCE_ID",)]
+    cursor.fetchall.return_value = []
+    channels = [
+        ChannelQuery(
+            kind="recipe_vector",
+            channel="vector:chunk_text",
+            recipe_code="chunk_text",
+            embedding=[0.1],
+            target_accuracy=80,
+        ),
+        ChannelQuery(
+            kind="recipe_vector",
+            channel="vector:page_image",
+            recipe_code="page_image",
+            embedding=[0.2],
+            target_accuracy=100,
+        ),
+    ]
+
+    with patch.object(rag_repository, "connection", return_value=context):
+        rag_repository.multi_channel_search(
+            channels=channels,
+            top_k=20,
+            user_hash=None,
+            current_version_only=True,
+            document_types=[],
+        )
+
+    sql = " ".join(cursor.execute.call_args.args[0].split())
+    assert "FETCH APPROX FIRST 20 ROWS ONLY WITH TARGET ACCURACY 80" in sql
+    assert "FETCH EXACT FIRST 20 ROWS ONLY" in sql
+    assert "TARGET ACCURACY 95" not in sql
+
+
+async def run_search(
+    *,
+    document_types: list[str],
+    user_hash: str | None = None,
+    access: DocumentAccess | None = None,
+    row_counts: dict[str, int] | None = None,
+) -> tuple[Any, MagicMock]:
+    async def query_embeddings(values: list[str]) -> list[list[float]]:
+        return [[0.1] for _ in values]
+
+    exact_search = MagicMock(return_value=[vector_hit(f"x{index}") for index in range(12)])
+    patches = [
+        *search_patches(
+            recipes=[chunk_recipe()],
+            rerank=RerankSettings(enabled=False, candidate_count=20, top_n=5),
+            multi_channel_search=MagicMock(
+                return_value=[[], [vector_hit("a1"), vector_hit("a2")]]
+            ),
+            recipe_vector_search=exact_search,
+            evidence_texts=MagicMock(return_value={}),
+            recipe_row_counts=MagicMock(
+                return_value=row_counts if row_counts is not None else {"chunk_text": 500}
+            ),
+        ),
+        patch(
+            "app.rag.search_pipeline.retrieval_service_settings.get_query_expansion",
+            return_value=QueryExpansionSettings(enabled=False),
+        ),
+        patch("app.rag.search_pipeline.embedding_client.query", new=query_embeddings),
+        patch(
+            "app.rag.search_pipeline._document_access",
+            new=AsyncMock(return_value=(access, {"mode": "exists", "cached": False})),
+        ),
+    ]
+    with applied(patches):
+        response = await SearchPipeline().search(
+            **search_arguments(
+                top_k=4, document_types=document_types, user_hash=user_hash, debug=True
+            )
+        )
+    return response, exact_search
+
+
+@pytest.mark.asyncio
+async def test_sparse_filtered_approximate_result_is_refetched_exactly() -> None:
+    response, exact_search = await run_search(document_types=["catalog"])
+
+    assert exact_search.call_args.kwargs["target_accuracy"] == 100
+    summary = response.diagnostics["retrieval_summary"]
+    vector = next(item for item in summary["channels"] if item["channel"] == "vector:chunk_text")
+    assert vector["count"] == 12
+    assert vector["vector"]["target_accuracy"] == 95
+    assert vector["vector"]["requested"] == 20 and vector["vector"]["returned"] == 2
+    assert vector["vector"]["fallback"]["returned"] == 12
+    assert summary["vector_accuracy"]["fallbacks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_unfiltered_or_disabled_fallback_keeps_the_approximate_result(monkeypatch) -> None:
+    _, exact_search = await run_search(document_types=[])
+    monkeypatch.setenv("VECTOR_FALLBACK_MIN_RETURN_PERCENT", "0")
+    response, disabled_search = await run_search(document_types=["catalog"])
+
+    exact_search.assert_not_called()
+    disabled_search.assert_not_called()
+    assert response.diagnostics["retrieval_summary"]["vector_accuracy"]["fallbacks"] == 0
+
+
+@pytest.mark.asyncio
+async def test_unrestricted_user_is_not_treated_as_a_filtered_search() -> None:
+    unrestricted = DocumentAccess(document_ids=frozenset(), unrestricted=True)
+    _, exact_search = await run_search(document_types=[], user_hash="user", access=unrestricted)
+    restricted = DocumentAccess(document_ids=frozenset({"d-a1"}), unrestricted=False)
+    _, restricted_search = await run_search(document_types=[], user_hash="user", access=restricted)
+
+    exact_search.assert_not_called()
+    assert restricted_search.call_args.kwargs["target_accuracy"] == 100
+
+
+@pytest.mark.asyncio
+async def test_retry_is_skipped_when_the_recipe_has_no_more_rows() -> None:
+    response, exact_search = await run_search(
+        document_types=["catalog"], row_counts={"chunk_text": 2}
+    )
+
+    exact_search.assert_not_called()
+    summary = response.diagnostics["retrieval_summary"]
+    vector = next(item for item in summary["channels"] if item["channel"] == "vector:chunk_text")
+    assert vector["vector"]["fallback_skipped"] == "row_count"
+    assert summary["vector_accuracy"]["fallbacks"] == 0
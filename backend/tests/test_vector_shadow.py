@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import math
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+from app.rag import oracle_schema
+from app.rag.oracle_repository import rag_repository
+from app.rag.oracle_schema import build_vector_shadow
+from app.rag.pipeline_repository import pipeline_repository
+from app.rag.vector_shadow import quantize_binary, quantize_int8
+from tests.search_helpers import ScriptedCursor, scripted_database
+
+
+def cosine(left: list[float], right: list[float]) -> float:
+    dot = sum(a * b for a, b in zip(left, right))
+    return dot / (math.sqrt(sum(a * a for a in left)) * math.sqrt(sum(b * b for b in right)))
+
+
+def test_int8_keeps_cosine_and_binary_packs_sign_bits() -> None:
+    query = [0.03, -0.02, 0.01, 0.05, -0.04, 0.0, 0.02, -0.01]
+    near = [0.031, -0.018, 0.012, 0.049, -0.041, 0.001, 0.019, -0.012]
+    far = [-0.03, 0.02, 0.01, -0.05, 0.04, 0.0, -0.02, 0.01]
+
+    quantized = [list(quantize_int8(vector)) for vector in (query, near, far)]
+    assert max(abs(value) for value in quantized[0]) == 127
+    assert abs(cosine(quantized[0], quantized[1]) - cosine(query, near)) < 0.01
+    assert cosine(quantized[0], quantized[1]) > cosine(quantized[0], quantized[2])
+    assert list(quantize_binary(query)) == [0b10110010]
+    assert len(quantize_binary([0.1] * 1536)) == 192
+
+
+def run_vector_search(monkeypatch, target_accuracy: int) -> tuple[str, dict[str, Any]]:
+    monkeypatch.setenv("VECTOR_SHADOW_FORMAT", "binary")
+    monkeypatch.setenv("VECTOR_SHADOW_CANDIDATE_FACTOR", "4")
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.description = [("EVIDENCE_ID",)]
+    cursor.fetchall.return_value = []
+    with patch.object(rag_repository, "connection", return_value=context):
+        rag_repository.recipe_vector_search(
+            recipe_code="page_image",
+            embedding=[0.1, -0.2] * 768,
+            channel="vector:page_image",
+            top_k=20,
+            user_hash=None,
+            current_version_only=True,
+            document_types=[],
+            min_score=0.3,
+            target_accuracy=target_accuracy,
+        )
+    sql, binds = cursor.execute.call_args.args
+    return " ".join(sql.split()), binds
+
+
+def test_shadow_candidates_are_rescored_with_float32_cosine(monkeypatch) -> None:
+    sql, binds = run_vector_search(monkeypatch, 90)
+
+    assert "VECTOR_DISTANCE(ev.VECTOR_BINARY, :shadow_embedding, HAMMING)" in sql
+    assert "FETCH APPROX FIRST 80 ROWS ONLY WITH TARGET ACCURACY 90" in sql
+    assert sql.endswith(
+        "ORDER BY VECTOR_DISTANCE(shortlist.vector_value, :embedding, COSINE), "
+        "shortlist.embedding_id FETCH FIRST 20 ROWS ONLY"
+    )
+    assert "(1 - VECTOR_DISTANCE(shortlist.vector_value, :embedding, COSINE)) >= :min_score" in sql
+    assert binds["shadow_embedding"].typecode == "B" and len(binds["shadow_embedding"]) == 192
+
+
+def test_exact_search_skips_the_shadow_stage(monkeypatch) -> None:
+    sql, binds = run_vector_search(monkeypatch, 100)
+
+    assert "VECTOR_BINARY" not in sql and "shadow_embedding" not in binds
+    assert "FETCH EXACT FIRST 20 ROWS ONLY" in sql
+
+
+def test_store_embeddings_writes_the_shadow_column(monkeypatch) -> None:
+    monkeypatch.setenv("VECTOR_SHADOW_FORMAT", "INT8")
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    with patch.object(pipeline_repository, "connection", return_value=context):
+        pipeline_repository.store_embeddings(
+            run_id="run-1",
+            revision_id="rev-1",
+            recipe_revision_id="chunk_text_v1",
+            recipe_code="chunk_text",
+            values=[("artifact-1", "h" * 64, [0.5] + [0.0] * 1535, [])],
+        )
+
+    sql, binds = cursor.execute.call_args_list[0].args
+    assert "vector_value, VECTOR_INT8)" in " ".join(sql.split())
+    assert binds["shadow"].typecode == "b" and binds["shadow"][0] == 127
+
+
+def backfill_cursor(*, column_exists: bool, indexes: list[str]) -> ScriptedCursor:
+    batches = [[("e1", [0.1, -0.1]), ("e2", [-0.2, 0.3])], []]
+    return ScriptedCursor({
+        "USER_TAB_COLUMNS": [("VECTOR_INT8",)] if column_exists else [],
+        "USER_INDEXES": [(name,) for name in indexes],
+        "IS NULL FETCH FIRST": lambda: batches.pop(0),
+    })
+
+
+def run_build(cursor: ScriptedCursor) -> dict[str, Any]:
+    with patch.object(oracle_schema, "database_service", scripted_database(cursor)):
+        return build_vector_shadow()
+
+
+def test_shadow_column_is_added_backfilled_and_indexed(monkeypatch) -> None:
+    monkeypatch.setenv("VECTOR_SHADOW_FORMAT", "INT8")
+    monkeypatch.setenv("VECTOR_FLOAT_INDEX_ENABLED", "false")
+    cursor = backfill_cursor(column_exists=False, indexes=["SDS_EMBEDDING_HNSW_IDX"])
+
+    result = run_build(cursor)
+
+    assert result == {
+        "format": "INT8",
+        "steps": [
+            "add:VECTOR_INT8",
+            "backfill:VECTOR_INT8",
+            "create:SDS_EMBEDDING_INT8_IDX",
+            "drop:SDS_EMBEDDING_HNSW_IDX",
+        ],
+        "backfilled_rows": 2,
+    }
+    assert "ADD (VECTOR_INT8 VECTOR(*, INT8))" in cursor.statements[1]
+    assert [list(row["shadow"]) for row in cursor.updates] == [[127, -127], [-85, 127]]
+    create = next(item for item in cursor.statements if item.startswith("CREATE VECTOR INDEX"))
+    assert "(VECTOR_INT8)" in create and "DISTANCE COSINE" in create and create.endswith("LOCAL")
+
+
+def test_shadow_build_is_a_no_op_without_a_format(monkeypatch) -> None:
+    monkeypatch.delenv("VECTOR_SHADOW_FORMAT", raising=False)
+
+    assert build_vector_shadow() == {"format": None, "steps": [], "backfilled_rows": 0}
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest.mock import MagicMock, patch
+
+from app.rag.models import ProfileConfig
+from app.rag.oracle_repository import (
+    ChannelQuery,
+    oracle_text_query,
+    oracle_text_weighted_query,
+    rag_repository,
+)
+
+
+def profile(slot_no: int) -> ProfileConfig:
+    return ProfileConfig(
+        slot_no=slot_no,
+        name=f"profile {slot_no}",
+        enabled=True,
+        extraction_prompt="extract",
+        current_revision_id=f"p{slot_no}",
+    )
+
+
+def facet_row(slot_no: int, evidence_id: str) -> tuple[Any, ...]:
+    return (
+        0, 1, evidence_id, "d1", slot_no, "r1", 1, "VLM_TEXT", "vlm:1", None,
+        "text", "text", None, "a.pdf", "a.pdf", "bucket", 0.5,
+    )
+
+
+FACET_COLUMNS = [
+    (name,) for name in (
+        "branch_no", "branch_rank", "evidence_id", "document_id", "slot_no", "revision_id",
+        "page_number", "unit_kind", "source_locator", "bbox_json", "raw_text", "caption",
+        "asset_object_name", "file_name", "object_name", "bucket", "score",
+    )
+]
+
+
+def test_terms_shared_across_variants_are_weighted() -> None:
+    query = oracle_text_weighted_query(["ceiling light", "led light", "ダウンライト"])
+
+    assert query == "{ceiling} ACCUM {light}*2 ACCUM {led} ACCUM {ダウンライト}"
+    assert oracle_text_weighted_query(["ceiling light"]) == oracle_text_query("ceiling light")
+    assert oracle_text_weighted_query(["!!", "?"]) is None
+
+
+def test_merged_query_respects_the_term_limit(monkeypatch) -> None:
+    monkeypatch.setenv("ORACLE_TEXT_MAX_TERMS", "2")
+
+    query = oracle_text_weighted_query(["alpha beta", "gamma alpha"])
+
+    assert query == "{alpha}*2 ACCUM {beta}"
+
+
+def test_vlm_text_channels_share_one_contains_and_keep_their_slot() -> None:
+    context = MagicMock()
+    cursor = context.__enter__.return_value.cursor.return_value.__enter__.return_value
+    cursor.description = FACET_COLUMNS
+    cursor.fetchall.return_value = [facet_row(1, "f1"), facet_row(3, "f3")]
+    variants = ["ceiling light", "downlight"]
+    with patch.object(rag_repository, "connection", return_value=context):
+        results = rag_repository.multi_channel_search(
+            channels=[
+                ChannelQuery(
+                    kind="facet_keyword",
+                    channel=f"keyword:vlm_text_slot_{slot}",
+                    query=" ".join(variants),
+                    variants=variants,
+                    profile=profile(slot),
+                )
+                for slot in (1, 3)
+            ],
+            top_k=10,
+            user_hash=None,
+            current_version_only=True,
+            document_types=[],
+        )
+
+    sql, binds = cursor.execute.call_args.args
+    normalized = " ".join(sql.split())
+    assert normalized.count("CONTAINS(") == 1
+    assert "a.component_key IN ('vlm:' || TO_CHAR(:slot_0), 'vlm:' || TO_CHAR(:slot_0_1))" in normalized
+    assert "PARTITION BY ranked.slot_no" in normalized
+    assert (binds["slot_0"], binds["slot_0_1"]) == (1, 3)
+    assert binds["text_query_0"] == "{ceiling} ACCUM {light} ACCUM {downlight}"
+    assert [[hit.evidence_id for hit in result] for result in results] == [["f1"], ["f3"]]
+    assert [result[0].channel for result in results] == [
+        "keyword:vlm_text_slot_1",
+        "keyword:vlm_text_slot_3",
+    ]
@@ -28,6 +28,7 @@ let v2RetrievalActive = false;
 let currentSearchController = null;
 let searchCancelled = false;
 let searchProgressTimer = null;
+let provisionalResultHandler = null;
 const searchProgress = { startedAt: 0, state: {}, steps: new Map() };
 const defaultRetrievalModes = [
   'visual_vector',
@@ -233,6 +234,7 @@ function stepDetails(name) {
   const candidateMerge = searchProgress.state.candidateMerge || diagnostics.candidate_merge;
   const rerankSummary = searchProgress.state.rerankSummary || diagnostics.rerank_summary;
   const formatSummary = searchProgress.state.formatSummary || diagnostics.format_summary;
+  const verifySummary = searchProgress.state.verifySummary || diagnostics.verify_summary;
   if (name === 'query_variants' && queryPlan) {
     const sourceLabels = { deterministic: 'ルールベース', llm: 'LLM', off: '原文のみ' };
     return `
@@ -274,6 +276,19 @@ function stepDetails(name) {
       ${rerankSummary.degraded ? '<div>一部降格: rerank</div>' : ''}
     `;
   }
+  if (name === 'verify' && verifySummary) {
+    const verdictLabels = { verified: '合致', unverified: '不一致', failed: '失敗' };
+    return `
+      <div>確認済み: ${escapeHtml(verifySummary.completed)} / ${escapeHtml(verifySummary.candidate_count)}件</div>
+      ${verifySummary.stopped_early ? '<div>上位候補が揃ったため残りを省略</div>' : ''}
+      <div class="search-agent-step-grid">
+        ${(verifySummary.verdicts || []).map(verdict => `
+          <div>${escapeHtml(verdict.rank)}. ${escapeHtml(verdict.file_name)} p.${escapeHtml(verdict.page_number)}</div>
+          <div>${escapeHtml(verdictLabels[verdict.status] || verdict.status)}</div>
+        `).join('')}
+      </div>
+    `;
+  }
   if (name === 'format_results' && formatSummary) {
     return `
       <div>文書: ${escapeHtml(formatSummary.total_documents)}件</div>
@@ -349,7 +364,12 @@ function handleSearchEvent(event) {
   if (event.type === 'STATE_SNAPSHOT') searchProgress.state = event.snapshot || {};
   if (event.type === 'STEP_STARTED') searchProgress.steps.set(event.stepName, 'running');
   if (event.type === 'STEP_FINISHED') searchProgress.steps.set(event.stepName, 'done');
-  if (event.type === 'STATE_DELTA') applyStateDelta(event.delta);
+  if (event.type === 'STATE_DELTA') {
+    applyStateDelta(event.delta);
+    // リランク・LLM判定の完了前に届く暫定結果を先に表示する
+    const provisional = event.delta?.find(operation => operation.path === '/provisionalResult');
+    if (provisional?.value && provisionalResultHandler) provisionalResultHandler(provisional.value);
+  }
   if (event.type === 'RUN_FINISHED') {
     const result = event.result || searchProgress.state.result;
     if (result) searchProgress.state.result = result;
@@ -406,9 +426,10 @@ async function readSearchEventStream(response) {
   return finalResult;
 }
 
-async function streamSearch(endpoint, options) {
+async function streamSearch(endpoint, options, onProvisional = null) {
   searchCancelled = false;
   currentSearchController = new AbortController();
+  provisionalResultHandler = onProvisional;
   resetSearchProgress();
   try {
     const response = await authFetchWithAuth(endpoint, {
@@ -429,6 +450,7 @@ async function streamSearch(endpoint, options) {
     throw error;
   } finally {
     currentSearchController = null;
+    provisionalResultHandler = null;
   }
 }
 
@@ -686,7 +708,9 @@ export async function performImageSearch() {
     const data = usesEventStream ? await streamSearch(endpoint, {
       method: 'POST',
       body: formData
-    }) : await authApiCall(endpoint, {
+    }, provisional => displaySearchResults(
+      adaptV2Response(provisional, { includeImageSimilarity: true })
+    )) : await authApiCall(endpoint, {
       method: 'POST',
       body: formData,
       timeout: 70000
@@ -779,7 +803,7 @@ export async function performSearch() {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(requestBody)
-    }) : await authApiCall(endpoint, {
+    }, provisional => displaySearchResults(adaptV2Response(provisional))) : await authApiCall(endpoint, {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(requestBody),